@@ -13,6 +13,7 @@ import atexit
 
 # App/DB
 from database import db
+from services.model_events import register_model_change_listeners
 
 # Blueprints existentes
 from routes.auth import auth_bp
@@ -70,6 +71,7 @@ app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 52428800)
 # Extensões
 db.init_app(app)
 migrate = Migrate(app, db)
+register_model_change_listeners()
 CORS(app, resources={
     r"/api/*": {
         "origins": "*",
@@ -168,6 +170,18 @@ def setup_scheduler_jobs():
 def cleanup_resources():
     try:
         print("[Shutdown] Limpando recursos...")
+        # Não perder telemetria ainda não gravada
+        try:
+            from services.player_presence import player_presence
+            with app.app_context():
+                player_presence.flush()
+        except Exception as e:
+            print(f"[Shutdown] Falha ao gravar telemetria pendente: {e}")
+        try:
+            from services.media_jobs import media_jobs
+            media_jobs.shutdown()
+        except Exception as e:
+            print(f"[Shutdown] Falha ao encerrar pool de mídia: {e}")
         CONNECTED_PLAYERS.clear()
         SOCKET_SID_TO_PLAYER.clear()
         SOCKET_SID_TO_USER.clear()
@@ -232,12 +246,57 @@ def ensure_onboarding_columns():
             print(f"[Init] Aviso: não foi possível garantir colunas de onboarding: {e}")
 
 
+def ensure_media_columns():
+    """Garante colunas de mídia em bancos já existentes: contents.file_hash
+    (armazenamento por hash), contents.renditions (versões por dispositivo) e
+    campaigns.compiled_renditions (escada HLS do vídeo compilado)."""
+    columns = {
+        'contents': [
+            ('file_hash', ["ALTER TABLE contents ADD COLUMN file_hash VARCHAR(64) NULL",
+                           "CREATE INDEX ix_contents_file_hash ON contents (file_hash)"]),
+            ('renditions', ["ALTER TABLE contents ADD COLUMN renditions TEXT NULL"]),
+        ],
+        'campaigns': [
+            ('compiled_renditions', ["ALTER TABLE campaigns ADD COLUMN compiled_renditions TEXT NULL"]),
+        ],
+    }
+    with app.app_context():
+        try:
+            inspector = sa_inspect(db.engine)
+
+            def _add(statements):
+                try:
+                    for sql in statements:
+                        db.session.execute(text(sql))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[Init] Aviso ao adicionar coluna: {e}")
+
+            for table, table_columns in columns.items():
+                if not inspector.has_table(table):
+                    continue
+                existing = {col['name'] for col in inspector.get_columns(table)}
+                for name, statements in table_columns:
+                    if name not in existing:
+                        _add(statements)
+        except Exception as e:
+            print(f"[Init] Aviso: não foi possível garantir colunas de mídia: {e}")
+
+
 def create_tables():
     with app.app_context():
         try:
             db.create_all()
             # Garantir colunas de onboarding em bases existentes
             ensure_onboarding_columns()
+            ensure_media_columns()
+            # Carregar configurações do sistema no cache do processo
+            try:
+                from services.config_cache import config_cache
+                config_cache.load()
+            except Exception as e:
+                print(f"[Init] Aviso: não foi possível carregar configurações: {e}")
             admin = User.query.filter_by(email='admin@tvs.com').first()
             if not admin:
                 print("[Init] Criando usuário admin padrão...")
@@ -276,6 +335,21 @@ def start_application():
 
     create_tables()
 
+    # Retomar compilações que estavam na fila ou foram interrompidas
+    try:
+        from services.compile_queue import compile_queue
+        compile_queue.start(app)
+    except Exception as e:
+        print(f"[CompileQueue] Erro ao iniciar fila: {e}")
+
+    # Browser mDNS persistente: o registro de Chromecasts já estará populado no primeiro sync
+    try:
+        from services.chromecast_service import chromecast_service
+        if chromecast_service.start_registry(app):
+            print("[Cast] Registro de dispositivos Chromecast iniciado")
+    except Exception as e:
+        print(f"[Cast] Erro ao iniciar registro de dispositivos: {e}")
+
     try:
         if not scheduler.running:
             scheduler.start()
@@ -15,69 +15,41 @@ import time
 def _create_network_tables(cursor: sqlite3.Cursor):
     """Cria tabelas de séries temporais para monitoramento de tráfego
     (minute/hour/day) e seus respectivos índices, caso não existam.
+
+    Layout ts_epoch (início do bucket em segundos UTC), o mesmo de
+    monitoring/samples.py; bases com o layout antigo (ts_* em texto) são
+    convertidas por migrations/migrate_network_samples_epoch.py.
     """
-    # Minute table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS network_samples_minute (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        player_id TEXT NOT NULL,
-        ts_minute TEXT NOT NULL,
-        bytes INTEGER DEFAULT 0,
-        requests INTEGER DEFAULT 0,
-        video INTEGER DEFAULT 0,
-        image INTEGER DEFAULT 0,
-        audio INTEGER DEFAULT 0,
-        other INTEGER DEFAULT 0,
-        ip TEXT,
-        company TEXT,
-        location_id TEXT
-    )''')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsm_ts ON network_samples_minute(ts_minute)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsm_player_ts ON network_samples_minute(player_id, ts_minute)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsm_company_ts ON network_samples_minute(company, ts_minute)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsm_location_ts ON network_samples_minute(location_id, ts_minute)')
-
-    # Hour table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS network_samples_hour (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        player_id TEXT NOT NULL,
-        ts_hour TEXT NOT NULL,
-        bytes INTEGER DEFAULT 0,
-        requests INTEGER DEFAULT 0,
-        video INTEGER DEFAULT 0,
-        image INTEGER DEFAULT 0,
-        audio INTEGER DEFAULT 0,
-        other INTEGER DEFAULT 0,
-        ip TEXT,
-        company TEXT,
-        location_id TEXT
-    )''')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsh_ts ON network_samples_hour(ts_hour)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsh_player_ts ON network_samples_hour(player_id, ts_hour)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsh_company_ts ON network_samples_hour(company, ts_hour)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsh_location_ts ON network_samples_hour(location_id, ts_hour)')
-
-    # Day table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS network_samples_day (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        player_id TEXT NOT NULL,
-        ts_day TEXT NOT NULL,
-        bytes INTEGER DEFAULT 0,
-        requests INTEGER DEFAULT 0,
-        video INTEGER DEFAULT 0,
-        image INTEGER DEFAULT 0,
-        audio INTEGER DEFAULT 0,
-        other INTEGER DEFAULT 0,
-        ip TEXT,
-        company TEXT,
-        location_id TEXT
-    )''')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsd_ts ON network_samples_day(ts_day)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsd_player_ts ON network_samples_day(player_id, ts_day)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsd_company_ts ON network_samples_day(company, ts_day)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nsd_location_ts ON network_samples_day(location_id, ts_day)')
+    for table, unique in [
+        ('network_samples_minute', False),
+        ('network_samples_hour', True),
+        ('network_samples_day', True),
+    ]:
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id TEXT NOT NULL,
+            ts_epoch INTEGER NOT NULL,
+            bytes INTEGER DEFAULT 0,
+            requests INTEGER DEFAULT 0,
+            video INTEGER DEFAULT 0,
+            image INTEGER DEFAULT 0,
+            audio INTEGER DEFAULT 0,
+            other INTEGER DEFAULT 0,
+            ip TEXT,
+            company TEXT,
+            location_id TEXT
+        )''')
+        cursor.execute(f'PRAGMA table_info({table})')
+        if 'ts_epoch' not in [row[1] for row in cursor.fetchall()]:
+            # Layout antigo: índices e conversão ficam com a migração dedicada
+            continue
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(ts_epoch)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_player_ts ON {table}(player_id, ts_epoch)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_company_ts ON {table}(company, ts_epoch)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_location_ts ON {table}(location_id, ts_epoch)')
+        if unique:
+            cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_player_ts ON {table}(player_id, ts_epoch)')
 
 
 def _resolve_db_path(cli_path: str | None = None):
@@ -211,12 +183,17 @@ def run_migration():
 
                 # Configurações de Monitoramento/Tráfego
                 ('monitor.emit_interval_sec', '30', 'int', 'Intervalo (s) para emitir estatísticas em tempo real'),
+                ('monitor.admin_broadcast_interval_sec', '1', 'int', 'Intervalo (s) para agrupar atualizações de status enviadas aos admins'),
                 ('monitor.overuse_window_min', '1', 'int', 'Janela (min) para cálculo de bytes/min e req/min'),
                 ('monitor.overuse_bpm_mb', '100', 'int', 'Limite de bytes/min em MB para alertar sobreuso'),
                 ('monitor.overuse_rpm', '300', 'int', 'Limite de requisições/min para alertar sobreuso'),
                 ('monitor.sample_retention_days', '30', 'int', 'Dias de retenção dos samples agregados'),
                 ('monitor.enable_persist', 'true', 'bool', 'Persistir métricas (minute/hour/day) no banco'),
-                ('monitor.enable_system_stats', 'true', 'bool', 'Coletar e expor métricas do servidor (CPU/RAM/NET)')
+                ('monitor.enable_system_stats', 'true', 'bool', 'Coletar e expor métricas do servidor (CPU/RAM/NET)'),
+
+                # Configurações de Compilação de Vídeo
+                ('compile.max_concurrent', '1', 'int', 'Compilações de vídeo simultâneas na fila global'),
+                ('compile.ffmpeg_threads', '0', 'int', 'Threads por processo FFmpeg na compilação (0 = automático)')
             ]
 
             now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Migração: conteúdos legados para o armazenamento por hash
+Move arquivos enviados antes de services.media_store (nomes UUID na raiz de
+UPLOAD_FOLDER) para media/<aa>/<sha256><ext>, preenchendo contents.file_hash e
+deduplicando arquivos idênticos em media_blobs. Conteúdos cujo arquivo não
+existe mais no disco são apenas listados.
+
+Uso:
+    python migrations/migrate_content_addressed_store.py [--keep-files]
+"""
+
+import argparse
+import os
+import sys
+
+# Garantir que estamos no diretório backend
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if 'migrations' in backend_dir:
+    backend_dir = os.path.dirname(backend_dir)
+sys.path.insert(0, backend_dir)
+
+from app import app, ensure_media_columns
+from database import db
+from models.content import Content
+from services import media_store
+from services.media_server import media_index, upload_path
+
+
+def upgrade(keep_files=False):
+    """Aplicar migração - mover uploads legados para media_blobs"""
+
+    print("🔧 Aplicando migração: armazenamento de mídia por hash...")
+
+    ensure_media_columns()
+    with app.app_context():
+        db.create_all()
+        migrated = deduplicated = missing = 0
+        try:
+            legacy = Content.query.filter(Content.file_hash.is_(None), Content.file_path.isnot(None)).all()
+            for content in legacy:
+                rel_path = media_store.media_rel_path(content.file_path)
+                legacy_path = upload_path(rel_path)
+                if not rel_path or not os.path.isfile(legacy_path):
+                    missing += 1
+                    print(f"⚠️  Arquivo ausente para '{content.title}' ({content.file_path})")
+                    continue
+                with open(legacy_path, 'rb') as f:
+                    blob = media_store.ingest_stream(f, rel_path, content.mime_type)
+                if blob.ref_count > 1:
+                    deduplicated += 1
+                original_path = content.file_path
+                media_store.attach(content, blob)
+                db.session.commit()
+                migrated += 1
+
+                # Outro conteúdo legado ainda aponta para o mesmo arquivo: remover só no último
+                still_used = Content.query.filter(Content.file_hash.is_(None),
+                                                  Content.file_path == original_path).count()
+                if not keep_files and not still_used:
+                    os.remove(legacy_path)
+                    media_index.invalidate(legacy_path)
+
+            print(f"✅ {migrated} conteúdos migrados ({deduplicated} deduplicados, {missing} sem arquivo)")
+            print("🎉 Migração aplicada com sucesso!")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Erro durante migração: {e}")
+            raise
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move uploads legados para o armazenamento por hash')
+    parser.add_argument('--keep-files', action='store_true', help='não remover os arquivos legados após a cópia')
+    args = parser.parse_args()
+    upgrade(keep_files=args.keep_files)
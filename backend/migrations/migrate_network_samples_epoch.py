@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Migração: network_samples_* com timestamp inteiro (ts_epoch)
+Converte as colunas ts_minute/ts_hour/ts_day (texto ISO) para ts_epoch (BIGINT,
+início do bucket em segundos UTC) e, no MariaDB/MySQL, recria as tabelas
+particionadas por dia. A aplicação faz a mesma conversão na inicialização;
+rodar este script antes do deploy evita a espera com tabelas grandes.
+
+As tabelas antigas são mantidas como <tabela>_legacy_<timestamp> (remova
+manualmente após conferir os dados).
+
+Uso:
+    python migrations/migrate_network_samples_epoch.py [--chunk 50000]
+"""
+
+import argparse
+import os
+import sys
+
+# Garantir que estamos no diretório backend
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if 'migrations' in backend_dir:
+    backend_dir = os.path.dirname(backend_dir)
+sys.path.insert(0, backend_dir)
+
+from app import app
+from database import db
+from monitoring.samples import MIGRATION_CHUNK, migrate_legacy_tables, ensure_sample_tables
+
+
+def upgrade(chunk=MIGRATION_CHUNK):
+    """Aplicar migração - converter network_samples_* para ts_epoch"""
+
+    print("🔧 Aplicando migração: network_samples_* com ts_epoch...")
+
+    with app.app_context():
+        try:
+            migrated = migrate_legacy_tables(db.engine, chunk=chunk)
+            ensure_sample_tables(db.engine)
+            if migrated:
+                for table, rows in migrated.items():
+                    print(f"✅ {table}: {rows} linhas convertidas")
+            else:
+                print("✅ Tabelas já estão no layout ts_epoch")
+            print("🎉 Migração aplicada com sucesso!")
+        except Exception as e:
+            print(f"❌ Erro durante migração: {e}")
+            raise
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converte network_samples_* para ts_epoch')
+    parser.add_argument('--chunk', type=int, default=MIGRATION_CHUNK, help='linhas copiadas por transação')
+    args = parser.parse_args()
+    upgrade(chunk=args.chunk)
@@ -45,6 +45,8 @@ class Campaign(db.Model):
     compiled_stale = db.Column(db.Boolean, default=True)
     compiled_video_resolution = db.Column(db.String(20))  # e.g., 1920x1080
     compiled_video_fps = db.Column(db.Integer)
+    # Escada HLS/fMP4 (JSON): {"master": caminho do master.m3u8, "renditions": [{label, width, height, bandwidth, path, playlist}]}
+    compiled_renditions = db.Column(db.Text)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -56,6 +58,7 @@ class Campaign(db.Model):
     background_audio = db.relationship('Content', foreign_keys=[background_audio_content_id], lazy=True)
     
     def to_dict(self):
+        ladder = self.get_compiled_renditions()
         return {
             'id': self.id,
             'name': self.name,
@@ -85,7 +88,18 @@ class Campaign(db.Model):
             'compiled_stale': self.compiled_stale,
             'compiled_video_resolution': self.compiled_video_resolution,
             'compiled_video_fps': self.compiled_video_fps,
+            'compiled_hls_url': (f"/uploads/{ladder['master']}" if ladder.get('master') else None),
+            'compiled_renditions': [
+                dict(r, url=f"/uploads/{r['path']}") for r in ladder.get('renditions', [])
+            ],
         }
+
+    def get_compiled_renditions(self):
+        """Escada de renditions do vídeo compilado ({} se não houver)."""
+        try:
+            return json.loads(self.compiled_renditions) if self.compiled_renditions else {}
+        except (TypeError, ValueError):
+            return {}
     
     def get_active_contents(self, order_by_index=True):
         """Retorna conteúdos ativos da campanha"""
@@ -0,0 +1,46 @@
+from datetime import datetime
+import uuid
+from database import db
+
+
+class CompileJob(db.Model):
+    """Job da fila de compilação de vídeos de campanha (services.compile_queue).
+
+    Persistido para que jobs enfileirados ou interrompidos sobrevivam a reinícios.
+    """
+    __tablename__ = 'compile_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    campaign_id = db.Column(db.String(36), db.ForeignKey('campaigns.id', ondelete='CASCADE'), nullable=False, index=True)
+    # queued, running, completed, failed, cancelled
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # maior = antes
+    resolution = db.Column(db.String(20))
+    fps = db.Column(db.Integer)
+    background_audio_content_id = db.Column(db.String(36))
+    requested_by = db.Column(db.String(36))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'campaign_id': self.campaign_id,
+            'status': self.status,
+            'priority': self.priority,
+            'resolution': self.resolution,
+            'fps': self.fps,
+            'background_audio_content_id': self.background_audio_content_id,
+            'requested_by': self.requested_by,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<CompileJob {self.campaign_id} {self.status}>'
@@ -23,10 +23,13 @@ class Content(db.Model):
     description = db.Column(db.Text)
     content_type = db.Column(db.String(50), nullable=False)  # image, video, text, html, rss
     file_path = db.Column(db.String(500))
+    file_hash = db.Column(db.String(64), index=True)  # SHA-256 calculado no upload (media_blobs)
     thumbnail_path = db.Column(db.String(500))  # Caminho para thumbnail/miniatura
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
     duration = db.Column(db.Integer, default=10)  # segundos para exibição
+    # Versões derivadas (JSON, services.renditions): {"source": {...}, "video": {perfil: {path, width, height, kbps, size}}}
+    renditions = db.Column(db.Text)
     tags = db.Column(db.Text)  # JSON array de tags
     category = db.Column(db.String(100))
     is_active = db.Column(db.Boolean, default=True)
@@ -68,6 +71,8 @@ class Content(db.Model):
             'description': self.description,
             'content_type': self.content_type,
             'file_path': self.file_path,
+            'file_hash': self.file_hash,
+            'renditions': self.get_renditions(),
             'thumbnail_path': self.thumbnail_path,
             'file_size': self.file_size,
             'mime_type': self.mime_type,
@@ -81,5 +86,17 @@ class Content(db.Model):
             'author': self.author.username if hasattr(self, 'author') and self.author else None
         }
     
+    def get_renditions(self):
+        """Versões derivadas do arquivo ({} se ainda não processadas)."""
+        try:
+            return json.loads(self.renditions) if self.renditions else {}
+        except (TypeError, ValueError):
+            return {}
+
+    @property
+    def checksum(self):
+        """SHA-256 do arquivo, persistido no upload (sem reler o disco)."""
+        return self.file_hash
+
     def __repr__(self):
         return f'<Content {self.title}>'
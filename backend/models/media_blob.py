@@ -0,0 +1,31 @@
+from datetime import datetime
+from database import db
+
+
+class MediaBlob(db.Model):
+    """Arquivo armazenado por conteúdo (SHA-256) em UPLOAD_FOLDER/media/.
+
+    Vários Content podem apontar para o mesmo blob (mesmo file_hash);
+    ref_count conta essas referências e o arquivo é removido ao chegar a zero.
+    """
+    __tablename__ = 'media_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    file_path = db.Column(db.String(500), nullable=False)  # relativo a UPLOAD_FOLDER
+    file_size = db.Column(db.BigInteger, default=0)
+    mime_type = db.Column(db.String(100))
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'file_path': self.file_path,
+            'file_size': self.file_size,
+            'mime_type': self.mime_type,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def __repr__(self):
+        return f'<MediaBlob {self.sha256[:12]} refs={self.ref_count}>'
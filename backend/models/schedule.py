@@ -70,7 +70,10 @@ class Schedule(db.Model):
     campaign = db.relationship('Campaign', overlaps="schedules", lazy=True)
     player = db.relationship('Player', overlaps="schedules", lazy=True)
     
-    def to_dict(self):
+    def to_dict(self, has_conflicts=None):
+        """Projeção completa. `has_conflicts` pré-calculado em lote evita uma consulta por linha."""
+        if has_conflicts is None:
+            has_conflicts = self.has_conflicts_with_other_schedules()
         return {
             'id': self.id,
             'name': self.name,
@@ -106,7 +109,32 @@ class Schedule(db.Model):
             'campaign_name': self.campaign.name if self.campaign else None,
             'location_name': self.player.location.name if (self.player and self.player.location) else None,
             'is_all_day': self.is_all_day,
-            'has_conflicts': self.has_conflicts_with_other_schedules()
+            'has_conflicts': has_conflicts
+        }
+
+    def to_summary_dict(self, has_conflicts=None):
+        """Projeção leve para listas e calendários (sem player/campanha embutidos)."""
+        if has_conflicts is None:
+            has_conflicts = self.has_conflicts_with_other_schedules()
+        return {
+            'id': self.id,
+            'name': self.name,
+            'campaign_id': self.campaign_id,
+            'campaign_name': self.campaign.name if self.campaign else None,
+            'player_id': self.player_id,
+            'player_name': self.player.name if self.player else None,
+            'location_name': self.player.location.name if (self.player and self.player.location) else None,
+            'start_date': fmt_br_datetime(self.start_date),
+            'end_date': fmt_br_datetime(self.end_date),
+            'start_time': self.start_time.strftime('%H:%M:%S') if self.start_time else None,
+            'end_time': self.end_time.strftime('%H:%M:%S') if self.end_time else None,
+            'days_of_week': self.days_of_week,
+            'priority': self.priority,
+            'is_persistent': self.is_persistent,
+            'content_type': self.content_type,
+            'is_active': self.is_active,
+            'is_all_day': self.is_all_day,
+            'has_conflicts': has_conflicts
         }
     
     def get_filtered_contents(self):
@@ -161,45 +189,10 @@ class Schedule(db.Model):
         """Retorna o modo de reprodução configurado no agendamento"""
         return self.playback_mode or 'sequential'
     
-    def is_active_now(self):
-        """Verifica se o agendamento deve estar ativo agora"""
-        now = datetime.now()
-        current_date = now.date()
-        current_time = now.time()
-        current_weekday = now.weekday()
-        
-        # Verificar se está no período de datas
-        if current_date < self.start_date.date() or current_date > self.end_date.date():
-            return False
-        
-        # Normalizar dias da semana do formato frontend (1=Seg..6=Sáb, 0=Dom) para Python (0=Seg..6=Dom)
-        if self.days_of_week:
-            try:
-                allowed_days_raw = [int(d.strip()) for d in self.days_of_week.split(',')]
-                allowed_days = [(6 if d == 0 else d - 1) for d in allowed_days_raw]
-            except Exception:
-                allowed_days = list(range(7))
-        else:
-            allowed_days = list(range(7))
-        
-        # Verificar horário com suporte a overnight e boundary de dia
-        if self.start_time <= self.end_time:
-            # Janela no mesmo dia
-            if current_weekday not in allowed_days:
-                return False
-            if not (self.start_time <= current_time <= self.end_time):
-                return False
-        else:
-            # Janela overnight (ex: 22:00 -> 06:00)
-            in_window = (current_time >= self.start_time) or (current_time <= self.end_time)
-            if not in_window:
-                return False
-            # Se estamos na madrugada (antes do end_time), validar contra o dia anterior
-            weekday_to_check = current_weekday if current_time >= self.start_time else (current_weekday - 1) % 7
-            if weekday_to_check not in allowed_days:
-                return False
-        
-        return True
+    def is_active_now(self, now=None):
+        """Verifica se o agendamento deve estar ativo agora (vigência, dias e horário)"""
+        from services.schedule_predicates import is_schedule_active
+        return is_schedule_active(self, now or datetime.now())
     
     def set_content_filter(self, content_type=None, content_ids=None, location_filter=None, 
                           time_filter=None, custom_filters=None):
@@ -337,8 +330,10 @@ class Schedule(db.Model):
         if not self.player_id or not self.start_date or not self.end_date:
             return False
             
+        from services.schedule_conflicts import ScheduleConflictIndex
+        
         # Buscar outros agendamentos ativos do mesmo player no mesmo período
-        conflicting_schedules = Schedule.query.filter(
+        others = Schedule.query.filter(
             Schedule.id != self.id,
             Schedule.player_id == self.player_id,
             Schedule.is_active == True,
@@ -346,47 +341,13 @@ class Schedule(db.Model):
             Schedule.end_date >= self.start_date
         ).all()
         
-        if not conflicting_schedules:
+        if not others:
             return False
             
-        # Verificar conflitos de horário e dias da semana
-        self_days = set(map(int, self.days_of_week.split(','))) if self.days_of_week else set()
-        
-        for other_schedule in conflicting_schedules:
-            other_days = set(map(int, other_schedule.days_of_week.split(','))) if other_schedule.days_of_week else set()
-            
-            # Se há dias em comum
-            if self_days.intersection(other_days):
-                # Verificar conflito de horário
-                if self._has_time_conflict(other_schedule):
-                    return True
-                    
-        return False
+        # Como o _has_time_conflict original: sem horário conflita o dia todo
+        return ScheduleConflictIndex([self] + others, missing_times_all_day=True).has_conflicts(self.id)
     
     @property
     def is_all_day(self):
         """Verifica se o agendamento é para o dia inteiro (24/7)"""
         return (self.start_time == time(0, 0, 0) and self.end_time == time(23, 59, 59)) if (self.start_time and self.end_time) else False
-    
-    def _has_time_conflict(self, other_schedule):
-        """Verifica se há conflito de horário entre dois agendamentos"""
-        # Se ambos são dia inteiro, há conflito
-        if self.is_all_day and other_schedule.is_all_day:
-            return True
-            
-        # Se um é dia inteiro e o outro não, há conflito
-        if self.is_all_day or other_schedule.is_all_day:
-            return True
-            
-        # Verificar conflito de horários específicos
-        if not self.start_time or not self.end_time or not other_schedule.start_time or not other_schedule.end_time:
-            return True
-            
-        # Converter horários para minutos para facilitar comparação
-        self_start_min = self.start_time.hour * 60 + self.start_time.minute
-        self_end_min = self.end_time.hour * 60 + self.end_time.minute
-        other_start_min = other_schedule.start_time.hour * 60 + other_schedule.start_time.minute
-        other_end_min = other_schedule.end_time.hour * 60 + other_schedule.end_time.minute
-        
-        # Verificar sobreposição de horários
-        return not (self_end_min <= other_start_min or other_end_min <= self_start_min)
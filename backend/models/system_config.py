@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.sql import func
+import copy
 import json
 from datetime import datetime
 
@@ -52,11 +54,9 @@ class SystemConfig(db.Model):
 
     @staticmethod
     def get_value(key, default=None):
-        """Obtém o valor de uma configuração pelo nome da chave"""
-        config = SystemConfig.query.filter_by(key=key).first()
-        if config:
-            return config.get_typed_value()
-        return default
+        """Obtém o valor de uma configuração pelo nome da chave (via cache do processo)"""
+        from services.config_cache import config_cache
+        return config_cache.get(key, default)
 
     @staticmethod
     def set_value(key, value, value_type=None, description=None):
@@ -117,11 +117,37 @@ class SystemConfig(db.Model):
     @staticmethod
     def get_all_configs():
         """Retorna todas as configurações como dicionário"""
-        configs = SystemConfig.query.all()
-        return {config.key: config.get_typed_value() for config in configs}
+        from services.config_cache import config_cache
+        return copy.deepcopy(config_cache.snapshot())
 
     @staticmethod
     def get_configs_by_prefix(prefix):
         """Retorna todas as configurações que começam com o prefixo especificado"""
-        configs = SystemConfig.query.filter(SystemConfig.key.startswith(prefix)).all()
-        return {config.key: config.get_typed_value() for config in configs}
+        from services.config_cache import config_cache
+        return copy.deepcopy({key: value for key, value in config_cache.snapshot().items() if key.startswith(prefix)})
+
+
+class SystemConfigVersion(db.Model):
+    """Contador de versão das configurações (linha única, id=1).
+
+    Incrementado na mesma transação de qualquer INSERT/UPDATE/DELETE em
+    system_configs; outros processos comparam com a versão do seu cache
+    para saber quando recarregar.
+    """
+    __tablename__ = 'system_config_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+def _bump_config_version(mapper, connection, target):
+    table = SystemConfigVersion.__table__
+    result = connection.execute(
+        table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+    )
+    if not result.rowcount:
+        connection.execute(table.insert().values(id=1, version=1))
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(SystemConfig, _event_name, _bump_config_version)
@@ -0,0 +1,132 @@
+"""Contadores de tráfego de /uploads particionados por thread (shards).
+
+O middleware de monitoramento roda em toda requisição de mídia. Em vez de
+disputar o TRAFFIC_LOCK global (duas vezes por hit) e montar timestamps ISO,
+cada thread grava num shard próprio (atribuído em round-robin no primeiro uso;
+o lock do shard praticamente nunca é disputado) com o minuto como inteiro epoch.
+
+`merge()` transfere os shards para as estruturas globais de monitoring.state
+(TRAFFIC_STATS, TRAFFIC_MINUTE, UPLOAD_METRICS['status_counts']); é chamado
+pelos jobs de flush/emissão e pelas rotas antes de lê-las.
+"""
+import itertools
+import threading
+from datetime import datetime
+
+from models.schedule import fmt_br_datetime
+from .state import TRAFFIC_STATS, TRAFFIC_MINUTE, TRAFFIC_LOCK, UPLOAD_METRICS
+
+SHARD_COUNT = 16
+
+STATUS_KEYS = ('200', '206', '304', '4xx', '5xx')
+
+
+def status_key(status):
+    """Classe de status HTTP usada nos contadores (None para as não contabilizadas)."""
+    if status in (200, 206, 304):
+        return str(status)
+    if 400 <= status < 500:
+        return '4xx'
+    if status >= 500:
+        return '5xx'
+    return None
+
+
+class _Shard:
+    __slots__ = ('lock', 'players', 'minutes', 'status_counts', 'total_bytes')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.players = {}        # pid -> [bytes, requests, {categoria: bytes}, {status: n}, último hit (epoch)]
+        self.minutes = {}        # (pid, minuto epoch) -> [bytes, requests, {categoria: bytes}]
+        self.status_counts = {}  # status -> n
+        self.total_bytes = 0
+
+
+class TrafficCounters:
+    def __init__(self, shard_count=SHARD_COUNT):
+        self._shards = [_Shard() for _ in range(shard_count)]
+        self._local = threading.local()
+        self._next_shard = itertools.count()
+        self._merge_lock = threading.Lock()
+        self._last_hit = {}  # pid -> epoch do último hit já refletido em last_seen
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._shards[next(self._next_shard) % len(self._shards)]
+            self._local.shard = shard
+        return shard
+
+    def record(self, pid, now, bytes_sent, category, status):
+        """Contabiliza um hit de mídia; `now` é time.time() da requisição."""
+        minute = int(now) // 60 * 60
+        sc_key = status_key(status)
+        shard = self._shard()
+        with shard.lock:
+            pstats = shard.players.get(pid)
+            if pstats is None:
+                pstats = shard.players[pid] = [0, 0, {}, {}, 0.0]
+            pstats[0] += bytes_sent
+            pstats[1] += 1
+            pstats[2][category] = pstats[2].get(category, 0) + bytes_sent
+            if sc_key:
+                pstats[3][sc_key] = pstats[3].get(sc_key, 0) + 1
+                shard.status_counts[sc_key] = shard.status_counts.get(sc_key, 0) + 1
+            pstats[4] = now
+            bucket = shard.minutes.get((pid, minute))
+            if bucket is None:
+                bucket = shard.minutes[(pid, minute)] = [0, 0, {}]
+            bucket[0] += bytes_sent
+            bucket[1] += 1
+            bucket[2][category] = bucket[2].get(category, 0) + bytes_sent
+            shard.total_bytes += bytes_sent
+
+    def merge(self):
+        """Soma os shards em TRAFFIC_STATS/TRAFFIC_MINUTE/UPLOAD_METRICS e os esvazia."""
+        with self._merge_lock:
+            drained = []
+            for shard in self._shards:
+                with shard.lock:
+                    if not shard.players:
+                        continue
+                    drained.append((shard.players, shard.minutes, shard.status_counts, shard.total_bytes))
+                    shard.players, shard.minutes, shard.status_counts, shard.total_bytes = {}, {}, {}, 0
+            if not drained:
+                return
+            with TRAFFIC_LOCK:
+                for players, minutes, status_counts, total_bytes in drained:
+                    for pid, (nbytes, requests, by_type, statuses, last_hit) in players.items():
+                        pstats = TRAFFIC_STATS['players'].setdefault(pid, {
+                            'bytes': 0,
+                            'requests': 0,
+                            'by_type': {'video': 0, 'image': 0, 'audio': 0, 'other': 0},
+                            'status_counts': {key: 0 for key in STATUS_KEYS},
+                            'last_seen': None
+                        })
+                        pstats['bytes'] += nbytes
+                        pstats['requests'] += requests
+                        for category, value in by_type.items():
+                            pstats['by_type'][category] = pstats['by_type'].get(category, 0) + value
+                        pcounts = pstats.setdefault('status_counts', {key: 0 for key in STATUS_KEYS})
+                        for key, value in statuses.items():
+                            pcounts[key] = pcounts.get(key, 0) + value
+                        if self._last_hit.get(pid, 0) <= last_hit:
+                            self._last_hit[pid] = last_hit
+                            pstats['last_seen'] = fmt_br_datetime(datetime.fromtimestamp(last_hit))
+                    for (pid, minute), (nbytes, requests, by_type) in minutes.items():
+                        bucket = TRAFFIC_MINUTE.setdefault(pid, {}).setdefault(minute, {
+                            'bytes': 0, 'requests': 0,
+                            'by_type': {'video': 0, 'image': 0, 'audio': 0, 'other': 0}
+                        })
+                        bucket['bytes'] += nbytes
+                        bucket['requests'] += requests
+                        for category, value in by_type.items():
+                            bucket['by_type'][category] = bucket['by_type'].get(category, 0) + value
+                    for key, value in status_counts.items():
+                        UPLOAD_METRICS['status_counts'][key] = UPLOAD_METRICS['status_counts'].get(key, 0) + value
+                    TRAFFIC_STATS['total_bytes'] += total_bytes
+
+
+# Instância global dos contadores de tráfego
+traffic_counters = TrafficCounters()
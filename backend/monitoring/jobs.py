@@ -2,254 +2,273 @@ from datetime import datetime, timezone, timedelta
 from sqlalchemy import text
 
 from database import db
-from models.player import Player
 from models.system_config import SystemConfig
 
 from .state import TRAFFIC_STATS, TRAFFIC_MINUTE, TRAFFIC_LOCK
+from .counters import traffic_counters
 from .utils import collect_system_stats
+from .samples import (
+    SAMPLE_TABLES, bucket_epoch, ensure_sample_tables,
+    ensure_future_partitions, drop_partitions_before,
+)
 
 
-def _ensure_network_tables():
+# Engines (por URL) cujas tabelas de samples já foram verificadas neste processo
+_NETWORK_TABLES_READY = set()
+
+# Linhas por execute() no INSERT em lote
+SAMPLE_INSERT_CHUNK = 1000
+
+_INSERT_MINUTE_SQL = text('''\
+    INSERT INTO network_samples_minute (
+        player_id, ts_epoch, bytes, requests, video, image, audio, other, ip, company, location_id
+    ) VALUES (:player_id, :ts_epoch, :bytes, :requests, :video, :image, :audio, :other, :ip, :company, :location_id)
+''')
+
+
+def _ensure_network_tables(force=False):
+    """Cria/converte as tabelas de samples se necessário (DDL executada uma vez por processo)."""
     try:
         engine = db.engine
-        is_mysql = (engine.dialect.name or '').startswith('mysql')
-        with engine.begin() as conn:
-            for table, ts_col in [
-                ('network_samples_minute', 'ts_minute'),
-                ('network_samples_hour', 'ts_hour'),
-                ('network_samples_day', 'ts_day')
-            ]:
-                if is_mysql:
-                    create_sql = f'''\
-                        CREATE TABLE IF NOT EXISTS {table} (
-                            id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                            player_id VARCHAR(36) NOT NULL,
-                            {ts_col} VARCHAR(32) NOT NULL,
-                            bytes BIGINT DEFAULT 0,
-                            requests INT DEFAULT 0,
-                            video BIGINT DEFAULT 0,
-                            image BIGINT DEFAULT 0,
-                            audio BIGINT DEFAULT 0,
-                            other BIGINT DEFAULT 0,
-                            ip VARCHAR(45),
-                            company VARCHAR(100),
-                            location_id VARCHAR(36)
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    '''
-                else:
-                    create_sql = f'''\
-                        CREATE TABLE IF NOT EXISTS {table} (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            player_id TEXT NOT NULL,
-                            {ts_col} TEXT NOT NULL,
-                            bytes INTEGER DEFAULT 0,
-                            requests INTEGER DEFAULT 0,
-                            video INTEGER DEFAULT 0,
-                            image INTEGER DEFAULT 0,
-                            audio INTEGER DEFAULT 0,
-                            other INTEGER DEFAULT 0,
-                            ip TEXT,
-                            company TEXT,
-                            location_id TEXT
-                        )
-                    '''
-                conn.execute(text(create_sql))
-
-                # Índices com nomes determinísticos por tabela/coluna
-                idx_ts = f'idx_{table}_{ts_col}'
-                idx_player_ts = f'idx_{table}_player_{ts_col}'
-                idx_company_ts = f'idx_{table}_company_{ts_col}'
-                idx_location_ts = f'idx_{table}_location_{ts_col}'
-
-                index_statements = [
-                    f'CREATE INDEX IF NOT EXISTS {idx_ts} ON {table}({ts_col})',
-                    f'CREATE INDEX IF NOT EXISTS {idx_player_ts} ON {table}(player_id, {ts_col})',
-                    f'CREATE INDEX IF NOT EXISTS {idx_company_ts} ON {table}(company, {ts_col})',
-                    f'CREATE INDEX IF NOT EXISTS {idx_location_ts} ON {table}(location_id, {ts_col})',
-                ]
-
-                for stmt in index_statements:
-                    try:
-                        conn.execute(text(stmt))
-                    except Exception as _e:
-                        # MariaDB < 10.5 pode não suportar IF NOT EXISTS em CREATE INDEX
-                        # Tenta sem IF NOT EXISTS e ignora erro de índice duplicado
-                        try:
-                            fallback = stmt.replace(' IF NOT EXISTS', '')
-                            conn.execute(text(fallback))
-                        except Exception as __e:
-                            msg = str(__e).lower()
-                            if 'duplicate key name' not in msg and 'already exists' not in msg:
-                                raise
+        engine_key = str(engine.url)
+        if engine_key in _NETWORK_TABLES_READY and not force:
+            return
+        ensure_sample_tables(engine)
+        _NETWORK_TABLES_READY.add(engine_key)
     except Exception as e:
         print(f"[Monitor] Falha ao garantir tabelas de samples: {e}")
 
 
-def flush_traffic_minute_now():
+def _restore_traffic_minute(snapshot):
+    """Devolve buckets não gravados para TRAFFIC_MINUTE (somando com os que chegaram depois)."""
+    with TRAFFIC_LOCK:
+        for pid, buckets in snapshot.items():
+            pminute = TRAFFIC_MINUTE.setdefault(pid, {})
+            for ts_minute, data in buckets.items():
+                bucket = pminute.setdefault(ts_minute, {
+                    'bytes': 0, 'requests': 0,
+                    'by_type': {'video': 0, 'image': 0, 'audio': 0, 'other': 0}
+                })
+                bucket['bytes'] += data.get('bytes', 0)
+                bucket['requests'] += data.get('requests', 0)
+                for category, value in data.get('by_type', {}).items():
+                    bucket['by_type'][category] = bucket['by_type'].get(category, 0) + value
+
+
+def _minute_sample_rows(snapshot):
+    """Converte o snapshot de TRAFFIC_MINUTE em parâmetros do INSERT (metadados do cache)."""
+    from services.player_presence import player_presence
+    from .player_metadata import player_metadata_cache
+
+    metadata = player_metadata_cache.get_many(list(snapshot))
+    rows = []
+    for pid, buckets in snapshot.items():
+        pid = str(pid)
+        meta = metadata.get(pid) or {}
+        # IP mais recente vem do store de presença (connect grava em lote)
+        presence = player_presence.get(pid)
+        ip = (presence or {}).get('ip_address') or meta.get('ip')
+        for ts_minute, data in buckets.items():
+            by_type = data.get('by_type', {})
+            rows.append({
+                'player_id': pid,
+                'ts_epoch': bucket_epoch(ts_minute, 60),
+                'bytes': int(data.get('bytes', 0)),
+                'requests': int(data.get('requests', 0)),
+                'video': int(by_type.get('video', 0)),
+                'image': int(by_type.get('image', 0)),
+                'audio': int(by_type.get('audio', 0)),
+                'other': int(by_type.get('other', 0)),
+                'ip': ip,
+                'company': meta.get('company'),
+                'location_id': meta.get('location_id'),
+            })
+    return rows
+
+
+def write_minute_samples(rows):
+    """Grava samples por minuto em lote (executemany por bloco, uma transação)."""
+    if not rows:
+        return 0
+    with db.engine.begin() as conn:
+        for start in range(0, len(rows), SAMPLE_INSERT_CHUNK):
+            conn.execute(_INSERT_MINUTE_SQL, rows[start:start + SAMPLE_INSERT_CHUNK])
+    return len(rows)
+
+
+def flush_traffic_minute_now(app=None):
+    """Persiste os buckets por minuto acumulados em memória.
+
+    Chamado pelo scheduler (com `app`) ou por rotas já dentro do contexto da aplicação.
+    """
+    if app is not None:
+        with app.app_context():
+            return flush_traffic_minute_now()
     try:
+        traffic_counters.merge()
         with TRAFFIC_LOCK:
             snapshot = {pid: dict(buckets) for pid, buckets in TRAFFIC_MINUTE.items()}
             TRAFFIC_MINUTE.clear()
         if not snapshot:
-            return
+            return 0
         enabled = SystemConfig.get_value('monitor.enable_persist', True)
         if str(enabled).lower() not in ['1', 'true', 'yes']:
-            return
+            return 0
         _ensure_network_tables()
-        for pid, buckets in snapshot.items():
-            try:
-                player = db.session.get(Player, pid)
-                company = getattr(player, 'company', None)
-                location_id = getattr(player, 'location_id', None)
-            except Exception:
-                player = None
-                company = None
-                location_id = None
-            for ts_minute, data in buckets.items():
-                try:
-                    db.session.execute(text('''\
-                        INSERT INTO network_samples_minute (
-                            player_id, ts_minute, bytes, requests, video, image, audio, other, ip, company, location_id
-                        ) VALUES (:player_id, :ts_minute, :bytes, :requests, :video, :image, :audio, :other, :ip, :company, :location_id)
-                    '''), {
-                        'player_id': str(pid),
-                        'ts_minute': ts_minute,
-                        'bytes': int(data.get('bytes', 0)),
-                        'requests': int(data.get('requests', 0)),
-                        'video': int(data.get('by_type', {}).get('video', 0)),
-                        'image': int(data.get('by_type', {}).get('image', 0)),
-                        'audio': int(data.get('by_type', {}).get('audio', 0)),
-                        'other': int(data.get('by_type', {}).get('other', 0)),
-                        'ip': getattr(player, 'ip_address', None) if player else None,
-                        'company': company,
-                        'location_id': str(location_id) if location_id else None
-                    })
-                except Exception as ie:
-                    print(f"[Monitor] Falha ao inserir sample minuto para pid={pid}: {ie}")
         try:
-            db.session.commit()
-        except Exception as ce:
-            print(f"[Monitor] Commit falhou nos samples minuto: {ce}")
-            db.session.rollback()
+            return write_minute_samples(_minute_sample_rows(snapshot))
+        except Exception as ie:
+            print(f"[Monitor] Falha ao inserir samples minuto ({len(snapshot)} players): {ie}")
+            _restore_traffic_minute(snapshot)
+            return 0
     except Exception as e:
         print(f"[Monitor] Flush minuto falhou: {e}")
+        return 0
+
+
+def _rollup_upsert_sql(dialect_name, target, step, mode):
+    """INSERT ... SELECT agregado de network_samples_minute com upsert por (player_id, ts_epoch).
 
+    mode='add': soma o incremento ao bucket existente (linhas novas desde o watermark).
+    mode='replace': substitui o bucket pelo total recalculado (bootstrap).
+    """
+    is_mysql = (dialect_name or '').startswith('mysql')
+    select_sql = f'''\
+        SELECT player_id, ts_epoch - (ts_epoch % {step}) AS bucket_ts,
+               SUM(bytes) AS bytes, SUM(requests) AS requests,
+               SUM(video) AS video, SUM(image) AS image,
+               SUM(audio) AS audio, SUM(other) AS other,
+               MAX(ip) AS ip, MAX(company) AS company, MAX(location_id) AS location_id
+        FROM network_samples_minute
+        WHERE id > :low_id AND id <= :high_id AND ts_epoch >= :start
+        GROUP BY player_id, bucket_ts
+    '''
+    insert_sql = f'''\
+        INSERT INTO {target} (
+            player_id, ts_epoch, bytes, requests, video, image, audio, other, ip, company, location_id
+        )
+    '''
+    counters = ('bytes', 'requests', 'video', 'image', 'audio', 'other')
+    if is_mysql:
+        new_value = lambda col: f'VALUES({col})'
+    else:
+        new_value = lambda col: f'excluded.{col}'
+    if mode == 'add':
+        assignments = [f'{col} = {target}.{col} + {new_value(col)}' for col in counters]
+    else:
+        assignments = [f'{col} = {new_value(col)}' for col in counters]
+    assignments += [f'{col} = COALESCE({new_value(col)}, {target}.{col})' for col in ('ip', 'company', 'location_id')]
+    if is_mysql:
+        # Tabela derivada: ON DUPLICATE KEY UPDATE não pode referenciar um SELECT com GROUP BY
+        return text(f"{insert_sql} SELECT * FROM ({select_sql}) AS agg "
+                    f"ON DUPLICATE KEY UPDATE {', '.join(assignments)}")
+    return text(f"{insert_sql} {select_sql} "
+                f"ON CONFLICT(player_id, ts_epoch) DO UPDATE SET {', '.join(assignments)}")
 
-def aggregate_minute_to_hour():
+
+def _run_rollup(name, granularity, bootstrap_lookback):
+    """Agrega na tabela de `granularity` apenas as linhas de minuto com id acima do watermark de `name`.
+
+    Leitura do watermark, upsert e avanço do watermark ocorrem na mesma transação,
+    então cada linha de minuto entra exatamente uma vez no rollup. Na primeira
+    execução (sem watermark) os buckets de `bootstrap_lookback` são recalculados
+    por inteiro, como a agregação antiga fazia, e o watermark passa a valer daí
+    em diante. Retorna o número de linhas de minuto processadas.
+    """
+    _ensure_network_tables()
+    target, step = SAMPLE_TABLES[granularity]
+    engine = db.engine
+    with engine.begin() as conn:
+        state = conn.execute(text('SELECT last_id FROM network_rollup_state WHERE name = :name'),
+                             {'name': name}).fetchone()
+        high_id = conn.execute(text('SELECT MAX(id) FROM network_samples_minute')).scalar() or 0
+        if state is None:
+            start = bucket_epoch(datetime.now(timezone.utc) - bootstrap_lookback, step)
+            low_id, mode = 0, 'replace'
+        else:
+            start, low_id, mode = 0, int(state[0] or 0), 'add'
+        processed = 0
+        if high_id > low_id:
+            params = {'low_id': low_id, 'high_id': high_id, 'start': start}
+            processed = conn.execute(text(
+                'SELECT COUNT(*) FROM network_samples_minute '
+                'WHERE id > :low_id AND id <= :high_id AND ts_epoch >= :start'
+            ), params).scalar() or 0
+            if processed:
+                conn.execute(_rollup_upsert_sql(engine.dialect.name, target, step, mode), params)
+        updated_at = datetime.now(timezone.utc).isoformat()
+        if state is None:
+            conn.execute(text('INSERT INTO network_rollup_state (name, last_id, updated_at) VALUES (:name, :last_id, :updated_at)'),
+                         {'name': name, 'last_id': high_id, 'updated_at': updated_at})
+        elif high_id > low_id:
+            conn.execute(text('UPDATE network_rollup_state SET last_id = :last_id, updated_at = :updated_at WHERE name = :name'),
+                         {'name': name, 'last_id': high_id, 'updated_at': updated_at})
+    return processed
+
+
+def aggregate_minute_to_hour(app=None):
+    """Rollup incremental network_samples_minute -> network_samples_hour."""
+    if app is not None:
+        with app.app_context():
+            return aggregate_minute_to_hour()
     try:
-        _ensure_network_tables()
-        now = datetime.now(timezone.utc)
-        start = (now - timedelta(hours=6)).isoformat()
-        sql = text('''\
-            SELECT player_id,
-                   SUBSTR(ts_minute, 1, 13) AS hour_key,
-                   SUM(bytes) AS bytes, SUM(requests) AS requests,
-                   SUM(video) AS video, SUM(image) AS image,
-                   SUM(audio) AS audio, SUM(other) AS other,
-                   MAX(company) AS company, MAX(location_id) AS location_id, MAX(ip) AS ip
-            FROM network_samples_minute
-            WHERE ts_minute >= :start
-            GROUP BY player_id, hour_key
-        ''')
-        rows = db.session.execute(sql, {'start': start}).fetchall()
-        for r in rows:
-            player_id, hour_key = r[0], r[1]
-            ts_hour = f"{hour_key}:00:00+00:00"
-            try:
-                db.session.execute(text('DELETE FROM network_samples_hour WHERE player_id = :pid AND ts_hour = :th'),
-                                   {'pid': str(player_id), 'th': ts_hour})
-                db.session.execute(text('''\
-                    INSERT INTO network_samples_hour (
-                        player_id, ts_hour, bytes, requests, video, image, audio, other, ip, company, location_id
-                    ) VALUES (:player_id, :ts_hour, :bytes, :requests, :video, :image, :audio, :other, :ip, :company, :location_id)
-                '''), {
-                    'player_id': str(player_id), 'ts_hour': ts_hour,
-                    'bytes': int(r[2] or 0), 'requests': int(r[3] or 0),
-                    'video': int(r[4] or 0), 'image': int(r[5] or 0),
-                    'audio': int(r[6] or 0), 'other': int(r[7] or 0),
-                    'ip': r[10], 'company': r[8], 'location_id': r[9]
-                })
-            except Exception as ie:
-                print(f"[Agg m2h] Falha ao inserir hour pid={player_id} {ts_hour}: {ie}")
-        try:
-            db.session.commit()
-        except Exception as ce:
-            print(f"[Agg m2h] Commit falhou: {ce}")
-            db.session.rollback()
+        return _run_rollup('minute_hour', 'hour', timedelta(hours=6))
     except Exception as e:
         print(f"[Agg m2h] Erro: {e}")
+        return 0
+
 
+def aggregate_hour_to_day(app=None):
+    """Rollup incremental para network_samples_day.
 
-def aggregate_hour_to_day():
+    Lê os mesmos incrementos de network_samples_minute (watermark próprio) em vez
+    de reler as horas: buckets de hora são atualizados no lugar e não têm como
+    indicar o que mudou desde a última execução.
+    """
+    if app is not None:
+        with app.app_context():
+            return aggregate_hour_to_day()
     try:
-        _ensure_network_tables()
-        now = datetime.now(timezone.utc)
-        start = (now - timedelta(days=3)).isoformat()
-        sql = text('''\
-            SELECT player_id,
-                   SUBSTR(ts_hour, 1, 10) AS day_key,
-                   SUM(bytes) AS bytes, SUM(requests) AS requests,
-                   SUM(video) AS video, SUM(image) AS image,
-                   SUM(audio) AS audio, SUM(other) AS other,
-                   MAX(company) AS company, MAX(location_id) AS location_id, MAX(ip) AS ip
-            FROM network_samples_hour
-            WHERE ts_hour >= :start
-            GROUP BY player_id, day_key
-        ''')
-        rows = db.session.execute(sql, {'start': start}).fetchall()
-        for r in rows:
-            player_id, day_key = r[0], r[1]
-            ts_day = f"{day_key}T00:00:00+00:00"
-            try:
-                db.session.execute(text('DELETE FROM network_samples_day WHERE player_id = :pid AND ts_day = :td'),
-                                   {'pid': str(player_id), 'td': ts_day})
-                db.session.execute(text('''\
-                    INSERT INTO network_samples_day (
-                        player_id, ts_day, bytes, requests, video, image, audio, other, ip, company, location_id
-                    ) VALUES (:player_id, :ts_day, :bytes, :requests, :video, :image, :audio, :other, :ip, :company, :location_id)
-                '''), {
-                    'player_id': str(player_id), 'ts_day': ts_day,
-                    'bytes': int(r[2] or 0), 'requests': int(r[3] or 0),
-                    'video': int(r[4] or 0), 'image': int(r[5] or 0),
-                    'audio': int(r[6] or 0), 'other': int(r[7] or 0),
-                    'ip': r[10], 'company': r[8], 'location_id': r[9]
-                })
-            except Exception as ie:
-                print(f"[Agg h2d] Falha ao inserir day pid={player_id} {ts_day}: {ie}")
-        try:
-            db.session.commit()
-        except Exception as ce:
-            print(f"[Agg h2d] Commit falhou: {ce}")
-            db.session.rollback()
+        return _run_rollup('minute_day', 'day', timedelta(days=3))
     except Exception as e:
         print(f"[Agg h2d] Erro: {e}")
+        return 0
+
 
+def retention_cleanup(app=None):
+    """Remove samples mais antigos que monitor.sample_retention_days.
 
-def retention_cleanup():
+    No MariaDB/MySQL descarta partições diárias inteiras (e cria as dos próximos
+    dias); o DELETE restante só alcança o dia parcial do corte (range scan em ts_epoch).
+    """
+    if app is not None:
+        with app.app_context():
+            return retention_cleanup()
     try:
+        _ensure_network_tables()
         days = int(SystemConfig.get_value('monitor.sample_retention_days', 30) or 30)
-        now = datetime.now(timezone.utc)
-        cutoff = (now - timedelta(days=days)).isoformat()
-        for table, col in [
-            ('network_samples_minute', 'ts_minute'),
-            ('network_samples_hour', 'ts_hour'),
-            ('network_samples_day', 'ts_day'),
-        ]:
+        cutoff = bucket_epoch(datetime.now(timezone.utc) - timedelta(days=days), 60)
+        engine = db.engine
+        try:
+            ensure_future_partitions(engine)
+            dropped = drop_partitions_before(engine, cutoff)
+            if dropped:
+                print(f"[Retention] {dropped} partições removidas")
+        except Exception as pe:
+            print(f"[Retention] Falha ao manter partições: {pe}")
+        for table, _step in SAMPLE_TABLES.values():
             try:
-                db.session.execute(text(f"DELETE FROM {table} WHERE {col} < :cutoff"), {'cutoff': cutoff})
+                with engine.begin() as conn:
+                    conn.execute(text(f"DELETE FROM {table} WHERE ts_epoch < :cutoff"), {'cutoff': cutoff})
             except Exception as de:
                 print(f"[Retention] Falha ao limpar {table}: {de}")
-        try:
-            db.session.commit()
-        except Exception as ce:
-            print(f"[Retention] Commit falhou: {ce}")
-            db.session.rollback()
     except Exception as e:
         print(f"[Retention] Erro: {e}")
 
 
 def emit_traffic_stats_job(socketio):
     try:
+        traffic_counters.merge()
         snapshot = {
             'since': TRAFFIC_STATS.get('since'),
             'total_bytes': TRAFFIC_STATS.get('total_bytes', 0),
@@ -273,16 +292,37 @@ def sync_player_statuses_job(app):
         print(f"[AutoSync] Falha ao sincronizar players: {e}")
 
 
-def check_schedules_with_context(app):
+def check_schedules_with_context(app, scheduler=None):
     try:
         print(f"[{datetime.now(timezone.utc)}] Executando verificação de agendamentos...")
         with app.app_context():
             from services.schedule_executor import schedule_executor
             schedule_executor.check_and_execute_schedules()
+            next_wakeup = schedule_executor.next_wakeup()
+        # Desperta exatamente no próximo início/fim de janela em vez de esperar o tick do minuto
+        if scheduler is not None and next_wakeup is not None:
+            scheduler.add_job(
+                func=lambda: check_schedules_with_context(app, scheduler),
+                trigger='date',
+                run_date=next_wakeup,
+                id='schedule_boundary_wakeup',
+                name='Despertar no próximo limite de agendamento',
+                replace_existing=True
+            )
     except Exception as e:
         print(f"[Scheduler] Erro no check_and_execute_schedules: {e}")
 
 
+def flush_player_presence_job(app):
+    """Grava em lote a telemetria de presença acumulada (pings/heartbeats)."""
+    try:
+        with app.app_context():
+            from services.player_presence import player_presence
+            player_presence.flush()
+    except Exception as e:
+        print(f"[Presence] Falha no flush de telemetria: {e}")
+
+
 def emit_system_stats_job(app, socketio):
     """Emite estatísticas do sistema via Socket.IO com contexto da aplicação"""
     try:
@@ -297,9 +337,11 @@ def emit_system_stats_job(app, socketio):
 def configure_scheduler_jobs(scheduler, app, socketio):
     try:
         print("[Scheduler] Configurando jobs...")
+        # DDL das tabelas de samples apenas na inicialização
+        _ensure_network_tables()
         if not scheduler.get_job('schedule_checker'):
             scheduler.add_job(
-                func=lambda: check_schedules_with_context(app),
+                func=lambda: check_schedules_with_context(app, scheduler),
                 trigger="interval",
                 minutes=1,
                 id='schedule_checker',
@@ -319,6 +361,20 @@ def configure_scheduler_jobs(scheduler, app, socketio):
                 name='Emitir estatísticas de tráfego para admins',
                 replace_existing=True
             )
+        if not scheduler.get_job('admin_broadcast_flush'):
+            from services.admin_broadcast import admin_broadcaster, ADMIN_BROADCAST_INTERVAL_SEC
+            try:
+                broadcast_interval = float(SystemConfig.get_value('monitor.admin_broadcast_interval_sec', ADMIN_BROADCAST_INTERVAL_SEC) or ADMIN_BROADCAST_INTERVAL_SEC)
+            except Exception:
+                broadcast_interval = ADMIN_BROADCAST_INTERVAL_SEC
+            scheduler.add_job(
+                func=lambda: admin_broadcaster.flush(socketio),
+                trigger='interval',
+                seconds=max(0.2, broadcast_interval),
+                id='admin_broadcast_flush',
+                name='Emitir atualizações de status agregadas para admins',
+                replace_existing=True
+            )
         if not scheduler.get_job('player_status_sync'):
             scheduler.add_job(
                 func=lambda: sync_player_statuses_job(app),
@@ -328,9 +384,19 @@ def configure_scheduler_jobs(scheduler, app, socketio):
                 name='Sincronizar status dos players',
                 replace_existing=True
             )
+        if not scheduler.get_job('player_presence_flush'):
+            from services.player_presence import PRESENCE_FLUSH_INTERVAL_SEC
+            scheduler.add_job(
+                func=lambda: flush_player_presence_job(app),
+                trigger='interval',
+                seconds=PRESENCE_FLUSH_INTERVAL_SEC,
+                id='player_presence_flush',
+                name='Persistir telemetria de presença dos players',
+                replace_existing=True
+            )
         if not scheduler.get_job('traffic_minute_flush'):
             scheduler.add_job(
-                func=flush_traffic_minute_now,
+                func=lambda: flush_traffic_minute_now(app),
                 trigger='interval',
                 seconds=60,
                 id='traffic_minute_flush',
@@ -339,25 +405,25 @@ def configure_scheduler_jobs(scheduler, app, socketio):
             )
         if not scheduler.get_job('agg_minute_hour'):
             scheduler.add_job(
-                func=aggregate_minute_to_hour,
+                func=lambda: aggregate_minute_to_hour(app),
                 trigger='interval',
                 minutes=5,
                 id='agg_minute_hour',
-                name='Agregação minute->hour (lookback 6h)',
+                name='Agregação incremental minute->hour',
                 replace_existing=True
             )
         if not scheduler.get_job('agg_hour_day'):
             scheduler.add_job(
-                func=aggregate_hour_to_day,
+                func=lambda: aggregate_hour_to_day(app),
                 trigger='interval',
                 hours=1,
                 id='agg_hour_day',
-                name='Agregação hour->day (lookback 3d)',
+                name='Agregação incremental ->day',
                 replace_existing=True
             )
         if not scheduler.get_job('retention_cleanup'):
             scheduler.add_job(
-                func=retention_cleanup,
+                func=lambda: retention_cleanup(app),
                 trigger='cron',
                 hour=3,
                 minute=15,
@@ -0,0 +1,180 @@
+"""Histogramas de latência em memória fixa (estilo HDR, buckets log-lineares).
+
+Substitui o deque de 2000 latências que era copiado e ordenado a cada coleta de
+métricas. Cada valor cai num bucket logarítmico (erro relativo ~GROWTH/2) em
+O(1). Cada histograma guarda um slot por minuto (até WINDOW_SLOTS), então
+1m/5m/1h somam 1, 5 ou 60 slots e os percentis saem em O(buckets).
+
+Há um histograma por classe de rota (uploads, media, api) e um por player
+(apenas rotas de mídia, que trazem ?pid=). Players sem tráfego há mais de uma
+hora são descartados; como o pid vem da query string, no máximo MAX_PLAYERS
+histogramas ficam em memória (o menos recente sai quando o limite estoura).
+"""
+import math
+import threading
+import time
+
+MIN_MS = 0.05
+GROWTH = 1.08
+BUCKET_COUNT = 200          # MIN_MS * GROWTH**200 ~ 250 s
+WINDOW_SLOTS = 60           # slots de 1 minuto = janela máxima de 1h
+WINDOWS = {'1m': 1, '5m': 5, '1h': 60}
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+MAX_PLAYERS = 2000          # histogramas por player mantidos em memória
+
+_LOG_GROWTH = math.log(GROWTH)
+
+
+def bucket_index(value_ms):
+    if value_ms <= MIN_MS:
+        return 0
+    return min(BUCKET_COUNT - 1, int(math.log(value_ms / MIN_MS) / _LOG_GROWTH) + 1)
+
+
+def bucket_value(index):
+    """Valor representativo do bucket (média geométrica dos limites)."""
+    if index == 0:
+        return MIN_MS
+    return MIN_MS * GROWTH ** (index - 0.5)
+
+
+def route_class(path):
+    """Classe de rota usada nos histogramas (None para rotas não medidas)."""
+    if path.startswith('/uploads/'):
+        return 'uploads'
+    if path.startswith('/api/content/media'):
+        return 'media'
+    if path.startswith('/api/'):
+        return 'api'
+    return None
+
+
+class LatencyHistogram:
+    """Histograma por minuto: {minuto: [{bucket: contagem}, total, soma, máximo]}.
+
+    Os buckets de cada slot são esparsos: a memória cresce com a dispersão das
+    latências observadas, limitada a BUCKET_COUNT x WINDOW_SLOTS contadores.
+    """
+
+    __slots__ = ('lock', 'slots', 'last_minute')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.last_minute = 0
+
+    def record(self, value_ms, minute):
+        index = bucket_index(value_ms)
+        with self.lock:
+            slot = self.slots.get(minute)
+            if slot is None:
+                slot = self.slots[minute] = [{}, 0, 0.0, 0.0]
+                # Rotação: descarta minutos fora da maior janela
+                oldest = minute - WINDOW_SLOTS + 1
+                for old in [m for m in self.slots if m < oldest]:
+                    del self.slots[old]
+                self.last_minute = minute
+            slot[0][index] = slot[0].get(index, 0) + 1
+            slot[1] += 1
+            slot[2] += value_ms
+            if value_ms > slot[3]:
+                slot[3] = value_ms
+
+    def summary(self, minutes, current_minute):
+        """count/avg/max/p50/p90/p95/p99 dos últimos `minutes` minutos."""
+        oldest = current_minute - minutes + 1
+        counts = [0] * BUCKET_COUNT
+        total, value_sum, value_max = 0, 0.0, 0.0
+        with self.lock:
+            for minute, (buckets, count, slot_sum, slot_max) in self.slots.items():
+                if minute < oldest or minute > current_minute:
+                    continue
+                for i, n in buckets.items():
+                    counts[i] += n
+                total += count
+                value_sum += slot_sum
+                value_max = max(value_max, slot_max)
+        result = {'count': total, 'avg_ms': round(value_sum / total, 3) if total else 0.0,
+                  'max_ms': round(value_max, 3)}
+        targets = [(p, p * total) for p in PERCENTILES]
+        cumulative = 0
+        t = 0
+        for i, n in enumerate(counts):
+            if not n:
+                continue
+            cumulative += n
+            while t < len(targets) and cumulative >= targets[t][1]:
+                result[f'p{int(targets[t][0] * 100)}_ms'] = round(min(bucket_value(i), value_max), 3)
+                t += 1
+            if t == len(targets):
+                break
+        for p, _target in targets[t:]:
+            result[f'p{int(p * 100)}_ms'] = 0.0
+        return result
+
+
+class LatencyRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._players = {}
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def _player_histogram(self, player_id, minute):
+        histogram = self._players.get(player_id)
+        if histogram is None:
+            with self._lock:
+                histogram = self._players.get(player_id)
+                if histogram is None:
+                    if len(self._players) >= MAX_PLAYERS:
+                        self._prune_players_locked(minute)
+                    if len(self._players) >= MAX_PLAYERS:
+                        # Sem tráfego há mais tempo sai primeiro
+                        oldest = min(self._players, key=lambda pid: self._players[pid].last_minute)
+                        del self._players[oldest]
+                    histogram = self._players[player_id] = LatencyHistogram()
+        return histogram
+
+    def record(self, route, value_ms, player_id=None, now=None):
+        minute = int(now if now is not None else time.time()) // 60
+        self._histogram(self._routes, route).record(value_ms, minute)
+        if player_id:
+            self._player_histogram(str(player_id), minute).record(value_ms, minute)
+
+    def _prune_players_locked(self, current_minute):
+        stale = [pid for pid, h in self._players.items()
+                 if h.last_minute < current_minute - WINDOW_SLOTS + 1]
+        for pid in stale:
+            del self._players[pid]
+
+    def _prune_players(self, current_minute):
+        with self._lock:
+            self._prune_players_locked(current_minute)
+
+    def summary(self, route=None, player_id=None, windows=None):
+        """Resumo por janela de uma classe de rota ou de um player."""
+        current_minute = int(time.time()) // 60
+        table, key = (self._players, str(player_id)) if player_id else (self._routes, route)
+        histogram = table.get(key)
+        windows = windows or list(WINDOWS)
+        if histogram is None:
+            return {window: LatencyHistogram().summary(WINDOWS[window], current_minute) for window in windows}
+        return {window: histogram.summary(WINDOWS[window], current_minute) for window in windows}
+
+    def snapshot(self, windows=None, include_players=False):
+        """Resumo de todas as classes de rota (e, opcionalmente, de todos os players)."""
+        self._prune_players(int(time.time()) // 60)
+        data = {'routes': {route: self.summary(route=route, windows=windows) for route in list(self._routes)}}
+        if include_players:
+            data['players'] = {pid: self.summary(player_id=pid, windows=windows) for pid in list(self._players)}
+        return data
+
+
+# Instância global dos histogramas de latência
+latency_registry = LatencyRegistry()
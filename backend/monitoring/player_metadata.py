@@ -0,0 +1,77 @@
+"""Cache de metadados de player usados nos samples de tráfego (empresa, location, ip).
+
+O flush por minuto grava empresa/location/ip junto com cada bucket. Em vez de
+um `db.session.get(Player, pid)` (e mais uma consulta em Location para a
+empresa) por player a cada minuto, carregamos os que faltam numa única
+consulta e guardamos por PLAYER_METADATA_TTL_SEC. Alterações em players
+(services.model_events) descartam as entradas afetadas.
+"""
+import threading
+import time
+
+from database import db
+from models.player import Player
+from models.location import Location
+from services.model_events import subscribe
+
+PLAYER_METADATA_TTL_SEC = 600
+
+_EMPTY = {'ip': None, 'company': None, 'location_id': None}
+
+
+class PlayerMetadataCache:
+    def __init__(self, ttl=PLAYER_METADATA_TTL_SEC):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # player_id -> (carregado_em, {'ip', 'company', 'location_id'})
+        subscribe(self._on_model_changes)
+
+    def _on_model_changes(self, changes):
+        players = changes.get('players', ())
+        if players:
+            with self._lock:
+                for pid in players:
+                    self._entries.pop(pid, None)
+
+    def get_many(self, player_ids):
+        """Metadados por player; IDs desconhecidos recebem valores vazios (também cacheados)."""
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            for pid in player_ids:
+                pid = str(pid)
+                entry = self._entries.get(pid)
+                if entry and now - entry[0] < self.ttl:
+                    result[pid] = entry[1]
+                else:
+                    missing.append(pid)
+        if missing:
+            loaded = {}
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = db.session.query(
+                    Player.id, Player.ip_address, Player.location_id, Location.company
+                ).outerjoin(Location, Location.id == Player.location_id).filter(
+                    Player.id.in_(chunk)
+                ).all()
+                for pid, ip, location_id, company in rows:
+                    loaded[str(pid)] = {
+                        'ip': ip,
+                        'company': company,
+                        'location_id': str(location_id) if location_id else None,
+                    }
+            with self._lock:
+                for pid in missing:
+                    meta = loaded.get(pid, _EMPTY)
+                    self._entries[pid] = (now, meta)
+                    result[pid] = meta
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Instância global do cache de metadados
+player_metadata_cache = PlayerMetadataCache()
@@ -9,13 +9,17 @@ from models.player import Player
 from models.system_config import SystemConfig
 
 from .state import TRAFFIC_STATS, TRAFFIC_MINUTE, TRAFFIC_LOCK
+from .counters import traffic_counters
+from .latency import latency_registry, WINDOWS as LATENCY_WINDOWS
 from .utils import collect_system_stats
 from .jobs import _ensure_network_tables
+from .samples import SAMPLE_TABLES, bucket_epoch, epoch_to_iso
 
 
 # Helpers locais
 
 def _traffic_snapshot():
+    traffic_counters.merge()
     with TRAFFIC_LOCK:
         return {
             'since': TRAFFIC_STATS.get('since'),
@@ -47,8 +51,8 @@ def register_monitoring_routes(app):
 
             snapshot = _traffic_snapshot()
 
-            now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
-            minute_keys = [(now - timedelta(minutes=i)).isoformat() for i in range(window_min)]
+            current_minute = bucket_epoch(datetime.now(timezone.utc), 60)
+            minute_keys = [current_minute - 60 * i for i in range(window_min)]
             overuse_players = []
             recent_players = {}
 
@@ -140,42 +144,43 @@ def register_monitoring_routes(app):
             company = request.args.get('company')
             location_id = request.args.get('location_id')
 
-            if group_by == 'hour':
-                table, ts_col = 'network_samples_hour', 'ts_hour'
-            elif group_by == 'day':
-                table, ts_col = 'network_samples_day', 'ts_day'
-            else:
-                table, ts_col = 'network_samples_minute', 'ts_minute'
+            if group_by not in SAMPLE_TABLES:
+                group_by = 'minute'
+            table, _step = SAMPLE_TABLES[group_by]
 
-            def _iso(dt):
-                if not dt:
-                    return None
+            def _epoch(dt):
+                parsed = None
                 try:
                     if _p:
-                        return _p.isoparse(dt).isoformat()
-                except Exception:
-                    pass
-                try:
-                    d = dt.replace('Z', '')
-                    return datetime.fromisoformat(d).isoformat()
-                except Exception:
-                    pass
-                # Suporte a formatos BR: DD/MM/YYYY e DD/MM/YYYY HH:MM:SS
-                try:
-                    if ' ' in dt:
-                        d = datetime.strptime(dt.strip(), '%d/%m/%Y %H:%M:%S')
-                    else:
-                        d = datetime.strptime(dt.strip(), '%d/%m/%Y')
-                    return d.isoformat()
+                        parsed = _p.isoparse(dt)
                 except Exception:
-                    return dt
+                    parsed = None
+                if parsed is None:
+                    try:
+                        parsed = datetime.fromisoformat(dt.replace('Z', ''))
+                    except Exception:
+                        parsed = None
+                if parsed is None:
+                    # Suporte a formatos BR: DD/MM/YYYY e DD/MM/YYYY HH:MM:SS
+                    try:
+                        if ' ' in dt:
+                            parsed = datetime.strptime(dt.strip(), '%d/%m/%Y %H:%M:%S')
+                        else:
+                            parsed = datetime.strptime(dt.strip(), '%d/%m/%Y')
+                    except Exception:
+                        raise ValueError(f'Data inválida: {dt}')
+                # Sem fuso: UTC, como os buckets gravados
+                return bucket_epoch(parsed, 1)
 
             params = {}
             clauses = []
-            if q_from:
-                clauses.append(f"{ts_col} >= :start"); params['start'] = _iso(q_from)
-            if q_to:
-                clauses.append(f"{ts_col} <= :end"); params['end'] = _iso(q_to)
+            try:
+                if q_from:
+                    clauses.append("ts_epoch >= :start"); params['start'] = _epoch(q_from)
+                if q_to:
+                    clauses.append("ts_epoch <= :end"); params['end'] = _epoch(q_to)
+            except ValueError as ve:
+                return jsonify({'error': str(ve)}), 400
             if player_id:
                 clauses.append("player_id = :player_id"); params['player_id'] = str(player_id)
             if company:
@@ -185,14 +190,14 @@ def register_monitoring_routes(app):
 
             where_sql = (" WHERE " + " AND ".join(clauses)) if clauses else ""
             sql = text(f"""
-                SELECT {ts_col} AS ts,
+                SELECT ts_epoch AS ts,
                        SUM(bytes) AS bytes, SUM(requests) AS requests,
                        SUM(video) AS video, SUM(image) AS image,
                        SUM(audio) AS audio, SUM(other) AS other
                 FROM {table}
                 {where_sql}
-                GROUP BY {ts_col}
-                ORDER BY {ts_col} ASC
+                GROUP BY ts_epoch
+                ORDER BY ts_epoch ASC
             """)
             try:
                 rows = db.session.execute(sql, params).fetchall()
@@ -203,7 +208,7 @@ def register_monitoring_routes(app):
                     return jsonify({'group_by': group_by, 'series': []}), 200
                 raise
             series = [{
-                'ts': r[0], 'bytes': int(r[1] or 0), 'requests': int(r[2] or 0),
+                'ts': epoch_to_iso(r[0]), 'bytes': int(r[1] or 0), 'requests': int(r[2] or 0),
                 'video': int(r[3] or 0), 'image': int(r[4] or 0),
                 'audio': int(r[5] or 0), 'other': int(r[6] or 0)
             } for r in rows]
@@ -250,8 +255,8 @@ def register_monitoring_routes(app):
                 delta = timedelta(hours=24)
             start = (now - delta).isoformat()
 
-            clauses = ["ts_minute >= :start"]
-            params = {'start': start, 'limit': limit}
+            clauses = ["ts_epoch >= :start"]
+            params = {'start': bucket_epoch(now - delta, 60), 'limit': limit}
             if player_id:
                 clauses.append("player_id = :player_id"); params['player_id'] = str(player_id)
             if company:
@@ -294,6 +299,34 @@ def register_monitoring_routes(app):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/monitor/system/latency', methods=['GET'])
+    @jwt_required()
+    def api_monitor_system_latency():  # noqa: F401
+        try:
+            user_id = get_jwt_identity()
+            user = db.session.get(User, user_id)
+            if not user or user.role not in ['admin', 'manager']:
+                return jsonify({'error': 'Sem permissão'}), 403
+
+            windows = [w for w in (request.args.get('windows') or '').split(',') if w]
+            invalid = [w for w in windows if w not in LATENCY_WINDOWS]
+            if invalid:
+                return jsonify({'error': f"Janela inválida: {', '.join(invalid)} (use {', '.join(LATENCY_WINDOWS)})"}), 400
+            windows = windows or None
+
+            player_id = request.args.get('player_id')
+            route = request.args.get('route')
+            if player_id:
+                return jsonify({'player_id': player_id,
+                                'latency': latency_registry.summary(player_id=player_id, windows=windows)}), 200
+            if route:
+                return jsonify({'route': route,
+                                'latency': latency_registry.summary(route=route, windows=windows)}), 200
+            include_players = request.args.get('players') in ['1', 'true', 'yes']
+            return jsonify(latency_registry.snapshot(windows=windows, include_players=include_players)), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/monitor/traffic/accumulated', methods=['GET'])
     @jwt_required()
     def monitor_traffic_accumulated():  # noqa: F401
@@ -313,14 +346,15 @@ def register_monitoring_routes(app):
 
             now = datetime.now(timezone.utc)
             if period == '1h':
-                start = (now - timedelta(hours=1)).isoformat()
+                start_dt = now - timedelta(hours=1)
             elif period == '7d':
-                start = (now - timedelta(days=7)).isoformat()
+                start_dt = now - timedelta(days=7)
             else:
-                start = (now - timedelta(days=1)).isoformat()
+                start_dt = now - timedelta(days=1)
+            start = start_dt.isoformat()
 
-            where_sql = 'WHERE ts_minute >= :start'
-            params = {'start': start}
+            where_sql = 'WHERE ts_epoch >= :start'
+            params = {'start': bucket_epoch(start_dt, 60)}
 
             if user.role == 'rh' and getattr(user, 'company', None):
                 company = user.company
@@ -337,7 +371,7 @@ def register_monitoring_routes(app):
 
             sql = text(f'''\
                 SELECT player_id,
-                       MAX(ts_minute) AS last_seen,
+                       MAX(ts_epoch) AS last_seen,
                        SUM(bytes) AS bytes,
                        SUM(requests) AS requests,
                        SUM(video) AS video,
@@ -358,7 +392,7 @@ def register_monitoring_routes(app):
                 raise
             items = [{
                 'player_id': r[0],
-                'last_seen': r[1],
+                'last_seen': epoch_to_iso(r[1]),
                 'bytes': int(r[2] or 0),
                 'requests': int(r[3] or 0),
                 'video': int(r[4] or 0),
@@ -379,7 +413,7 @@ def register_monitoring_routes(app):
             if not user or user.role not in ['admin', 'manager']:
                 return jsonify({'error': 'Sem permissão'}), 403
             from .jobs import flush_traffic_minute_now
-            flush_traffic_minute_now()
-            return jsonify({'ok': True}), 200
+            rows = flush_traffic_minute_now()
+            return jsonify({'ok': True, 'rows': rows}), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
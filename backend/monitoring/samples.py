@@ -0,0 +1,297 @@
+"""Layout das tabelas de séries temporais de tráfego (network_samples_*).
+
+Cada linha é identificada pelo início do bucket em `ts_epoch` (BIGINT, segundos
+UTC do minuto/hora/dia). Filtros por período viram range scans inteiros nos
+índices (player_id/company/location_id, ts_epoch) e os rollups agrupam com
+aritmética inteira em vez de SUBSTR sobre strings ISO.
+
+No MariaDB/MySQL as três tabelas são particionadas por RANGE(ts_epoch), uma
+partição por dia (pYYYYMMDD) mais `pmax`. A retenção remove partições inteiras
+(drop_partitions_before) e o job diário mantém PARTITION_DAYS_AHEAD dias futuros
+já criados (ensure_future_partitions). No SQLite o layout é o mesmo, sem partições.
+
+Bases com o layout antigo (ts_minute/ts_hour/ts_day em texto ISO) são convertidas
+por migrate_legacy_tables: cópia em blocos por id para uma tabela nova, troca de
+nomes e a tabela antiga preservada como `<tabela>_legacy_<timestamp>`. A
+conversão roda na inicialização ou antes do deploy via
+migrations/migrate_network_samples_epoch.py.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+# granularidade -> (tabela, tamanho do bucket em segundos)
+SAMPLE_TABLES = {
+    'minute': ('network_samples_minute', 60),
+    'hour': ('network_samples_hour', 3600),
+    'day': ('network_samples_day', 86400),
+}
+
+# Coluna de timestamp texto do layout antigo
+LEGACY_TS_COLUMNS = {
+    'network_samples_minute': 'ts_minute',
+    'network_samples_hour': 'ts_hour',
+    'network_samples_day': 'ts_day',
+}
+
+# Tabelas com um único bucket por player (alvo de upsert dos rollups)
+UNIQUE_BUCKET_TABLES = ('network_samples_hour', 'network_samples_day')
+
+PARTITION_DAYS_AHEAD = 3
+MIGRATION_CHUNK = 50000
+DAY_SECONDS = 86400
+
+_DATA_COLUMNS = 'player_id, ts_epoch, bytes, requests, video, image, audio, other, ip, company, location_id'
+
+
+def bucket_epoch(value, step=60):
+    """Início do bucket (segundos UTC) para epoch, datetime ou string ISO."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.timestamp()
+    value = int(value)
+    return value - value % step
+
+
+def epoch_to_iso(value):
+    """Bucket em ISO UTC (mesmo formato das antigas colunas ts_minute/ts_hour/ts_day)."""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(int(value), tz=timezone.utc).isoformat()
+
+
+def is_mysql(engine):
+    return (engine.dialect.name or '').startswith('mysql')
+
+
+def _table_columns(conn, table):
+    """Nomes das colunas de `table`, ou None se ela não existe."""
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return None
+    return {col['name'] for col in inspector.get_columns(table)}
+
+
+# ----------------------------------------------------------------------
+# DDL
+# ----------------------------------------------------------------------
+def _partition_name(day_epoch):
+    return 'p' + datetime.fromtimestamp(day_epoch, tz=timezone.utc).strftime('%Y%m%d')
+
+
+def _partition_defs(first_day, last_day):
+    """Partições diárias [first_day, last_day] (epochs de início de dia)."""
+    defs = []
+    day = first_day
+    while day <= last_day:
+        defs.append(f'PARTITION {_partition_name(day)} VALUES LESS THAN ({day + DAY_SECONDS})')
+        day += DAY_SECONDS
+    return defs
+
+
+def _create_table(conn, table, name=None, mysql=False, first_day=None):
+    """Cria `name` (padrão: `table`) no layout ts_epoch, com índices nomeados a partir de `table`."""
+    name = name or table
+    unique = table in UNIQUE_BUCKET_TABLES
+    if mysql:
+        today = bucket_epoch(datetime.now(timezone.utc), DAY_SECONDS)
+        first_day = min(first_day if first_day is not None else today, today)
+        partitions = _partition_defs(first_day, today + PARTITION_DAYS_AHEAD * DAY_SECONDS)
+        partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+        unique_key = f'UNIQUE KEY uq_{table}_player_ts (player_id, ts_epoch),' if unique else ''
+        conn.execute(text(f'''\
+            CREATE TABLE IF NOT EXISTS {name} (
+                id BIGINT NOT NULL AUTO_INCREMENT,
+                player_id VARCHAR(36) NOT NULL,
+                ts_epoch BIGINT NOT NULL,
+                bytes BIGINT DEFAULT 0,
+                requests INT DEFAULT 0,
+                video BIGINT DEFAULT 0,
+                image BIGINT DEFAULT 0,
+                audio BIGINT DEFAULT 0,
+                other BIGINT DEFAULT 0,
+                ip VARCHAR(45),
+                company VARCHAR(100),
+                location_id VARCHAR(36),
+                PRIMARY KEY (id, ts_epoch),
+                {unique_key}
+                KEY idx_{table}_ts (ts_epoch),
+                KEY idx_{table}_player_ts (player_id, ts_epoch),
+                KEY idx_{table}_company_ts (company, ts_epoch),
+                KEY idx_{table}_location_ts (location_id, ts_epoch)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            PARTITION BY RANGE (ts_epoch) ({', '.join(partitions)})
+        '''))
+        return
+
+    conn.execute(text(f'''\
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id TEXT NOT NULL,
+            ts_epoch INTEGER NOT NULL,
+            bytes INTEGER DEFAULT 0,
+            requests INTEGER DEFAULT 0,
+            video INTEGER DEFAULT 0,
+            image INTEGER DEFAULT 0,
+            audio INTEGER DEFAULT 0,
+            other INTEGER DEFAULT 0,
+            ip TEXT,
+            company TEXT,
+            location_id TEXT
+        )
+    '''))
+    statements = [
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {name}(ts_epoch)',
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_player_ts ON {name}(player_id, ts_epoch)',
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_company_ts ON {name}(company, ts_epoch)',
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_location_ts ON {name}(location_id, ts_epoch)',
+    ]
+    if unique:
+        statements.append(f'CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_player_ts ON {name}(player_id, ts_epoch)')
+    for stmt in statements:
+        conn.execute(text(stmt))
+
+
+def ensure_sample_tables(engine):
+    """Converte tabelas no layout antigo (se houver) e cria as que faltam."""
+    migrate_legacy_tables(engine)
+    mysql = is_mysql(engine)
+    with engine.begin() as conn:
+        for table, _step in SAMPLE_TABLES.values():
+            _create_table(conn, table, mysql=mysql)
+        # Watermark dos rollups incrementais (último id de network_samples_minute processado)
+        conn.execute(text('''\
+            CREATE TABLE IF NOT EXISTS network_rollup_state (
+                name VARCHAR(32) NOT NULL PRIMARY KEY,
+                last_id BIGINT NOT NULL DEFAULT 0,
+                updated_at VARCHAR(32)
+            )
+        '''))
+    if mysql:
+        ensure_future_partitions(engine)
+
+
+# ----------------------------------------------------------------------
+# Migração do layout antigo (timestamps ISO em texto)
+# ----------------------------------------------------------------------
+def _legacy_epoch_sql(mysql, ts_col):
+    # Strings gravadas sempre em UTC ('YYYY-MM-DDTHH:MM:SS+00:00'); a sessão MySQL usa +00:00
+    if mysql:
+        return f"UNIX_TIMESTAMP(STR_TO_DATE(SUBSTR({ts_col}, 1, 19), '%Y-%m-%dT%H:%i:%s'))"
+    return f"CAST(strftime('%s', SUBSTR({ts_col}, 1, 19)) AS INTEGER)"
+
+
+def migrate_legacy_tables(engine, chunk=MIGRATION_CHUNK):
+    """Converte network_samples_* com timestamp texto para o layout ts_epoch.
+
+    Retorna {tabela: linhas copiadas} das tabelas convertidas. Os ids são
+    preservados (o watermark dos rollups continua válido). Nas tabelas de
+    rollup, buckets duplicados ficam com a linha mais recente.
+    """
+    mysql = is_mysql(engine)
+    migrated = {}
+    for table, ts_col in LEGACY_TS_COLUMNS.items():
+        with engine.connect() as conn:
+            columns = _table_columns(conn, table)
+        if not columns or ts_col not in columns or 'ts_epoch' in columns:
+            continue
+
+        print(f"[Samples] Convertendo {table} ({ts_col} texto -> ts_epoch)...")
+        new_name = f'{table}_epoch'
+        epoch_sql = _legacy_epoch_sql(mysql, ts_col)
+        with engine.begin() as conn:
+            if mysql:
+                conn.execute(text("SET time_zone = '+00:00'"))
+            conn.execute(text(f'DROP TABLE IF EXISTS {new_name}'))
+            first_ts = conn.execute(text(f'SELECT MIN({epoch_sql}) FROM {table}')).scalar()
+            _create_table(conn, table, name=new_name, mysql=mysql,
+                          first_day=bucket_epoch(first_ts, DAY_SECONDS) if first_ts is not None else None)
+
+        insert = ('REPLACE INTO' if mysql else 'INSERT OR REPLACE INTO') if table in UNIQUE_BUCKET_TABLES else 'INSERT INTO'
+        copy_sql = text(f'''\
+            {insert} {new_name} (id, {_DATA_COLUMNS})
+            SELECT id, player_id, {epoch_sql}, bytes, requests, video, image, audio, other, ip, company, location_id
+            FROM {table}
+            WHERE id > :low_id AND id <= :high_id
+            ORDER BY id
+        ''')
+        copied = 0
+        low_id = 0
+        while True:
+            with engine.begin() as conn:
+                if mysql:
+                    conn.execute(text("SET time_zone = '+00:00'"))
+                high_id = conn.execute(text(f'SELECT MAX(id) FROM {table}')).scalar() or 0
+                if high_id <= low_id:
+                    # Nada novo desde o último bloco: troca os nomes na mesma transação (SQLite)
+                    backup = f"{table}_legacy_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+                    if mysql:
+                        conn.execute(text(f'RENAME TABLE {table} TO {backup}, {new_name} TO {table}'))
+                    else:
+                        conn.execute(text(f'ALTER TABLE {table} RENAME TO {backup}'))
+                        conn.execute(text(f'ALTER TABLE {new_name} RENAME TO {table}'))
+                    break
+                upper = min(high_id, low_id + chunk)
+                result = conn.execute(copy_sql, {'low_id': low_id, 'high_id': upper})
+                copied += max(result.rowcount or 0, 0)
+                low_id = upper
+        migrated[table] = copied
+        print(f"[Samples] {table} convertida ({copied} linhas); layout antigo mantido em {backup}")
+    return migrated
+
+
+# ----------------------------------------------------------------------
+# Partições (MariaDB/MySQL)
+# ----------------------------------------------------------------------
+def _partitions(conn, table):
+    """[(nome, limite superior ou None para MAXVALUE)] em ordem."""
+    rows = conn.execute(text('''\
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    '''), {'table': table}).fetchall()
+    return [(name, None if str(bound).upper() == 'MAXVALUE' else int(bound)) for name, bound in rows]
+
+
+def ensure_future_partitions(engine, days_ahead=PARTITION_DAYS_AHEAD):
+    """Divide `pmax` para que existam partições diárias até hoje + days_ahead."""
+    if not is_mysql(engine):
+        return 0
+    today = bucket_epoch(datetime.now(timezone.utc), DAY_SECONDS)
+    last_day = today + days_ahead * DAY_SECONDS
+    created = 0
+    with engine.begin() as conn:
+        for table, _step in SAMPLE_TABLES.values():
+            partitions = _partitions(conn, table)
+            if not partitions or partitions[-1][1] is not None:
+                continue
+            bounds = [bound for _name, bound in partitions if bound is not None]
+            first_day = max(bounds) if bounds else today
+            defs = _partition_defs(first_day, last_day)
+            if not defs:
+                continue
+            defs.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+            conn.execute(text(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(defs)})"))
+            created += len(defs) - 1
+    return created
+
+
+def drop_partitions_before(engine, cutoff_epoch):
+    """Remove partições diárias inteiramente anteriores a cutoff_epoch; retorna quantas."""
+    if not is_mysql(engine):
+        return 0
+    dropped = 0
+    with engine.begin() as conn:
+        for table, _step in SAMPLE_TABLES.values():
+            expired = [name for name, bound in _partitions(conn, table)
+                       if bound is not None and bound <= cutoff_epoch]
+            if expired:
+                conn.execute(text(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}"))
+                dropped += len(expired)
+    return dropped
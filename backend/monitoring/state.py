@@ -1,5 +1,4 @@
 from threading import Lock
-from collections import deque
 from models.schedule import fmt_br_datetime
 from datetime import datetime
 
@@ -14,10 +13,9 @@ TRAFFIC_STATS = {
 TRAFFIC_MINUTE = {}
 TRAFFIC_LOCK = Lock()
 
-# Métricas de uploads (latência e contadores HTTP)
+# Métricas de uploads (contadores HTTP; latências em monitoring.latency)
 UPLOAD_METRICS = {
     'status_counts': {'200': 0, '206': 0, '304': 0, '4xx': 0, '5xx': 0},
-    'latencies_ms': deque(maxlen=2000)
 }
 
 # Snapshot anterior de rede para cálculo de taxa (bytes/s)
@@ -1,10 +1,12 @@
 import os
-import math
 from datetime import datetime, timezone
 import psutil
 from flask import request, g
 
 from .state import UPLOAD_METRICS, SYSTEM_NET_LAST
+from .counters import traffic_counters
+from .latency import latency_registry
+from services.admin_broadcast import admin_broadcaster
 
 
 def categorize_content_type(path: str, mimetype: str) -> str:
@@ -21,18 +23,6 @@ def categorize_content_type(path: str, mimetype: str) -> str:
         return 'other'
 
 
-def percentile(p: float, values: list[float]) -> float:
-    if not values:
-        return 0.0
-    arr = sorted(values)
-    k = (len(arr) - 1) * p
-    f = int(math.floor(k))
-    c = int(math.ceil(k))
-    if f == c:
-        return float(arr[f])
-    return float(arr[f] + (arr[c] - arr[f]) * (k - f))
-
-
 def collect_system_stats():
     try:
         cpu = psutil.cpu_percent(interval=None)
@@ -50,9 +40,9 @@ def collect_system_stats():
         SYSTEM_NET_LAST['bytes_sent'] = nio.bytes_sent
         SYSTEM_NET_LAST['bytes_recv'] = nio.bytes_recv
 
-        lats = list(UPLOAD_METRICS['latencies_ms'])
-        latency_avg = float(sum(lats) / len(lats)) if lats else 0.0
-        latency_p95 = percentile(0.95, lats) if lats else 0.0
+        traffic_counters.merge()
+        latency = latency_registry.snapshot()
+        uploads_5m = latency_registry.summary(route='uploads', windows=['5m'])['5m']
 
         return {
             'cpu_percent': cpu,
@@ -77,10 +67,12 @@ def collect_system_stats():
             },
             'uploads': {
                 'status_counts': UPLOAD_METRICS['status_counts'],
-                'latency_avg_ms': latency_avg,
-                'latency_p95_ms': latency_p95,
-                'window_size': len(lats)
+                'latency_avg_ms': uploads_5m['avg_ms'],
+                'latency_p95_ms': uploads_5m['p95_ms'],
+                'window_size': uploads_5m['count']
             },
+            'latency': latency,
+            'admin_broadcast': admin_broadcaster.stats(),
             'ts': now.isoformat()
         }
     except Exception as e:
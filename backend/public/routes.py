@@ -1,9 +1,12 @@
-from flask import request, jsonify, send_from_directory, make_response, redirect
+from flask import request, jsonify, send_from_directory, make_response, redirect, abort
 import os
 from database import db
 from models.player import Player
 from models.user import User
 from models.location import Location
+from services.media_server import media_index, send_media, upload_path
+from services.renditions import (IMAGE_FORMAT_EXT, IMAGE_FULL_LABEL, NEGOTIABLE_IMAGE_EXTS,
+                                 accepted_image_formats, rendition_rel_path)
 
 # Helpers locais (isolados)
 
@@ -109,19 +112,21 @@ def register_public_routes(app):
     # Servir uploads com cabeçalhos adequados
     @app.route('/uploads/<path:filename>')
     def serve_upload(filename):  # noqa: F401
-        upload_dir = app.config['UPLOAD_FOLDER']
-        if not os.path.isabs(upload_dir):
-            upload_dir = os.path.join(app.root_path, upload_dir)
-        resp = send_from_directory(upload_dir, filename, conditional=True)
-        try:
-            abs_path = os.path.normpath(os.path.join(upload_dir, filename))
-            st = os.stat(abs_path)
-            etag = f"\"{st.st_size:x}-{int(st.st_mtime):x}\""
-            resp.headers['ETag'] = etag
-        except Exception:
-            pass
-        resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
-        resp.headers['Accept-Ranges'] = 'bytes'
+        # Imagens: variante `full` em AVIF/WebP quando o cliente aceita (services.renditions)
+        served = filename
+        negotiable = os.path.splitext(filename)[1].lower() in NEGOTIABLE_IMAGE_EXTS
+        if negotiable:
+            for fmt in accepted_image_formats(request.headers.get('Accept')):
+                candidate = rendition_rel_path(filename, IMAGE_FULL_LABEL, IMAGE_FORMAT_EXT[fmt])
+                if media_index.get(upload_path(candidate)) is not None:
+                    served = candidate
+                    break
+        # Range/ETag/304 com stat em cache e sendfile (services.media_server)
+        resp = send_media(upload_path(), served)
+        if resp is None:
+            abort(404)
+        if negotiable:
+            resp.headers.add('Vary', 'Accept')
         return resp
 
     # Tizen player assets
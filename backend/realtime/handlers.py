@@ -9,11 +9,24 @@ from models.content import Content
 from models.content_distribution import ContentDistribution
 
 from services.distribution_manager import ContentDistributionManager
+from services.player_presence import player_presence
+from services.admin_broadcast import admin_broadcaster
 
 from .state import CONNECTED_PLAYERS, SOCKET_SID_TO_PLAYER, SOCKET_SID_TO_USER, PLAYER_PLAYBACK_STATUS
 from .utils import _authenticate_websocket_user
 from monitoring.utils import collect_system_stats
 
+# Telemetria após um comando stop (gravada pelo player_presence junto com os heartbeats)
+STOPPED_PLAYBACK = {
+    'is_playing': False,
+    'current_content_id': None,
+    'current_content_title': None,
+    'current_content_type': None,
+    'current_campaign_id': None,
+    'current_campaign_name': None,
+    'playback_start_time': None,
+}
+
 
 def register_socketio_handlers(socketio, app):
     @socketio.on('connect', namespace='/')
@@ -152,37 +165,36 @@ def register_socketio_handlers(socketio, app):
                 emit('error', {'message': 'player_id é obrigatório'})
                 return
 
-            player = Player.query.get(player_id)
-            if not player:
+            if not player_presence.exists(player_id):
                 emit('error', {'message': 'Player não encontrado'})
                 return
 
-            player.last_seen = datetime.now(timezone.utc)
-            player.is_online = True
-
+            last_seen = datetime.now(timezone.utc)
+            values = {'is_online': True, 'last_ping': last_seen}
             if storage_info:
-                player.storage_used_gb = storage_info.get('used_gb', player.storage_used_gb)
-                player.storage_capacity_gb = storage_info.get('capacity_gb', player.storage_capacity_gb)
+                if 'used_gb' in storage_info:
+                    values['storage_used_gb'] = storage_info['used_gb']
+                if 'capacity_gb' in storage_info:
+                    values['storage_capacity_gb'] = storage_info['capacity_gb']
+            if network_info and 'speed_mbps' in network_info:
+                values['network_speed_mbps'] = network_info['speed_mbps']
 
-            if network_info:
-                player.network_speed_mbps = network_info.get('speed_mbps', player.network_speed_mbps)
+            # Gravado em lote pelo job player_presence_flush
+            state = player_presence.record(player_id, **values)
 
-            db.session.commit()
-
-            socketio.emit('player_status_update', {
+            admin_broadcaster.publish('player_status_update', player_id, {
                 'player_id': player_id,
                 'is_online': True,
-                'last_seen': player.last_seen.isoformat(),
-                'storage_used_gb': player.storage_used_gb,
-                'storage_capacity_gb': player.storage_capacity_gb
-            }, room='admin')
+                'last_seen': last_seen.isoformat(),
+                'storage_used_gb': state.get('storage_used_gb'),
+                'storage_capacity_gb': state.get('storage_capacity_gb')
+            })
 
             emit('heartbeat_confirmed', {
                 'player_id': player_id,
                 'timestamp': fmt_br_datetime(datetime.now())
             })
         except Exception as e:
-            db.session.rollback()
             emit('error', {'message': str(e)})
 
     @socketio.on('request_content_download')
@@ -236,20 +248,20 @@ def register_socketio_handlers(socketio, app):
             current_time = datetime.now(timezone.utc)
 
             if event_type == 'playback_start':
-                player = Player.query.get(player_id)
-                if player:
-                    player.is_playing = True
-                    player.current_content_id = event_data.get('content_id')
-                    player.current_content_title = event_data.get('content_title')
-                    player.current_content_type = event_data.get('content_type')
-                    player.current_campaign_id = event_data.get('campaign_id')
-                    player.current_campaign_name = event_data.get('campaign_name')
-                    player.playback_start_time = current_time
-                    player.last_playback_heartbeat = current_time
-                    db.session.commit()
+                if player_presence.exists(player_id):
+                    player_presence.record(
+                        player_id,
+                        is_playing=True,
+                        current_content_id=event_data.get('content_id'),
+                        current_content_title=event_data.get('content_title'),
+                        current_content_type=event_data.get('content_type'),
+                        current_campaign_id=event_data.get('campaign_id'),
+                        current_campaign_name=event_data.get('campaign_name'),
+                        playback_start_time=current_time,
+                        last_playback_heartbeat=current_time,
+                    )
 
                     print(f"[Playback] Player {player_id} iniciou reprodução: {event_data.get('content_title')}")
-                    print(f"[Playback] Status salvo no banco de dados")
 
                 PLAYER_PLAYBACK_STATUS[player_id] = {
                     'is_playing': True,
@@ -282,12 +294,12 @@ def register_socketio_handlers(socketio, app):
                     PLAYER_PLAYBACK_STATUS[player_id]['playlist_index'] = event_data.get('playlist_index', 0)
                 print(f"[Playback] Player {player_id} mudou conteúdo para: {event_data.get('next_content_title')}")
 
-            socketio.emit('playback_status_update', {
+            admin_broadcaster.publish('playback_status_update', player_id, {
                 'player_id': player_id,
                 'event_type': event_type,
                 'status': PLAYER_PLAYBACK_STATUS.get(player_id, {}),
                 'timestamp': current_time.isoformat()
-            }, room='admin')
+            })
         except Exception as e:
             print(f"[Playback] Erro ao processar evento: {e}")
             emit('error', {'message': str(e)})
@@ -327,38 +339,23 @@ def register_socketio_handlers(socketio, app):
                     success = chromecast_service.send_command(player.chromecast_id, 'stop')
                     print(f"[PlayerCommand] Resultado do comando stop: {success}")
                     if success:
-                        player.is_playing = False
-                        player.current_content_id = None
-                        player.current_content_title = None
-                        player.current_content_type = None
-                        player.current_campaign_id = None
-                        player.current_campaign_name = None
-                        player.playback_start_time = None
-                        db.session.commit()
+                        player_presence.record(player_id, **STOPPED_PLAYBACK)
                         emit('player_command_response', {
                             'player_id': player_id,
                             'command': command,
                             'success': True,
                             'message': 'Reprodução parada com sucesso'
                         })
-                        socketio.emit('playback_status_update', {
+                        admin_broadcaster.publish('playback_status_update', player_id, {
                             'player_id': player_id,
                             'event_type': 'playback_stop',
                             'status': {'is_playing': False},
                             'timestamp': datetime.now(timezone.utc).isoformat()
-                        }, room='admin')
+                        })
                     else:
                         emit('error', {'message': 'Falha ao parar reprodução no Chromecast'})
                 else:
-                    player.is_playing = False
-                    player.current_content_id = None
-                    player.current_content_title = None
-                    player.current_content_type = None
-                    player.current_campaign_id = None
-                    player.current_campaign_name = None
-                    player.playback_start_time = None
-                    player.status = 'online'
-                    db.session.commit()
+                    player_presence.record(player_id, status='online', **STOPPED_PLAYBACK)
                     socketio.emit('remote_command', {
                         'command': command,
                         'data': command_data,
@@ -370,19 +367,19 @@ def register_socketio_handlers(socketio, app):
                         'success': True,
                         'message': 'Reprodução parada com sucesso'
                     })
-                    socketio.emit('playback_status_update', {
+                    admin_broadcaster.publish('playback_status_update', player_id, {
                         'player_id': player_id,
                         'event_type': 'playback_stop',
                         'status': {'is_playing': False},
                         'timestamp': datetime.now(timezone.utc).isoformat()
-                    }, room='admin')
-                    socketio.emit('player_status_update', {
+                    })
+                    admin_broadcaster.publish('player_status_update', player_id, {
                         'player_id': player_id,
                         'status': 'online',
                         'is_playing': False,
                         'current_content': None,
                         'timestamp': datetime.now(timezone.utc).isoformat()
-                    }, room='admin')
+                    })
             elif command in ['start', 'pause', 'restart']:
                 if player.chromecast_id and command in ['pause']:
                     from services.chromecast_service import chromecast_service
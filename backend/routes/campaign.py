@@ -14,6 +14,9 @@ import os
 
 # New: video compiler
 from services.video_compiler import video_compiler
+from services.compile_queue import compile_queue
+from models.compile_job import CompileJob
+from services.media_server import media_index
 
 campaign_bp = Blueprint('campaign', __name__)
 
@@ -423,6 +426,13 @@ def delete_campaign(campaign_id):
         except Exception:
             pass
 
+        try:
+            # Jobs de compilação: interromper o que estiver rodando e remover o histórico
+            compile_queue.cancel_campaign(campaign_id)
+            CompileJob.query.filter_by(campaign_id=campaign_id).delete(synchronize_session=False)
+        except Exception:
+            db.session.rollback()
+
         # Remover arquivo de vídeo compilado, se existir
         try:
             if getattr(campaign, 'compiled_video_path', None):
@@ -435,6 +445,8 @@ def delete_campaign(campaign_id):
                         os.remove(compiled_full)
                     except Exception:
                         pass
+                media_index.invalidate(compiled_full)
+            video_compiler.remove_ladder(campaign.get_compiled_renditions())
         except Exception:
             pass
 
@@ -927,10 +939,23 @@ def compile_campaign(campaign_id):
             campaign.compiled_stale = True
             db.session.commit()
 
+        # Prioridade opcional na fila global (maior = antes)
+        try:
+            priority = int(req.get('priority', 0) or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'priority deve ser um número inteiro'}), 400
+
         # Parâmetros passados para o compilador (inclui áudio de fundo opcional)
         try:
-            video_compiler.start_async_compile(campaign.id, resolution=resolution, fps=fps, background_audio_content_id=bg_audio_id)
-            return jsonify({'status': 'processing', 'message': 'Compilação iniciada'}), 202
+            if not video_compiler.start_async_compile(campaign.id, resolution=resolution, fps=fps, background_audio_content_id=bg_audio_id,
+                                                      priority=priority, requested_by=get_jwt_identity()):
+                return jsonify({'error': 'Falha ao enfileirar compilação'}), 500
+            job = compile_queue.active_job(campaign.id)
+            return jsonify({
+                'status': 'processing',
+                'message': 'Compilação enfileirada',
+                'job': compile_queue.job_dict(job) if job else None,
+            }), 202
         except Exception as e:
             return jsonify({'error': f'Falha ao iniciar compilação: {str(e)}'}), 500
     except Exception as e:
@@ -945,6 +970,7 @@ def compile_status(campaign_id):
         if not campaign:
             return jsonify({'error': 'Campanha não encontrada'}), 404
         c = campaign.to_dict()
+        job = compile_queue.active_job(campaign_id)
         return jsonify({
             'compiled_video_path': c.get('compiled_video_path'),
             'compiled_video_url': c.get('compiled_video_url'),
@@ -955,6 +981,45 @@ def compile_status(campaign_id):
             'compiled_stale': c.get('compiled_stale'),
             'compiled_video_resolution': c.get('compiled_video_resolution'),
             'compiled_video_fps': c.get('compiled_video_fps'),
+            'compile_job': compile_queue.job_dict(job) if job else None,
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/<campaign_id>/compile', methods=['DELETE'])
+@jwt_required()
+def cancel_compile(campaign_id):
+    """Cancela a compilação da campanha (na fila ou em andamento)."""
+    try:
+        campaign = Campaign.query.get(campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campanha não encontrada'}), 404
+        cancelled = compile_queue.cancel_campaign(campaign_id)
+        if not cancelled:
+            return jsonify({'error': 'Nenhuma compilação ativa para esta campanha'}), 404
+        return jsonify({'message': 'Cancelamento solicitado', 'cancelled': cancelled}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/compile/queue', methods=['GET'])
+@jwt_required()
+def compile_queue_state():
+    """Estado da fila global de compilação: em andamento, na fila e recentes."""
+    try:
+        return jsonify(compile_queue.list()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/compile/jobs/<job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_compile_job(job_id):
+    """Cancela um job da fila de compilação."""
+    try:
+        job = compile_queue.cancel(job_id)
+        if job is None:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        return jsonify({'message': 'Cancelamento solicitado', 'job': compile_queue.job_dict(job)}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -3,6 +3,7 @@ from database import db
 from models.campaign import Campaign, CampaignContent
 from models.content import Content
 from models.user import User
+from services.media_store import media_rel_path
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import uuid
 import json
@@ -28,7 +29,7 @@ def get_campaign_contents(campaign_id):
             content_data = cc.to_dict()
             # Adicionar informações extras do conteúdo
             if cc.content:
-                content_data['content']['file_url'] = f"/uploads/{cc.content.file_path.split('/')[-1]}" if cc.content.file_path else None
+                content_data['content']['file_url'] = f"/uploads/{media_rel_path(cc.content.file_path)}" if cc.content.file_path else None
                 content_data['content']['thumbnail_url'] = f"/content/thumbnails/{cc.content.thumbnail_path.split('/')[-1]}" if cc.content.thumbnail_path else None
             contents_data.append(content_data)
         
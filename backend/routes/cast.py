@@ -215,7 +215,7 @@ def get_cast_status(player_id):
         if not player.chromecast_id:
             return jsonify({'error': 'Player não possui Chromecast associado'}), 400
         
-        # Obter status real do Chromecast
+        # Status espelhado em memória (atualizado por push pelos listeners da conexão)
         cast_status = chromecast_service.get_device_status(player.chromecast_id)
         
         if cast_status:
@@ -227,3 +227,32 @@ def get_cast_status(player_id):
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@cast_bp.route('/dispatcher/metrics', methods=['GET'])
+@jwt_required()
+def get_cast_dispatcher_metrics():
+    """Fila e latências de comandos por Chromecast (opcional: ?device_id=)"""
+    try:
+        device_id = request.args.get('device_id')
+        return jsonify({
+            'devices': chromecast_service.dispatcher_metrics(device_id)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cast_bp.route('/status', methods=['GET'])
+@jwt_required()
+def get_all_cast_status():
+    """Estado espelhado de todos os Chromecasts conectados, com o player associado"""
+    try:
+        states = chromecast_service.all_device_status()
+        players = Player.query.filter(Player.chromecast_id.in_(list(states.keys()))).all() if states else []
+        by_device = {str(p.chromecast_id): p for p in players}
+        devices = []
+        for device_id, state in states.items():
+            player = by_device.get(device_id)
+            devices.append(dict(state, player_id=player.id if player else None,
+                                player_name=player.name if player else None))
+        return jsonify({'devices': devices, 'total': len(devices)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
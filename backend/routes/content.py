@@ -1,14 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app, make_response, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, make_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-from PIL import Image
 import os
-import uuid
-import subprocess
 import json
 from datetime import datetime
 from models.content import Content, db
 from models.user import User
+from services import media_store
+from services.media_jobs import build_task, media_jobs
+from services.media_server import media_index, send_media, upload_path
+from services.model_events import notify_changes
 from sqlalchemy import or_
 
 content_bp = Blueprint('content', __name__)
@@ -62,143 +63,35 @@ def normalize_tags_to_text(value):
     except Exception:
         return '[]'
 
-def generate_video_thumbnail(video_path, thumbnail_path):
-    """Gera thumbnail de vídeo usando FFmpeg"""
-    try:
-        # Comando FFmpeg para gerar thumbnail no segundo 1 do vídeo
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,
-            '-ss', '00:00:01.000',
-            '-vframes', '1',
-            '-q:v', '2',
-            '-y',  # Sobrescrever arquivo existente
-            thumbnail_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            return True
-        else:
-            print(f"FFmpeg error: {result.stderr}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        print("FFmpeg timeout - vídeo muito longo ou corrompido")
-        return False
-    except FileNotFoundError:
-        print("FFmpeg não encontrado. Instale FFmpeg para gerar thumbnails de vídeo.")
-        return False
-    except Exception as e:
-        print(f"Erro ao gerar thumbnail: {str(e)}")
-        return False
-
-def generate_image_thumbnail(image_path, thumbnail_path, size=(300, 200)):
-    """Gera thumbnail de imagem usando PIL"""
-    try:
-        with Image.open(image_path) as img:
-            # Converter para RGB se necessário
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Redimensionar mantendo proporção
-            try:
-                resample = Image.Resampling.LANCZOS  # Pillow >= 9.1
-            except Exception:
-                # Compatibilidade com versões antigas
-                resample = getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', Image.BICUBIC))
-            img.thumbnail(size, resample)
-            
-            # Salvar thumbnail
-            img.save(thumbnail_path, 'JPEG', quality=85)
-            return True
-            
-    except Exception as e:
-        print(f"Erro ao gerar thumbnail de imagem: {str(e)}")
-        return False
-
-def generate_audio_thumbnail(audio_path, thumbnail_path, size='640x360'):
-    try:
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-i', audio_path,
-            '-filter_complex', f"showwavespic=s={size}:colors=DodgerBlue",
-            '-frames:v', '1',
-            thumbnail_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode == 0 and os.path.exists(thumbnail_path):
-            return True
-        cmd2 = [
-            'ffmpeg',
-            '-y',
-            '-i', audio_path,
-            '-lavfi', f"showspectrumpic=s={size}:legend=disabled",
-            '-frames:v', '1',
-            thumbnail_path
-        ]
-        result2 = subprocess.run(cmd2, capture_output=True, text=True, timeout=30)
-        return result2.returncode == 0 and os.path.exists(thumbnail_path)
-    except subprocess.TimeoutExpired:
-        print("FFmpeg timeout - áudio muito longo ou corrompido")
-        return False
-    except FileNotFoundError:
-        print("FFmpeg não encontrado. Instale FFmpeg para gerar thumbnails de áudio.")
-        return False
-    except Exception as e:
-        print(f"Erro ao gerar thumbnail de áudio: {str(e)}")
-        return False
-
-def get_video_duration_seconds(video_path):
-    """Obtém a duração real do vídeo em segundos via ffprobe. Retorna int ou None."""
-    try:
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode == 0 and result.stdout.strip():
-            return int(float(result.stdout.strip()))
-        # Fallback: tentar extrair a partir do stderr do ffmpeg
-        cmd2 = ['ffmpeg', '-i', video_path]
-        result2 = subprocess.run(cmd2, capture_output=True, text=True)
-        out = result2.stderr or ''
-        if 'Duration:' in out:
-            try:
-                dur_str = out.split('Duration:')[1].split(',')[0].strip()  # HH:MM:SS.xx
-                h, m, s = dur_str.split(':')
-                s = float(s)
-                return int(float(h) * 3600 + float(m) * 60 + s)
-            except Exception:
-                return None
-        return None
-    except Exception:
-        return None
-
 # Endpoint para servir arquivos de mídia
-@content_bp.route('/media/<filename>')
+@content_bp.route('/media/<path:filename>')
 def serve_media(filename):
     """Serve arquivos de mídia do diretório de uploads"""
-    try:
-        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
-    except FileNotFoundError:
+    resp = send_media(upload_path(), filename)
+    if resp is None:
         return jsonify({'error': 'Arquivo não encontrado'}), 404
+    return resp
 
 
 # Endpoint para servir thumbnails
 @content_bp.route('/thumbnails/<filename>')
 def serve_thumbnail(filename):
     """Serve thumbnails do diretório de thumbnails"""
-    try:
-        thumbnail_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails')
-        return send_from_directory(thumbnail_dir, filename)
-    except FileNotFoundError:
+    resp = send_media(upload_path('thumbnails'), filename)
+    if resp is None:
         return jsonify({'error': 'Thumbnail não encontrado'}), 404
+    return resp
+
+
+def _enqueue_media_processing(kind, items, probe_duration=True, thumbnails=True, renditions=True):
+    """Enfileira thumbnail/duração/metadados/versões de [(Content, caminho do arquivo)]; retorna o job."""
+    thumbnails_dir = None
+    if thumbnails:
+        thumbnails_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails')
+        os.makedirs(thumbnails_dir, exist_ok=True)
+    tasks = [build_task(content, src, thumbnails_dir, probe_duration=probe_duration, renditions=renditions)
+             for content, src in items]
+    return media_jobs.submit(current_app._get_current_object(), kind, tasks)
 
 
 # Add route without trailing slash to avoid 308 redirects
@@ -280,6 +173,8 @@ def update_content(content_id):
         
         # Atualização pode vir como multipart/form-data (com arquivo) ou JSON
         is_multipart = 'file' in request.files or request.content_type and 'multipart/form-data' in request.content_type
+        replaced_hash = None
+        process_file_path = None
         
         if is_multipart:
             # Campos de formulário
@@ -306,47 +201,20 @@ def update_content(content_id):
             # Atualizar arquivo, se enviado
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+                # Armazenamento por hash (deduplicado); referência antiga liberada após o commit
+                replaced_hash = content.file_hash or ''
+                blob = media_store.ingest_upload(file, filename)
+                file_path = upload_path(blob.file_path)
                 
                 # Atualizar metadados do arquivo
-                content.file_path = unique_filename
-                content.file_size = os.path.getsize(file_path)
+                media_store.attach(content, blob)
                 content.mime_type = file.mimetype
                 
                 # Atualizar content_type inferindo pela extensão
                 content.content_type = get_content_type(filename)
                 
-                # Regenerar thumbnail
-                thumbnails_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails')
-                os.makedirs(thumbnails_dir, exist_ok=True)
-                thumbnail_path = os.path.join(thumbnails_dir, f"{uuid.uuid4()}.jpg")
-                if content.content_type == 'video':
-                    generate_video_thumbnail(file_path, thumbnail_path)
-                elif content.content_type == 'image':
-                    generate_image_thumbnail(file_path, thumbnail_path)
-                elif content.content_type == 'audio':
-                    generate_audio_thumbnail(file_path, thumbnail_path)
-                # Para outros tipos, thumbnail é opcional
-                if os.path.exists(thumbnail_path):
-                    content.thumbnail_path = os.path.basename(thumbnail_path)
-                
-                # Atualizar duração em update de arquivo (multipart)
-                if content.content_type == 'video':
-                    try:
-                        real_dur_new = get_video_duration_seconds(file_path)
-                        if real_dur_new and real_dur_new > 0:
-                            content.duration = int(real_dur_new)
-                    except Exception:
-                        pass
-                elif content.content_type == 'audio':
-                    try:
-                        real_dur_new = get_video_duration_seconds(file_path)
-                        if real_dur_new and real_dur_new > 0:
-                            content.duration = int(real_dur_new)
-                    except Exception:
-                        pass
+                # Thumbnail e duração reais são calculados em background (services.media_jobs)
+                process_file_path = file_path
         else:
             # JSON puro
             data = request.get_json(force=True, silent=False)
@@ -366,10 +234,14 @@ def update_content(content_id):
         
         content.updated_at = datetime.utcnow()
         db.session.commit()
+        if replaced_hash:
+            media_store.release(replaced_hash)
+        job = _enqueue_media_processing('update', [(content, process_file_path)]) if process_file_path else None
         
         return jsonify({
             'message': 'Conteúdo atualizado com sucesso',
-            'content': content.to_dict()
+            'content': content.to_dict(),
+            'processing_job': job
         }), 200
         
     except Exception as e:
@@ -399,6 +271,10 @@ def delete_content(content_id):
         from models.campaign import CampaignContent
         from models.content_distribution import ContentDistribution
         
+        # Campanhas afetadas (coletadas antes do DELETE) para invalidar caches após o commit
+        affected_campaigns = {row[0] for row in db.session.query(CampaignContent.campaign_id)
+                              .filter(CampaignContent.content_id == content_id).all()}
+        
         # Usar SQL direto para evitar problemas de relacionamento do SQLAlchemy
         # Remover dependências em CampaignContent primeiro
         db.session.execute(
@@ -412,14 +288,17 @@ def delete_content(content_id):
             {"content_id": content_id}
         )
         
-        # Remover arquivo físico
-        if content.file_path:
+        # Remover arquivo físico (blobs por hash são liberados após o commit: podem ser compartilhados)
+        file_hash = content.file_hash
+        if content.file_path and not file_hash:
             file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], content.file_path)
             if os.path.exists(file_path):
                 try:
                     os.remove(file_path)
                 except OSError as e:
                     print(f"Erro ao remover arquivo: {e}")
+            media_index.invalidate(file_path)
+            media_store.remove_derived(media_store.media_rel_path(content.file_path))
         
         # Remover thumbnail se existir
         if content.thumbnail_path:
@@ -429,6 +308,7 @@ def delete_content(content_id):
                     os.remove(thumbnail_path)
                 except OSError as e:
                     print(f"Erro ao remover thumbnail: {e}")
+            media_index.invalidate(thumbnail_path)
         
         # Deletar o conteúdo usando SQL direto
         db.session.execute(
@@ -437,6 +317,10 @@ def delete_content(content_id):
         )
         
         db.session.commit()
+        # DELETE via SQL direto não passa pelos eventos do ORM: avisar playlists/timeline
+        notify_changes({'contents': [content_id], 'affected_campaigns': affected_campaigns})
+        if file_hash:
+            media_store.release(file_hash)
         
         return jsonify({'message': 'Conteúdo deletado com sucesso'}), 200
         
@@ -569,6 +453,7 @@ def list_content():
 def create_content():
     try:
         user_id = get_jwt_identity()
+        process_file_path = None
         
         # Verificar se é upload de arquivo
         if 'file' in request.files:
@@ -578,58 +463,29 @@ def create_content():
             
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                
-                file.save(file_path)
+                # Hash calculado durante a gravação; arquivo idêntico reaproveita o blob existente
+                blob = media_store.ingest_upload(file, filename)
+                file_path = upload_path(blob.file_path)
                 
                 # Obter informações do arquivo
-                file_size = os.path.getsize(file_path)
                 content_type = get_content_type(filename)
                 
-                # Para imagens, obter dimensões
-                duration = 10  # padrão para imagens
-                if content_type == 'image':
-                    try:
-                        with Image.open(file_path) as img:
-                            width, height = img.size
-                    except:
-                        pass
-                elif content_type == 'video':
-                    # Calcular duração real do vídeo
-                    real_dur = get_video_duration_seconds(file_path)
-                    if real_dur and real_dur > 0:
-                        duration = int(real_dur)
-                elif content_type == 'audio':
-                    # Calcular duração real do áudio (ffprobe funciona igualmente)
-                    real_dur = get_video_duration_seconds(file_path)
-                    if real_dur and real_dur > 0:
-                        duration = int(real_dur)
- 
-                # Gerar thumbnail
-                thumbnails_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails')
-                os.makedirs(thumbnails_dir, exist_ok=True)
-                thumbnail_path = os.path.join(thumbnails_dir, f"{uuid.uuid4()}.jpg")
-                if content_type == 'video':
-                    generate_video_thumbnail(file_path, thumbnail_path)
-                elif content_type == 'image':
-                    generate_image_thumbnail(file_path, thumbnail_path)
-                elif content_type == 'audio':
-                    generate_audio_thumbnail(file_path, thumbnail_path)
-                thumb_file = os.path.basename(thumbnail_path) if os.path.exists(thumbnail_path) else None
+                # Duração real, dimensões e thumbnail são calculados em background (services.media_jobs)
+                duration = 10  # padrão até o ffprobe concluir
+                process_file_path = file_path
 
                 content = Content(
                     title=request.form.get('title', filename),
                     description=request.form.get('description', ''),
                     content_type=content_type,
-                    file_path=unique_filename,
-                    file_size=file_size,
+                    file_path=blob.file_path,
+                    file_hash=blob.sha256,
+                    file_size=blob.file_size,
                     mime_type=file.mimetype,
                     duration=duration,
                     tags=normalize_tags_to_text(request.form.get('tags', '[]')),
                     category=request.form.get('category') or None,
-                    user_id=user_id,
-                    thumbnail_path=thumb_file
+                    user_id=user_id
                 )
             else:
                 return jsonify({'error': 'Tipo de arquivo não suportado'}), 400
@@ -653,21 +509,17 @@ def create_content():
             
             # Para conteúdo HTML/texto, salvar em arquivo
             if data.get('content'):
-                unique_filename = f"{uuid.uuid4()}.html"
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(data['content'])
-                
-                content.file_path = unique_filename
-                content.file_size = os.path.getsize(file_path)
+                blob = media_store.ingest_bytes(data['content'].encode('utf-8'), 'content.html', 'text/html')
+                media_store.attach(content, blob)
         
         db.session.add(content)
         db.session.commit()
+        job = _enqueue_media_processing('upload', [(content, process_file_path)]) if process_file_path else None
         
         return jsonify({
             'message': 'Conteúdo criado com sucesso',
-            'content': content.to_dict()
+            'content': content.to_dict(),
+            'processing_job': job
         }), 201
         
     except Exception as e:
@@ -702,13 +554,10 @@ def rebuild_thumbnails():
         if types:
             query = query.filter(Content.content_type.in_(types))
         items = query.all()
-        processed = 0
-        generated = 0
+        queued = []
         skipped = 0
-        errors = []
-        updated_ids = []
         for c in items:
-            if limit is not None and generated >= limit:
+            if limit is not None and len(queued) >= limit:
                 break
             need = force or not c.thumbnail_path or not os.path.exists(os.path.join(thumbnails_dir, c.thumbnail_path or ''))
             if not need:
@@ -721,33 +570,30 @@ def rebuild_thumbnails():
             if not os.path.exists(src):
                 skipped += 1
                 continue
-            dest_name = f"{uuid.uuid4()}.jpg"
-            dest = os.path.join(thumbnails_dir, dest_name)
-            ok = False
-            if c.content_type == 'video':
-                ok = generate_video_thumbnail(src, dest)
-            elif c.content_type == 'image':
-                ok = generate_image_thumbnail(src, dest)
-            elif c.content_type == 'audio':
-                ok = generate_audio_thumbnail(src, dest)
-            if ok and os.path.exists(dest):
-                c.thumbnail_path = dest_name
-                generated += 1
-                updated_ids.append(c.id)
-            else:
-                try:
-                    if os.path.exists(dest):
-                        os.remove(dest)
-                except Exception:
-                    pass
-                errors.append(c.id)
-            processed += 1
-        db.session.commit()
-        return jsonify({'processed': processed, 'generated': generated, 'skipped': skipped, 'errors': errors, 'updated_ids': updated_ids}), 200
+            queued.append((c, src))
+        # Geração em paralelo no pool de threads de media_jobs; progresso via Socket.IO (media_job_progress)
+        job = _enqueue_media_processing('rebuild_thumbnails', queued, probe_duration=False, renditions=False)
+        return jsonify({'queued': len(queued), 'skipped': skipped, 'job': job}), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+
+@content_bp.route('/jobs', methods=['GET'])
+@jwt_required()
+def list_media_jobs():
+    """Jobs recentes de processamento de mídia (sem os resultados por item)."""
+    return jsonify({'jobs': media_jobs.list()}), 200
+
+
+@content_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_media_job(job_id):
+    job = media_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job), 200
+
 @content_bp.route('/recalc-durations', methods=['POST'])
 @jwt_required()
 def recalc_video_durations():
@@ -760,19 +606,53 @@ def recalc_video_durations():
 
         base_dir = current_app.config['UPLOAD_FOLDER']
         videos = Content.query.filter(Content.content_type == 'video').all()
-        updated = 0
+        queued = []
         for c in videos:
             if not c.file_path:
                 continue
             full_path = os.path.join(base_dir, c.file_path)
             if not os.path.exists(full_path):
                 continue
-            dur = get_video_duration_seconds(full_path)
-            if dur and dur > 0 and dur != c.duration:
-                c.duration = int(dur)
-                updated += 1
-        db.session.commit()
-        return jsonify({'updated': updated, 'total_videos': len(videos)}), 200
+            queued.append((c, full_path))
+        # ffprobe em paralelo no pool de threads de media_jobs (sem gerar thumbnails)
+        job = _enqueue_media_processing('recalc_durations', queued, thumbnails=False, renditions=False)
+        return jsonify({'queued': len(queued), 'total_videos': len(videos), 'job': job}), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@content_bp.route('/rebuild-renditions', methods=['POST'])
+@jwt_required()
+def rebuild_renditions():
+    """Gera versões por dispositivo (vídeos) e variantes de tela (imagens) que faltam (admin/manager)."""
+    try:
+        user_id = get_jwt_identity()
+        user = User.query.get(user_id)
+        if not user or user.role not in ['admin', 'manager']:
+            return jsonify({'error': 'Sem permissão'}), 403
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force', False))
+        types = data.get('types') or ['video', 'image']
+        if isinstance(types, str):
+            types = [t.strip() for t in types.split(',') if t.strip()]
+
+        items = Content.query.filter(Content.content_type.in_(types)).all()
+        queued = []
+        skipped = 0
+        for c in items:
+            if not c.file_path or (c.renditions and not force):
+                skipped += 1
+                continue
+            full_path = upload_path(media_store.media_rel_path(c.file_path))
+            if not os.path.exists(full_path):
+                skipped += 1
+                continue
+            if force:
+                media_store.remove_derived(media_store.media_rel_path(c.file_path))
+            queued.append((c, full_path))
+        # Transcodificação em background; progresso via Socket.IO (media_job_progress)
+        job = _enqueue_media_processing('rebuild_renditions', queued, probe_duration=False, thumbnails=False)
+        return jsonify({'queued': len(queued), 'skipped': skipped, 'job': job}), 202
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
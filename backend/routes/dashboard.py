@@ -11,9 +11,20 @@ from models.player import Player
 from models.schedule import Schedule
 from models.editorial import Editorial
 from models.location import Location
+from services.schedule_predicates import filter_active_schedules
+from services.player_presence import player_presence
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+
+def _count_online_players(threshold):
+    """Players com ping desde `threshold`, incluindo pings ainda não gravados (player_presence)."""
+    rows = db.session.query(Player.id).filter(
+        Player.last_ping.isnot(None),
+        Player.last_ping >= threshold
+    ).all()
+    return len(set(r[0] for r in rows) | player_presence.online_ids(threshold))
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_dashboard_stats():
@@ -52,10 +63,7 @@ def get_dashboard_stats():
         # Fix: Calculate online players based on last_ping within 5 minutes (same logic as Player.is_online property)
         five_minutes_ago = datetime.utcnow() - timedelta(minutes=5)
         try:
-            online_players = Player.query.filter(
-                Player.last_ping.isnot(None),
-                Player.last_ping >= five_minutes_ago
-            ).count()
+            online_players = _count_online_players(five_minutes_ago)
         except Exception as e:
             print(f"[DASHBOARD] online_players fallback due to: {e}")
             online_players = 0
@@ -350,10 +358,7 @@ def get_system_health():
         # Fix: Calculate online players based on last_ping within 5 minutes (same logic as Player.is_online property)
         five_minutes_ago = datetime.utcnow() - timedelta(minutes=5)
         try:
-            online_players = Player.query.filter(
-                Player.last_ping.isnot(None),
-                Player.last_ping >= five_minutes_ago
-            ).count()
+            online_players = _count_online_players(five_minutes_ago)
         except Exception as e:
             print(f"[DASHBOARD] health online_players fallback due to: {e}")
             online_players = 0
@@ -525,6 +530,9 @@ def get_playback_status():
             is_orm_players = False
             print(f"[DASHBOARD] Players encontrados: {len(all_players)} (fallback leve)")
         
+        # Telemetria mais recente (pings/heartbeats ainda não gravados no banco)
+        all_players = [player_presence.view(p) for p in all_players]
+
         for player in all_players:
             print(f"[DASHBOARD] Processando player: {player.name} (ID: {player.id})")
             print(f"[DASHBOARD] Last ping: {player.last_ping}")
@@ -603,6 +611,7 @@ def get_playback_status():
             player = Player.query.get(player_id)
             if not player:
                 continue
+            player = player_presence.view(player)
                 
             # Se o player está reproduzindo atualmente, não é fantasma (considerando heartbeat recente)
             hb_dt = None
@@ -654,13 +663,7 @@ def get_playback_status():
                 except Exception:
                     pass
 
-                active_now = []
-                for s in schedules:
-                    try:
-                        if s.is_active_now():
-                            active_now.append(s)
-                    except Exception:
-                        continue
+                active_now = filter_active_schedules(schedules, datetime.now())
 
                 active_main = [s for s in active_now if (s.content_type or 'main') != 'overlay']
                 active_overlay = [s for s in active_now if (s.content_type or 'main') == 'overlay']
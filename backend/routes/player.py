@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_socketio import emit
+from sqlalchemy import bindparam
 from datetime import datetime, timedelta
 import secrets
 import json
@@ -12,6 +13,14 @@ from models.user import User
 from models.location import Location
 from models.schedule import Schedule
 from services.auto_sync_service import auto_sync_service
+from services.schedule_predicates import filter_active_schedules
+from services.schedule_timeline import schedule_boundaries
+from services.playlist_cache import playlist_cache
+from services.player_presence import player_presence
+from services.admin_broadcast import admin_broadcaster
+from services.media_server import media_index
+from services.media_store import content_file_version, media_rel_path
+from services.renditions import select_device_file, select_image_variant, select_rendition
 
 player_bp = Blueprint('player', __name__)
 
@@ -77,27 +86,28 @@ def list_players():
                 sql_where.append("l.company = :company")
                 sql_params['company'] = current_user.company
         
-        # Filtrar por status (prioritário) ou is_online
+        # Filtrar por status (prioritário) ou is_online.
+        # Pings ainda não gravados (player_presence) também contam como online.
+        online_filter = None
         if status is not None and str(status).strip() != '':
             s = status.lower()
             if s in ['online', 'offline']:
-                threshold = datetime.utcnow() - timedelta(minutes=5)
-                if s == 'online':
-                    sql_where.append("p.last_ping IS NOT NULL AND p.last_ping >= :threshold")
-                else:
-                    sql_where.append("(p.last_ping IS NULL OR p.last_ping < :threshold)")
-                sql_params['threshold'] = threshold
+                online_filter = (s == 'online')
             else:
                 sql_where.append("LOWER(p.status) = :status")
                 sql_params['status'] = s
         elif is_online is not None:
+            online_filter = (is_online.lower() == 'true')
+        expanding = []
+        if online_filter is not None:
             threshold = datetime.utcnow() - timedelta(minutes=5)
-            if is_online.lower() == 'true':
-                sql_where.append("p.last_ping IS NOT NULL AND p.last_ping >= :threshold")
-                sql_params['threshold'] = threshold
+            sql_params['threshold'] = threshold
+            sql_params['presence_online_ids'] = sorted(player_presence.online_ids(threshold))
+            expanding.append(bindparam('presence_online_ids', expanding=True))
+            if online_filter:
+                sql_where.append("((p.last_ping IS NOT NULL AND p.last_ping >= :threshold) OR p.id IN :presence_online_ids)")
             else:
-                sql_where.append("(p.last_ping IS NULL OR p.last_ping < :threshold)")
-                sql_params['threshold'] = threshold
+                sql_where.append("((p.last_ping IS NULL OR p.last_ping < :threshold) AND p.id NOT IN :presence_online_ids)")
         
         # Filtrar por is_active
         if is_active is not None:
@@ -133,12 +143,12 @@ def list_players():
         
         # Executar query de contagem
         from sqlalchemy import text
-        count_result = db.session.execute(text(sql_count), sql_params).scalar()
+        count_result = db.session.execute(text(sql_count).bindparams(*expanding), sql_params).scalar()
         total = count_result or 0
         pages = (total + per_page - 1) // per_page if total > 0 else 1
         
         # Executar query principal
-        result = db.session.execute(text(sql_select), sql_params)
+        result = db.session.execute(text(sql_select).bindparams(*expanding), sql_params)
         
         # Converter resultados em objetos Player
         players = []
@@ -147,7 +157,8 @@ def list_players():
             for column in Player.__table__.columns:
                 if hasattr(row, column.name):
                     setattr(player, column.name, getattr(row, column.name))
-            players.append(player)
+            # Telemetria mais recente que a gravada no banco
+            players.append(player_presence.apply(player))
         
         # Montar resposta
         return jsonify({
@@ -397,24 +408,19 @@ def delete_player(player_id):
 def player_ping(player_id):
     """Endpoint para players enviarem ping de status"""
     try:
-        player = Player.query.get(player_id)
-        
-        if not player:
+        if not player_presence.exists(player_id):
             return jsonify({'error': 'Player não encontrado'}), 404
         
         data = request.get_json() or {}
         
-        # Atualiza status com base no ping
-        player.status = 'online'
-        player.last_ping = datetime.utcnow()
-        
+        # Atualiza status com base no ping (gravado em lote pelo player_presence)
+        values = {'status': 'online', 'last_ping': datetime.utcnow()}
         if 'storage_used_gb' in data:
-            player.storage_used_gb = data['storage_used_gb']
+            values['storage_used_gb'] = data['storage_used_gb']
         elif 'storage_used' in data:
             # Compatibilidade com versões antigas que enviam 'storage_used'
-            player.storage_used_gb = data['storage_used']
-        
-        db.session.commit()
+            values['storage_used_gb'] = data['storage_used']
+        player_presence.record(player_id, **values)
         
         return jsonify({
             'message': 'Ping recebido',
@@ -423,7 +429,6 @@ def player_ping(player_id):
         }), 200
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @player_bp.route('/<player_id>/command', methods=['POST'])
@@ -477,6 +482,9 @@ def refresh_player_playlist(player_id):
         if not player:
             return jsonify({'error': 'Player não encontrado'}), 404
 
+        # Arquivos podem ter mudado em disco: descartar playlist em cache
+        playlist_cache.invalidate_player(player_id)
+
         from app import socketio
         socketio.emit('player_command', {
             'command': 'update_playlist',
@@ -497,6 +505,8 @@ def refresh_all_playlists():
         if user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Sem permissão para atualizar playlists'}), 403
 
+        playlist_cache.clear()
+
         from app import socketio
         socketio.emit('player_command', {
             'command': 'update_playlist',
@@ -850,37 +860,33 @@ def connect_player(player_id):
     Updates last_ping, status and optionally records IP address.
     """
     try:
-        player = Player.query.get(player_id)
-        if not player:
+        if not player_presence.exists(player_id):
             return jsonify({'error': 'Player não encontrado'}), 404
 
         # Update status
-        player.status = 'online'
-        player.last_ping = datetime.utcnow()
+        values = {'status': 'online', 'last_ping': datetime.utcnow()}
         # Best-effort capture of IP
         try:
             remote_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
             if remote_ip:
-                player.ip_address = remote_ip
+                values['ip_address'] = remote_ip
         except Exception:
             pass
 
-        db.session.commit()
+        player_presence.record(player_id, **values)
 
         # Notify admins of status update (optional)
         try:
-            from app import socketio
-            socketio.emit('player_status_update', {
+            admin_broadcaster.publish('player_status_update', player_id, {
                 'player_id': player_id,
                 'is_online': True,
                 'last_seen': datetime.utcnow().isoformat()
-            }, room='admin')
+            })
         except Exception:
             pass
 
         return jsonify({'message': 'Player conectado', 'player_id': player_id}), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
     
@@ -888,52 +894,50 @@ def connect_player(player_id):
 def playback_start(player_id):
     """Public endpoint: registra início de reprodução e atualiza telemetria."""
     try:
-        player = Player.query.get(player_id)
-        if not player:
+        if not player_presence.exists(player_id):
             return jsonify({'error': 'Player não encontrado'}), 404
 
         data = request.get_json() or {}
         now = datetime.utcnow()
 
         # Atualizar status de reprodução do player
-        player.is_playing = True
-        player.current_content_id = data.get('content_id')
-        player.current_content_title = data.get('content_title')
-        player.current_content_type = data.get('content_type')
-        player.current_campaign_id = data.get('campaign_id')
-        player.current_campaign_name = data.get('campaign_name')
-        player.playback_start_time = now
-        player.last_playback_heartbeat = now
-        # Manter presença atualizada
-        player.status = 'online'
-        player.last_ping = now
-
-        db.session.commit()
+        state = player_presence.record(
+            player_id,
+            is_playing=True,
+            current_content_id=data.get('content_id'),
+            current_content_title=data.get('content_title'),
+            current_content_type=data.get('content_type'),
+            current_campaign_id=data.get('campaign_id'),
+            current_campaign_name=data.get('campaign_name'),
+            playback_start_time=now,
+            last_playback_heartbeat=now,
+            # Manter presença atualizada
+            status='online',
+            last_ping=now,
+        )
 
         # Notificar dashboards (best-effort)
         try:
-            from app import socketio
-            socketio.emit('playback_status_update', {
+            admin_broadcaster.publish('playback_status_update', player_id, {
                 'player_id': player_id,
                 'event_type': 'playback_start',
                 'status': {
                     'is_playing': True,
-                    'content_id': player.current_content_id,
-                    'content_title': player.current_content_title,
-                    'content_type': player.current_content_type,
-                    'campaign_id': player.current_campaign_id,
-                    'campaign_name': player.current_campaign_name,
-                    'start_time': player.playback_start_time.isoformat() if player.playback_start_time else None,
-                    'last_heartbeat': player.last_playback_heartbeat.isoformat() if player.last_playback_heartbeat else None
+                    'content_id': state.get('current_content_id'),
+                    'content_title': state.get('current_content_title'),
+                    'content_type': state.get('current_content_type'),
+                    'campaign_id': state.get('current_campaign_id'),
+                    'campaign_name': state.get('current_campaign_name'),
+                    'start_time': now.isoformat(),
+                    'last_heartbeat': now.isoformat()
                 },
                 'timestamp': now.isoformat()
-            }, room='admin')
+            })
         except Exception:
             pass
 
         return jsonify({'message': 'playback_start registrado'}), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
@@ -941,56 +945,46 @@ def playback_start(player_id):
 def playback_heartbeat(player_id):
     """Public endpoint: atualiza heartbeat de reprodução."""
     try:
-        player = Player.query.get(player_id)
-        if not player:
+        if not player_presence.exists(player_id):
             return jsonify({'error': 'Player não encontrado'}), 404
 
         data = request.get_json() or {}
         now = datetime.utcnow()
 
         # Atualizar heartbeat e campos opcionais
-        player.last_playback_heartbeat = now
+        values = {'last_playback_heartbeat': now}
         if 'is_playing' in data:
-            player.is_playing = bool(data.get('is_playing'))
-        if data.get('content_id'):
-            player.current_content_id = data.get('content_id')
-        if data.get('content_title'):
-            player.current_content_title = data.get('content_title')
-        if data.get('content_type'):
-            player.current_content_type = data.get('content_type')
-        if data.get('campaign_id'):
-            player.current_campaign_id = data.get('campaign_id')
-        if data.get('campaign_name'):
-            player.current_campaign_name = data.get('campaign_name')
+            values['is_playing'] = bool(data.get('is_playing'))
+        for field in ('content_id', 'content_title', 'content_type', 'campaign_id', 'campaign_name'):
+            if data.get(field):
+                values[f'current_{field}'] = data.get(field)
         # Manter presença atualizada
-        player.status = 'online'
-        player.last_ping = now
+        values['status'] = 'online'
+        values['last_ping'] = now
 
-        db.session.commit()
+        state = player_presence.record(player_id, **values)
 
         # Notificar dashboards (best-effort)
         try:
-            from app import socketio
-            socketio.emit('playback_status_update', {
+            admin_broadcaster.publish('playback_status_update', player_id, {
                 'player_id': player_id,
                 'event_type': 'playback_heartbeat',
                 'status': {
-                    'is_playing': player.is_playing,
-                    'content_id': player.current_content_id,
-                    'content_title': player.current_content_title,
-                    'content_type': player.current_content_type,
-                    'campaign_id': player.current_campaign_id,
-                    'campaign_name': player.current_campaign_name,
-                    'last_heartbeat': player.last_playback_heartbeat.isoformat() if player.last_playback_heartbeat else None
+                    'is_playing': bool(state.get('is_playing')),
+                    'content_id': state.get('current_content_id'),
+                    'content_title': state.get('current_content_title'),
+                    'content_type': state.get('current_content_type'),
+                    'campaign_id': state.get('current_campaign_id'),
+                    'campaign_name': state.get('current_campaign_name'),
+                    'last_heartbeat': now.isoformat()
                 },
                 'timestamp': now.isoformat()
-            }, room='admin')
+            })
         except Exception:
             pass
 
         return jsonify({'message': 'heartbeat registrado'}), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
@@ -998,44 +992,42 @@ def playback_heartbeat(player_id):
 def playback_end(player_id):
     """Public endpoint: registra fim da reprodução."""
     try:
-        player = Player.query.get(player_id)
-        if not player:
+        if not player_presence.exists(player_id):
             return jsonify({'error': 'Player não encontrado'}), 404
 
         data = request.get_json() or {}
         now = datetime.utcnow()
 
-        player.is_playing = False
-        player.last_playback_heartbeat = now
-        # Manter presença atualizada
-        player.status = 'online'
-        player.last_ping = now
-
-        db.session.commit()
+        state = player_presence.record(
+            player_id,
+            is_playing=False,
+            last_playback_heartbeat=now,
+            # Manter presença atualizada
+            status='online',
+            last_ping=now,
+        )
 
         # Notificar dashboards (best-effort)
         try:
-            from app import socketio
-            socketio.emit('playback_status_update', {
+            admin_broadcaster.publish('playback_status_update', player_id, {
                 'player_id': player_id,
                 'event_type': 'playback_end',
                 'status': {
                     'is_playing': False,
-                    'content_id': player.current_content_id,
-                    'content_title': player.current_content_title,
-                    'content_type': player.current_content_type,
-                    'campaign_id': player.current_campaign_id,
-                    'campaign_name': player.current_campaign_name,
+                    'content_id': state.get('current_content_id'),
+                    'content_title': state.get('current_content_title'),
+                    'content_type': state.get('current_content_type'),
+                    'campaign_id': state.get('current_campaign_id'),
+                    'campaign_name': state.get('current_campaign_name'),
                     'end_time': now.isoformat()
                 },
                 'timestamp': now.isoformat()
-            }, room='admin')
+            })
         except Exception:
             pass
 
         return jsonify({'message': 'playback_end registrado'}), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @player_bp.route('/<player_id>/info', methods=['GET'])
@@ -1084,222 +1076,292 @@ def get_player_playlist(player_id):
     """Public endpoint to provide the current playlist for a Web/Android player.
     Chooses the active MAIN schedule for the player (if any) and returns a list of items
     normalized for the WebPlayer (type, file_url, title, description, duration).
+    A playlist resolvida fica em cache (services.playlist_cache) até mudar algo que a afete.
     """
     try:
-        player = Player.query.get(player_id)
-        if not player:
-            return jsonify({'error': 'Player não encontrado'}), 404
+        media_base = request.host_url.rstrip('/')
+        entry = playlist_cache.get(player_id, media_base)
+        if entry is None:
+            version = playlist_cache.begin()
+            built = _build_player_playlist(player_id, media_base)
+            if built is None:
+                return jsonify({'error': 'Player não encontrado'}), 404
+            entry = playlist_cache.store(player_id, media_base, version, **built)
+
+        etag_header = entry['etag']
+        if etag_header:
+            inm = request.headers.get('If-None-Match')
+            if inm and (inm.strip() == etag_header or inm.strip().strip('"') == etag_header.strip('"')):
+                return '', 304, {'ETag': etag_header}
+
+        resp = jsonify(entry['payload'])
+        if etag_header:
+            resp.headers['ETag'] = etag_header
+        return resp, 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        now = datetime.now()
-        # Find schedules in date window and active flag
-        schedules = Schedule.query.filter(
-            Schedule.player_id == player_id,
-            Schedule.is_active == True,
-            Schedule.start_date <= now,
-            Schedule.end_date >= now
-        ).all()
-        
-        # Filtrar schedules compatíveis com o tipo de dispositivo
-        if player.device_type:
-            schedules = [s for s in schedules if s.is_compatible_with_device_type(player.device_type)]
-
-        # Filter those active in time window (hours/days) and separate by content type
-        active_main = []
-        active_overlay = []
-        for s in schedules:
-            try:
-                if s.is_active_now():
-                    if (s.content_type or 'main') == 'overlay':
-                        active_overlay.append(s)
-                    else:
-                        active_main.append(s)
-            except Exception:
-                continue
 
-        # Decide which schedules to use: all MAIN active; if none, first OVERLAY
-        schedules_to_use = []
-        if active_main:
-            # Order MAIN schedules by priority desc, then created_at asc to have stable rotation
-            try:
-                active_main.sort(key=lambda s: (-(s.priority or 0), getattr(s, 'created_at', datetime.min)))
-            except Exception:
-                pass
-            schedules_to_use = active_main
-        elif active_overlay:
-            schedules_to_use = [active_overlay[0]]
+def _playlist_expiry(player_id, schedules, now):
+    """Próximo instante em que a playlist do player pode mudar sem escrita no banco."""
+    # Filtros de conteúdo por hora/dia (CampaignContent.schedule_filter) mudam na virada da hora
+    expires_at = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    window_end = expires_at
+    for s in schedules:
+        for instant in schedule_boundaries(s, now, window_end, grace_seconds=0):
+            expires_at = min(expires_at, instant)
+        if s.end_date and now < s.end_date < expires_at:
+            expires_at = s.end_date
+    # Agendamento que entra em vigência antes disso
+    upcoming = db.session.query(db.func.min(Schedule.start_date)).filter(
+        Schedule.player_id == player_id,
+        Schedule.is_active == True,
+        Schedule.start_date > now
+    ).scalar()
+    if upcoming and upcoming < expires_at:
+        expires_at = upcoming
+    return expires_at
+
+
+def _build_player_playlist(player_id, media_base):
+    """Resolve a playlist do player; retorna kwargs para playlist_cache.store (ou None se não existir)."""
+    player = Player.query.get(player_id)
+    if not player:
+        return None
+
+    now = datetime.now()
+    # Find schedules in date window and active flag
+    schedules = Schedule.query.filter(
+        Schedule.player_id == player_id,
+        Schedule.is_active == True,
+        Schedule.start_date <= now,
+        Schedule.end_date >= now
+    ).all()
+    
+    # Filtrar schedules compatíveis com o tipo de dispositivo
+    if player.device_type:
+        schedules = [s for s in schedules if s.is_compatible_with_device_type(player.device_type)]
+
+    # Filter those active in time window (hours/days) and separate by content type
+    active_now = filter_active_schedules(schedules, now)
+    active_main = [s for s in active_now if (s.content_type or 'main') != 'overlay']
+    active_overlay = [s for s in active_now if (s.content_type or 'main') == 'overlay']
+
+    # Decide which schedules to use: all MAIN active; if none, first OVERLAY
+    schedules_to_use = []
+    if active_main:
+        # Order MAIN schedules by priority desc, then created_at asc to have stable rotation
+        try:
+            active_main.sort(key=lambda s: (-(s.priority or 0), getattr(s, 'created_at', datetime.min)))
+        except Exception:
+            pass
+        schedules_to_use = active_main
+    elif active_overlay:
+        schedules_to_use = [active_overlay[0]]
 
-        if not schedules_to_use:
-            return jsonify({'player_id': player_id, 'contents': []}), 200
+    expires_at = _playlist_expiry(player_id, schedules, now)
 
-        media_base = request.host_url.rstrip('/')
-        # Resolve absolute uploads directory for FS checks
-        upload_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        if not os.path.isabs(upload_dir):
-            upload_dir = os.path.join(current_app.root_path, upload_dir)
-        items = []
-        # Guards to evitar itens duplicados quando múltiplos schedules ativos incluem a mesma campanha/conteúdo
-        added_compiled_campaigns = set()  # campaign_id
-        added_file_urls = set()  # absolute file URLs
-
-        def _file_version(abs_path: str) -> str:
-            """Gera uma versão estável baseada em tamanho+mtime para invalidar cache quando o arquivo muda."""
+    if not schedules_to_use:
+        return {
+            'payload': {'player_id': player_id, 'contents': []},
+            'etag': None,
+            'expires_at': expires_at,
+        }
+
+    # Resolve absolute uploads directory for FS checks
+    upload_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    if not os.path.isabs(upload_dir):
+        upload_dir = os.path.join(current_app.root_path, upload_dir)
+    items = []
+    # Guards to evitar itens duplicados quando múltiplos schedules ativos incluem a mesma campanha/conteúdo
+    added_compiled_campaigns = set()  # campaign_id
+    added_file_urls = set()  # absolute file URLs
+    dependency_content_ids = set()  # conteúdos considerados (invalidação do cache)
+
+    def _file_version(abs_path: str) -> str:
+        """Gera uma versão estável baseada em tamanho+mtime (stat em cache) para invalidar cache quando o arquivo muda."""
+        info = media_index.get(abs_path)
+        return info.etag.strip('"').replace('-', '') if info else "0"
+
+    def append_schedule_items(sch):
+        # 1) Include compiled campaign video once per schedule if applicable
+        camp = getattr(sch, 'campaign', None)
+        if camp and (sch.content_type or 'main') != 'overlay':
             try:
-                st = os.stat(abs_path)
-                return f"{st.st_size:x}{int(st.st_mtime):x}"
+                if (
+                    getattr(camp, 'compiled_video_status', None) == 'ready' and
+                    getattr(camp, 'compiled_video_path', None) and
+                    not getattr(camp, 'compiled_stale', False)
+                ):
+                    compiled_rel_path = str(camp.compiled_video_path).lstrip('/').replace('\\', '/')
+                    # Escada HLS: rendition adequada à tela/dispositivo do player
+                    ladder = camp.get_compiled_renditions()
+                    rendition = select_rendition(ladder.get('renditions'), player.resolution, player.device_type)
+                    if rendition and media_index.get(os.path.join(upload_dir, rendition['path'])) is not None:
+                        compiled_rel_path = rendition['path']
+                    else:
+                        rendition = None
+                    compiled_url = f"{media_base}/uploads/{compiled_rel_path}?pid={player_id}"
+                    compiled_abs_path = os.path.normpath(os.path.join(upload_dir, compiled_rel_path))
+                    # Somente incluir se o arquivo realmente existir
+                    if media_index.get(compiled_abs_path) is not None:
+                        # Acrescentar versão (?v=) para cache forte e invalidação automática
+                        ver = _file_version(compiled_abs_path)
+                        compiled_url = f"{compiled_url}&v={ver}"
+                        # Evitar duplicar compilado da mesma campanha
+                        if str(camp.id) not in added_compiled_campaigns and compiled_url not in added_file_urls:
+                            items.append({
+                                'id': f"compiled-{camp.id}",
+                                'title': f"Campanha: {camp.name} (Compilado)",
+                                'description': 'Vídeo compilado a partir de imagens',
+                                'type': 'video',
+                                'file_url': compiled_url,
+                                'hls_url': f"{media_base}/uploads/{ladder['master']}" if rendition else None,
+                                'rendition': rendition['label'] if rendition else None,
+                                'duration': getattr(camp, 'compiled_video_duration', None) or (camp.content_duration if getattr(camp, 'content_duration', None) else 10),
+                                'campaign_id': camp.id,
+                                'campaign_name': camp.name,
+                                'schedule_id': sch.id,
+                            })
+                            added_compiled_campaigns.add(str(camp.id))
+                            added_file_urls.add(compiled_url)
             except Exception:
-                return "0"
+                pass
 
-        def append_schedule_items(sch):
-            # 1) Include compiled campaign video once per schedule if applicable
-            camp = getattr(sch, 'campaign', None)
-            if camp and (sch.content_type or 'main') != 'overlay':
-                try:
-                    if (
-                        getattr(camp, 'compiled_video_status', None) == 'ready' and
-                        getattr(camp, 'compiled_video_path', None) and
-                        not getattr(camp, 'compiled_stale', False)
-                    ):
-                        compiled_rel_path = str(camp.compiled_video_path).lstrip('/').replace('\\', '/')
-                        compiled_url = f"{media_base}/uploads/{compiled_rel_path}?pid={player_id}"
-                        compiled_abs_path = os.path.normpath(os.path.join(upload_dir, compiled_rel_path))
-                        # Somente incluir se o arquivo realmente existir
-                        if os.path.exists(compiled_abs_path):
-                            # Acrescentar versão (?v=) para cache forte e invalidação automática
-                            ver = _file_version(compiled_abs_path)
-                            compiled_url = f"{compiled_url}&v={ver}"
-                            # Evitar duplicar compilado da mesma campanha
-                            if str(camp.id) not in added_compiled_campaigns and compiled_url not in added_file_urls:
-                                items.append({
-                                    'id': f"compiled-{camp.id}",
-                                    'title': f"Campanha: {camp.name} (Compilado)",
-                                    'description': 'Vídeo compilado a partir de imagens',
-                                    'type': 'video',
-                                    'file_url': compiled_url,
-                                    'duration': getattr(camp, 'compiled_video_duration', None) or (camp.content_duration if getattr(camp, 'content_duration', None) else 10),
-                                    'campaign_id': camp.id,
-                                    'campaign_name': camp.name,
-                                    'schedule_id': sch.id,
-                                })
-                                added_compiled_campaigns.add(str(camp.id))
-                                added_file_urls.add(compiled_url)
-                except Exception:
-                    pass
+        # Todo item da campanha é dependência do cache, inclusive os que os filtros
+        # de tipo/local ou is_active descartam agora: editar um deles pode trazê-lo de volta
+        if camp is not None:
+            dependency_content_ids.update(cc.content_id for cc in camp.contents)
 
-            # 2) Add campaign contents according to schedule filters
-            try:
-                filtered = sch.get_filtered_contents() or []
-                for cc in filtered:
-                    content = getattr(cc, 'content', None)
-                    if not content or not getattr(content, 'file_path', None):
-                        continue
-                    filename = str(content.file_path).split('/')[-1]
-                    # Verificar existência do arquivo físico; se ausente, pular para evitar 404
-                    content_abs_path = os.path.join(upload_dir, filename)
-                    if not os.path.exists(content_abs_path):
-                        continue
+        # 2) Add campaign contents according to schedule filters
+        try:
+            filtered = sch.get_filtered_contents() or []
+            for cc in filtered:
+                content = getattr(cc, 'content', None)
+                if not content or not getattr(content, 'file_path', None):
+                    continue
+                filename = media_rel_path(content.file_path)
+                # Verificar existência do arquivo físico; se ausente, pular para evitar 404
+                content_abs_path = os.path.join(upload_dir, filename)
+                if media_index.get(content_abs_path) is None:
+                    continue
+                ctype = (content.content_type or '').lower()
+                # Vídeos: versão mais leve que o dispositivo reproduz e que cobre a tela
+                rendition = None
+                if ctype == 'video' and content.renditions:
+                    rendition = select_device_file(content.get_renditions(), player.resolution,
+                                                   player.device_type, content.file_size)
+                elif ctype == 'image' and content.renditions:
+                    # Imagens: variante no tamanho da tela, em WebP/AVIF quando o dispositivo decodifica
+                    rendition = select_image_variant(content.get_renditions(), player.resolution,
+                                                     player.device_type, content.file_size)
+                if rendition and media_index.get(os.path.join(upload_dir, rendition['path'])) is None:
+                    rendition = None
+                if rendition:
+                    file_url = f"{media_base}/uploads/{rendition['path']}?pid={player_id}"
+                    ver2 = _file_version(os.path.join(upload_dir, rendition['path']))
+                else:
                     file_url = f"{media_base}/uploads/{filename}?pid={player_id}"
-                    # Acrescentar versão (?v=)
-                    ver2 = _file_version(content_abs_path)
-                    file_url = f"{file_url}&v={ver2}"
-                    ctype = (content.content_type or '').lower()
-                    if ctype.startswith('img') or ctype == 'image':
-                        item_type = 'image'
-                    elif ctype.startswith('aud') or ctype == 'audio':
-                        item_type = 'audio'
-                    else:
-                        item_type = 'video'
+                    # Acrescentar versão (?v=): hash do banco (media_blobs) ou stat para legados
+                    ver2 = content_file_version(content, content_abs_path)
+                file_url = f"{file_url}&v={ver2}"
+                if ctype.startswith('img') or ctype == 'image':
+                    item_type = 'image'
+                elif ctype.startswith('aud') or ctype == 'audio':
+                    item_type = 'audio'
+                else:
+                    item_type = 'video'
 
-                    duration = None
-                    try:
-                        duration = cc.get_effective_duration()
-                    except Exception:
-                        duration = getattr(content, 'duration', None)
-
-                    # Evitar duplicação do mesmo arquivo (quando múltiplos schedules incluem o mesmo conteúdo)
-                    if file_url in added_file_urls:
-                        continue
-                    items.append({
-                        'id': content.id,
-                        'title': content.title,
-                        'description': getattr(content, 'description', ''),
-                        'type': item_type,
-                        'file_url': file_url,
-                        'duration': duration or 10,
-                        'campaign_id': camp.id if camp else None,
-                        'campaign_name': camp.name if camp else None,
-                        'schedule_id': sch.id,
-                    })
-                    added_file_urls.add(file_url)
-            except Exception:
-                pass
+                duration = None
+                try:
+                    duration = cc.get_effective_duration()
+                except Exception:
+                    duration = getattr(content, 'duration', None)
+
+                # Evitar duplicação do mesmo arquivo (quando múltiplos schedules incluem o mesmo conteúdo)
+                if file_url in added_file_urls:
+                    continue
+                items.append({
+                    'id': content.id,
+                    'title': content.title,
+                    'description': getattr(content, 'description', ''),
+                    'type': item_type,
+                    'file_url': file_url,
+                    'duration': duration or 10,
+                    'campaign_id': camp.id if camp else None,
+                    'campaign_name': camp.name if camp else None,
+                    'schedule_id': sch.id,
+                })
+                added_file_urls.add(file_url)
+        except Exception:
+            pass
 
-        for sch in schedules_to_use:
-            append_schedule_items(sch)
-
-        # ETag/If-None-Match cache support
-        etag_src = json.dumps({
-            'player_id': str(player_id),
-            'schedule_ids': [str(s.id) for s in schedules_to_use],
-            'contents': items
-        }, sort_keys=True, ensure_ascii=False, default=str)
-        etag_val = hashlib.md5(etag_src.encode('utf-8')).hexdigest()
-        etag_header = f'"{etag_val}"'
-
-        inm = request.headers.get('If-None-Match')
-        if inm and (inm.strip() == etag_header or inm.strip().strip('"') == etag_val):
-            return '', 304, {'ETag': etag_header}
-
-        # Incluir configurações de reprodução do primeiro agendamento ativo
-        playback_config = {}
-        background_audio_id = None
-        background_audio_url = None
-        
-        if schedules_to_use:
-            schedule = schedules_to_use[0]
-            playback_config = {
-                'playback_mode': schedule.get_effective_playback_mode(),
-                'loop_behavior': getattr(schedule, 'loop_behavior', 'until_next'),
-                'loop_duration_minutes': getattr(schedule, 'loop_duration_minutes', None),
-                'content_duration': getattr(schedule, 'content_duration', 10),
-                'transition_duration': getattr(schedule, 'transition_duration', 1),
-                'shuffle_enabled': getattr(schedule, 'shuffle_enabled', False),
-                'auto_skip_errors': getattr(schedule, 'auto_skip_errors', True),
-                'is_persistent': getattr(schedule, 'is_persistent', False),
-                'content_type': getattr(schedule, 'content_type', 'main'),
-            }
-            print(f"[DEBUG] Enviando configurações de reprodução: {playback_config}")
-            
-            # Incluir áudio de fundo da campanha, se configurado
-            try:
-                campaign = getattr(schedule, 'campaign', None)
-                if campaign and hasattr(campaign, 'background_audio_content_id'):
-                    bg_audio_id = getattr(campaign, 'background_audio_content_id', None)
-                    if bg_audio_id:
-                        from models.content import Content
-                        bg_audio = Content.query.get(bg_audio_id)
-                        if bg_audio and bg_audio.file_path:
-                            filename = str(bg_audio.file_path).split('/')[-1]
-                            # Verificar existência do arquivo
-                            bg_audio_abs = os.path.join(upload_dir, filename)
-                            if os.path.exists(bg_audio_abs):
-                                background_audio_id = bg_audio_id
-                                background_audio_url = f"{media_base}/api/content/media/{filename}?pid={player_id}"
-                                print(f"[DEBUG] Background audio configurado: {background_audio_url}")
-            except Exception as e:
-                print(f"[DEBUG] Erro ao carregar áudio de fundo: {str(e)}")
-        
-        resp = jsonify({
+    for sch in schedules_to_use:
+        append_schedule_items(sch)
+
+    # ETag/If-None-Match cache support
+    etag_src = json.dumps({
+        'player_id': str(player_id),
+        'schedule_ids': [str(s.id) for s in schedules_to_use],
+        'contents': items
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    etag_val = hashlib.md5(etag_src.encode('utf-8')).hexdigest()
+    etag_header = f'"{etag_val}"'
+
+    # Incluir configurações de reprodução do primeiro agendamento ativo
+    playback_config = {}
+    background_audio_id = None
+    background_audio_url = None
+    
+    if schedules_to_use:
+        schedule = schedules_to_use[0]
+        playback_config = {
+            'playback_mode': schedule.get_effective_playback_mode(),
+            'loop_behavior': getattr(schedule, 'loop_behavior', 'until_next'),
+            'loop_duration_minutes': getattr(schedule, 'loop_duration_minutes', None),
+            'content_duration': getattr(schedule, 'content_duration', 10),
+            'transition_duration': getattr(schedule, 'transition_duration', 1),
+            'shuffle_enabled': getattr(schedule, 'shuffle_enabled', False),
+            'auto_skip_errors': getattr(schedule, 'auto_skip_errors', True),
+            'is_persistent': getattr(schedule, 'is_persistent', False),
+            'content_type': getattr(schedule, 'content_type', 'main'),
+        }
+        print(f"[DEBUG] Enviando configurações de reprodução: {playback_config}")
+        
+        # Incluir áudio de fundo da campanha, se configurado
+        try:
+            campaign = getattr(schedule, 'campaign', None)
+            if campaign and hasattr(campaign, 'background_audio_content_id'):
+                bg_audio_id = getattr(campaign, 'background_audio_content_id', None)
+                if bg_audio_id:
+                    dependency_content_ids.add(bg_audio_id)
+                    from models.content import Content
+                    bg_audio = Content.query.get(bg_audio_id)
+                    if bg_audio and bg_audio.file_path:
+                        filename = media_rel_path(bg_audio.file_path)
+                        # Verificar existência do arquivo
+                        bg_audio_abs = os.path.join(upload_dir, filename)
+                        if media_index.get(bg_audio_abs) is not None:
+                            background_audio_id = bg_audio_id
+                            background_audio_url = f"{media_base}/api/content/media/{filename}?pid={player_id}"
+                            print(f"[DEBUG] Background audio configurado: {background_audio_url}")
+        except Exception as e:
+            print(f"[DEBUG] Erro ao carregar áudio de fundo: {str(e)}")
+    
+    return {
+        'payload': {
             'player_id': player_id,
             'schedule_ids': [s.id for s in schedules_to_use],
             'contents': items,
             'playback_config': playback_config,
             'background_audio_content_id': background_audio_id,
             'background_audio_url': background_audio_url
-        })
-        resp.headers['ETag'] = etag_header
-        return resp, 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        },
+        'etag': etag_header,
+        'expires_at': expires_at,
+        'campaign_ids': [s.campaign_id for s in schedules_to_use],
+        'content_ids': dependency_content_ids,
+    }
 
 @player_bp.route('/resolve-code/<code>', methods=['GET'])
 def resolve_code(code):
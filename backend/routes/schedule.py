@@ -1,229 +1,23 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from datetime import datetime, time
+import uuid
 from models.schedule import Schedule, db
 from models.campaign import Campaign
 from models.player import Player
 from models.user import User
 from models.location import Location
+from services.schedule_predicates import filter_active_schedules
+from services.schedule_serializer import resolve_view, schedule_load_options, serialize_schedules
+from services.schedule_conflicts import ScheduleConflictIndex
+from services.model_events import notify_changes
 
 schedule_bp = Blueprint('schedule', __name__)
 
 # Brazilian datetime formatting/parsing helpers
 BR_DATETIME_FORMAT = '%d/%m/%Y %H:%M:%S'
 
-def _detect_schedule_conflicts(target_schedule, all_schedules):
-    """Detecta conflitos de horário entre agendamentos do mesmo player"""
-    if not target_schedule.player_id or not target_schedule.start_date or not target_schedule.end_date:
-        return False
-        
-    # Buscar outros agendamentos ativos do mesmo player no mesmo período
-    conflicting_schedules = [
-        s for s in all_schedules 
-        if (s.id != target_schedule.id and 
-            s.player_id == target_schedule.player_id and 
-            s.is_active == True and
-            s.start_date <= target_schedule.end_date and
-            s.end_date >= target_schedule.start_date)
-    ]
-    
-    if not conflicting_schedules:
-        return False
-        
-    # Verificar conflitos de horário e dias da semana
-    target_days = set(map(int, target_schedule.days_of_week.split(','))) if target_schedule.days_of_week else set()
-    
-    for other_schedule in conflicting_schedules:
-        other_days = set(map(int, other_schedule.days_of_week.split(','))) if other_schedule.days_of_week else set()
-        
-        # Se há dias em comum
-        if target_days.intersection(other_days):
-            # Verificar conflito de horário
-            if _has_time_conflict(target_schedule, other_schedule):
-                return True
-                
-    return False
-
-def _has_time_conflict(schedule1, schedule2):
-    """Verifica se há conflito de horário entre dois agendamentos"""
-    # Verificar se os horários são válidos
-    if not schedule1.start_time or not schedule1.end_time or not schedule2.start_time or not schedule2.end_time:
-        return False
-        
-    # Converter horários para minutos para facilitar comparação
-    s1_start_min = schedule1.start_time.hour * 60 + schedule1.start_time.minute
-    s1_end_min = schedule1.end_time.hour * 60 + schedule1.end_time.minute
-    s2_start_min = schedule2.start_time.hour * 60 + schedule2.start_time.minute
-    s2_end_min = schedule2.end_time.hour * 60 + schedule2.end_time.minute
-    
-    # Verificar se são dia inteiro
-    schedule1_all_day = (s1_start_min == 0 and s1_end_min == 1439)  # 23:59 = 1439 minutos
-    schedule2_all_day = (s2_start_min == 0 and s2_end_min == 1439)
-    
-    # Se ambos são dia inteiro, há conflito
-    if schedule1_all_day and schedule2_all_day:
-        return True
-        
-    # Se um é dia inteiro e o outro não, há conflito
-    if schedule1_all_day or schedule2_all_day:
-        return True
-        
-    # Verificar sobreposição de horários específicos
-    # Dois intervalos se sobrepõem se: start1 < end2 AND start2 < end1
-    return s1_start_min < s2_end_min and s2_start_min < s1_end_min
-
-def _determine_conflict_type(target_schedule, all_schedules):
-    """Determina o tipo de conflito para cores inteligentes no calendário"""
-    # Se é overlay, sempre mostrar como overlay (roxo)
-    if target_schedule.content_type == 'overlay':
-        return 'overlay'
-    
-    # Buscar outros agendamentos ativos do mesmo player no mesmo período
-    conflicting_schedules = [
-        s for s in all_schedules 
-        if (s.id != target_schedule.id and 
-            s.player_id == target_schedule.player_id and 
-            s.is_active == True and
-            s.start_date <= target_schedule.end_date and
-            s.end_date >= target_schedule.start_date)
-    ]
-    
-    if not conflicting_schedules:
-        return 'normal'
-    
-    # Verificar conflitos de horário e dias da semana
-    target_days = set(map(int, target_schedule.days_of_week.split(','))) if target_schedule.days_of_week else set()
-    
-    # Contar tipos de conflitos
-    overlay_conflicts = 0
-    main_conflicts = 0
-    
-    for other_schedule in conflicting_schedules:
-        other_days = set(map(int, other_schedule.days_of_week.split(','))) if other_schedule.days_of_week else set()
-        
-        # Se há dias em comum
-        if target_days.intersection(other_days):
-            # Verificar conflito de horário
-            if _has_time_conflict(target_schedule, other_schedule):
-                if other_schedule.content_type == 'overlay':
-                    overlay_conflicts += 1
-                else:
-                    main_conflicts += 1
-    
-    # Determinar tipo baseado nos conflitos encontrados
-    if overlay_conflicts > 0 and main_conflicts == 0:
-        # Conflito apenas com overlays - não é problema crítico
-        return 'normal'
-    elif main_conflicts > 0:
-        # Conflito com outros agendamentos principais - problema crítico
-        return 'conflict'
-    else:
-        return 'normal'
-
-def _determine_overlap_priority(target_schedule, all_schedules):
-    """Determina a prioridade visual de um agendamento em caso de sobreposição"""
-    # Se é overlay, sempre tem prioridade alta (fica por cima)
-    if target_schedule.content_type == 'overlay':
-        return 'overlay'
-    
-    # Buscar outros agendamentos ativos do mesmo player no mesmo período
-    overlapping_schedules = [
-        s for s in all_schedules 
-        if (s.id != target_schedule.id and 
-            s.player_id == target_schedule.player_id and 
-            s.is_active == True and
-            s.start_date <= target_schedule.end_date and
-            s.end_date >= target_schedule.start_date)
-    ]
-    
-    if not overlapping_schedules:
-        return 'normal'
-    
-    # Verificar sobreposições de horário e dias da semana
-    target_days = set(map(int, target_schedule.days_of_week.split(','))) if target_schedule.days_of_week else set()
-    
-    # Encontrar agendamentos que se sobrepõem temporalmente
-    overlapping_main_schedules = []
-    for other_schedule in overlapping_schedules:
-        other_days = set(map(int, other_schedule.days_of_week.split(','))) if other_schedule.days_of_week else set()
-        
-        # Se há dias em comum
-        if target_days.intersection(other_days):
-            # Verificar conflito de horário
-            if _has_time_conflict(target_schedule, other_schedule):
-                if other_schedule.content_type == 'main':
-                    overlapping_main_schedules.append(other_schedule)
-    
-    if not overlapping_main_schedules:
-        return 'normal'
-    
-    # Determinar prioridade baseada na ordem de criação
-    # Agendamentos mais recentes ficam "por cima" (cores mais vibrantes)
-    target_created_at = target_schedule.created_at if target_schedule.created_at else target_schedule.id
-    
-    # Verificar se este agendamento é o mais recente entre os sobrepostos
-    is_most_recent = True
-    for other_schedule in overlapping_main_schedules:
-        other_created_at = other_schedule.created_at if other_schedule.created_at else other_schedule.id
-        if other_created_at > target_created_at:
-            is_most_recent = False
-            break
-    
-    if is_most_recent:
-        return 'overlap_top'  # Agendamento mais recente - cor mais vibrante
-    else:
-        return 'overlap_bottom'  # Agendamento mais antigo - cor mais suave
-
-def _assign_overlap_color_index(target_schedule, all_schedules):
-    """
-    Atribui um índice de cor único para schedules que se sobrepõem.
-    Garante que schedules sobrepostos tenham cores diferentes.
-    Retorna um inteiro que pode ser usado como índice de cor (0-7).
-    """
-    # Buscar outros agendamentos ativos do mesmo player no mesmo período
-    overlapping_schedules = [
-        s for s in all_schedules 
-        if (s.id != target_schedule.id and 
-            s.player_id == target_schedule.player_id and 
-            s.is_active == True and
-            s.start_date <= target_schedule.end_date and
-            s.end_date >= target_schedule.start_date)
-    ]
-    
-    if not overlapping_schedules:
-        return 0  # Sem sobreposição, cor padrão
-    
-    # Verificar sobreposições de horário e dias da semana
-    target_days = set(map(int, target_schedule.days_of_week.split(','))) if target_schedule.days_of_week else set()
-    
-    # Encontrar agendamentos que se sobrepõem temporalmente
-    truly_overlapping = []
-    for other_schedule in overlapping_schedules:
-        other_days = set(map(int, other_schedule.days_of_week.split(','))) if other_schedule.days_of_week else set()
-        
-        # Se há dias em comum
-        if target_days.intersection(other_days):
-            # Verificar conflito de horário
-            if _has_time_conflict(target_schedule, other_schedule):
-                truly_overlapping.append(other_schedule)
-    
-    if not truly_overlapping:
-        return 0  # Sem sobreposição real, cor padrão
-    
-    # Ordenar schedules por ID para consistência
-    all_overlapping = [target_schedule] + truly_overlapping
-    all_overlapping.sort(key=lambda s: s.id)
-    
-    # Encontrar o índice do schedule atual na lista ordenada
-    # Isso garante que cada schedule sobreposto tenha uma cor diferente
-    for idx, schedule in enumerate(all_overlapping):
-        if schedule.id == target_schedule.id:
-            # Retornar índice mod 8 (temos 8 cores disponíveis)
-            return (idx + 1) % 8
-    
-    return 0
-
-
 def fmt_br_datetime(dt):
     try:
         # Se dt for uma string, retorná-la diretamente
@@ -299,6 +93,10 @@ def parse_flexible_time(value):
 @schedule_bp.route('', methods=['GET'])  # evita redirect 308 em /api/schedules
 @jwt_required()
 def list_schedules():
+    """Lista paginada de agendamentos.
+    Query params: page, per_page, campaign_id, player_id, is_active,
+    view=full|summary (summary omite player/campanha embutidos)
+    """
     try:
         print("[DEBUG] Iniciando list_schedules")
         page = request.args.get('page', 1, type=int)
@@ -306,29 +104,23 @@ def list_schedules():
         campaign_id = request.args.get('campaign_id')
         player_id = request.args.get('player_id')
         is_active = request.args.get('is_active')
+        view = resolve_view(request.args.get('view'))
         
-        print(f"[DEBUG] Parâmetros: page={page}, per_page={per_page}, campaign_id={campaign_id}, player_id={player_id}, is_active={is_active}")
+        print(f"[DEBUG] Parâmetros: page={page}, per_page={per_page}, campaign_id={campaign_id}, player_id={player_id}, is_active={is_active}, view={view}")
         
         user_id = get_jwt_identity()
-        print(f"[DEBUG] JWT Identity: {user_id}")
-        
         current_user = User.query.get(user_id)
-        print(f"[DEBUG] User encontrado: {current_user is not None}")
         
-        query = Schedule.query
-        print("[DEBUG] Query base criada")
+        query = Schedule.query.options(*schedule_load_options(view))
         
         if campaign_id:
             query = query.filter(Schedule.campaign_id == campaign_id)
-            print(f"[DEBUG] Filtro por campaign_id: {campaign_id}")
         
         if player_id:
             query = query.filter(Schedule.player_id == player_id)
-            print(f"[DEBUG] Filtro por player_id: {player_id}")
         
         if is_active is not None:
             query = query.filter(Schedule.is_active == (is_active.lower() == 'true'))
-            print(f"[DEBUG] Filtro por is_active: {is_active}")
         
         # RH: restrict to schedules of players in their company
         if current_user and current_user.role == 'rh':
@@ -338,39 +130,15 @@ def list_schedules():
                          .filter(Location.company == current_user.company)
         
         query = query.order_by(Schedule.created_at.desc())
-        print("[DEBUG] Query ordenada")
         
-        # Verificar se há schedules antes de paginar
         try:
-            count = query.count()
-            print(f"[DEBUG] Total de schedules encontrados: {count}")
-        except Exception as count_error:
-            print(f"[ERROR] Erro ao contar schedules: {count_error}")
-            import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
-        
-        try:
-            print("[DEBUG] Tentando paginar resultados")
             pagination = query.paginate(
                 page=page, per_page=per_page, error_out=False
             )
             print(f"[DEBUG] Paginação bem-sucedida: {pagination.total} itens, {pagination.pages} páginas")
             
-            # Processar cada item individualmente para identificar problemas
-            schedules_dict = []
-            for i, schedule in enumerate(pagination.items):
-                try:
-                    print(f"[DEBUG] Processando schedule {i+1}/{len(pagination.items)}: {schedule.id}")
-                    schedule_dict = schedule.to_dict()
-                    schedules_dict.append(schedule_dict)
-                    print(f"[DEBUG] Schedule {schedule.id} processado com sucesso")
-                except Exception as item_error:
-                    print(f"[ERROR] Erro ao processar schedule {schedule.id}: {item_error}")
-                    import traceback
-                    print(f"[ERROR] Traceback: {traceback.format_exc()}")
-            
             return jsonify({
-                'schedules': schedules_dict,
+                'schedules': serialize_schedules(pagination.items, view),
                 'total': pagination.total,
                 'pages': pagination.pages,
                 'current_page': page,
@@ -529,8 +297,15 @@ def create_schedules_bulk():
       content_type?, is_active?, playback_mode?, content_duration?, transition_duration?,
       loop_behavior?, loop_duration_minutes?, content_selection?,
       location_id? (opcional) OU player_ids? (array),
-      check_conflicts?: bool (default false)
+      check_conflicts?: bool (default false),
+      on_conflict?: skip | replace | ignore (default skip),
+      view?: full | summary (default full; também aceito como query param)
     }
+
+    Players e agendamentos existentes são carregados em lote, os conflitos
+    resolvidos em memória e os novos agendamentos inseridos numa única
+    transação. A resposta traz `results` com o desfecho de cada player e
+    `schedules` com os criados na projeção pedida em `view`.
     """
     try:
         user_id = get_jwt_identity()
@@ -559,8 +334,7 @@ def create_schedules_bulk():
         if not campaign:
             return jsonify({'error': 'Campanha não encontrada'}), 404
 
-        # Resolver lista de players alvo
-        target_players = []
+        # Resolver lista de players alvo (uma consulta, location já carregada para o escopo RH)
         if location_id:
             location = Location.query.get(location_id)
             if not location:
@@ -568,17 +342,20 @@ def create_schedules_bulk():
             # Escopo RH: empresa deve ser a mesma
             if user.role == 'rh' and location.company != user.company:
                 return jsonify({'error': 'RH só pode agendar para sua empresa'}), 403
-            target_players = [p for p in location.players if p and p.is_active]
+            target_players = Player.query.filter(
+                Player.location_id == location.id,
+                Player.is_active == True
+            ).all()
         else:
             # Buscar players por IDs explicitados
-            target_players = Player.query.filter(Player.id.in_(player_ids)).all()
+            target_players = Player.query.options(joinedload(Player.location)) \
+                                         .filter(Player.id.in_(player_ids)).all()
             if not target_players:
                 return jsonify({'error': 'Nenhum player encontrado pelos IDs informados'}), 404
             # Escopo RH: todos devem pertencer à mesma empresa do RH
             if user.role == 'rh':
                 for p in target_players:
-                    loc = Location.query.get(p.location_id) if p else None
-                    if not loc or loc.company != user.company:
+                    if not p.location or p.location.company != user.company:
                         return jsonify({'error': 'RH só pode agendar para players da sua empresa'}), 403
 
         # Converter datas/horários
@@ -611,141 +388,118 @@ def create_schedules_bulk():
         days_of_week = data.get('days_of_week', '1,2,3,4,5')
         check_conflicts = bool(data.get('check_conflicts', False))
 
-        # Função utilitária local para checar conflito com lógica alinhada ao endpoint /conflicts
-        def has_conflict_for_player(player_id):
-            new_content_type = data.get('content_type') or _get_schedule_content_type(campaign.id)
-            query = Schedule.query.filter(
-                Schedule.player_id == player_id,
-                Schedule.is_active == True,
-                Schedule.start_date <= end_date,
-                Schedule.end_date >= start_date
-            )
-            existing = query.all()
-            # Sobreposição de horários (com overnight)
-            def overlaps(a_start, a_end, b_start, b_end):
-                if a_start <= a_end and b_start <= b_end:
-                    return a_start < b_end and a_end > b_start
-                if a_start > a_end and b_start <= b_end:
-                    return a_start <= b_end or a_end >= b_start
-                if a_start <= a_end and b_start > b_end:
-                    return b_start <= a_end or b_end >= a_start
-                return True
-            for sch in existing:
-                existing_content_type = getattr(sch, 'content_type', None) or _get_schedule_content_type(sch.campaign_id)
-                if existing_content_type != new_content_type:
-                    continue
-                existing_days = set(int(d) for d in sch.days_of_week.split(',') if d.strip()) if sch.days_of_week else set()
-                new_days = set(int(d) for d in days_of_week.split(',') if d.strip()) if days_of_week else set()
-                if existing_days and new_days and not existing_days.intersection(new_days):
-                    continue
-                if sch.start_time and sch.end_time and start_time and end_time:
-                    if not overlaps(start_time, end_time, sch.start_time, sch.end_time):
-                        continue
-                return True
-            return False
-
-        def list_conflicts_for_player(player_id):
+        # Agendamentos existentes de todos os players alvo numa única consulta;
+        # a resolução de conflitos (skip/replace/ignore) acontece em memória
+        index = None
+        if check_conflicts and target_players:
             new_content_type = data.get('content_type') or _get_schedule_content_type(campaign.id)
-            query = Schedule.query.filter(
-                Schedule.player_id == player_id,
+            existing = Schedule.query.filter(
+                Schedule.player_id.in_([p.id for p in target_players]),
                 Schedule.is_active == True,
                 Schedule.start_date <= end_date,
                 Schedule.end_date >= start_date
-            )
-            existing = query.all()
-            conflicts = []
-            def overlaps(a_start, a_end, b_start, b_end):
-                if a_start <= a_end and b_start <= b_end:
-                    return a_start < b_end and a_end > b_start
-                if a_start > a_end and b_start <= b_end:
-                    return a_start <= b_end or a_end >= b_start
-                if a_start <= a_end and b_start > b_end:
-                    return b_start <= a_end or b_end >= a_start
-                return True
-            for sch in existing:
-                existing_content_type = getattr(sch, 'content_type', None) or _get_schedule_content_type(sch.campaign_id)
-                if existing_content_type != new_content_type:
-                    continue
-                existing_days = set(int(d) for d in sch.days_of_week.split(',') if d.strip()) if sch.days_of_week else set()
-                new_days = set(int(d) for d in days_of_week.split(',') if d.strip()) if days_of_week else set()
-                if existing_days and new_days and not existing_days.intersection(new_days):
-                    continue
-                if sch.start_time and sch.end_time and start_time and end_time:
-                    if not overlaps(start_time, end_time, sch.start_time, sch.end_time):
-                        continue
-                conflicts.append(sch)
-            return conflicts
-
-        created = []
+            ).all()
+            index = ScheduleConflictIndex(existing, content_type_of=_resolved_content_type,
+                                          missing_times_all_day=True, empty_days_all=True)
+
+        now = datetime.utcnow()
+        base_row = {
+            'name': data['name'],
+            'campaign_id': campaign.id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'start_time': start_time,
+            'end_time': end_time,
+            'days_of_week': days_of_week,
+            'repeat_type': data.get('repeat_type', 'daily'),
+            'repeat_interval': data.get('repeat_interval', 1),
+            'priority': data.get('priority', 1),
+            'is_persistent': data.get('is_persistent', False),
+            'content_type': data.get('content_type', 'main'),
+            'is_active': data.get('is_active', True),
+            'playback_mode': data.get('playback_mode', 'sequential'),
+            'content_duration': data.get('content_duration', 10),
+            'transition_duration': data.get('transition_duration', 1),
+            'loop_behavior': data.get('loop_behavior', 'until_next'),
+            'loop_duration_minutes': data.get('loop_duration_minutes'),
+            'content_selection': data.get('content_selection', 'all'),
+            'shuffle_enabled': False,
+            'auto_skip_errors': True,
+            'created_at': now,
+            'updated_at': now,
+        }
+
+        rows = []
+        results = []
         skipped = []
         replaced = []
+        replaced_ids = set()
         errors = []
 
         for player in target_players:
             try:
-                if check_conflicts and has_conflict_for_player(player.id):
+                result = {'player_id': player.id, 'player_name': player.name}
+                conflicts = index.conflicts_for(
+                    player.id, start_date, end_date, start_time, end_time, days_of_week,
+                    content_type=new_content_type
+                ) if index is not None else []
+                if conflicts:
+                    result['conflicts'] = [str(sch.id) for sch in conflicts]
                     if on_conflict == 'replace':
                         # Desativar agendamentos conflitantes antes de criar
-                        conflicts = list_conflicts_for_player(player.id)
                         for sch in conflicts:
-                            sch.is_active = False
-                            sch.updated_at = datetime.utcnow()
-                            replaced.append({'player_id': player.id, 'schedule_id': str(sch.id)})
-                        # prosseguir com criação após desativar
-                    elif on_conflict == 'ignore':
-                        # prosseguir sem alterações
-                        pass
-                    else:
+                            if sch.id not in replaced_ids:
+                                replaced_ids.add(sch.id)
+                                replaced.append({'player_id': player.id, 'schedule_id': str(sch.id)})
+                        result['replaced'] = result['conflicts']
+                    elif on_conflict != 'ignore':
                         skipped.append({'player_id': player.id, 'reason': 'Conflito detectado'})
+                        results.append(dict(result, status='skipped', reason='Conflito detectado'))
                         continue
 
-                schedule = Schedule(
-                    name=data['name'],
-                    campaign_id=campaign.id,
-                    player_id=player.id,
-                    start_date=start_date,
-                    end_date=end_date,
-                    start_time=start_time,
-                    end_time=end_time,
-                    days_of_week=days_of_week,
-                    repeat_type=data.get('repeat_type', 'daily'),
-                    repeat_interval=data.get('repeat_interval', 1),
-                    priority=data.get('priority', 1),
-                    is_persistent=data.get('is_persistent', False),
-                    content_type=data.get('content_type', 'main'),
-                    is_active=data.get('is_active', True),
-                    playback_mode=data.get('playback_mode', 'sequential'),
-                    content_duration=data.get('content_duration', 10),
-                    transition_duration=data.get('transition_duration', 1),
-                    loop_behavior=data.get('loop_behavior', 'until_next'),
-                    loop_duration_minutes=data.get('loop_duration_minutes'),
-                    content_selection=data.get('content_selection', 'all'),
-                    shuffle_enabled=False,
-                    auto_skip_errors=True
-                )
-                db.session.add(schedule)
-                created.append(schedule)
+                row = dict(base_row, id=str(uuid.uuid4()), player_id=player.id)
+                rows.append(row)
+                results.append(dict(result, status='created', schedule_id=row['id']))
             except Exception as item_error:
                 errors.append({'player_id': getattr(player, 'id', None), 'error': str(item_error)})
+                results.append({'player_id': getattr(player, 'id', None), 'status': 'error', 'error': str(item_error)})
 
         # Se nada foi criado, abortar cedo
-        if not created and skipped and not errors:
-            return jsonify({'message': 'Nenhum agendamento criado devido a conflitos', 'created': 0, 'skipped': len(skipped), 'errors': []}), 200
+        if not rows and skipped and not errors:
+            return jsonify({'message': 'Nenhum agendamento criado devido a conflitos', 'created': 0, 'skipped': len(skipped), 'errors': [], 'results': results}), 200
 
-        # Commit em lote
+        # Desativação e inserção em lote numa única transação
         try:
+            if replaced_ids:
+                Schedule.query.filter(Schedule.id.in_(replaced_ids)).update(
+                    {'is_active': False, 'updated_at': now}, synchronize_session=False
+                )
+            if rows:
+                db.session.bulk_insert_mappings(Schedule, rows)
             db.session.commit()
         except Exception as commit_error:
             db.session.rollback()
             return jsonify({'error': f'Falha ao salvar agendamentos: {str(commit_error)}'}), 500
 
+        # Operações em lote não passam pelos eventos do ORM: invalidar caches uma única vez
+        notify_changes({
+            'schedules': [row['id'] for row in rows] + list(replaced_ids),
+            'affected_players': {row['player_id'] for row in rows} | {r['player_id'] for r in replaced},
+            'affected_campaigns': {campaign.id} if rows else set(),
+        })
+
+        view = resolve_view(request.args.get('view') or data.get('view'))
+        created = Schedule.query.options(*schedule_load_options(view)) \
+                                .filter(Schedule.id.in_([row['id'] for row in rows])).all() if rows else []
+
         return jsonify({
             'message': 'Agendamentos criados com sucesso',
-            'created': len(created),
+            'created': len(rows),
             'skipped': len(skipped),
             'replaced': len(replaced),
             'errors': errors,
-            'schedules': [s.to_dict() for s in created],
+            'results': results,
+            'schedules': serialize_schedules(created, view),
         }), 201
 
     except Exception as e:
@@ -935,15 +689,15 @@ def get_active_schedules_for_player(player_id):
     try:
         now = datetime.now()  # usar horário local para consistência
         # Buscar agendamentos do player cujo período de datas engloba o now
-        schedules = Schedule.query.filter(
+        schedules = Schedule.query.options(*schedule_load_options()).filter(
             Schedule.player_id == player_id,
             Schedule.is_active == True,
             Schedule.start_date <= now,
             Schedule.end_date >= now
         ).all()
         
-        # Delegar a lógica de horário/dia para o model (is_active_now)
-        active_schedules = [s.to_dict() for s in schedules if s.is_active_now()]
+        # Lógica de horário/dia compartilhada com o executor (predicados compilados)
+        active_schedules = serialize_schedules(filter_active_schedules(schedules, now))
         
         return jsonify({
             'schedules': active_schedules,
@@ -964,6 +718,7 @@ def get_schedules_in_range():
       - is_active: (opcional) filtra por ativos true|false
       - player_id: (opcional) filtra por player específico
       - company: (opcional) filtra por empresa específica
+      - view: (opcional) full|summary
     """
     try:
         print(f"[SCHEDULE] Global range endpoint called")
@@ -973,6 +728,7 @@ def get_schedules_in_range():
         is_active = request.args.get('is_active')
         player_id = request.args.get('player_id')
         company = request.args.get('company')
+        view = resolve_view(request.args.get('view'))
 
         print(f"[SCHEDULE] Query params: start={start_raw}, end={end_raw}, is_active={is_active}, player_id={player_id}, company={company}")
 
@@ -992,7 +748,7 @@ def get_schedules_in_range():
             return jsonify({'error': 'start deve ser anterior ou igual a end'}), 400
 
         # Construir query base
-        query = Schedule.query.filter(
+        query = Schedule.query.options(*schedule_load_options(view)).filter(
             Schedule.start_date <= end_dt,
             Schedule.end_date >= start_dt
         )
@@ -1043,28 +799,13 @@ def get_schedules_in_range():
                     if s.player_id != player_id:
                         print(f"[SCHEDULE] - {s.name}: Player {s.player_name} (ID: {s.player_id})")
 
-        # Calcular conflitos em tempo real para cada agendamento
-        schedules_with_conflicts = []
-        for schedule in schedules:
-            schedule_dict = schedule.to_dict()
-            
-            # Detectar conflitos em tempo real
-            has_conflicts = _detect_schedule_conflicts(schedule, schedules)
-            schedule_dict['has_conflicts'] = has_conflicts
-            
-            # Determinar tipo de conflito para cores inteligentes
-            conflict_type = _determine_conflict_type(schedule, schedules)
-            schedule_dict['conflict_type'] = conflict_type
-            
-            # Determinar prioridade de sobreposição para cores diferenciadas
-            overlap_priority = _determine_overlap_priority(schedule, schedules)
-            schedule_dict['overlap_priority'] = overlap_priority
-            
-            # NOVO: Atribuir índice de cor para diferenciar schedules sobrepostos
-            color_index = _assign_overlap_color_index(schedule, schedules)
-            schedule_dict['color_index'] = color_index
-            
-            schedules_with_conflicts.append(schedule_dict)
+        # Conflitos, tipo, prioridade de sobreposição e índice de cor numa única varredura
+        annotations = ScheduleConflictIndex(schedules).annotations()
+        schedules_with_conflicts = serialize_schedules(
+            schedules, view, has_conflicts={sid: a['has_conflicts'] for sid, a in annotations.items()}
+        )
+        for schedule_dict in schedules_with_conflicts:
+            schedule_dict.update(annotations[schedule_dict['id']])
         
         return jsonify({
             'schedules': schedules_with_conflicts,
@@ -1083,6 +824,7 @@ def get_schedules_for_player_in_range(player_id):
       - start: data inicial (BR dd/mm/yyyy[ HH:MM[:SS]] ou ISO)
       - end: data final (BR dd/mm/yyyy[ HH:MM[:SS]] ou ISO)
       - is_active: (opcional) filtra por ativos true|false
+      - view: (opcional) full|summary
     """
     try:
         print(f"[SCHEDULE] Range endpoint called for player {player_id}")
@@ -1090,6 +832,7 @@ def get_schedules_for_player_in_range(player_id):
         start_raw = request.args.get('start')
         end_raw = request.args.get('end')
         is_active = request.args.get('is_active')
+        view = resolve_view(request.args.get('view'))
 
         print(f"[SCHEDULE] Query params: start={start_raw}, end={end_raw}, is_active={is_active}")
 
@@ -1115,7 +858,7 @@ def get_schedules_for_player_in_range(player_id):
             if not loc or loc.company != current_user.company:
                 return jsonify({'error': 'Acesso negado a players de outra empresa'}), 403
 
-        query = Schedule.query.filter(
+        query = Schedule.query.options(*schedule_load_options(view)).filter(
             Schedule.player_id == player_id,
             Schedule.start_date <= end_dt,
             Schedule.end_date >= start_dt
@@ -1130,28 +873,13 @@ def get_schedules_for_player_in_range(player_id):
         for s in schedules:
             print(f"[SCHEDULE] - {s.name}: {s.start_date} to {s.end_date}, days: {s.days_of_week}, time: {s.start_time}-{s.end_time}")
 
-        # Calcular conflitos em tempo real para cada agendamento
-        schedules_with_conflicts = []
-        for schedule in schedules:
-            schedule_dict = schedule.to_dict()
-            
-            # Detectar conflitos em tempo real
-            has_conflicts = _detect_schedule_conflicts(schedule, schedules)
-            schedule_dict['has_conflicts'] = has_conflicts
-            
-            # Determinar tipo de conflito para cores inteligentes
-            conflict_type = _determine_conflict_type(schedule, schedules)
-            schedule_dict['conflict_type'] = conflict_type
-            
-            # Determinar prioridade de sobreposição para cores diferenciadas
-            overlap_priority = _determine_overlap_priority(schedule, schedules)
-            schedule_dict['overlap_priority'] = overlap_priority
-            
-            # NOVO: Atribuir índice de cor para diferenciar schedules sobrepostos
-            color_index = _assign_overlap_color_index(schedule, schedules)
-            schedule_dict['color_index'] = color_index
-            
-            schedules_with_conflicts.append(schedule_dict)
+        # Conflitos, tipo, prioridade de sobreposição e índice de cor numa única varredura
+        annotations = ScheduleConflictIndex(schedules).annotations()
+        schedules_with_conflicts = serialize_schedules(
+            schedules, view, has_conflicts={sid: a['has_conflicts'] for sid, a in annotations.items()}
+        )
+        for schedule_dict in schedules_with_conflicts:
+            schedule_dict.update(annotations[schedule_dict['id']])
         
         return jsonify({
             'schedules': schedules_with_conflicts,
@@ -1166,15 +894,16 @@ def get_schedules_for_player_in_range(player_id):
 @schedule_bp.route('/campaign/<campaign_id>', methods=['GET'])
 @jwt_required()
 def get_schedules_by_campaign(campaign_id):
-    """Obter agendamentos para uma campanha específica"""
+    """Obter agendamentos para uma campanha específica (view=full|summary)"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         is_active = request.args.get('is_active')
+        view = resolve_view(request.args.get('view'))
         
         current_user = User.query.get(get_jwt_identity())
         
-        query = Schedule.query.filter(Schedule.campaign_id == campaign_id)
+        query = Schedule.query.options(*schedule_load_options(view)).filter(Schedule.campaign_id == campaign_id)
         
         if is_active is not None:
             query = query.filter(Schedule.is_active == (is_active.lower() == 'true'))
@@ -1191,7 +920,7 @@ def get_schedules_by_campaign(campaign_id):
         )
         
         return jsonify({
-            'schedules': [schedule.to_dict() for schedule in pagination.items],
+            'schedules': serialize_schedules(pagination.items, view),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -1250,7 +979,7 @@ def check_schedule_conflicts():
         print(f"[DEBUG] New content type: {new_content_type}")
         
         # Buscar agendamentos que podem conflitar
-        query = Schedule.query.filter(
+        query = Schedule.query.options(*schedule_load_options()).filter(
             Schedule.player_id == player_id,
             Schedule.is_active == True,
             Schedule.start_date <= end_date,
@@ -1263,41 +992,15 @@ def check_schedule_conflicts():
         existing_schedules = query.all()
         print(f"[DEBUG] Existing schedules: {[schedule.id for schedule in existing_schedules]}")
         
-        conflicts = []
-        
-        for schedule in existing_schedules:
-            # Determinar tipo de conteúdo do agendamento existente
-            existing_content_type = getattr(schedule, 'content_type', None) or _get_schedule_content_type(schedule.campaign_id)
-            print(f"[DEBUG] Existing content type: {existing_content_type}")
-            
-            # Se são tipos diferentes (overlay + main), não há conflito
-            if new_content_type != existing_content_type:
-                continue
-            
-            # Verificar sobreposição de dias da semana
-            existing_days = set(int(d) for d in schedule.days_of_week.split(',') if d.strip())
-            new_days = set(int(d) for d in days_of_week.split(',') if d.strip())
-            
-            if not existing_days.intersection(new_days):
-                continue
-            
-            # Verificar sobreposição de horários
-            if start_time and end_time and schedule.start_time and schedule.end_time:
-                # Considera overnight nos dois intervalos
-                def overlaps(a_start, a_end, b_start, b_end):
-                    if a_start <= a_end and b_start <= b_end:
-                        return a_start < b_end and a_end > b_start
-                    if a_start > a_end and b_start <= b_end:
-                        return a_start <= b_end or a_end >= b_start
-                    if a_start <= a_end and b_start > b_end:
-                        return b_start <= a_end or b_end >= a_start
-                    # ambos overnight
-                    return True
-                if not overlaps(start_time, end_time, schedule.start_time, schedule.end_time):
-                    continue
-            
-            conflicts.append(schedule.to_dict())
+        # Overlay e main não conflitam entre si: só conta o mesmo tipo de conteúdo
+        index = ScheduleConflictIndex(existing_schedules, content_type_of=_resolved_content_type,
+                                      missing_times_all_day=True)
+        conflicts = index.conflicts_for(
+            player_id, start_date, end_date, start_time, end_time, days_of_week,
+            content_type=new_content_type, exclude_id=exclude_schedule_id
+        )
         
+        conflicts = serialize_schedules(conflicts)
         print(f"[DEBUG] Conflicts found: {[conflict['id'] for conflict in conflicts]}")
         return jsonify({
             'has_conflicts': len(conflicts) > 0,
@@ -1310,6 +1013,10 @@ def check_schedule_conflicts():
         print(f"[DEBUG] Traceback: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+def _resolved_content_type(schedule):
+    """content_type gravado no agendamento, ou o derivado da campanha quando vazio"""
+    return getattr(schedule, 'content_type', None) or _get_schedule_content_type(schedule.campaign_id)
+
 def _get_schedule_content_type(campaign_id):
     """Determina o tipo de conteúdo de um agendamento baseado na campanha"""
     try:
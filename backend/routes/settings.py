@@ -14,7 +14,8 @@ CONFIG_PREFIXES = {
     'display': 'display.',
     'storage': 'storage.',
     'security': 'security.',
-    'monitor': 'monitor.'
+    'monitor': 'monitor.',
+    'compile': 'compile.'
 }
 
 # Configurações padrão do sistema
@@ -47,12 +48,17 @@ DEFAULT_SETTINGS = {
 
     # Configurações de Monitoramento/Tráfego
     'monitor.emit_interval_sec': {'value': 30, 'type': 'int', 'description': 'Intervalo (s) para emitir estatísticas em tempo real'},
+    'monitor.admin_broadcast_interval_sec': {'value': 1, 'type': 'int', 'description': 'Intervalo (s) para agrupar atualizações de status enviadas aos admins'},
     'monitor.overuse_window_min': {'value': 1, 'type': 'int', 'description': 'Janela (min) para cálculo de bytes/min e req/min'},
     'monitor.overuse_bpm_mb': {'value': 100, 'type': 'int', 'description': 'Limite de bytes/min em MB para alertar sobreuso'},
     'monitor.overuse_rpm': {'value': 300, 'type': 'int', 'description': 'Limite de requisições/min para alertar sobreuso'},
     'monitor.sample_retention_days': {'value': 30, 'type': 'int', 'description': 'Dias de retenção dos samples agregados'},
     'monitor.enable_persist': {'value': True, 'type': 'bool', 'description': 'Persistir métricas (minute/hour/day) no banco'},
-    'monitor.enable_system_stats': {'value': True, 'type': 'bool', 'description': 'Coletar e expor métricas do servidor (CPU/RAM/NET)'}
+    'monitor.enable_system_stats': {'value': True, 'type': 'bool', 'description': 'Coletar e expor métricas do servidor (CPU/RAM/NET)'},
+
+    # Configurações de Compilação de Vídeo
+    'compile.max_concurrent': {'value': 1, 'type': 'int', 'description': 'Compilações de vídeo simultâneas na fila global'},
+    'compile.ffmpeg_threads': {'value': 0, 'type': 'int', 'description': 'Threads por processo FFmpeg na compilação (0 = automático)'}
 }
 
 def ensure_default_settings():
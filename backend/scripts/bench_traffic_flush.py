@@ -0,0 +1,144 @@
+"""Benchmark do flush de tráfego por minuto (monitoring.jobs.flush_traffic_minute_now).
+
+Cria um banco SQLite temporário (ou usa --database-url), cadastra N players,
+preenche TRAFFIC_MINUTE com `--minutes` buckets por player e mede:
+
+- batched: o caminho atual (metadados em cache + INSERT em lote);
+- legacy:  um `db.session.get(Player)` + INSERT de uma linha por bucket,
+           como o flush fazia antes (apenas para comparação).
+
+Uso:
+    python scripts/bench_traffic_flush.py --players 1000 10000 --minutes 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark do flush de tráfego por minuto')
+    parser.add_argument('--players', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--minutes', type=int, default=1, help='buckets por player')
+    parser.add_argument('--database-url', default=None, help='padrão: SQLite temporário')
+    parser.add_argument('--skip-legacy', action='store_true')
+    return parser.parse_args()
+
+
+def _fill_traffic(player_ids, minutes):
+    from monitoring.state import TRAFFIC_MINUTE, TRAFFIC_LOCK
+    base = int(time.time()) // 60 * 60
+    with TRAFFIC_LOCK:
+        TRAFFIC_MINUTE.clear()
+        for i, pid in enumerate(player_ids):
+            TRAFFIC_MINUTE[pid] = {
+                base - 60 * m: {
+                    'bytes': 1024 * (i % 97 + 1), 'requests': 3,
+                    'by_type': {'video': 1024 * (i % 97 + 1), 'image': 0, 'audio': 0, 'other': 0}
+                }
+                for m in range(minutes)
+            }
+
+
+def _legacy_flush(db, text):
+    """Reprodução do flush antigo (uma consulta e um INSERT por bucket)."""
+    from models.player import Player
+    from monitoring.samples import bucket_epoch
+    from monitoring.state import TRAFFIC_MINUTE, TRAFFIC_LOCK
+    with TRAFFIC_LOCK:
+        snapshot = {pid: dict(buckets) for pid, buckets in TRAFFIC_MINUTE.items()}
+        TRAFFIC_MINUTE.clear()
+    for pid, buckets in snapshot.items():
+        player = db.session.get(Player, pid)
+        company = getattr(player, 'company', None)
+        for ts_minute, data in buckets.items():
+            db.session.execute(text('''\
+                INSERT INTO network_samples_minute (
+                    player_id, ts_epoch, bytes, requests, video, image, audio, other, ip, company, location_id
+                ) VALUES (:player_id, :ts_epoch, :bytes, :requests, :video, :image, :audio, :other, :ip, :company, :location_id)
+            '''), {
+                'player_id': pid, 'ts_epoch': bucket_epoch(ts_minute, 60),
+                'bytes': data['bytes'], 'requests': data['requests'],
+                'video': data['by_type']['video'], 'image': 0, 'audio': 0, 'other': 0,
+                'ip': player.ip_address if player else None, 'company': company,
+                'location_id': player.location_id if player else None,
+            })
+    db.session.commit()
+
+
+def main():
+    args = _parse_args()
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='bench_traffic_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{Path(tmpdir, 'bench.db').as_posix()}"
+
+    from sqlalchemy import text
+    from app import app
+    from database import db
+    from models.location import Location
+    from models.player import Player
+    from monitoring.jobs import _ensure_network_tables, flush_traffic_minute_now
+    from monitoring.player_metadata import player_metadata_cache
+
+    with app.app_context():
+        db.create_all()
+        _ensure_network_tables()
+        location = Location(name='Bench', city='Bench', state='SP', company='Bench')
+        db.session.add(location)
+        db.session.commit()
+        location_id = location.id
+
+        created = 0
+        for count in sorted(args.players):
+            rows = [{'id': f'bench-{i:06d}', 'name': f'bench {i}', 'location_id': location_id,
+                     'ip_address': f'10.0.{i // 256 % 256}.{i % 256}'}
+                    for i in range(created, count)]
+            if rows:
+                db.session.execute(Player.__table__.insert(), rows)
+                db.session.commit()
+            created = max(created, count)
+
+            player_ids = [f'bench-{i:06d}' for i in range(count)]
+            total = count * args.minutes
+            results = []
+
+            player_metadata_cache.clear()
+            _fill_traffic(player_ids, args.minutes)
+            started = time.perf_counter()
+            flush_traffic_minute_now()
+            elapsed = time.perf_counter() - started
+            results.append(('batched (cache frio)', elapsed))
+
+            _fill_traffic(player_ids, args.minutes)
+            started = time.perf_counter()
+            flush_traffic_minute_now()
+            elapsed = time.perf_counter() - started
+            results.append(('batched (cache quente)', elapsed))
+
+            if not args.skip_legacy:
+                _fill_traffic(player_ids, args.minutes)
+                db.session.expunge_all()
+                started = time.perf_counter()
+                _legacy_flush(db, text)
+                elapsed = time.perf_counter() - started
+                results.append(('legacy', elapsed))
+
+            print(f"\n{count} players x {args.minutes} min = {total} linhas")
+            for label, elapsed in results:
+                print(f"  {label:<24} {elapsed * 1000:10.1f} ms  {total / elapsed:12.0f} linhas/s")
+
+    if tmpdir:
+        print(f"\nBanco temporário: {tmpdir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Canal de broadcast agregado para a sala 'admin'.
+
+Cada heartbeat/ping de player gerava um `socketio.emit(...)` imediato para a
+sala 'admin'; com centenas de TVs o dashboard recebia dezenas de mensagens por
+segundo e o servidor (modo threading) serializava todas. Aqui as atualizações
+por player são acumuladas (a mais recente substitui campos anteriores) e o job
+`admin_broadcast_flush` emite uma única mensagem `admin_status_batch` por tick
+(ADMIN_BROADCAST_INTERVAL_SEC, configurável em `monitor.admin_broadcast_interval_sec`).
+
+Formato do lote:
+    {'seq': n, 'timestamp': iso,
+     'player_status': [payload de player_status_update, ...],
+     'playback_status': [payload de playback_status_update, ...]}
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+ADMIN_BROADCAST_INTERVAL_SEC = 1.0
+ADMIN_BROADCAST_EVENT = 'admin_status_batch'
+
+# Evento legado -> chave no lote
+CHANNELS = {
+    'player_status_update': 'player_status',
+    'playback_status_update': 'playback_status',
+}
+
+
+class AdminBroadcaster:
+    """Acumula deltas por player e os entrega em lote à sala 'admin'."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {key: OrderedDict() for key in CHANNELS.values()}
+        self._seq = 0
+        # Métricas
+        self.published = 0       # atualizações recebidas
+        self.superseded = 0      # atualizações absorvidas por outra do mesmo player no mesmo tick
+        self.items_emitted = 0   # atualizações efetivamente enviadas
+        self.batches_emitted = 0
+        self.last_batch_size = 0
+        self.last_flush_at = None
+
+    def publish(self, event, player_id, payload):
+        """Enfileira uma atualização de `event` (player_status_update/playback_status_update)."""
+        channel = CHANNELS.get(event)
+        if channel is None or not player_id:
+            return
+        player_id = str(player_id)
+        with self._lock:
+            pending = self._pending[channel]
+            current = pending.get(player_id)
+            if current is None:
+                pending[player_id] = dict(payload, player_id=player_id)
+            else:
+                current.update(payload)
+                pending.move_to_end(player_id)
+                self.superseded += 1
+            self.published += 1
+
+    def flush(self, socketio):
+        """Emite o lote acumulado (se houver); retorna o número de itens enviados."""
+        with self._lock:
+            if not any(self._pending.values()):
+                return 0
+            batch = {key: list(items.values()) for key, items in self._pending.items()}
+            self._pending = {key: OrderedDict() for key in CHANNELS.values()}
+            self._seq += 1
+            seq = self._seq
+        size = sum(len(items) for items in batch.values())
+        message = dict(batch, seq=seq, timestamp=datetime.now(timezone.utc).isoformat())
+        try:
+            socketio.emit(ADMIN_BROADCAST_EVENT, message, room='admin')
+        except Exception as e:
+            print(f"[AdminBroadcast] Falha ao emitir lote {seq}: {e}")
+            return 0
+        with self._lock:
+            self.items_emitted += size
+            self.batches_emitted += 1
+            self.last_batch_size = size
+            self.last_flush_at = datetime.now(timezone.utc)
+        return size
+
+    def stats(self):
+        with self._lock:
+            pending = sum(len(items) for items in self._pending.values())
+            return {
+                'published': self.published,
+                'superseded': self.superseded,
+                'items_emitted': self.items_emitted,
+                'batches_emitted': self.batches_emitted,
+                'pending': pending,
+                'last_batch_size': self.last_batch_size,
+                # Atualizações recebidas por mensagem efetivamente enviada
+                'coalescing_ratio': round(self.published / self.batches_emitted, 2) if self.batches_emitted else 0.0,
+                'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None,
+            }
+
+
+# Instância global do canal de broadcast
+admin_broadcaster = AdminBroadcaster()
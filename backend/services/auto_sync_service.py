@@ -5,13 +5,23 @@ from models.player import Player, db
 from services.chromecast_service import chromecast_service
 import unicodedata
 
+# Espera pelas primeiras respostas mDNS só logo após iniciar o registro
+CAST_REGISTRY_WARMUP_SEC = 8
+# Teto da rodada de conexões paralelas; quem não responder conta como offline nesta rodada
+CAST_SYNC_CONNECT_TIMEOUT_SEC = 30
+
 class AutoSyncService:
     def __init__(self):
         self.is_running = False
         self.sync_thread = None
     
     def sync_all_players(self):
-        """Sincroniza todos os players e atualiza seus status"""
+        """Sincroniza todos os players e atualiza seus status.
+
+        Lê o registro vivo de Chromecasts (browser mDNS persistente) em vez de
+        redescobrir a rede e conecta os dispositivos em paralelo pelo pool do
+        chromecast_service: um dispositivo inacessível não atrasa os demais.
+        """
         try:
             print("[AUTO_SYNC] Iniciando sincronização automática de todos os players...")
             
@@ -19,12 +29,16 @@ class AutoSyncService:
             players = Player.query.filter(Player.is_active == True).all()
             print(f"[AUTO_SYNC] Encontrados {len(players)} players ativos")
             
-            # Descobrir dispositivos Chromecast na rede
-            discovered_devices = chromecast_service.discover_devices(timeout=8)
-            print(f"[AUTO_SYNC] Dispositivos Chromecast descobertos: {len(discovered_devices)}")
+            # Dispositivos Chromecast conhecidos pelo registro (sem nova descoberta)
+            discovered_devices = chromecast_service.discover_devices(timeout=CAST_REGISTRY_WARMUP_SEC)
+            print(f"[AUTO_SYNC] Dispositivos Chromecast no registro: {len(discovered_devices)}")
+            
+            # Descartar conexões mortas antes de decidir quem precisa reconectar
+            chromecast_service.health_check()
             
             synced_count = 0
             online_count = 0
+            pending = []  # (player, device, nome alvo, autoassociado)
             
             def _norm(s: str) -> str:
                 if not s:
@@ -33,96 +47,43 @@ class AutoSyncService:
                 s = ''.join(c for c in s if not unicodedata.combining(c))
                 return s.strip().lower()
             
+            def _match(player):
+                player_name_norm = _norm(player.chromecast_name or player.name or '')
+                for device in discovered_devices:
+                    if player.chromecast_id and str(device['id']) == str(player.chromecast_id):
+                        return device
+                for device in discovered_devices:
+                    device_name_norm = _norm(device.get('name', ''))
+                    if device_name_norm == player_name_norm or (player_name_norm in device_name_norm) or (device_name_norm in player_name_norm):
+                        return device
+                return None
+            
             for player in players:
                 try:
-                    if player.chromecast_id:
-                        # Player com Chromecast - verificar se está disponível
-                        chromecast_found = False
-                        
-                        for device in discovered_devices:
-                            # Estratégia de identificação flexível
-                            device_name = device.get('name', '')
-                            player_target_name = player.chromecast_name or player.name or ''
-                            device_name_norm = _norm(device_name)
-                            player_name_norm = _norm(player_target_name)
-                            
-                            uuid_match = str(device['id']) == str(player.chromecast_id)
-                            name_match = device_name_norm == player_name_norm
-                            name_contains = (player_name_norm in device_name_norm) or (device_name_norm in player_name_norm)
-                            
-                            if uuid_match or name_match or name_contains:
-                                print(f"[AUTO_SYNC] Chromecast encontrado para {player.name}: {device.get('name')}")
-                                chromecast_found = True
-                                
-                                # Atualizar UUID se necessário
-                                if str(device['id']) != str(player.chromecast_id):
-                                    player.chromecast_id = str(device['id'])
-                                
-                                # Tentar conectar
-                                success, actual_uuid = chromecast_service.connect_to_device(
-                                    device_id=str(device['id']),
-                                    device_name=player_target_name
-                                )
-                                if success:
-                                    # Garantir que UUID no banco está correto
-                                    if actual_uuid and str(actual_uuid) != str(player.chromecast_id):
-                                        player.chromecast_id = str(actual_uuid)
-                                    player.status = 'online'
-                                    player.last_ping = datetime.utcnow()
-                                    player.ip_address = device.get('ip', player.ip_address)
-                                    online_count += 1
-                                    print(f"[AUTO_SYNC] {player.name} -> ONLINE")
-                                else:
-                                    player.status = 'offline'
-                                    print(f"[AUTO_SYNC] {player.name} -> OFFLINE (conexão falhou)")
-                                break
-                        
-                        if not chromecast_found:
+                    is_chromecast = bool(player.chromecast_id) or (player.platform or '').lower() == 'chromecast'
+                    if is_chromecast:
+                        device = _match(player)
+                        if device is None:
                             player.status = 'offline'
                             print(f"[AUTO_SYNC] {player.name} -> OFFLINE (não encontrado)")
-                    else:
-                        # Player sem chromecast_id
-                        if (player.platform or '').lower() == 'chromecast':
-                            # Tentar autoassociar por nome
-                            player_target_name = player.chromecast_name or player.name or ''
-                            player_name_norm = _norm(player_target_name)
-                            matched = None
-                            for device in discovered_devices:
-                                device_name = device.get('name', '')
-                                device_name_norm = _norm(device_name)
-                                if device_name_norm == player_name_norm or player_name_norm in device_name_norm or device_name_norm in player_name_norm:
-                                    matched = device
-                                    break
-                            if matched:
-                                print(f"[AUTO_SYNC] Autoassociação por nome: {player.name} -> {matched.get('name')} ({matched.get('id')})")
-                                player.chromecast_id = str(matched.get('id'))
-                                player.chromecast_name = matched.get('name') or player.chromecast_name
-                                # Validar conexão
-                                success, actual_uuid = chromecast_service.connect_to_device(
-                                    device_id=str(matched.get('id')),
-                                    device_name=player_target_name
-                                )
-                                if success:
-                                    if actual_uuid and str(actual_uuid) != str(player.chromecast_id):
-                                        player.chromecast_id = str(actual_uuid)
-                                    player.status = 'online'
-                                    player.last_ping = datetime.utcnow()
-                                    player.ip_address = matched.get('ip', player.ip_address)
-                                    online_count += 1
-                                    print(f"[AUTO_SYNC] {player.name} -> ONLINE (autoassociado)")
-                                else:
-                                    player.status = 'offline'
-                                    print(f"[AUTO_SYNC] {player.name} -> OFFLINE (falha conexão após autoassociação)")
-                            else:
-                                player.status = 'offline'
-                                print(f"[AUTO_SYNC] {player.name} (Chromecast sem ID) -> OFFLINE (nenhum correspondente)")
                         else:
-                            # Player não-Chromecast: considerar atividade recente
-                            if player.last_ping and (datetime.utcnow() - player.last_ping).total_seconds() < 300:
-                                player.status = 'online'
-                                online_count += 1
+                            auto_associated = not player.chromecast_id
+                            if auto_associated:
+                                print(f"[AUTO_SYNC] Autoassociação por nome: {player.name} -> {device.get('name')} ({device.get('id')})")
+                                player.chromecast_name = device.get('name') or player.chromecast_name
                             else:
-                                player.status = 'offline'
+                                print(f"[AUTO_SYNC] Chromecast encontrado para {player.name}: {device.get('name')}")
+                            # Atualizar UUID se necessário
+                            if str(device['id']) != str(player.chromecast_id):
+                                player.chromecast_id = str(device['id'])
+                            pending.append((player, device, player.chromecast_name or player.name or '', auto_associated))
+                    else:
+                        # Player não-Chromecast: considerar atividade recente
+                        if player.last_ping and (datetime.utcnow() - player.last_ping).total_seconds() < 300:
+                            player.status = 'online'
+                            online_count += 1
+                        else:
+                            player.status = 'offline'
                     
                     synced_count += 1
                     
@@ -130,6 +91,27 @@ class AutoSyncService:
                     print(f"[AUTO_SYNC] Erro ao sincronizar {player.name}: {e}")
                     player.status = 'offline'
             
+            # Conectar/validar todos os Chromecasts de uma vez (paralelismo limitado)
+            results = chromecast_service.connect_many(
+                [(str(device['id']), target_name) for _, device, target_name, _ in pending],
+                timeout=CAST_SYNC_CONNECT_TIMEOUT_SEC,
+            ) if pending else {}
+            for player, device, _, auto_associated in pending:
+                success, actual_uuid = results.get(str(device['id']), (False, ""))
+                suffix = ' (autoassociado)' if auto_associated else ''
+                if success:
+                    # Garantir que UUID no banco está correto
+                    if actual_uuid and str(actual_uuid) != str(player.chromecast_id):
+                        player.chromecast_id = str(actual_uuid)
+                    player.status = 'online'
+                    player.last_ping = datetime.utcnow()
+                    player.ip_address = device.get('ip', player.ip_address)
+                    online_count += 1
+                    print(f"[AUTO_SYNC] {player.name} -> ONLINE{suffix}")
+                else:
+                    player.status = 'offline'
+                    print(f"[AUTO_SYNC] {player.name} -> OFFLINE (conexão falhou){suffix}")
+            
             # Salvar todas as alterações
             db.session.commit()
             
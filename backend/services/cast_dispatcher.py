@@ -0,0 +1,202 @@
+"""Despacho de comandos para Chromecasts: uma fila e uma thread por dispositivo.
+
+Antes load_media segurava um lock global enquanto iniciava o Default Media
+Receiver e esperava a mídia ficar ativa; um Chromecast lento travava os
+comandos de todos os outros e a thread do schedule_executor que chamou.
+
+- submit() retorna imediatamente um concurrent.futures.Future; o comando roda
+  na thread do dispositivo, em ordem de chegada.
+- Comandos com `coalesce=True` (LOAD) substituem o comando do mesmo tipo ainda
+  na fila do dispositivo: vale o último, que entra no fim da fila (depois de
+  um STOP enfileirado no meio). O Future substituído é cancelado e marcado
+  com `superseded = True`.
+- Cada comando declara um `budget` (pior caso de execução, em segundos); o
+  Future recebe `wait_budget`, a soma dos budgets do comando em execução, dos
+  que estão à frente na fila e do próprio: quem espera o resultado de forma
+  síncrona usa isso como timeout em vez de um teto fixo.
+- Latências (espera na fila e execução) ficam por dispositivo em metrics(),
+  exposto em /api/cast/dispatcher/metrics.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 100  # amostras por dispositivo para média/p95
+
+
+class _Command:
+    __slots__ = ('kind', 'fn', 'future', 'coalesce', 'budget', 'submitted_at')
+
+    def __init__(self, kind, fn, coalesce, budget):
+        self.kind = kind
+        self.fn = fn
+        self.future = Future()
+        self.coalesce = coalesce
+        self.budget = budget
+        self.submitted_at = time.monotonic()
+
+
+class _DeviceStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.queue_ms = deque(maxlen=LATENCY_WINDOW)
+        self.exec_ms = deque(maxlen=LATENCY_WINDOW)
+        self.exec_by_kind = {}  # kind -> deque de ms
+        self.last_command_at = None
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return {'count': 0, 'avg_ms': None, 'p95_ms': None, 'max_ms': None, 'last_ms': None}
+        ordered = sorted(samples)
+        return {
+            'count': len(ordered),
+            'avg_ms': round(sum(ordered) / len(ordered), 1),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            'max_ms': round(ordered[-1], 1),
+            'last_ms': round(samples[-1], 1),
+        }
+
+    def to_dict(self, queue_depth, busy):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'queue_depth': queue_depth,
+            'busy': busy,
+            'last_command_at': self.last_command_at,
+            'queue_wait': self._summary(self.queue_ms),
+            'execution': self._summary(self.exec_ms),
+            'by_command': {kind: self._summary(samples) for kind, samples in self.exec_by_kind.items()},
+        }
+
+
+class _DeviceWorker:
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.stats = _DeviceStats()
+        self.busy = False
+        self.current = None  # comando em execução
+        self.stopped = False
+        self.thread = threading.Thread(target=self._loop, daemon=True, name=f'cast-{device_id[:8]}')
+        self.thread.start()
+
+    def submit(self, kind, fn, coalesce, budget):
+        command = _Command(kind, fn, coalesce, budget)
+        with self.cond:
+            if coalesce:
+                for pending in self.queue:
+                    if pending.coalesce and pending.kind == kind:
+                        # O mais recente vence: o anterior sai da fila e o novo vai para o fim,
+                        # depois dos comandos enfileirados entre os dois (ex.: STOP)
+                        self.queue.remove(pending)
+                        pending.future.superseded = True
+                        pending.future.cancel()
+                        self.stats.coalesced += 1
+                        break
+            self.queue.append(command)
+            ahead = [self.current] if self.current is not None else []
+            command.future.wait_budget = sum(c.budget for c in ahead + list(self.queue))
+            self.stats.submitted += 1
+            self.cond.notify()
+        return command.future
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            while self.queue:
+                self.queue.popleft().future.cancel()
+            self.cond.notify()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.stopped:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                command = self.queue.popleft()
+                self.current = command
+                self.busy = True
+            try:
+                if command.future.set_running_or_notify_cancel():
+                    self._execute(command)
+            finally:
+                with self.cond:
+                    self.current = None
+                    self.busy = False
+
+    def _execute(self, command):
+        started = time.monotonic()
+        ok = False
+        try:
+            result = command.fn()
+            ok = result is not False
+            command.future.set_result(result)
+        except BaseException as e:
+            logger.warning(f"[CastDispatcher] Comando '{command.kind}' falhou em {self.device_id}: {e}")
+            command.future.set_exception(e)
+        finally:
+            finished = time.monotonic()
+            stats = self.stats
+            stats.queue_ms.append((started - command.submitted_at) * 1000)
+            exec_ms = (finished - started) * 1000
+            stats.exec_ms.append(exec_ms)
+            stats.exec_by_kind.setdefault(command.kind, deque(maxlen=LATENCY_WINDOW)).append(exec_ms)
+            stats.last_command_at = time.time()
+            if ok:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+
+
+class CastDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers = {}  # device_id -> _DeviceWorker
+
+    def _worker(self, device_id):
+        with self._lock:
+            worker = self._workers.get(device_id)
+            if worker is None:
+                worker = self._workers[device_id] = _DeviceWorker(device_id)
+            return worker
+
+    def submit(self, device_id: str, kind: str, fn, coalesce: bool = False, budget: float = 0.0) -> Future:
+        """Enfileira `fn()` na thread do dispositivo; o Future recebe o retorno ou a exceção.
+
+        `budget` é o pior caso de execução de `fn` em segundos (ver wait_budget).
+        """
+        return self._worker(str(device_id)).submit(kind, fn, coalesce, budget)
+
+    def metrics(self, device_id: str = None):
+        with self._lock:
+            workers = dict(self._workers)
+        if device_id is not None:
+            workers = {k: v for k, v in workers.items() if k == str(device_id)}
+        result = {}
+        for key, worker in workers.items():
+            with worker.cond:
+                result[key] = worker.stats.to_dict(len(worker.queue), worker.busy)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+# Instância global do despachante de comandos Chromecast
+cast_dispatcher = CastDispatcher()
@@ -0,0 +1,167 @@
+"""Registro vivo de dispositivos Chromecast na rede local.
+
+Antes cada sincronização chamava pychromecast.discover_chromecasts, que abria
+um Zeroconf temporário e bloqueava por 5-10 s esperando respostas mDNS. Agora
+um CastBrowser persistente fica escutando anúncios/remoções de serviços
+_googlecast._tcp e mantém o dicionário de dispositivos sempre atualizado;
+consultas são leituras em memória.
+
+Cada entrada guarda um "host tuple" (ip, porta, uuid, modelo, nome) que permite
+conectar via pychromecast.get_chromecast_from_host sem depender do Zeroconf.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+import logging
+
+import pychromecast
+from zeroconf import Zeroconf
+
+logger = logging.getLogger(__name__)
+
+
+class CastRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._devices = {}  # uuid -> entrada (ver _entry_from_info)
+        self._zeroconf = None
+        self._browser = None
+        self._started_at = None
+
+    # -------------------- Ciclo de vida --------------------
+    def start(self) -> bool:
+        """Inicia o browser persistente (idempotente). Retorna False se o mDNS estiver indisponível."""
+        with self._lock:
+            if self._browser is not None:
+                return True
+            try:
+                self._zeroconf = Zeroconf()
+                listener = pychromecast.discovery.SimpleCastListener(
+                    add_callback=self._on_add,
+                    remove_callback=self._on_remove,
+                    update_callback=self._on_update,
+                )
+                self._browser = pychromecast.discovery.CastBrowser(listener, self._zeroconf)
+                self._browser.start_discovery()
+                self._started_at = time.time()
+                logger.info("Registro de Chromecasts iniciado (browser mDNS persistente)")
+                return True
+            except Exception as e:
+                logger.error(f"Erro ao iniciar registro de Chromecasts: {e}")
+                self._close_locked()
+                return False
+
+    def stop(self):
+        with self._lock:
+            self._close_locked()
+            self._devices.clear()
+
+    def _close_locked(self):
+        if self._browser is not None:
+            try:
+                self._browser.stop_discovery()
+            except Exception as e:
+                logger.warning(f"Erro ao parar browser de descoberta: {e}")
+            self._browser = None
+        if self._zeroconf is not None:
+            try:
+                self._zeroconf.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar Zeroconf: {e}")
+            self._zeroconf = None
+        self._started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._browser is not None
+
+    def wait_ready(self, timeout: float) -> None:
+        """Logo após iniciar, aguarda (até `timeout` s desde o início) as primeiras respostas mDNS.
+
+        Com o browser já rodando há mais tempo, retorna imediatamente.
+        """
+        with self._changed:
+            if self._started_at is None:
+                return
+            deadline = self._started_at + timeout
+            while not self._devices:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                self._changed.wait(remaining)
+
+    # -------------------- Callbacks do browser (thread do Zeroconf) --------------------
+    def _on_add(self, uuid, service):
+        self._store(uuid, 'adicionado')
+
+    def _on_update(self, uuid, service):
+        self._store(uuid, None)
+
+    def _on_remove(self, uuid, service, cast_info):
+        with self._changed:
+            entry = self._devices.pop(str(uuid), None)
+            self._changed.notify_all()
+        if entry:
+            logger.info(f"Chromecast removido da rede: {entry['name']} ({uuid})")
+
+    def _store(self, uuid, action):
+        browser = self._browser
+        info = browser.devices.get(uuid) if browser is not None else None
+        if info is None or not info.host:
+            return
+        entry = self._entry_from_info(info)
+        with self._changed:
+            previous = self._devices.get(entry['id'])
+            if previous:
+                entry['first_seen'] = previous['first_seen']
+            self._devices[entry['id']] = entry
+            self._changed.notify_all()
+        if action:
+            logger.info(f"Chromecast {action}: {entry['name']} ({entry['id']}) em {entry['ip']}:{entry['port']}")
+
+    @staticmethod
+    def _entry_from_info(info) -> Dict:
+        now = time.time()
+        port = info.port or 8009
+        return {
+            'id': str(info.uuid),
+            # "host tuple" que NÃO depende de Zeroconf
+            'host': (info.host, port, info.uuid, info.model_name, info.friendly_name),
+            'name': info.friendly_name,
+            'model': info.model_name,
+            'ip': info.host,
+            'port': port,
+            'cast_type': info.cast_type,
+            'manufacturer': info.manufacturer,
+            'first_seen': now,
+            'last_seen': now,
+        }
+
+    # -------------------- Consulta --------------------
+    def entries(self) -> Dict[str, Dict]:
+        """Cópia do registro: uuid -> entrada com 'host' tuple."""
+        with self._lock:
+            return {uuid: dict(entry) for uuid, entry in self._devices.items()}
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._devices.get(str(device_id))
+            return dict(entry) if entry else None
+
+    def devices(self) -> List[Dict]:
+        """Dispositivos no formato público de ChromecastService.discover_devices."""
+        return [{
+            'id': entry['id'],
+            'name': entry['name'],
+            'model': entry['model'],
+            'ip': entry['ip'],
+            'port': entry['port'],
+            'status': 'available',
+            'cast_type': entry['cast_type'],
+            'manufacturer': entry['manufacturer'],
+        } for entry in self.entries().values()]
+
+
+# Instância global do registro de dispositivos
+cast_registry = CastRegistry()
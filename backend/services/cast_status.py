@@ -0,0 +1,204 @@
+"""Espelho em memória do estado de cada Chromecast conectado.
+
+Cada conexão do pool registra listeners de status do receiver (app ativo,
+volume), de mídia (content_id, player_state, posição) e de conexão do socket.
+O dispositivo empurra as mudanças e o espelho é atualizado na hora; rotas,
+dashboard e schedule_executor leem daqui sem ida e volta pela rede.
+
+Mudanças relevantes são publicadas para o dashboard como
+`playback_status_update` (lote admin_status_batch), com `event_type`
+'cast_status', quando o dispositivo está associado a um player.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+import logging
+
+from pychromecast.controllers.media import MediaStatusListener
+from pychromecast.controllers.receiver import CastStatusListener
+from pychromecast.socket_client import ConnectionStatusListener
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_PLAYER_STATES = ('PLAYING', 'BUFFERING')
+# Campos cuja mudança é publicada para o dashboard (posição muda o tempo todo e não entra)
+PUBLISHED_FIELDS = ('connection', 'app_id', 'content_id', 'player_state', 'volume_muted')
+# Validade do cache dispositivo -> player (associações mudam raramente)
+PLAYER_CACHE_TTL_SEC = 60
+
+
+class _Listener(CastStatusListener, MediaStatusListener, ConnectionStatusListener):
+    """Encaminha os eventos de um dispositivo para o espelho."""
+
+    def __init__(self, mirror, device_id, cast):
+        self._mirror = mirror
+        self._device_id = device_id
+        self._cast = cast
+
+    def _update(self, **fields):
+        # Conexões substituídas continuam emitindo eventos até fechar: ignorar
+        if self._mirror.attached(self._device_id) is self._cast:
+            self._mirror.update(self._device_id, **fields)
+
+    def new_cast_status(self, status):
+        self._update(**self._mirror.cast_fields(status))
+
+    def new_media_status(self, status):
+        self._update(**self._mirror.media_fields(status))
+
+    def load_media_failed(self, queue_item_id, error_code):
+        self._update(last_error=f'LOAD_FAILED ({error_code})')
+
+    def new_connection_status(self, status):
+        self._update(connection=getattr(status, 'status', None))
+
+
+class CastStatusMirror:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}    # device_id -> estado
+        self._attached = {}  # device_id -> Chromecast com listeners registrados
+        self._players = {}   # device_id -> (player_id ou None, instante da consulta)
+        self._app = None
+
+    def bind_app(self, app):
+        """App usado para resolver o player de um dispositivo ao publicar para o dashboard."""
+        self._app = app
+
+    # -------------------- Registro --------------------
+    def attach(self, device_id: str, cast):
+        """Registra os listeners na conexão (uma vez por objeto Chromecast) e semeia o estado."""
+        device_id = str(device_id)
+        with self._lock:
+            if self._attached.get(device_id) is cast:
+                return
+            self._attached[device_id] = cast
+        listener = _Listener(self, device_id, cast)
+        try:
+            cast.socket_client.receiver_controller.register_status_listener(listener)
+            cast.socket_client.register_connection_listener(listener)
+            cast.media_controller.register_status_listener(listener)
+        except Exception as e:
+            logger.warning(f"[CastStatus] Não foi possível registrar listeners em {device_id}: {e}")
+        seed = {'device_name': getattr(cast, 'name', None), 'connection': 'CONNECTED'}
+        if getattr(cast, 'status', None) is not None:
+            seed.update(self.cast_fields(cast.status))
+        media_status = getattr(getattr(cast, 'media_controller', None), 'status', None)
+        if media_status is not None and getattr(media_status, 'player_state', None) is not None:
+            seed.update(self.media_fields(media_status))
+        self.update(device_id, **seed)
+
+    def attached(self, device_id: str):
+        with self._lock:
+            return self._attached.get(str(device_id))
+
+    def detach(self, device_id: str):
+        device_id = str(device_id)
+        with self._lock:
+            self._attached.pop(device_id, None)
+        self.update(device_id, connection='DISCONNECTED')
+
+    # -------------------- Conversão --------------------
+    @staticmethod
+    def cast_fields(status):
+        return {
+            'app_id': getattr(status, 'app_id', None),
+            'current_app': getattr(status, 'display_name', None),
+            'status_text': getattr(status, 'status_text', None),
+            'volume_level': getattr(status, 'volume_level', None),
+            'volume_muted': getattr(status, 'volume_muted', None),
+        }
+
+    @staticmethod
+    def media_fields(status):
+        last_updated = getattr(status, 'last_updated', None)
+        return {
+            'content_id': getattr(status, 'content_id', None),
+            'content_type': getattr(status, 'content_type', None),
+            'title': getattr(status, 'title', None),
+            'player_state': getattr(status, 'player_state', None),
+            'current_time': getattr(status, 'current_time', None),
+            'duration': getattr(status, 'duration', None),
+            'playback_rate': getattr(status, 'playback_rate', 1) or 1,
+            'media_updated_at': last_updated.isoformat() if last_updated else None,
+            '_media_updated_ts': last_updated.timestamp() if last_updated else None,
+        }
+
+    # -------------------- Atualização --------------------
+    def update(self, device_id: str, **fields):
+        device_id = str(device_id)
+        with self._lock:
+            state = self._states.setdefault(device_id, {'device_id': device_id})
+            changed = any(state.get(key) != fields[key] for key in PUBLISHED_FIELDS if key in fields)
+            state.update(fields)
+            state['updated_at'] = datetime.now(timezone.utc).isoformat()
+        if changed:
+            self._publish(device_id)
+
+    def _player_id(self, device_id):
+        with self._lock:
+            cached = self._players.get(device_id)
+            if cached and time.time() - cached[1] < PLAYER_CACHE_TTL_SEC:
+                return cached[0]
+        if self._app is None:
+            return None
+        player_id = None
+        try:
+            from models.player import Player
+            with self._app.app_context():
+                player = Player.query.filter_by(chromecast_id=device_id).first()
+                player_id = str(player.id) if player else None
+        except Exception as e:
+            logger.warning(f"[CastStatus] Falha ao resolver player de {device_id}: {e}")
+            return None
+        with self._lock:
+            self._players[device_id] = (player_id, time.time())
+        return player_id
+
+    def _publish(self, device_id):
+        player_id = self._player_id(device_id)
+        if not player_id:
+            return
+        try:
+            from services.admin_broadcast import admin_broadcaster
+            admin_broadcaster.publish('playback_status_update', player_id, {
+                'player_id': player_id,
+                'event_type': 'cast_status',
+                'status': self.get(device_id),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+            })
+        except Exception as e:
+            logger.warning(f"[CastStatus] Falha ao publicar estado de {device_id}: {e}")
+
+    # -------------------- Consulta --------------------
+    def get(self, device_id: str):
+        """Estado do dispositivo com posição estimada; None se nunca conectado."""
+        with self._lock:
+            state = self._states.get(str(device_id))
+            state = dict(state) if state else None
+        if state is None:
+            return None
+        updated_ts = state.pop('_media_updated_ts', None)
+        position = state.get('current_time')
+        if position is not None and updated_ts and state.get('player_state') == 'PLAYING':
+            elapsed = datetime.now(timezone.utc).timestamp() - updated_ts
+            position += state.get('playback_rate', 1) * max(0.0, elapsed)
+        state['position'] = position
+        state['is_connected'] = state.get('connection') == 'CONNECTED'
+        state['is_playing'] = state.get('player_state') in ACTIVE_PLAYER_STATES
+        return state
+
+    def all(self):
+        with self._lock:
+            device_ids = list(self._states.keys())
+        return {device_id: self.get(device_id) for device_id in device_ids}
+
+    def is_playing(self, device_id: str, media_url: str) -> bool:
+        """O dispositivo está conectado e reproduzindo exatamente este URL."""
+        state = self.get(device_id)
+        return bool(state and state['is_connected'] and state['is_playing']
+                    and state.get('content_id') == media_url)
+
+
+# Instância global do espelho de status dos Chromecasts
+cast_status_mirror = CastStatusMirror()
@@ -1,23 +1,43 @@
 import pychromecast
-from pychromecast.controllers.media import MediaController
+import os
 import time
 import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait as wait_futures
 from typing import List, Dict, Optional
 import logging
-from zeroconf import Zeroconf
 import atexit
 
+from services.cast_dispatcher import cast_dispatcher
+from services.cast_registry import cast_registry
+from services.cast_status import cast_status_mirror
+
 logger = logging.getLogger(__name__)
 
+# Pool de conexões: quantos Chromecasts conectam ao mesmo tempo e quanto cada tentativa espera
+CAST_CONNECT_WORKERS = max(1, int(os.getenv('CAST_CONNECT_WORKERS', '4')))
+CAST_CONNECT_TRIES = max(1, int(os.getenv('CAST_CONNECT_TRIES', '2')))
+CAST_CONNECT_TIMEOUT = float(os.getenv('CAST_CONNECT_TIMEOUT', '5'))
+# Espera por cada resposta do receiver (start_app/LOAD) e pior caso de um comando simples na fila
+CAST_LOAD_TIMEOUT = float(os.getenv('CAST_LOAD_TIMEOUT', '10'))
+CAST_COMMAND_TIMEOUT = float(os.getenv('CAST_COMMAND_TIMEOUT', '30'))
+# Pior caso de connect_to_device (host direto, descobertas por nome e testes de conexão)
+CAST_CONNECT_BUDGET = float(os.getenv('CAST_CONNECT_BUDGET', '60'))
+# Pior caso de um LOAD: start_app + LOAD e, no fallback de imagem, start_app + LOAD de novo
+CAST_LOAD_BUDGET = 4 * CAST_LOAD_TIMEOUT
+DEFAULT_MEDIA_RECEIVER = 'CC1AD845'
+
+
+class CastConnectionError(Exception):
+    """Dispositivo sem conexão ao executar um comando enfileirado."""
+
+
 class ChromecastService:
     def __init__(self):
-        self.discovered_devices = {}
         self.active_connections = {}
-        self._discovery_thread = None
-        self._stop_discovery = False
-        self._zeroconf = None
-        self._browser = None
         self._connection_lock = threading.Lock()
+        self._device_locks = {}  # device_id -> Lock (uma conexão por dispositivo de cada vez)
+        self._connect_pool = None
+        self._app = None  # app do start_registry, para threads sem contexto
         self._cleanup_registered = False
         self._failed_connections = {}  # Track failed connections to prevent loops
         self._connection_retry_limit = 3
@@ -29,95 +49,144 @@ class ChromecastService:
         if not self._cleanup_registered:
             atexit.register(self.cleanup)
             self._cleanup_registered = True
-    
-    def _ensure_zeroconf(self, force_recreate: bool = False):
-        """Garante uma instância Zeroconf estável e viva. Nunca fecha para recriar
-        a menos que solicitado explicitamente (force_recreate=True).
+
+    @property
+    def discovered_devices(self) -> Dict[str, Dict]:
+        """Dispositivos vistos pelo registro mDNS persistente (uuid -> entrada com 'host' tuple)."""
+        return cast_registry.entries()
+
+    def start_registry(self, app=None) -> bool:
+        """Inicia o browser mDNS persistente que alimenta o registro de dispositivos.
+
+        `app` permite ao espelho de status associar dispositivos a players para o dashboard.
         """
-        try:
-            if force_recreate and self._zeroconf is not None:
-                try:
-                    self._zeroconf.close()
-                except Exception:
-                    pass
-                self._zeroconf = None
-            if self._zeroconf is None:
-                self._zeroconf = Zeroconf()
-                logger.info("Instância Zeroconf inicializada")
-            return self._zeroconf
-        except Exception as e:
-            logger.error(f"Erro ao inicializar Zeroconf: {e}")
-            return None
-    
+        if app is not None:
+            self._app = app
+            cast_status_mirror.bind_app(app)
+        return cast_registry.start()
+
     def discover_devices(self, timeout: int = 5) -> List[Dict]:
-        """Descobre dispositivos Chromecast na rede local SEM manter objetos Chromecast vivos.
+        """Lista os dispositivos Chromecast da rede local a partir do registro vivo.
 
-        Usa pychromecast.discover_chromecasts para obter CastInfo (metadados) e
-        converte para uma representação leve (host tuple). Não inicia threads
-        nem mantém referências que dependam de Zeroconf.
+        O browser mDNS fica ativo em segundo plano; só na primeira chamada (ou logo
+        após iniciar) aguarda até `timeout` segundos pelas primeiras respostas.
         """
         try:
-            logger.info("Iniciando descoberta de dispositivos Chromecast (modo leve)...")
-            devices = []
-
-            # Descobrir via pychromecast; deixa que ele gerencie uma instância temporária de Zeroconf
-            cast_infos, browser = pychromecast.discover_chromecasts(timeout=timeout)
-            try:
-                # Construir mapeamento leve
-                self.discovered_devices.clear()
-                for info in cast_infos:
-                    try:
-                        uuid_str = str(info.uuid)
-                        host = info.host
-                        port = info.port or 8009
-                        name = info.friendly_name
-                        model = info.model_name
-                        cast_type = info.cast_type
-                        manufacturer = info.manufacturer
-
-                        # Guardar um "host tuple" que NÃO depende de Zeroconf
-                        host_tuple = (host, port, info.uuid, model, name)
-
-                        self.discovered_devices[uuid_str] = {
-                            'host': host_tuple,
-                            'name': name,
-                            'model': model,
-                            'ip': host,
-                            'port': port,
-                            'cast_type': cast_type,
-                            'manufacturer': manufacturer,
-                        }
-
-                        devices.append({
-                            'id': uuid_str,
-                            'name': name,
-                            'model': model,
-                            'ip': host,
-                            'port': port,
-                            'status': 'available',
-                            'cast_type': cast_type,
-                            'manufacturer': manufacturer,
-                        })
-                    except Exception as e:
-                        logger.warning(f"Erro ao processar CastInfo: {e}")
-                        continue
-            finally:
-                # Encerrar discovery para não deixar threads ativas; esta chamada
-                # fecha a instância TEMPORÁRIA de Zeroconf criada por pychromecast
-                try:
-                    if browser:
-                        pychromecast.discovery.stop_discovery(browser)
-                    self._browser = None
-                except Exception as e:
-                    logger.warning(f"Erro ao parar discovery browser: {e}")
-
-            logger.info(f"Descobertos {len(devices)} dispositivos Chromecast (modo leve)")
+            if not cast_registry.start():
+                return []
+            cast_registry.wait_ready(timeout)
+            devices = cast_registry.devices()
+            logger.info(f"{len(devices)} dispositivos Chromecast no registro")
             return devices
-
         except Exception as e:
             logger.error(f"Erro na descoberta de dispositivos: {e}")
             return []
-    
+
+    # -------------------- Pool de conexões --------------------
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._connection_lock:
+            if self._connect_pool is None:
+                self._connect_pool = ThreadPoolExecutor(max_workers=CAST_CONNECT_WORKERS,
+                                                        thread_name_prefix='cast-connect')
+            return self._connect_pool
+
+    def _device_lock(self, device_id: str) -> threading.Lock:
+        with self._connection_lock:
+            lock = self._device_locks.get(device_id)
+            if lock is None:
+                lock = self._device_locks[device_id] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _cast_from_host(host_tuple):
+        return pychromecast.get_chromecast_from_host(host_tuple, tries=CAST_CONNECT_TRIES,
+                                                      timeout=CAST_CONNECT_TIMEOUT, retry_wait=1)
+
+    def is_connected(self, device_id: str) -> bool:
+        """Conexão existente ainda viva (socket conectado e status recebido)."""
+        cast = self.active_connections.get(device_id)
+        if cast is None:
+            return False
+        try:
+            socket_client = getattr(cast, 'socket_client', None)
+            alive = socket_client is None or bool(getattr(socket_client, 'is_connected', True))
+            return alive and cast.status is not None
+        except Exception:
+            return False
+
+    def _store_connection(self, device_id: str, cast):
+        """Registra a conexão, encerrando a anterior do mesmo dispositivo (se for outra)."""
+        previous = self.active_connections.get(device_id)
+        self.active_connections[device_id] = cast
+        cast_status_mirror.attach(device_id, cast)
+        if previous is not None and previous is not cast and previous not in self.active_connections.values():
+            try:
+                previous.disconnect(timeout=1)
+            except Exception:
+                pass
+
+    def health_check(self) -> Dict[str, bool]:
+        """Descarta conexões mortas do pool; retorna device_id -> saudável."""
+        result = {}
+        for device_id in list(self.active_connections.keys()):
+            healthy = self.is_connected(device_id)
+            result[device_id] = healthy
+            if not healthy:
+                logger.warning(f"Conexão com {device_id} não está saudável; removendo do pool")
+                cast = self.active_connections.pop(device_id, None)
+                cast_status_mirror.detach(device_id)
+                if cast is not None and cast not in self.active_connections.values():
+                    try:
+                        cast.disconnect(timeout=1)
+                    except Exception:
+                        pass
+        return result
+
+    def _in_app_context(self, fn):
+        """Envolve `fn` para rodar em outra thread com o app context de quem chamou.
+
+        connect_to_device consulta o banco (auto-correção do UUID pelo nome);
+        threads do pool e do despachante não herdam o contexto do Flask.
+        """
+        app = None
+        try:
+            from flask import current_app
+            app = current_app._get_current_object()
+        except Exception:
+            app = self._app
+
+        if app is None:
+            return fn
+
+        def _run():
+            with app.app_context():
+                return fn()
+        return _run
+
+    def connect_many(self, targets: List[tuple], timeout: float = None) -> Dict[str, tuple]:
+        """Conecta vários dispositivos em paralelo (no máximo CAST_CONNECT_WORKERS por vez).
+
+        `targets` é uma lista de (device_id, device_name). Retorna
+        device_id -> (sucesso, uuid_real); dispositivos que não responderem dentro
+        de `timeout` segundos contam como falha nesta rodada.
+        """
+        pool = self._get_pool()
+        futures = {}
+        for device_id, device_name in targets:
+            if device_id and device_id not in futures:
+                futures[device_id] = pool.submit(self._in_app_context(
+                    lambda device_id=device_id, device_name=device_name: self.connect_to_device(device_id, device_name)
+                ))
+        wait_futures(list(futures.values()), timeout=timeout)
+
+        results = {}
+        for device_id, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                results[device_id] = future.result()
+            else:
+                results[device_id] = (False, "")
+        return results
+
     def _is_device_in_cooldown(self, device_id: str) -> bool:
         """Verifica se o dispositivo está em cooldown após falhas"""
         if device_id not in self._failed_connections:
@@ -153,7 +222,17 @@ class ChromecastService:
     
     def connect_to_device(self, device_id: str, device_name: str = None, force: bool = False) -> tuple[bool, str]:
         """Conecta a um dispositivo Chromecast específico usando UUID ou nome com circuit breaker.
-        Quando force=True, ignora cooldown para tentativas manuais (ex.: rota /sync)."""
+        Quando force=True, ignora cooldown para tentativas manuais (ex.: rota /sync).
+        Uma conexão já aberta e saudável é reaproveitada sem tráfego de rede."""
+        if self.is_connected(device_id):
+            return True, device_id
+        with self._device_lock(device_id):
+            # Outra thread pode ter conectado enquanto esperávamos
+            if self.is_connected(device_id):
+                return True, device_id
+            return self._connect_to_device(device_id, device_name, force)
+
+    def _connect_to_device(self, device_id: str, device_name: str = None, force: bool = False) -> tuple[bool, str]:
         try:
             # Circuit breaker: verificar se dispositivo está em cooldown
             if (not force) and self._is_device_in_cooldown(device_id):
@@ -167,7 +246,7 @@ class ChromecastService:
                 host_tuple = entry.get('host')
                 if host_tuple:
                     try:
-                        cast = pychromecast.get_chromecast_from_host(host_tuple, tries=3, timeout=10, retry_wait=2)
+                        cast = self._cast_from_host(host_tuple)
                         if self._test_connection(cast, device_id):
                             logger.info(f"Conectado usando host tuple para UUID: {device_id}")
                             self._record_connection_success(device_id)
@@ -183,8 +262,8 @@ class ChromecastService:
                 for attempt in range(2):  # Reduzido de 3 para 2
                     logger.info(f"Tentativa {attempt + 1}/2 de descoberta por nome...")
 
-                    # Redescobrir dispositivos com timeout menor
-                    self.discover_devices(timeout=5)  # Reduzido de 8 para 5
+                    # Consultar o registro vivo (só bloqueia logo após iniciar o browser)
+                    self.discover_devices(timeout=5)
 
                     # Buscar dispositivo pelo nome
                     found_device = self._find_device_by_name(device_name)
@@ -201,9 +280,9 @@ class ChromecastService:
                                 self._update_device_uuid_by_name(device_name, real_uuid)
 
                             # Armazenar conexão com AMBOS os UUIDs para compatibilidade
-                            self.active_connections[real_uuid] = cast
+                            self._store_connection(real_uuid, cast)
                             if device_id != real_uuid:
-                                self.active_connections[device_id] = cast  # Compatibilidade
+                                self._store_connection(device_id, cast)  # Compatibilidade
 
                             self._record_connection_success(device_id)
                             return True, real_uuid
@@ -222,7 +301,7 @@ class ChromecastService:
                 host_tuple = entry.get('host')
                 if host_tuple:
                     try:
-                        cast = pychromecast.get_chromecast_from_host(host_tuple, tries=3, timeout=10, retry_wait=2)
+                        cast = self._cast_from_host(host_tuple)
                         if self._test_connection(cast, device_id):
                             logger.info(f"Dispositivo encontrado na descoberta geral: {device_id}")
                             self._record_connection_success(device_id)
@@ -267,7 +346,7 @@ class ChromecastService:
                     if not host_tuple:
                         continue
                     try:
-                        cast = pychromecast.get_chromecast_from_host(host_tuple, tries=3, timeout=10, retry_wait=2)
+                        cast = self._cast_from_host(host_tuple)
                         return (cast, str(uuid_key))
                     except Exception as e:
                         logger.warning(f"Erro ao criar conexão por host para '{cast_name}': {e}")
@@ -285,7 +364,7 @@ class ChromecastService:
             cast.wait(timeout=10)
             
             if cast.status is not None:
-                self.active_connections[device_id] = cast
+                self._store_connection(device_id, cast)
                 logger.info(f"Conectado ao Chromecast: {cast.name} ({device_id})")
                 return True
             else:
@@ -301,7 +380,7 @@ class ChromecastService:
         try:
             logger.info(f"Conectando ao dispositivo pelo nome: {device_name}")
             
-            # Descobrir dispositivos
+            # Garantir o registro ativo (só espera na primeira vez)
             self.discover_devices(timeout=10)
             
             # Buscar por nome
@@ -311,7 +390,7 @@ class ChromecastService:
                     host_tuple = entry.get('host')
                     if host_tuple:
                         try:
-                            cast = pychromecast.get_chromecast_from_host(host_tuple, tries=3, timeout=10, retry_wait=2)
+                            cast = self._cast_from_host(host_tuple)
                             if self._test_connection(cast, uuid):
                                 return True, uuid
                         except Exception as e:
@@ -343,278 +422,257 @@ class ChromecastService:
                     finally:
                         # Remover da lista de conexões ativas
                         del self.active_connections[device_id]
+                        cast_status_mirror.detach(device_id)
                         logger.info(f"Dispositivo {device_id} desconectado")
                         
         except Exception as e:
             logger.error(f"Erro ao desconectar dispositivo {device_id}: {e}")
     
+    # -------------------- Comandos (fila por dispositivo) --------------------
+    def _require_cast(self, device_id: str, device_name: str = None):
+        """Conexão viva do dispositivo, conectando pelo pool se necessário."""
+        if not self.is_connected(device_id) and device_name:
+            self.connect_to_device(device_id, device_name)
+        cast = self.active_connections.get(device_id)
+        if cast is None or cast.status is None:
+            raise CastConnectionError(f"Chromecast {device_id} não está conectado")
+        return cast
+
+    def _wait(self, future: Future, label: str, device_id: str) -> bool:
+        """Espera o resultado de um comando enfileirado (chamadas síncronas).
+
+        O timeout é o wait_budget do dispatcher: pior caso do próprio comando e
+        de tudo que já estava na fila do dispositivo. Um LOAD substituído por
+        outro mais recente não é falha (o mais recente segue na fila).
+        """
+        timeout = getattr(future, 'wait_budget', None) or CAST_COMMAND_TIMEOUT
+        try:
+            return bool(future.result(timeout=timeout))
+        except CancelledError:
+            if getattr(future, 'superseded', False):
+                logger.info(f"[CHROMECAST] {label} para {device_id} substituído por um mais recente")
+                return True
+            logger.warning(f"[CHROMECAST] {label} para {device_id} cancelado")
+            return False
+        except FuturesTimeout:
+            logger.warning(f"[CHROMECAST] {label} para {device_id} ainda em execução após {timeout:.0f}s")
+            return False
+        except Exception as e:
+            logger.error(f"[CHROMECAST] {label} para {device_id} falhou: {e}")
+            return False
+
+    def send_command_async(self, device_id: str, command: str, params: Dict = None) -> Future:
+        """Enfileira um comando na thread do dispositivo e retorna o Future (bool)."""
+        return cast_dispatcher.submit(device_id, command, self._in_app_context(
+            lambda: self._send_command_now(device_id, command, params)), budget=CAST_COMMAND_TIMEOUT)
+
     def send_command(self, device_id: str, command: str, params: Dict = None) -> bool:
-        """Envia comando para um dispositivo Chromecast"""
+        """Envia comando para um dispositivo Chromecast e aguarda o resultado"""
+        return self._wait(self.send_command_async(device_id, command, params), f"Comando '{command}'", device_id)
+
+    def _send_command_now(self, device_id: str, command: str, params: Dict = None) -> bool:
         try:
             logger.info(f"[COMMAND] Enviando comando '{command}' para device {device_id}")
-            logger.info(f"[COMMAND] Conexões ativas: {list(self.active_connections.keys())}")
-            
+
             if device_id not in self.active_connections:
                 logger.error(f"[COMMAND] Device {device_id} não está nas conexões ativas")
                 return False
-            
+
             cast = self.active_connections[device_id]
-            logger.info(f"[COMMAND] Cast obtido: {cast.name} - Status: {cast.status}")
-            
+
             # Verificar se o cast está conectado
             if cast.status is None:
                 logger.error(f"[COMMAND] Cast {device_id} não está conectado (status=None)")
                 return False
-            
+
             mc = cast.media_controller
-            logger.info(f"[COMMAND] Media controller: {mc}")
-            
-            # Log do status atual da mídia antes do comando
-            try:
-                current_status = getattr(mc, 'status', None)
-                if current_status:
-                    logger.info(f"[COMMAND] Status atual da mídia: {current_status.player_state}")
-                    logger.info(f"[COMMAND] Conteúdo atual: {current_status.content_id}")
-                else:
-                    logger.info(f"[COMMAND] Nenhum status de mídia disponível")
-            except Exception as e:
-                logger.warning(f"[COMMAND] Erro ao obter status da mídia: {e}")
-            
+
             # Executar comando
             if command == 'play':
-                logger.info(f"[COMMAND] Executando play()")
                 mc.play()
             elif command == 'pause':
-                logger.info(f"[COMMAND] Executando pause()")
                 mc.pause()
             elif command == 'stop':
-                logger.info(f"[COMMAND] Executando stop()")
                 mc.stop()
-                # Aguardar um pouco para o comando ser processado
-                time.sleep(0.5)
-                # Verificar se o comando foi efetivo
-                try:
-                    new_status = getattr(mc, 'status', None)
-                    if new_status:
-                        logger.info(f"[COMMAND] Status após stop: {new_status.player_state}")
-                    else:
-                        logger.info(f"[COMMAND] Nenhum status após stop")
-                except Exception as e:
-                    logger.warning(f"[COMMAND] Erro ao verificar status após stop: {e}")
             elif command == 'set_volume':
                 volume = params.get('volume', 0.5) if params else 0.5
-                logger.info(f"[COMMAND] Executando set_volume({volume})")
                 cast.set_volume(volume)
             elif command == 'seek':
                 position = params.get('position', 0) if params else 0
-                logger.info(f"[COMMAND] Executando seek({position})")
                 mc.seek(position)
             else:
                 logger.warning(f"[COMMAND] Comando não suportado: {command}")
                 return False
-            
+
             logger.info(f"[COMMAND] Comando '{command}' enviado com sucesso para {device_id}")
             return True
-            
+
         except Exception as e:
             logger.error(f"[COMMAND] Erro ao enviar comando {command} para {device_id}: {e}")
             import traceback
             logger.error(f"[COMMAND] Traceback: {traceback.format_exc()}")
             return False
-    
+
+    def load_media_async(self, device_id: str, media_url: str, content_type: str = 'video/mp4',
+                         title: str = '', subtitles: str = '', device_name: str = None) -> Future:
+        """Enfileira o LOAD e retorna o Future (bool).
+
+        Um LOAD ainda na fila do mesmo dispositivo é substituído por este (o
+        Future anterior é cancelado). Com `device_name`, conecta pelo pool se
+        necessário; sem conexão, o Future termina com CastConnectionError.
+        """
+        return cast_dispatcher.submit(
+            device_id, 'load',
+            self._in_app_context(
+                lambda: self._load_media_now(device_id, media_url, content_type, title, subtitles, device_name)),
+            coalesce=True,
+            budget=CAST_LOAD_BUDGET + (CAST_CONNECT_BUDGET if device_name else 0),
+        )
+
     def load_media(self, device_id: str, media_url: str, content_type: str = 'video/mp4', 
                    title: str = '', subtitles: str = '') -> bool:
-        """Carrega mídia em um dispositivo Chromecast"""
+        """Carrega mídia em um dispositivo Chromecast e aguarda o resultado"""
+        return self._wait(self.load_media_async(device_id, media_url, content_type, title, subtitles),
+                          'LOAD', device_id)
+
+    def _ensure_default_receiver(self, device_id: str, cast):
+        """Inicia o Default Media Receiver se outro app estiver ativo (start_app aguarda a resposta)."""
+        state = cast_status_mirror.get(device_id) or {}
+        if (state.get('app_id') or getattr(cast, 'app_id', None)) == DEFAULT_MEDIA_RECEIVER:
+            return
         try:
-            logger.info(f"[CHROMECAST] Tentando carregar mídia:")
-            logger.info(f"[CHROMECAST] - Device ID: {device_id}")
-            logger.info(f"[CHROMECAST] - Media URL: {media_url}")
-            logger.info(f"[CHROMECAST] - Content Type: {content_type}")
-            logger.info(f"[CHROMECAST] - Title: {title}")
-            logger.info(f"[CHROMECAST] - Subtitles: {subtitles}")
-            
-            # Evitar condições de corrida durante envio de mídia
-            with self._connection_lock:
-                if device_id not in self.active_connections:
-                    logger.error(f"[CHROMECAST] Device {device_id} não está nas conexões ativas")
-                    logger.info(f"[CHROMECAST] Conexões ativas: {list(self.active_connections.keys())}")
-                    return False
-
-                # Anti-duplicação rápida (mesmo URL enviado em <2s)
-                last = self._last_media_sent.get(device_id)
-                now_ts = time.time()
-                if last and last.get('url') == media_url and (now_ts - float(last.get('ts', 0))) < 2.0:
-                    logger.info(f"[CHROMECAST] Ignorando envio duplicado (mesmo URL em <2s) para {device_id}")
-                    return True
-
-                cast = self.active_connections[device_id]
-                logger.info(f"[CHROMECAST] Cast obtido: {cast.name}")
-
-                mc = cast.media_controller
-                logger.info(f"[CHROMECAST] Media controller: {mc}")
-
-                # Criar MediaController se necessário
-                if not hasattr(cast, 'media_controller') or cast.media_controller is None:
-                    logger.info(f"[CHROMECAST] Criando novo MediaController")
-                    mc = MediaController()
-                    cast.register_handler(mc)
-
-                # Se já está tocando o mesmo URL, evitar reenvio
-                try:
-                    current_status = getattr(mc, 'status', None)
-                    if current_status and getattr(current_status, 'content_id', None) == media_url and getattr(current_status, 'player_state', None) in ('PLAYING', 'BUFFERING'):
-                        logger.info("[CHROMECAST] Mesmo conteúdo já está em reprodução; suprimindo reenvio")
-                        return True
-                except Exception:
-                    pass
-
-                # Garantir que o Default Media Receiver esteja ativo (CC1AD845)
-                try:
-                    logger.info("[CHROMECAST] Iniciando Default Media Receiver (CC1AD845)")
-                    cast.start_app("CC1AD845")
-                    # Aguardar app ficar ativo por até ~1s
-                    for _ in range(5):
-                        time.sleep(0.2)
-                        st = getattr(cast, 'status', None)
-                        app_ok = False
-                        try:
-                            app_ok = (getattr(st, 'app_id', None) == 'CC1AD845') or (getattr(st, 'display_name', '') or '').lower().startswith('default media receiver')
-                        except Exception:
-                            app_ok = False
-                        if app_ok:
-                            break
-                except Exception as e:
-                    logger.warning(f"[CHROMECAST] Não foi possível iniciar o Default Media Receiver: {e}")
-
-                # Opcional: garantir que não esteja mutado
-                try:
-                    st2 = getattr(cast, 'status', None)
-                    if st2 and getattr(st2, 'volume_muted', False):
-                        cast.set_volume_muted(False)
-                except Exception:
-                    pass
-
-                # Carregar mídia - para imagens, enviar também thumb
-                logger.info(f"[CHROMECAST] Chamando play_media...")
-                is_image = content_type.startswith('image/')
-                try:
-                    if is_image:
-                        mc.play_media(media_url, content_type, title=title, subtitles=subtitles if subtitles else None, thumb=media_url)
-                    else:
-                        mc.play_media(media_url, content_type, title=title, subtitles=subtitles if subtitles else None)
-                except TypeError:
-                    # Compatibilidade com versões antigas sem parâmetro thumb
-                    mc.play_media(media_url, content_type, title=title, subtitles=subtitles if subtitles else None)
-
-                logger.info(f"[CHROMECAST] play_media chamado, aguardando ativação...")
-                mc.block_until_active()
-                time.sleep(0.3)
-
-                # Logar status detalhado
-                status = getattr(mc, 'status', None)
-                if status:
-                    logger.info(f"[CHROMECAST] Media Status após play:")
-                    logger.info(f"    - player_state: {status.player_state}")
-                    logger.info(f"    - content_id: {status.content_id}")
-                    logger.info(f"    - content_type: {status.content_type}")
-                    logger.info(f"    - title: {status.title}")
-                    logger.info(f"    - duration: {status.duration}")
-                else:
-                    logger.info(f"[CHROMECAST] Media Status indisponível")
-
-                # Fallback: se permanecer IDLE com imagem, tentar novamente uma vez
-                try:
-                    if is_image and (not status or status.player_state in (None, 'IDLE')):
-                        logger.info("[CHROMECAST] Fallback para imagem: reexecutando play_media após iniciar Default Receiver")
-                        cast.start_app("CC1AD845")
-                        time.sleep(0.5)
-                        try:
-                            mc.play_media(media_url, content_type, title=title, subtitles=subtitles if subtitles else None, thumb=media_url)
-                        except TypeError:
-                            mc.play_media(media_url, content_type, title=title, subtitles=subtitles if subtitles else None)
-                        mc.block_until_active()
-                        time.sleep(0.3)
-                        status = getattr(mc, 'status', None)
-                        logger.info(f"[CHROMECAST] Status após fallback: {getattr(status, 'player_state', None)}")
-                except Exception as e:
-                    logger.warning(f"[CHROMECAST] Erro no fallback de imagem: {e}")
-
-                # Registrar último envio para anti-duplicação
-                self._last_media_sent[device_id] = {'url': media_url, 'ts': now_ts}
-
-                logger.info(f"Mídia carregada no Chromecast {device_id}: {title}")
-                return True
-            
+            logger.info(f"[CHROMECAST] Iniciando Default Media Receiver ({DEFAULT_MEDIA_RECEIVER})")
+            cast.start_app(DEFAULT_MEDIA_RECEIVER, timeout=CAST_LOAD_TIMEOUT)
         except Exception as e:
-            logger.error(f"[CHROMECAST] Erro detalhado ao carregar mídia no dispositivo {device_id}: {e}")
-            logger.error(f"[CHROMECAST] Tipo do erro: {type(e).__name__}")
-            import traceback
-            logger.error(f"[CHROMECAST] Traceback: {traceback.format_exc()}")
+            logger.warning(f"[CHROMECAST] Não foi possível iniciar o Default Media Receiver: {e}")
+
+    def _play(self, mc, media_url: str, content_type: str, title: str, subtitles: str, is_image: bool) -> Optional[bool]:
+        """Envia o LOAD e aguarda a resposta do receiver; None se não responder a tempo."""
+        answered = threading.Event()
+        outcome = {}
+
+        def _on_response(success, response):
+            outcome['ok'] = bool(success)
+            answered.set()
+
+        kwargs = {'title': title, 'subtitles': subtitles or None, 'callback_function': _on_response}
+        if is_image:
+            kwargs['thumb'] = media_url
+        mc.play_media(media_url, content_type, **kwargs)
+        if not answered.wait(CAST_LOAD_TIMEOUT):
+            logger.warning(f"[CHROMECAST] Sem resposta ao LOAD em {CAST_LOAD_TIMEOUT}s")
+            return None
+        return outcome['ok']
+
+    def _load_media_now(self, device_id: str, media_url: str, content_type: str, title: str,
+                        subtitles: str, device_name: str = None) -> bool:
+        logger.info(f"[CHROMECAST] Carregando mídia em {device_id}: {media_url} ({content_type}) - {title}")
+        cast = self._require_cast(device_id, device_name)
+
+        # Anti-duplicação rápida (mesmo URL enviado em <2s)
+        last = self._last_media_sent.get(device_id)
+        now_ts = time.time()
+        if last and last.get('url') == media_url and (now_ts - float(last.get('ts', 0))) < 2.0:
+            logger.info(f"[CHROMECAST] Ignorando envio duplicado (mesmo URL em <2s) para {device_id}")
+            return True
+
+        mc = cast.media_controller
+
+        # Se já está tocando o mesmo URL (segundo o espelho de status), evitar reenvio
+        if cast_status_mirror.is_playing(device_id, media_url):
+            logger.info("[CHROMECAST] Mesmo conteúdo já está em reprodução; suprimindo reenvio")
+            return True
+
+        self._ensure_default_receiver(device_id, cast)
+
+        # Opcional: garantir que não esteja mutado
+        try:
+            if (cast_status_mirror.get(device_id) or {}).get('volume_muted'):
+                cast.set_volume_muted(False)
+        except Exception:
+            pass
+
+        is_image = content_type.startswith('image/')
+        ok = self._play(mc, media_url, content_type, title, subtitles, is_image)
+        player_state = (cast_status_mirror.get(device_id) or {}).get('player_state')
+        logger.info(f"[CHROMECAST] Resposta ao LOAD: {ok} - player_state: {player_state}")
+
+        # Fallback: imagem recusada ou parada em IDLE -> relançar o receiver e tentar uma vez
+        if is_image and (not ok or player_state in (None, 'IDLE')):
+            logger.info("[CHROMECAST] Fallback para imagem: relançando Default Media Receiver")
+            try:
+                cast.start_app(DEFAULT_MEDIA_RECEIVER, force_launch=True, timeout=CAST_LOAD_TIMEOUT)
+                ok = self._play(mc, media_url, content_type, title, subtitles, is_image)
+            except Exception as e:
+                logger.warning(f"[CHROMECAST] Erro no fallback de imagem: {e}")
+
+        if ok is None:
+            # Sem resposta: aceitar se o receiver já reporta o novo conteúdo
+            ok = (cast_status_mirror.get(device_id) or {}).get('content_id') == media_url
+        if not ok:
+            logger.error(f"[CHROMECAST] Receiver recusou a mídia em {device_id}: {media_url}")
             return False
-    
+
+        # Registrar último envio para anti-duplicação
+        self._last_media_sent[device_id] = {'url': media_url, 'ts': now_ts}
+        logger.info(f"Mídia carregada no Chromecast {device_id}: {title}")
+        return True
+
+    def dispatcher_metrics(self, device_id: str = None) -> Dict:
+        """Fila e latências por dispositivo (ver services.cast_dispatcher)."""
+        return cast_dispatcher.metrics(device_id)
+
     def get_device_status(self, device_id: str) -> Optional[Dict]:
-        """Obtém status atual de um dispositivo Chromecast"""
-        try:
-            if device_id not in self.active_connections:
-                return None
-            
-            cast = self.active_connections[device_id]
-            mc = cast.media_controller
-            
-            status = {
-                'device_id': device_id,
-                'device_name': cast.name,
-                'is_connected': cast.status is not None,
-                'volume_level': cast.status.volume_level if cast.status else 0,
-                'is_muted': cast.status.volume_muted if cast.status else False,
-                'current_app': cast.status.display_name if cast.status else None,
-                'media_status': None
-            }
-            
-            if mc.status.player_state is not None:
-                status['media_status'] = {
-                    'player_state': mc.status.player_state,
-                    'current_time': mc.status.current_time,
-                    'duration': mc.status.duration,
-                    'content_id': mc.status.content_id,
-                    'content_type': mc.status.content_type,
-                    'title': mc.status.title
-                }
-            
-            return status
-            
-        except Exception as e:
-            logger.error(f"Erro ao obter status do dispositivo {device_id}: {e}")
+        """Status atual de um dispositivo Chromecast, lido do espelho em memória (sem rede)"""
+        if device_id not in self.active_connections:
+            return None
+        state = cast_status_mirror.get(device_id)
+        if state is None:
             return None
+        status = {
+            'device_id': device_id,
+            'device_name': state.get('device_name'),
+            'is_connected': state['is_connected'],
+            'connection': state.get('connection'),
+            'volume_level': state.get('volume_level') or 0,
+            'is_muted': bool(state.get('volume_muted')),
+            'app_id': state.get('app_id'),
+            'current_app': state.get('current_app'),
+            'updated_at': state.get('updated_at'),
+            'media_status': None
+        }
+        if state.get('player_state') is not None:
+            status['media_status'] = {
+                'player_state': state.get('player_state'),
+                'current_time': state.get('position'),
+                'duration': state.get('duration'),
+                'content_id': state.get('content_id'),
+                'content_type': state.get('content_type'),
+                'title': state.get('title'),
+                'updated_at': state.get('media_updated_at')
+            }
+        return status
+
+    def all_device_status(self) -> Dict[str, Dict]:
+        """Espelho de todos os dispositivos já conectados (device_id -> estado)."""
+        return cast_status_mirror.all()
+
+    def is_playing(self, device_id: str, media_url: str) -> bool:
+        """O dispositivo já está reproduzindo este URL (consulta ao espelho, sem rede)."""
+        return cast_status_mirror.is_playing(device_id, media_url)
     
     def start_continuous_discovery(self, interval: int = 30):
-        """Inicia descoberta contínua de dispositivos"""
-        def discovery_loop():
-            while not self._stop_discovery:
-                self.discover_devices()
-                time.sleep(interval)
-        
-        if self._discovery_thread is None or not self._discovery_thread.is_alive():
-            self._stop_discovery = False
-            self._discovery_thread = threading.Thread(target=discovery_loop, daemon=True)
-            self._discovery_thread.start()
-            logger.info("Descoberta contínua de Chromecast iniciada")
+        """Mantido por compatibilidade: o registro mDNS persistente já é atualizado por push."""
+        self.start_registry()
     
     def stop_continuous_discovery(self):
-        """Para a descoberta contínua de dispositivos"""
-        self._stop_discovery = True
-        if self._discovery_thread and self._discovery_thread.is_alive():
-            self._discovery_thread.join(timeout=5)
-        logger.info("Descoberta contínua de Chromecast parada")
+        """Mantido por compatibilidade: o browser é parado em cleanup()."""
     
     def cleanup(self):
         """Limpa conexões e para descoberta de forma segura"""
         try:
             logger.info("Iniciando cleanup do ChromecastService...")
             
-            # Parar descoberta contínua
-            self.stop_continuous_discovery()
-            
             # Desconectar todos os dispositivos
             with self._connection_lock:
                 device_ids = list(self.active_connections.keys())
@@ -629,24 +687,12 @@ class ChromecastService:
                 
                 self.active_connections.clear()
             
-            # Parar browser de descoberta
-            if self._browser:
-                try:
-                    pychromecast.discovery.stop_discovery(self._browser)
-                    self._browser = None
-                except Exception as e:
-                    logger.warning(f"Erro ao parar browser durante cleanup: {e}")
-            
-            # Fechar Zeroconf de forma segura
-            if self._zeroconf:
-                try:
-                    self._zeroconf.close()
-                    self._zeroconf = None
-                    logger.info("Zeroconf fechado com sucesso")
-                except Exception as e:
-                    logger.warning(f"Erro ao fechar Zeroconf: {e}")
-            
-            self.discovered_devices.clear()
+            # Parar filas de comandos, browser mDNS persistente e pool de conexões
+            cast_dispatcher.shutdown()
+            cast_registry.stop()
+            if self._connect_pool is not None:
+                self._connect_pool.shutdown(wait=False, cancel_futures=True)
+                self._connect_pool = None
             logger.info("ChromecastService limpo com sucesso")
             
         except Exception as e:
@@ -0,0 +1,290 @@
+"""Fila global de compilação de vídeos de campanha.
+
+Antes cada pedido de compilação abria sua própria thread com FFmpeg usando
+todos os núcleos; várias campanhas alteradas ao mesmo tempo disputavam a CPU
+e atrasavam umas às outras. Agora os pedidos viram CompileJob (tabela
+compile_jobs) e no máximo `compile.max_concurrent` compilações rodam ao mesmo
+tempo, na ordem prioridade (maior primeiro) e depois chegada.
+
+- Cada processo FFmpeg recebe `-threads N`: `compile.ffmpeg_threads` ou, se 0,
+  núcleos / (compilações simultâneas x segmentos paralelos por compilação).
+- Pedidos repetidos para a mesma campanha reaproveitam o job ainda na fila;
+  com uma compilação em andamento, fica no máximo um job seguinte na fila,
+  que só começa quando a atual termina (nunca duas da mesma campanha ao mesmo
+  tempo, qualquer que seja `compile.max_concurrent`).
+- Cancelar um job na fila apenas o marca como cancelado; em andamento, os
+  processos FFmpeg são encerrados (CompileControl.cancel).
+- Jobs persistem no banco: ao iniciar, os que estavam 'running' (processo
+  interrompido) voltam para a fila.
+
+Estado exposto em /api/campaigns/compile/queue.
+"""
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from database import db
+from models.campaign import Campaign
+from models.compile_job import CompileJob
+from services.config_cache import config_cache
+from services.video_compiler import CompileControl, video_compiler
+
+DEFAULT_MAX_CONCURRENT = 1
+RECENT_JOBS = 20
+
+
+class CompileQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._running = {}  # job_id -> CompileControl
+
+    # -------------------- Configuração --------------------
+    def max_concurrent(self):
+        try:
+            return max(1, int(config_cache.get('compile.max_concurrent', DEFAULT_MAX_CONCURRENT) or DEFAULT_MAX_CONCURRENT))
+        except Exception:
+            return DEFAULT_MAX_CONCURRENT
+
+    def ffmpeg_threads(self):
+        try:
+            configured = int(config_cache.get('compile.ffmpeg_threads', 0) or 0)
+        except Exception:
+            configured = 0
+        if configured > 0:
+            return configured
+        return max(1, (os.cpu_count() or 2) // (self.max_concurrent() * video_compiler.segment_workers))
+
+    # -------------------- Ciclo de vida --------------------
+    def start(self, app):
+        """Retoma a fila ao iniciar: jobs interrompidos voltam para 'queued'."""
+        self._app = app
+        with app.app_context():
+            try:
+                resumed = CompileJob.query.filter_by(status='running').update(
+                    {'status': 'queued', 'started_at': None}, synchronize_session=False)
+                db.session.commit()
+                queued = CompileJob.query.filter_by(status='queued').count()
+                if queued:
+                    print(f"[CompileQueue] {queued} compilações na fila ({resumed} retomadas)")
+                self._dispatch()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[CompileQueue] Falha ao retomar fila: {e}")
+
+    def enqueue(self, campaign_id, resolution, fps, background_audio_content_id=None, priority=0, requested_by=None):
+        """Enfileira (ou atualiza o job pendente da campanha) e dispara se houver vaga."""
+        if self._app is None:
+            from flask import current_app
+            self._app = current_app._get_current_object()
+        try:
+            priority = int(priority or 0)
+        except (TypeError, ValueError):
+            priority = 0
+
+        job = CompileJob.query.filter_by(campaign_id=campaign_id, status='queued').first()
+        if job is None:
+            job = CompileJob(campaign_id=campaign_id, priority=priority)
+            db.session.add(job)
+        else:
+            job.priority = max(job.priority or 0, priority)
+        job.resolution = resolution
+        job.fps = int(fps)
+        job.background_audio_content_id = background_audio_content_id
+        job.requested_by = requested_by or job.requested_by
+
+        campaign = db.session.get(Campaign, campaign_id)
+        if campaign is not None:
+            campaign.compiled_video_status = 'processing'
+            campaign.compiled_video_error = None
+        db.session.commit()
+
+        position = self.position(job)
+        video_compiler._emit(self._app, 'campaign_compile_progress', {
+            'campaign_id': campaign_id,
+            'status': 'processing',
+            'progress': 0,
+            'message': f'Na fila de compilação (posição {position})',
+            'job_id': job.id,
+            'queue_position': position,
+        })
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        """Inicia jobs da fila enquanto houver vaga (chamar dentro de app context)."""
+        app = self._app
+        if app is None:
+            return
+        started = []
+        with self._lock:
+            try:
+                free = self.max_concurrent() - len(self._running)
+                while free > 0:
+                    # Uma compilação por campanha: o job seguinte espera a atual terminar
+                    # (evita saída antiga sobrescrevendo a nova e work_dir compartilhado)
+                    running_campaigns = db.session.query(CompileJob.campaign_id).filter_by(status='running')
+                    job = (CompileJob.query.filter(CompileJob.status == 'queued',
+                                                   CompileJob.campaign_id.notin_(running_campaigns))
+                           .order_by(CompileJob.priority.desc(), CompileJob.created_at.asc())
+                           .first())
+                    if job is None:
+                        break
+                    # Reivindicação atômica: outro dispatch pode ter pego o mesmo job
+                    claimed = db.session.execute(
+                        text("UPDATE compile_jobs SET status = 'running', started_at = :now "
+                             "WHERE id = :id AND status = 'queued'"),
+                        {'id': job.id, 'now': datetime.utcnow()},
+                    ).rowcount
+                    if not claimed:
+                        db.session.commit()
+                        continue
+                    campaign = db.session.get(Campaign, job.campaign_id)
+                    if campaign is not None:
+                        campaign.compiled_video_status = 'processing'
+                    db.session.commit()
+                    control = CompileControl(threads=self.ffmpeg_threads())
+                    self._running[job.id] = control
+                    started.append((job.id, job.campaign_id, job.resolution, job.fps,
+                                    job.background_audio_content_id, control))
+                    free -= 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"[CompileQueue] Falha ao despachar jobs: {e}")
+
+        for args in started:
+            print(f"[CompileQueue] Iniciando job {args[0]} (campanha {args[1]}, -threads {args[5].threads})")
+            threading.Thread(target=self._run_job, args=(app,) + args, daemon=True,
+                             name=f'compile-{args[0][:8]}').start()
+
+    def _run_job(self, app, job_id, campaign_id, resolution, fps, background_audio_content_id, control):
+        status = 'failed'
+        error = None
+        try:
+            status = video_compiler._compile_campaign_worker(
+                app, campaign_id, resolution, fps, background_audio_content_id, control=control)
+        except Exception as e:
+            error = str(e)
+            print(f"[CompileQueue] Erro no job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            with app.app_context():
+                try:
+                    job = db.session.get(CompileJob, job_id)
+                    if job is not None:
+                        job.status = 'completed' if status == 'ready' else status
+                        job.finished_at = datetime.utcnow()
+                        if status == 'failed' and error is None:
+                            campaign = db.session.get(Campaign, campaign_id)
+                            error = campaign.compiled_video_error if campaign else 'Campanha não encontrada'
+                        job.error = error
+                        db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[CompileQueue] Falha ao registrar job {job_id}: {e}")
+                self._dispatch()
+
+    # -------------------- Cancelamento --------------------
+    def cancel(self, job_id):
+        """Cancela um job; retorna o job atualizado ou None se não existir."""
+        job = db.session.get(CompileJob, job_id)
+        if job is None:
+            return None
+        if job.status == 'queued':
+            cancelled = db.session.execute(
+                text("UPDATE compile_jobs SET status = 'cancelled', finished_at = :now "
+                     "WHERE id = :id AND status = 'queued'"),
+                {'id': job_id, 'now': datetime.utcnow()},
+            ).rowcount
+            if cancelled:
+                running = CompileJob.query.filter_by(campaign_id=job.campaign_id, status='running').count()
+                campaign = db.session.get(Campaign, job.campaign_id)
+                if campaign is not None and not running:
+                    video_compiler.restore_cancelled(campaign)
+            db.session.commit()
+            if cancelled and self._app is not None:
+                video_compiler._emit(self._app, 'campaign_compile_complete', {
+                    'campaign_id': job.campaign_id,
+                    'status': 'cancelled',
+                    'progress': 100,
+                    'message': 'Compilação cancelada'
+                })
+        elif job.status == 'running':
+            with self._lock:
+                control = self._running.get(job_id)
+            if control is not None:
+                control.cancel()
+        db.session.refresh(job)
+        return job
+
+    def cancel_campaign(self, campaign_id):
+        """Cancela todos os jobs ativos da campanha; retorna quantos foram cancelados."""
+        jobs = CompileJob.query.filter(CompileJob.campaign_id == campaign_id,
+                                       CompileJob.status.in_(CompileJob.ACTIVE_STATUSES)).all()
+        for job in jobs:
+            self.cancel(job.id)
+        return len(jobs)
+
+    # -------------------- Consulta --------------------
+    def position(self, job):
+        """Posição (1 = próximo) de um job na fila; None se não estiver na fila."""
+        if job is None or job.status != 'queued':
+            return None
+        ahead = CompileJob.query.filter(
+            CompileJob.status == 'queued',
+            db.or_(CompileJob.priority > job.priority,
+                   db.and_(CompileJob.priority == job.priority, CompileJob.created_at < job.created_at)),
+        ).count()
+        return ahead + 1
+
+    def active_job(self, campaign_id):
+        """Job ativo mais relevante da campanha: o em andamento ou o da fila."""
+        jobs = CompileJob.query.filter(CompileJob.campaign_id == campaign_id,
+                                       CompileJob.status.in_(CompileJob.ACTIVE_STATUSES)).all()
+        for status in ('running', 'queued'):
+            for job in jobs:
+                if job.status == status:
+                    return job
+        return None
+
+    def job_dict(self, job):
+        data = job.to_dict()
+        data['queue_position'] = self.position(job)
+        return data
+
+    def list(self):
+        running = (CompileJob.query.filter_by(status='running')
+                   .order_by(CompileJob.started_at.asc()).all())
+        queued = (CompileJob.query.filter_by(status='queued')
+                  .order_by(CompileJob.priority.desc(), CompileJob.created_at.asc()).all())
+        recent = (CompileJob.query.filter(CompileJob.status.notin_(CompileJob.ACTIVE_STATUSES))
+                  .order_by(CompileJob.finished_at.desc()).limit(RECENT_JOBS).all())
+        queued_data = []
+        for position, job in enumerate(queued, start=1):
+            data = job.to_dict()
+            data['queue_position'] = position
+            queued_data.append(data)
+        return {
+            'running': [job.to_dict() for job in running],
+            'queued': queued_data,
+            'recent': [job.to_dict() for job in recent],
+            'stats': self.stats(),
+        }
+
+    def stats(self):
+        with self._lock:
+            running = len(self._running)
+        return {
+            'max_concurrent': self.max_concurrent(),
+            'ffmpeg_threads': self.ffmpeg_threads(),
+            'segment_workers': video_compiler.segment_workers,
+            'running': running,
+            'queued': CompileJob.query.filter_by(status='queued').count(),
+        }
+
+
+# Instância global da fila de compilação
+compile_queue = CompileQueue()
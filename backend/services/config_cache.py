@@ -0,0 +1,103 @@
+"""Cache em memória das configurações do sistema (system_configs).
+
+`SystemConfig.get_value` era um SELECT por chamada, feito no middleware de
+uploads, em todos os jobs do scheduler, em join_admin, login e nas rotas de
+configuração. Aqui todas as chaves são carregadas de uma vez (já convertidas
+pelo value_type) e servidas da memória.
+
+Invalidação:
+- no próprio processo, qualquer commit que altere system_configs
+  (services.model_events) descarta o cache;
+- entre processos, a cada CONFIG_CACHE_TTL_SEC compara-se a versão em
+  system_config_version (incrementada na mesma transação de cada alteração) e
+  recarrega-se só se ela mudou.
+"""
+import copy
+import threading
+import time
+
+from database import db
+from services.model_events import subscribe
+
+CONFIG_CACHE_TTL_SEC = 30
+
+_MISSING = object()
+
+
+class ConfigCache:
+    def __init__(self, ttl=CONFIG_CACHE_TTL_SEC):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.reloads = 0
+        self.version_checks = 0
+        subscribe(self._on_model_changes)
+
+    def _on_model_changes(self, changes):
+        if changes.get('system_configs'):
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+    def _read_version(self):
+        from models.system_config import SystemConfigVersion
+        return db.session.query(SystemConfigVersion.version).filter(SystemConfigVersion.id == 1).scalar() or 0
+
+    def load(self):
+        """Recarrega todas as configurações do banco; retorna o dicionário carregado."""
+        from models.system_config import SystemConfig
+        version = self._read_version()
+        values = {config.key: config.get_typed_value() for config in SystemConfig.query.all()}
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._checked_at = time.monotonic()
+            self.reloads += 1
+        return values
+
+    def snapshot(self):
+        """Dicionário chave -> valor tipado (não modificar: compartilhado entre chamadas)."""
+        with self._lock:
+            values, version, checked_at = self._values, self._version, self._checked_at
+        if values is None:
+            return self.load()
+        if time.monotonic() - checked_at >= self.ttl:
+            try:
+                current = self._read_version()
+                self.version_checks += 1
+            except Exception as e:
+                print(f"[ConfigCache] Falha ao verificar versão: {e}")
+                current = version
+            if current != version:
+                return self.load()
+            with self._lock:
+                self._checked_at = time.monotonic()
+        return values
+
+    def get(self, key, default=None):
+        value = self.snapshot().get(key, _MISSING)
+        self.hits += 1
+        if value is _MISSING:
+            return default
+        # Valores JSON são mutáveis: cada chamador recebe sua cópia
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._values is not None,
+                'keys': len(self._values or {}),
+                'version': self._version,
+                'hits': self.hits,
+                'reloads': self.reloads,
+                'version_checks': self.version_checks,
+            }
+
+
+# Instância global do cache de configurações
+config_cache = ConfigCache()
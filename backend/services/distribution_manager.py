@@ -1,4 +1,3 @@
-import hashlib
 import os
 from datetime import datetime, timedelta, time
 from typing import List, Optional
@@ -7,6 +6,8 @@ from models.content import Content
 from models.player import Player
 from models.location import Location
 from models.content_distribution import ContentDistribution
+from services.media_server import upload_path
+from services.media_store import hash_file, media_rel_path
 from flask_socketio import emit
 import pytz
 
@@ -44,8 +45,8 @@ class ContentDistributionManager:
             if not target_players_list:
                 return {'success': False, 'error': 'Nenhum player válido encontrado'}
             
-            # Calcula checksum do arquivo
-            checksum = self._calculate_file_checksum(content.file_path)
+            # Checksum persistido no upload; só conteúdos legados (sem file_hash) releem o disco
+            checksum = content.file_hash or self._calculate_file_checksum(content.file_path)
             
             # Cria distribuições
             distributions_created = []
@@ -213,16 +214,15 @@ class ContentDistributionManager:
             distribution.mark_started()
     
     def _calculate_file_checksum(self, file_path: str) -> str:
-        """Calcula SHA256 do arquivo"""
-        if not file_path or not os.path.exists(file_path):
+        """Calcula SHA256 do arquivo (conteúdos legados, sem file_hash)"""
+        if not file_path:
+            return ''
+        if not os.path.isabs(file_path):
+            file_path = upload_path(media_rel_path(file_path))
+        if not os.path.exists(file_path):
             return ''
-        
-        sha256_hash = hashlib.sha256()
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
-            return sha256_hash.hexdigest()
+            return hash_file(file_path)
         except Exception:
             return ''
     
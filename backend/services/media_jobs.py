@@ -0,0 +1,189 @@
+"""Fila de jobs de processamento de mídia (thumbnails, duração, metadados).
+
+Uploads e edições de conteúdo não executam mais FFmpeg/ffprobe/PIL dentro da
+requisição: o conteúdo é salvo com os dados já conhecidos e um job é enfileirado.
+Cada item do job roda em um pool limitado (MEDIA_WORKERS, padrão = núcleos).
+O trabalho pesado já acontece fora do interpretador (processos ffmpeg/ffprobe;
+PIL libera o GIL ao decodificar/redimensionar), então um pool de threads que
+limita quantos desses processos rodam ao mesmo tempo ocupa os núcleos sem
+reimportar a aplicação em processos filhos (a app roda como `python app.py`,
+e o spawn do multiprocessing reexecutaria app.py em cada worker).
+
+Ao concluir cada item o resultado é gravado no Content (thumbnail_path,
+duration, renditions) e emitido via Socket.IO:
+- media_job_progress: {job_id, kind, done, failed, total, progress, content_id}
+- media_job_complete: {job_id, kind, status, done, failed, total}
+
+O estado dos jobs fica em memória (últimos JOB_HISTORY) e é exposto em
+/api/content/jobs.
+"""
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from database import db
+from services.media_processing import process_media
+from services.media_store import media_rel_path
+
+MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', '0') or 0) or (os.cpu_count() or 2)
+JOB_HISTORY = 200
+
+
+class MediaJobQueue:
+    def __init__(self, workers=MEDIA_WORKERS):
+        self.workers = max(1, int(workers))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = OrderedDict()
+
+    # -------------------- Pool --------------------
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media-job')
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------- Jobs --------------------
+    def submit(self, app, kind, tasks):
+        """Enfileira `tasks` (dicts aceitos por process_media) e retorna o estado do job."""
+        job_id = str(uuid.uuid4())
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'queued' if tasks else 'completed',
+            'total': len(tasks),
+            'done': 0,
+            'failed': 0,
+            'progress': 0 if tasks else 100,
+            'content_ids': [t.get('content_id') for t in tasks],
+            'results': [],
+            'created_at': datetime.utcnow().isoformat(),
+            'finished_at': None if tasks else datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        for task in tasks:
+            self._submit_task(app, job_id, task)
+        return self.get(job_id)
+
+    def _submit_task(self, app, job_id, task):
+        future = self._pool().submit(process_media, task)
+        future.add_done_callback(partial(self._on_task_done, app, job_id, task))
+
+    def _on_task_done(self, app, job_id, task, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'content_id': task.get('content_id'), 'error': str(e)}
+
+        try:
+            self._apply_result(app, result)
+        except Exception as e:
+            result['error'] = result.get('error') or f'Falha ao gravar resultado: {e}'
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['status'] = 'running'
+            job['done'] += 1
+            if result.get('error'):
+                job['failed'] += 1
+            job['results'].append(result)
+            job['progress'] = int(job['done'] * 100 / job['total'])
+            finished = job['done'] >= job['total']
+            if finished:
+                job['status'] = 'failed' if job['failed'] == job['total'] else 'completed'
+                job['finished_at'] = datetime.utcnow().isoformat()
+            progress = {k: job[k] for k in ('kind', 'done', 'failed', 'total', 'progress')}
+            status = job['status']
+
+        self._emit(app, 'media_job_progress', dict(progress, job_id=job_id, content_id=result.get('content_id'),
+                                                   thumbnail=result.get('thumbnail'),
+                                                   duration=result.get('duration'), error=result.get('error')))
+        if finished:
+            print(f"[MediaJobs] Job {job_id} ({progress['kind']}) concluído: "
+                  f"{progress['done'] - progress['failed']}/{progress['total']} ok")
+            self._emit(app, 'media_job_complete', {
+                'job_id': job_id, 'kind': progress['kind'], 'status': status,
+                'done': progress['done'], 'failed': progress['failed'], 'total': progress['total'],
+            })
+
+    def _apply_result(self, app, result):
+        content_id = result.get('content_id')
+        if not content_id or not (result.get('thumbnail') or result.get('duration') or result.get('renditions')):
+            return
+        from models.content import Content
+        with app.app_context():
+            try:
+                content = db.session.get(Content, content_id)
+                if content is None:
+                    return
+                if result.get('thumbnail'):
+                    content.thumbnail_path = result['thumbnail']
+                if result.get('duration') and result['duration'] > 0:
+                    content.duration = int(result['duration'])
+                if result.get('renditions'):
+                    content.renditions = json.dumps(result['renditions'])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _emit(self, app, event, payload):
+        try:
+            if hasattr(app, 'socketio') and app.socketio:
+                app.socketio.emit(event, payload)
+        except Exception:
+            pass
+
+    def get(self, job_id, include_results=True):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            data = dict(job)
+            data['results'] = list(job['results']) if include_results else None
+            data['content_ids'] = list(job['content_ids'])
+        return data
+
+    def list(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.get(job_id, include_results=False) for job_id in reversed(job_ids)]
+
+
+def build_task(content, src, thumbnails_dir, probe_duration=True, renditions=True):
+    """Item de job para um Content cujo arquivo está em `src` (sem thumbnail se thumbnails_dir=None).
+
+    Com `renditions`, vídeos ganham versões por perfil de dispositivo e imagens, variantes
+    por tamanho de tela/formato, ao lado do original.
+    """
+    task = {
+        'content_id': content.id,
+        'content_type': content.content_type,
+        'src': src,
+        'thumbnail_dest': os.path.join(thumbnails_dir, f"{uuid.uuid4()}.jpg") if thumbnails_dir else None,
+        'probe_duration': probe_duration,
+    }
+    if renditions and content.content_type in ('video', 'image') and content.file_path:
+        task['renditions_base'] = os.path.splitext(src)[0]
+        task['renditions_rel'] = os.path.splitext(media_rel_path(content.file_path))[0]
+    return task
+
+
+# Instância global da fila de processamento de mídia
+media_jobs = MediaJobQueue()
@@ -0,0 +1,416 @@
+"""Processamento de mídia executado fora da requisição (services.media_jobs).
+
+Funções puras (sem Flask nem banco) executadas pelos workers do pool:
+thumbnails (FFmpeg/PIL), duração via ffprobe, metadados de imagem, versões
+de vídeo por perfil de dispositivo (services.renditions.DEVICE_PROFILES) e
+variantes de imagem em tamanhos de tela/formatos modernos (IMAGE_SIZES).
+`process_media` é a unidade de trabalho de cada item de um job.
+"""
+import json
+import os
+import subprocess
+import uuid
+
+from PIL import Image, ImageOps, features
+
+from services.renditions import (DEVICE_ORDER, DEVICE_PROFILES, IMAGE_FORMAT_EXT, IMAGE_FULL_LABEL,
+                                 IMAGE_SIZES)
+
+RENDITION_TIMEOUT_SEC = 3600
+# Parâmetros do encoder por formato de variante de imagem
+IMAGE_SAVE_OPTIONS = {
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60},
+}
+
+
+def _pil_supports(feature):
+    try:
+        return bool(features.check(feature))
+    except Exception:
+        return False
+
+
+# AVIF depende do Pillow compilado com libavif (nativo a partir do 11.2)
+IMAGE_VARIANT_FORMATS = tuple(fmt for fmt in ('avif', 'webp', 'jpeg')
+                              if fmt == 'jpeg' or _pil_supports(fmt))
+
+
+def generate_video_thumbnail(video_path, thumbnail_path):
+    """Gera thumbnail de vídeo usando FFmpeg"""
+    try:
+        # Comando FFmpeg para gerar thumbnail no segundo 1 do vídeo
+        cmd = [
+            'ffmpeg',
+            '-i', video_path,
+            '-ss', '00:00:01.000',
+            '-vframes', '1',
+            '-q:v', '2',
+            '-y',  # Sobrescrever arquivo existente
+            thumbnail_path
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        
+        if result.returncode == 0:
+            return True
+        else:
+            print(f"FFmpeg error: {result.stderr}")
+            return False
+            
+    except subprocess.TimeoutExpired:
+        print("FFmpeg timeout - vídeo muito longo ou corrompido")
+        return False
+    except FileNotFoundError:
+        print("FFmpeg não encontrado. Instale FFmpeg para gerar thumbnails de vídeo.")
+        return False
+    except Exception as e:
+        print(f"Erro ao gerar thumbnail: {str(e)}")
+        return False
+
+def generate_image_thumbnail(image_path, thumbnail_path, size=(300, 200)):
+    """Gera thumbnail de imagem usando PIL"""
+    try:
+        with Image.open(image_path) as img:
+            # Converter para RGB se necessário
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGB')
+            
+            # Redimensionar mantendo proporção
+            try:
+                resample = Image.Resampling.LANCZOS  # Pillow >= 9.1
+            except Exception:
+                # Compatibilidade com versões antigas
+                resample = getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', Image.BICUBIC))
+            img.thumbnail(size, resample)
+            
+            # Salvar thumbnail
+            img.save(thumbnail_path, 'JPEG', quality=85)
+            return True
+            
+    except Exception as e:
+        print(f"Erro ao gerar thumbnail de imagem: {str(e)}")
+        return False
+
+def generate_audio_thumbnail(audio_path, thumbnail_path, size='640x360'):
+    try:
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-i', audio_path,
+            '-filter_complex', f"showwavespic=s={size}:colors=DodgerBlue",
+            '-frames:v', '1',
+            thumbnail_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode == 0 and os.path.exists(thumbnail_path):
+            return True
+        cmd2 = [
+            'ffmpeg',
+            '-y',
+            '-i', audio_path,
+            '-lavfi', f"showspectrumpic=s={size}:legend=disabled",
+            '-frames:v', '1',
+            thumbnail_path
+        ]
+        result2 = subprocess.run(cmd2, capture_output=True, text=True, timeout=30)
+        return result2.returncode == 0 and os.path.exists(thumbnail_path)
+    except subprocess.TimeoutExpired:
+        print("FFmpeg timeout - áudio muito longo ou corrompido")
+        return False
+    except FileNotFoundError:
+        print("FFmpeg não encontrado. Instale FFmpeg para gerar thumbnails de áudio.")
+        return False
+    except Exception as e:
+        print(f"Erro ao gerar thumbnail de áudio: {str(e)}")
+        return False
+
+def get_video_duration_seconds(video_path):
+    """Obtém a duração real do vídeo em segundos via ffprobe. Retorna int ou None."""
+    try:
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode == 0 and result.stdout.strip():
+            return int(float(result.stdout.strip()))
+        # Fallback: tentar extrair a partir do stderr do ffmpeg
+        cmd2 = ['ffmpeg', '-i', video_path]
+        result2 = subprocess.run(cmd2, capture_output=True, text=True)
+        out = result2.stderr or ''
+        if 'Duration:' in out:
+            try:
+                dur_str = out.split('Duration:')[1].split(',')[0].strip()  # HH:MM:SS.xx
+                h, m, s = dur_str.split(':')
+                s = float(s)
+                return int(float(h) * 3600 + float(m) * 60 + s)
+            except Exception:
+                return None
+        return None
+    except Exception:
+        return None
+
+
+def extract_image_metadata(image_path):
+    """Largura, altura, formato e modo de uma imagem (None se não for imagem válida)."""
+    try:
+        with Image.open(image_path) as img:
+            return {'width': img.width, 'height': img.height, 'format': img.format, 'mode': img.mode}
+    except Exception:
+        return None
+
+
+def probe_video(path):
+    """Contêiner, codecs, resolução, fps e bitrate (kbps) via ffprobe; None se falhar."""
+    try:
+        cmd = [
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'stream=codec_type,codec_name,width,height,pix_fmt,avg_frame_rate:format=format_name,bit_rate',
+            '-of', 'json',
+            path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout or '{}')
+    except Exception:
+        return None
+    streams = data.get('streams') or []
+    video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    if not video:
+        return None
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    fps = None
+    try:
+        num, den = str(video.get('avg_frame_rate') or '0/1').split('/')
+        fps = float(num) / float(den) if float(den) else None
+    except (TypeError, ValueError):
+        pass
+    try:
+        kbps = int(int((data.get('format') or {}).get('bit_rate')) / 1000)
+    except (TypeError, ValueError):
+        kbps = None
+    return {
+        'container': (data.get('format') or {}).get('format_name') or '',
+        'codec': video.get('codec_name'),
+        'pix_fmt': video.get('pix_fmt'),
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+        'fps': round(fps, 3) if fps else None,
+        'kbps': kbps,
+        'audio_codec': audio.get('codec_name') if audio else None,
+    }
+
+
+def device_compatible(info, profile):
+    """O arquivo original já atende ao perfil (H.264 yuv420p em MP4, dentro dos limites)?"""
+    short_side = min(info['width'], info['height'])
+    return (
+        info['codec'] == 'h264'
+        and info['pix_fmt'] in ('yuv420p', 'yuvj420p')
+        and 'mp4' in info['container']
+        and info['audio_codec'] in (None, 'aac', 'mp3')
+        and short_side <= profile['max_height']
+        and (info['kbps'] is None or info['kbps'] <= profile['max_kbps'])
+        and (info['fps'] is None or info['fps'] <= profile['max_fps'] + 0.5)
+    )
+
+
+def transcode_device_rendition(src, dest, target):
+    """Gera `dest` (H.264/AAC, faststart) conforme `target`; grava em arquivo temporário e renomeia."""
+    h = target['height']
+    kbps = target['kbps']
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp.mp4"
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-i', src,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        # Limita o lado menor (retrato ou paisagem) sem ampliar
+        '-vf', f"scale='if(gt(iw,ih),-2,min(iw,{h}))':'if(gt(iw,ih),min(ih,{h}),-2)',format=yuv420p",
+        '-fpsmax', str(target['max_fps']),
+        '-c:v', 'libx264', '-profile:v', target['h264_profile'], '-level', target['level'],
+        '-crf', '23', '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k',
+        '-c:a', 'aac', '-b:a', '128k', '-ac', '2',
+        '-movflags', '+faststart',
+        tmp
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=RENDITION_TIMEOUT_SEC)
+        if result.returncode != 0 or not os.path.exists(tmp):
+            raise RuntimeError(f"FFmpeg falhou: {(result.stderr or '')[-300:]}")
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def build_device_renditions(src, base_abs, base_rel):
+    """Versões do vídeo por perfil de dispositivo, gravadas em <base>.<perfil>.mp4.
+
+    Perfis que o original já atende não geram arquivo; perfis com o mesmo alvo
+    compartilham um único arquivo. Arquivos já existentes (blob deduplicado)
+    são reaproveitados. Retorna o dicionário gravado em Content.renditions.
+    """
+    info = probe_video(src)
+    if info is None:
+        raise RuntimeError('Não foi possível analisar o vídeo')
+    short_side = min(info['width'], info['height']) or DEVICE_PROFILES['modern']['max_height']
+    source = dict(info, size=os.path.getsize(src), compatible=[])
+    videos = {}
+    built = {}  # alvo -> entrada (perfis com alvo idêntico)
+    for name in DEVICE_ORDER:
+        profile = DEVICE_PROFILES[name]
+        if device_compatible(info, profile):
+            source['compatible'].append(name)
+            continue
+        target = {
+            'height': min(short_side, profile['max_height']),
+            'kbps': min(profile['max_kbps'], info['kbps'] or profile['max_kbps']),
+            'max_fps': profile['max_fps'],
+            'h264_profile': profile['h264_profile'],
+            'level': profile['level'],
+        }
+        key = tuple(sorted(target.items()))
+        if key not in built:
+            dest = f"{base_abs}.{name}.mp4"
+            if not os.path.exists(dest):
+                transcode_device_rendition(src, dest, target)
+            scale = target['height'] / float(short_side)
+            built[key] = {
+                'path': f"{base_rel}.{name}.mp4",
+                'width': int(round(info['width'] * scale / 2) * 2),
+                'height': int(round(info['height'] * scale / 2) * 2),
+                'kbps': target['kbps'],
+                'size': os.path.getsize(dest),
+            }
+        videos[name] = built[key]
+    return {'source': source, 'video': videos}
+
+
+def _resample():
+    try:
+        return Image.Resampling.LANCZOS  # Pillow >= 9.1
+    except Exception:
+        return getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', Image.BICUBIC))
+
+
+def build_image_variants(src, base_abs, base_rel):
+    """Variantes da imagem em <base>.<tamanho>.<ext> para cada tamanho de tela e formato.
+
+    Só reduz (nunca amplia): tamanhos maiores que a imagem viram uma única
+    variante `full`. Variantes que não ficam menores que o original são
+    descartadas. Retorna o dicionário gravado em Content.renditions (None para
+    imagens animadas, servidas sempre no original).
+    """
+    source_size = os.path.getsize(src)
+    with Image.open(src) as opened:
+        if getattr(opened, 'is_animated', False):
+            return None
+        source_format = (opened.format or '').lower()
+        img = ImageOps.exif_transpose(opened)
+        img.load()
+    width, height = img.size
+    short_side = min(width, height)
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+
+    full_side = min(short_side, IMAGE_SIZES[-1])
+    sizes = [(str(size), size) for size in IMAGE_SIZES if size < full_side]
+    sizes.append((IMAGE_FULL_LABEL, full_side))
+
+    variants = []
+    for label, side in sizes:
+        scale = side / float(short_side)
+        box = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        resized = img if box == img.size else img.resize(box, _resample())
+        for fmt in IMAGE_VARIANT_FORMATS:
+            if fmt == 'jpeg' and has_alpha:
+                # JPEG sem transparência: compor sobre fundo preto (como exibido nas TVs)
+                frame = Image.new('RGB', resized.size, (0, 0, 0))
+                frame.paste(resized, mask=resized.getchannel('A'))
+            else:
+                frame = resized
+            dest = f"{base_abs}.{label}{IMAGE_FORMAT_EXT[fmt]}"
+            if not os.path.exists(dest):
+                tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+                try:
+                    frame.save(tmp, **IMAGE_SAVE_OPTIONS[fmt])
+                    os.replace(tmp, dest)
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+            size = os.path.getsize(dest)
+            if size >= source_size:
+                # Não compensa: o original é servido no lugar
+                os.remove(dest)
+                continue
+            variants.append({
+                'label': label,
+                'format': fmt,
+                'path': f"{base_rel}.{label}{IMAGE_FORMAT_EXT[fmt]}",
+                'width': box[0],
+                'height': box[1],
+                'size': size,
+            })
+    return {
+        'source': {'width': width, 'height': height, 'format': source_format, 'size': source_size},
+        'image': variants,
+    }
+
+
+def process_media(task):
+    """Processa um item: {'content_id', 'content_type', 'src', 'thumbnail_dest', 'probe_duration',
+    'renditions_base', 'renditions_rel'}.
+
+    Retorna {'content_id', 'thumbnail', 'duration', 'metadata', 'renditions', 'error'}; `thumbnail`
+    é o nome do arquivo gerado em thumbnails/ (None se não foi possível gerar).
+    """
+    content_type = task.get('content_type')
+    src = task['src']
+    dest = task.get('thumbnail_dest')
+    result = {'content_id': task.get('content_id'), 'thumbnail': None, 'duration': None,
+              'metadata': None, 'renditions': None, 'error': None}
+    if not os.path.exists(src):
+        result['error'] = 'Arquivo não encontrado'
+        return result
+
+    if content_type == 'image':
+        result['metadata'] = extract_image_metadata(src)
+    elif task.get('probe_duration', True) and content_type in ('video', 'audio'):
+        result['duration'] = get_video_duration_seconds(src)
+
+    if dest:
+        generators = {
+            'video': generate_video_thumbnail,
+            'image': generate_image_thumbnail,
+            'audio': generate_audio_thumbnail,
+        }
+        generator = generators.get(content_type)
+        ok = generator(src, dest) if generator else False
+        if ok and os.path.exists(dest):
+            result['thumbnail'] = os.path.basename(dest)
+        else:
+            try:
+                if os.path.exists(dest):
+                    os.remove(dest)
+            except Exception:
+                pass
+            if generator:
+                result['error'] = 'Falha ao gerar thumbnail'
+
+    if content_type == 'video' and task.get('renditions_base'):
+        try:
+            result['renditions'] = build_device_renditions(src, task['renditions_base'], task['renditions_rel'])
+        except Exception as e:
+            result['error'] = result['error'] or f'Falha ao gerar versões por dispositivo: {e}'
+    elif content_type == 'image' and task.get('renditions_base'):
+        try:
+            result['renditions'] = build_image_variants(src, task['renditions_base'], task['renditions_rel'])
+        except Exception as e:
+            result['error'] = result['error'] or f'Falha ao gerar variantes de imagem: {e}'
+    return result
@@ -0,0 +1,300 @@
+"""Entrega de arquivos de mídia (uploads) com Range, validadores e índice de stat.
+
+Usado por /uploads/<path> e /api/content/media/<filename>. Cada TV pede os
+mesmos MP4s grandes em pedaços (Range) repetidamente. Por arquivo guardamos em
+memória o resultado do stat, o ETag forte, o Last-Modified e o mimetype.
+Entradas são revalidadas no máximo a cada MEDIA_STAT_TTL_SEC e atualizadas
+explicitamente por upload/remoção (media_index.refresh / invalidate).
+
+Corpo da resposta:
+- arquivo inteiro ou um único intervalo: `wsgi.file_wrapper` do servidor
+  quando disponível (gunicorn usa os.sendfile, respeitando Content-Length);
+  caso contrário, leitura em blocos de MEDIA_CHUNK_SIZE limitada ao intervalo;
+- múltiplos intervalos: multipart/byteranges com Content-Length exato.
+
+Condicionais: If-None-Match / If-Modified-Since (304), If-Range (intervalo só
+vale se o validador ainda for o atual) e 416 para intervalos insatisfazíveis.
+"""
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+from werkzeug.http import http_date, parse_date
+from werkzeug.security import safe_join
+
+MEDIA_STAT_TTL_SEC = 2.0
+# Playlists HLS das renditions compiladas (nem todo sistema registra estes tipos)
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/iso.segment', '.m4s')
+MEDIA_INDEX_MAX_ENTRIES = 5000
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+_HEX_DIGITS = frozenset('0123456789abcdef')
+
+
+def _content_hash_from_name(path):
+    """SHA-256 do nome `<sha><ext>`; derivados (`<sha>.<nome><ext>`) têm bytes próprios e não contam."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and set(stem) <= _HEX_DIGITS:
+        return stem
+    return None
+
+
+class MediaInfo:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'last_modified', 'mimetype', 'checked_at')
+
+    def __init__(self, path, st):
+        self.path = path
+        self.size = st.st_size
+        self.mtime = int(st.st_mtime)
+        content_hash = _content_hash_from_name(path)
+        if content_hash:
+            # Armazenamento por hash (services.media_store): o nome já é o SHA-256
+            self.etag = f'"{content_hash}"'
+        else:
+            # Forte: muda com tamanho, mtime (ns) ou inode (arquivo substituído)
+            self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ino:x}"'
+        self.last_modified = http_date(self.mtime)
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.checked_at = time.monotonic()
+
+
+class MediaIndex:
+    """Índice LRU caminho absoluto -> MediaInfo."""
+
+    def __init__(self, ttl=MEDIA_STAT_TTL_SEC, max_entries=MEDIA_INDEX_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.stats_calls = 0
+
+    def get(self, path):
+        """MediaInfo do arquivo (None se não existe ou não é arquivo regular)."""
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        with self._lock:
+            info = self._entries.get(path)
+            if info is not None and now - info.checked_at < self.ttl:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return info
+        return self.refresh(path)
+
+    def refresh(self, path):
+        """Refaz o stat de `path` (chamar após gravar o arquivo)."""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        if not os.path.isfile(path):
+            self.invalidate(path)
+            return None
+        info = MediaInfo(path, st)
+        with self._lock:
+            self._entries[path] = info
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats_calls += 1
+        return info
+
+    def invalidate(self, path):
+        """Descarta a entrada de `path` (arquivo removido ou substituído)."""
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'stat_calls': self.stats_calls}
+
+
+# Instância global do índice de mídia
+media_index = MediaIndex()
+
+
+def _etag_matches(header_value, etag, weak=True):
+    if not header_value:
+        return False
+    if header_value.strip() == '*':
+        return True
+    for candidate in header_value.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified(info):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return _etag_matches(if_none_match, info.etag)
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    return since is not None and info.mtime <= since.timestamp()
+
+
+def _range_applies(info):
+    """If-Range: o intervalo só vale se o validador enviado ainda é o atual."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return _etag_matches(if_range, info.etag, weak=False)
+    date = parse_date(if_range)
+    return date is not None and int(date.timestamp()) == info.mtime
+
+
+def _parse_ranges(header, size):
+    """Intervalos (início, fim exclusivo) satisfazíveis; [] se nenhum; None se cabeçalho inválido."""
+    if not header or not header.startswith('bytes='):
+        return None
+    ranges = []
+    for spec in header[6:].split(','):
+        spec = spec.strip()
+        if '-' not in spec:
+            return None
+        first, last = spec.split('-', 1)
+        try:
+            if first == '':
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size
+            else:
+                start = int(first)
+                if last and int(last) < start:
+                    return None
+                end = min(size, int(last) + 1) if last else size
+            if start >= size or end <= start:
+                continue
+        except ValueError:
+            return None
+        ranges.append((start, end))
+    if len(ranges) > 1:
+        # Mesclar sobreposições (evita amplificação com centenas de intervalos)
+        ranges.sort()
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        ranges = merged
+    return ranges
+
+
+def _iter_file(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(MEDIA_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _file_body(info, start, length):
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None:
+        f = open(info.path, 'rb')
+        if start:
+            f.seek(start)
+        # PEP 3333: o servidor não envia além do Content-Length
+        return file_wrapper(f, MEDIA_CHUNK_SIZE)
+    return _iter_file(info.path, start, length)
+
+
+def _multipart_body(info, ranges, boundary):
+    parts = []
+    for start, end in ranges:
+        head = (f'\r\n--{boundary}\r\n'
+                f'Content-Type: {info.mimetype}\r\n'
+                f'Content-Range: bytes {start}-{end - 1}/{info.size}\r\n\r\n').encode('ascii')
+        parts.append((head, start, end - start))
+    tail = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    total = sum(len(head) + length for head, _start, length in parts) + len(tail)
+
+    def generate():
+        for head, start, length in parts:
+            yield head
+            yield from _iter_file(info.path, start, length)
+        yield tail
+
+    return generate(), total
+
+
+def upload_path(*parts):
+    """Caminho absoluto dentro de UPLOAD_FOLDER (relativo ao app, como send_from_directory)."""
+    upload_dir = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isabs(upload_dir):
+        upload_dir = os.path.join(current_app.root_path, upload_dir)
+    return os.path.join(upload_dir, *parts)
+
+
+def send_media(base_dir, filename, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """Resposta para `filename` dentro de `base_dir` (None se não existir)."""
+    path = safe_join(os.path.abspath(base_dir), filename)
+    if path is None:
+        return None
+    info = media_index.get(path)
+    if info is None:
+        return None
+
+    headers = {
+        'ETag': info.etag,
+        'Last-Modified': info.last_modified,
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(info):
+        return Response(status=304, headers=headers)
+
+    head_only = request.method == 'HEAD'
+    ranges = None
+    range_header = request.headers.get('Range')
+    if range_header and _range_applies(info):
+        ranges = _parse_ranges(range_header, info.size)
+        if ranges == []:
+            headers['Content-Range'] = f'bytes */{info.size}'
+            return Response(status=416, headers=headers)
+
+    if not ranges or len(ranges) == 1:
+        start, end = ranges[0] if ranges else (0, info.size)
+        if ranges:
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{info.size}'
+        headers['Content-Length'] = str(end - start)
+        try:
+            body = [] if head_only else _file_body(info, start, end - start)
+        except OSError:
+            # Removido entre o stat em cache e a abertura
+            media_index.invalidate(path)
+            return None
+        return Response(body, status=206 if ranges else 200, headers=headers,
+                        mimetype=info.mimetype, direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    body, total = _multipart_body(info, ranges, boundary)
+    headers['Content-Length'] = str(total)
+    return Response([] if head_only else body, status=206, headers=headers,
+                    content_type=f'multipart/byteranges; boundary={boundary}', direct_passthrough=True)
@@ -0,0 +1,208 @@
+"""Armazenamento de mídia endereçado por conteúdo (SHA-256).
+
+Uploads são gravados uma única vez em UPLOAD_FOLDER/media/<aa>/<sha256><ext>,
+com o hash calculado durante a própria gravação (leituras de HASH_BUFFER_SIZE).
+O mesmo arquivo enviado duas vezes vira um único blob (tabela media_blobs) com
+ref_count = número de Content que o referenciam; o arquivo só é apagado quando
+a última referência é liberada.
+
+O hash fica em Content.file_hash: checksums de distribuição, o ETag servido em
+/uploads (o nome do arquivo é o próprio hash) e o `?v=` das playlists saem do
+banco, sem reler o disco. Conteúdos antigos (nomes UUID na raiz de uploads)
+continuam funcionando; migrations/migrate_content_addressed_store.py os move.
+"""
+import hashlib
+import io
+import os
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models.media_blob import MediaBlob
+from services.media_server import media_index, upload_path
+
+HASH_BUFFER_SIZE = 1024 * 1024
+STORE_DIR = 'media'
+TMP_DIR = '.tmp'
+
+
+def hash_file(path):
+    """SHA-256 de um arquivo existente (conteúdos legados sem file_hash)."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def blob_rel_path(sha256, ext=''):
+    return f"{STORE_DIR}/{sha256[:2]}/{sha256}{ext}"
+
+
+def file_extension(filename):
+    if filename and '.' in filename:
+        return '.' + filename.rsplit('.', 1)[1].lower()
+    return ''
+
+
+def media_rel_path(file_path):
+    """Caminho relativo a UPLOAD_FOLDER ('uploads/x.mp4', '/x.mp4' -> 'x.mp4')."""
+    rel = str(file_path or '').replace('\\', '/').lstrip('/')
+    if rel.lower().startswith('uploads/'):
+        rel = rel[len('uploads/'):]
+    return rel
+
+
+def content_file_version(content, abs_path=None):
+    """Versão para `?v=`: hash do banco; stat em cache para conteúdos legados."""
+    if getattr(content, 'file_hash', None):
+        return content.file_hash[:16]
+    info = media_index.get(abs_path) if abs_path else None
+    return info.etag.strip('"').replace('-', '') if info else '0'
+
+
+def _write_temp(stream):
+    tmp_dir = upload_path(STORE_DIR, TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(HASH_BUFFER_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path, sha.hexdigest(), size
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _increment(sha256):
+    return db.session.execute(
+        text("UPDATE media_blobs SET ref_count = ref_count + 1 WHERE sha256 = :h"), {'h': sha256}
+    ).rowcount
+
+
+def _register(tmp_path, sha256, size, filename, mime_type):
+    existing = db.session.get(MediaBlob, sha256)
+    if existing is not None:
+        if _increment(sha256):
+            db.session.refresh(existing)
+            final_path = upload_path(existing.file_path)
+            if os.path.exists(final_path):
+                _remove_quietly(tmp_path)
+            else:
+                # Arquivo sumiu do disco: restaurar com o upload atual
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                media_index.refresh(final_path)
+            return existing
+        # Um release() concorrente zerou e apagou o blob: criar de novo com este upload
+        db.session.expunge(existing)
+
+    rel_path = blob_rel_path(sha256, file_extension(filename))
+    final_path = upload_path(rel_path)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    media_index.refresh(final_path)
+
+    blob = MediaBlob(sha256=sha256, file_path=rel_path, file_size=size, mime_type=mime_type, ref_count=1)
+    try:
+        with db.session.begin_nested():
+            db.session.add(blob)
+    except IntegrityError:
+        # Upload concorrente do mesmo arquivo criou o blob primeiro
+        _increment(sha256)
+        blob = db.session.get(MediaBlob, sha256)
+    return blob
+
+
+def ingest_stream(stream, filename, mime_type=None):
+    """Grava `stream` no armazenamento e retorna o MediaBlob (ref_count já incrementado).
+
+    A alteração em media_blobs entra na transação do chamador (commit junto com o Content).
+    """
+    tmp_path, sha256, size = _write_temp(stream)
+    try:
+        return _register(tmp_path, sha256, size, filename, mime_type)
+    finally:
+        if os.path.exists(tmp_path):
+            _remove_quietly(tmp_path)
+
+
+def ingest_upload(file_storage, filename=None):
+    """Atalho para werkzeug FileStorage (request.files)."""
+    return ingest_stream(file_storage.stream, filename or file_storage.filename, file_storage.mimetype)
+
+
+def ingest_bytes(data, filename, mime_type=None):
+    return ingest_stream(io.BytesIO(data), filename, mime_type)
+
+
+def attach(content, blob):
+    """Aponta `content` para `blob` (file_path/file_hash/file_size); versões derivadas são refeitas."""
+    content.file_path = blob.file_path
+    content.file_hash = blob.sha256
+    content.file_size = blob.file_size
+    content.renditions = None
+
+
+def remove_derived(rel_path):
+    """Remove as versões derivadas (<arquivo>.<nome>.<ext>) geradas ao lado de `rel_path`."""
+    if not rel_path:
+        return 0
+    base = upload_path(os.path.splitext(rel_path)[0])
+    directory, prefix = os.path.dirname(base), os.path.basename(base) + '.'
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    original = os.path.basename(rel_path)
+    for entry in entries:
+        if entry.name.startswith(prefix) and entry.name != original and entry.is_file():
+            _remove_quietly(entry.path)
+            media_index.invalidate(entry.path)
+            removed += 1
+    return removed
+
+
+def release(sha256):
+    """Libera uma referência ao blob; remove arquivo e registro ao chegar a zero.
+
+    Chamar depois do commit que removeu/substituiu o Content (faz o próprio commit).
+    """
+    if not sha256:
+        return False
+    db.session.execute(
+        text("UPDATE media_blobs SET ref_count = ref_count - 1 WHERE sha256 = :h AND ref_count > 0"),
+        {'h': sha256},
+    )
+    blob = db.session.get(MediaBlob, sha256)
+    rel_path = blob.file_path if blob is not None else None
+    deleted = db.session.execute(
+        text("DELETE FROM media_blobs WHERE sha256 = :h AND ref_count <= 0"), {'h': sha256}
+    ).rowcount
+    db.session.commit()
+    if deleted and rel_path:
+        final_path = upload_path(rel_path)
+        _remove_quietly(final_path)
+        media_index.invalidate(final_path)
+        remove_derived(rel_path)
+        print(f"[MediaStore] Blob {sha256[:12]} removido (sem referências)")
+        return True
+    return False
@@ -0,0 +1,126 @@
+"""Notificação de alterações de modelos após commit.
+
+Os caches em memória (timeline de agendamentos, playlists, etc.) precisam saber
+quando Schedule/Campaign/CampaignContent/Content/Player/SystemConfig mudaram. Em vez de cada
+rota chamar invalidações manualmente, escutamos os eventos do SQLAlchemy:
+durante o flush coletamos os IDs tocados e, somente após o commit, avisamos os
+assinantes. Em rollback as alterações coletadas são descartadas.
+
+Observação: UPDATE/DELETE em massa (query.update(), text()) não passam pela
+unidade de trabalho do ORM e, portanto, não são vistos aqui; quem os usar deve
+chamar `notify_changes` explicitamente.
+"""
+import threading
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+# Tabelas observadas
+WATCHED_TABLES = ('schedules', 'campaigns', 'campaign_contents', 'contents', 'players', 'system_configs')
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+_registered = False
+
+_SESSION_KEY = '_tvs_model_changes'
+
+
+def _empty_changes():
+    changes = {table: set() for table in WATCHED_TABLES}
+    # IDs relacionados (valores atuais e anteriores das FKs) para invalidação dirigida
+    changes['affected_players'] = set()
+    changes['affected_campaigns'] = set()
+    return changes
+
+
+def subscribe(callback):
+    """Registra um callback `callback(changes)` chamado após cada commit com alterações."""
+    with _subscribers_lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def notify_changes(changes):
+    """Entrega um conjunto de alterações aos assinantes (também usado para invalidação manual)."""
+    full = _empty_changes()
+    for key, values in (changes or {}).items():
+        if key in full and values:
+            full[key].update(str(v) for v in values if v)
+    if not any(full.values()):
+        return
+    with _subscribers_lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(full)
+        except Exception as e:
+            print(f"[ModelEvents] Falha em assinante {getattr(callback, '__name__', callback)}: {e}")
+
+
+def _fk_values(obj, attr):
+    """Retorna valores atual e anterior de uma FK (para registros movidos entre pais)."""
+    values = set()
+    try:
+        current = getattr(obj, attr, None)
+        if current:
+            values.add(str(current))
+        hist = sa_inspect(obj).attrs[attr].history
+        for v in (hist.deleted or ()):
+            if v:
+                values.add(str(v))
+    except Exception:
+        pass
+    return values
+
+
+def _collect_after_flush(session, flush_context):
+    try:
+        changes = session.info.get(_SESSION_KEY)
+        if changes is None:
+            changes = _empty_changes()
+            session.info[_SESSION_KEY] = changes
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table not in WATCHED_TABLES:
+                continue
+            obj_id = getattr(obj, 'id', None)
+            if obj_id:
+                changes[table].add(str(obj_id))
+            if table == 'schedules':
+                changes['affected_players'].update(_fk_values(obj, 'player_id'))
+                changes['affected_campaigns'].update(_fk_values(obj, 'campaign_id'))
+            elif table == 'campaign_contents':
+                changes['affected_campaigns'].update(_fk_values(obj, 'campaign_id'))
+            elif table == 'campaigns' and obj_id:
+                changes['affected_campaigns'].add(str(obj_id))
+            elif table == 'players' and obj_id:
+                changes['affected_players'].add(str(obj_id))
+    except Exception as e:
+        print(f"[ModelEvents] Falha ao coletar alterações: {e}")
+
+
+def _dispatch_after_commit(session):
+    changes = session.info.pop(_SESSION_KEY, None)
+    if changes and any(changes.values()):
+        notify_changes(changes)
+
+
+def _discard_after_rollback(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def register_model_change_listeners():
+    """Instala os listeners globais de sessão (idempotente)."""
+    global _registered
+    if _registered:
+        return
+    event.listen(Session, 'after_flush', _collect_after_flush)
+    event.listen(Session, 'after_commit', _dispatch_after_commit)
+    event.listen(Session, 'after_rollback', _discard_after_rollback)
+    _registered = True
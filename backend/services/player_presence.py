@@ -0,0 +1,220 @@
+"""Presença e telemetria dos players com escrita adiada (write-behind).
+
+Ping, connect, playback_start/heartbeat/end (HTTP) e os eventos Socket.IO de
+heartbeat/reprodução chegam de todas as TVs a cada poucos segundos. Em vez de
+um `Player.query.get` + commit por batida, os valores vão para este store em
+memória e são gravados na tabela `players` em UPDATEs agrupados (executemany)
+pelo job `player_presence_flush` a cada PRESENCE_FLUSH_INTERVAL_SEC.
+
+Leituras de presença (dashboard, filtro online/offline de list_players) usam
+o mesmo store, então refletem a última batida mesmo antes do flush.
+"""
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam
+
+from database import db
+from models.player import Player
+from services.model_events import subscribe
+
+PRESENCE_FLUSH_INTERVAL_SEC = 5
+
+# Colunas de `players` mantidas pelo store
+TELEMETRY_COLUMNS = (
+    'status', 'is_online', 'last_ping', 'ip_address',
+    'storage_used_gb', 'storage_capacity_gb', 'network_speed_mbps',
+    'is_playing', 'current_content_id', 'current_content_title', 'current_content_type',
+    'current_campaign_id', 'current_campaign_name', 'playback_start_time', 'last_playback_heartbeat',
+)
+
+
+def _naive_utc(value):
+    """Datas com fuso viram UTC sem tzinfo (mesmo padrão de datetime.utcnow() no banco)."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class PlayerPresenceView:
+    """Player com os campos de telemetria sobrepostos pelos valores do store (somente leitura)."""
+
+    def __init__(self, player, state):
+        self.__dict__['_player'] = player
+        self.__dict__['_state'] = state
+
+    def __getattr__(self, name):
+        state = self.__dict__['_state']
+        if name in state:
+            return state[name]
+        return getattr(self.__dict__['_player'], name)
+
+    # Mesma regra do model (último ping < 5 minutos), avaliada sobre os valores do store
+    is_online = property(Player.is_online.fget)
+
+
+class PlayerPresenceStore:
+    """Estado de telemetria por player + alterações pendentes de gravação."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._state = {}     # player_id -> {coluna: valor} (base do banco + escritas recebidas)
+        self._dirty = {}     # player_id -> {coluna: valor} ainda não gravados
+        self._recheck = set()  # players alterados por outras rotas (recarregar base no flush)
+        self.writes_absorbed = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+        subscribe(self._on_model_changes)
+
+    # ------------------------------------------------------------------
+    # Carga / invalidação
+    # ------------------------------------------------------------------
+    def _query_state(self, player_ids):
+        columns = [Player.__table__.c[name] for name in TELEMETRY_COLUMNS]
+        rows = db.session.query(Player.__table__.c.id, *columns).filter(
+            Player.__table__.c.id.in_(list(player_ids))
+        ).all()
+        return {row[0]: dict(zip(TELEMETRY_COLUMNS, row[1:])) for row in rows}
+
+    def _on_model_changes(self, changes):
+        players = changes.get('players', ())
+        if players:
+            with self._lock:
+                self._recheck.update(p for p in players if p in self._state)
+
+    def exists(self, player_id):
+        """Verifica se o player existe (consulta o banco apenas na primeira vez)."""
+        player_id = str(player_id)
+        with self._lock:
+            if player_id in self._state:
+                return True
+        loaded = self._query_state([player_id])
+        if player_id not in loaded:
+            return False
+        with self._lock:
+            # Pode ter recebido escritas enquanto consultávamos: elas prevalecem
+            base = loaded[player_id]
+            base.update(self._state.get(player_id, {}))
+            self._state[player_id] = base
+        return True
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def record(self, player_id, **values):
+        """Registra valores de telemetria; retorna uma cópia do estado atual do player."""
+        player_id = str(player_id)
+        values = {k: _naive_utc(v) for k, v in values.items() if k in TELEMETRY_COLUMNS}
+        with self._lock:
+            state = self._state.setdefault(player_id, {})
+            state.update(values)
+            self._dirty.setdefault(player_id, {}).update(values)
+            self.writes_absorbed += 1
+            return dict(state)
+
+    def flush(self):
+        """Grava as alterações pendentes em UPDATEs agrupados por conjunto de colunas."""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                recheck, self._recheck = self._recheck, set()
+
+            written = 0
+            if dirty:
+                groups = {}
+                for player_id, values in dirty.items():
+                    groups.setdefault(tuple(sorted(values)), []).append((player_id, values))
+                table = Player.__table__
+                try:
+                    with db.engine.begin() as conn:
+                        for columns, entries in groups.items():
+                            stmt = table.update().where(table.c.id == bindparam('_pid')).values(
+                                {name: bindparam(f'v_{name}') for name in columns}
+                            )
+                            params = []
+                            for player_id, values in entries:
+                                row = {f'v_{name}': values[name] for name in columns}
+                                row['_pid'] = player_id
+                                params.append(row)
+                            conn.execute(stmt, params)
+                            written += len(params)
+                except Exception as e:
+                    print(f"[Presence] Falha ao gravar telemetria ({len(dirty)} players): {e}")
+                    with self._lock:
+                        # Devolver pendências sem sobrescrever valores mais novos
+                        for player_id, values in dirty.items():
+                            newer = self._dirty.get(player_id, {})
+                            merged = dict(values)
+                            merged.update(newer)
+                            self._dirty[player_id] = merged
+                    return 0
+
+            if recheck:
+                self._reload(recheck)
+
+            with self._lock:
+                self.rows_flushed += written
+                self.flushes += 1
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def _reload(self, player_ids):
+        """Atualiza a base de players alterados por outras rotas e descarta os excluídos."""
+        try:
+            loaded = self._query_state(player_ids)
+        except Exception as e:
+            print(f"[Presence] Falha ao recarregar players: {e}")
+            return
+        with self._lock:
+            for player_id in player_ids:
+                if player_id not in loaded:
+                    self._state.pop(player_id, None)
+                    self._dirty.pop(player_id, None)
+                    continue
+                base = loaded[player_id]
+                base.update(self._dirty.get(player_id, {}))
+                self._state[player_id] = base
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def get(self, player_id):
+        with self._lock:
+            state = self._state.get(str(player_id))
+            return dict(state) if state is not None else None
+
+    def view(self, player):
+        """Envolve um Player (ou objeto compatível) com a telemetria mais recente do store."""
+        state = self.get(getattr(player, 'id', None))
+        return PlayerPresenceView(player, state) if state else player
+
+    def apply(self, player):
+        """Copia a telemetria do store para um Player transitório (fora da sessão)."""
+        state = self.get(getattr(player, 'id', None)) or {}
+        for name, value in state.items():
+            setattr(player, name, value)
+        return player
+
+    def online_ids(self, threshold):
+        """IDs com last_ping >= threshold segundo o store."""
+        with self._lock:
+            return set(pid for pid, state in self._state.items()
+                       if state.get('last_ping') and state['last_ping'] >= threshold)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_players': len(self._state),
+                'pending_players': len(self._dirty),
+                'writes_absorbed': self.writes_absorbed,
+                'rows_flushed': self.rows_flushed,
+                'flushes': self.flushes,
+            }
+
+
+# Instância global do store de presença
+player_presence = PlayerPresenceStore()
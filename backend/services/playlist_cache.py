@@ -0,0 +1,125 @@
+"""Cache em memória das playlists resolvidas por player.
+
+GET /api/players/<id>/playlist é consultado continuamente por todos os
+kiosks. A playlist materializada (payload + ETag) fica guardada por
+(player, host) até o primeiro destes eventos:
+
+- commit que altere Schedule/Campaign/CampaignContent/Content/Player ligado
+  à entrada (via services.model_events);
+- próximo limite de agendamento do player (início/fim de janela, virada de
+  vigência) ou virada de hora (filtros de conteúdo por hora/dia);
+- PLAYLIST_CACHE_MAX_TTL, que cobre arquivos trocados em disco sem escrita
+  no banco e instâncias com mais de um processo.
+
+Assim uma requisição condicional vira uma consulta a dicionário e uma
+comparação de cabeçalho. Entradas menos usadas são descartadas ao atingir
+PLAYLIST_CACHE_MAX_ENTRIES.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from services.model_events import subscribe
+
+PLAYLIST_CACHE_MAX_ENTRIES = 2000
+PLAYLIST_CACHE_MAX_TTL = timedelta(minutes=5)
+
+
+class PlaylistCache:
+    """LRU de playlists resolvidas com invalidação dirigida por dependências."""
+
+    def __init__(self, max_entries=PLAYLIST_CACHE_MAX_ENTRIES, max_ttl=PLAYLIST_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (player_id, media_base) -> entrada
+        # Incrementado a cada invalidação; uma montagem iniciada antes não é guardada
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        subscribe(self._on_model_changes)
+
+    def begin(self):
+        """Marca o início de uma montagem (use o valor em `store`)."""
+        with self._lock:
+            return self._version
+
+    def get(self, player_id, media_base, now=None):
+        now = now or datetime.now()
+        key = (str(player_id), media_base)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry['expires_at']:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def store(self, player_id, media_base, version, payload, etag, expires_at,
+              campaign_ids=(), content_ids=(), now=None):
+        """Guarda a playlist montada; retorna a entrada (guardada ou não)."""
+        now = now or datetime.now()
+        entry = {
+            'payload': payload,
+            'etag': etag,
+            'expires_at': min(expires_at or (now + self.max_ttl), now + self.max_ttl),
+            'campaign_ids': set(str(c) for c in campaign_ids if c),
+            'content_ids': set(str(c) for c in content_ids if c),
+        }
+        key = (str(player_id), media_base)
+        with self._lock:
+            if version != self._version:
+                # Houve commit relevante durante a montagem: não guardar resultado possivelmente velho
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_player(self, player_id):
+        player_id = str(player_id)
+        with self._lock:
+            self._version += 1
+            for key in [k for k in self._entries if k[0] == player_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def _on_model_changes(self, changes):
+        players = changes.get('affected_players', set())
+        campaigns = changes.get('campaigns', set()) | changes.get('affected_campaigns', set())
+        contents = changes.get('contents', set())
+        if not (players or campaigns or contents):
+            return
+        with self._lock:
+            self._version += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if key[0] in players
+                or (campaigns and not campaigns.isdisjoint(entry['campaign_ids']))
+                or (contents and not contents.isdisjoint(entry['content_ids']))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+# Instância global do cache de playlists
+playlist_cache = PlaylistCache()
@@ -0,0 +1,163 @@
+"""Renditions de mídia e escolha do arquivo adequado a cada player.
+
+- Vídeo compilado de campanha: escada HLS (RENDITION_PRESETS). Cada rendition
+  é um MP4 fragmentado único: toca direto em <video src> (com Range via
+  /uploads) e também serve de mídia para a playlist HLS da rendition
+  (EXT-X-BYTERANGE), referenciada no master.m3u8.
+- Vídeos enviados: uma versão normalizada por perfil de dispositivo
+  (DEVICE_PROFILES), gerada na ingestão por services.media_jobs e gravada ao
+  lado do original (<arquivo>.<perfil>.mp4).
+- Imagens enviadas: variantes no tamanho das telas comuns (IMAGE_SIZES) em
+  AVIF/WebP/JPEG (<arquivo>.<tamanho>.<ext>); `full` é a imagem inteira
+  (limitada a 4K) e atende à negociação por Accept em /uploads.
+
+A escolha por player usa o lado menor de Player.resolution (telas em retrato
+contam igual) e os limites do perfil do device_type.
+"""
+import os
+
+# rótulo -> (largura, altura, bitrate de vídeo em kbps)
+RENDITION_PRESETS = {
+    '360p': (640, 360, 800),
+    '480p': (854, 480, 1400),
+    '720p': (1280, 720, 2800),
+    '1080p': (1920, 1080, 5000),
+}
+AUDIO_BITRATE_KBPS = 128
+HLS_SEGMENT_SEC = 4
+
+# Perfis por device_type: H.264 (perfil/nível), teto de resolução (lado menor), bitrate e fps
+DEVICE_PROFILES = {
+    'legacy': {'max_height': 720, 'max_kbps': 2500, 'h264_profile': 'main', 'level': '3.1', 'max_fps': 30},
+    'tizen': {'max_height': 1080, 'max_kbps': 6000, 'h264_profile': 'high', 'level': '4.1', 'max_fps': 30},
+    'modern': {'max_height': 2160, 'max_kbps': 12000, 'h264_profile': 'high', 'level': '5.1', 'max_fps': 60},
+}
+# Do mais restrito ao mais capaz: um player decodifica tudo que os perfis anteriores decodificam
+DEVICE_ORDER = ('legacy', 'tizen', 'modern')
+DEVICE_MAX_HEIGHT = {name: profile['max_height'] for name, profile in DEVICE_PROFILES.items()}
+DEFAULT_PLAYER_HEIGHT = 1080
+
+# Lado menor das resoluções comuns de Player.resolution (720p, 1080p, 4K)
+IMAGE_SIZES = (720, 1080, 2160)
+IMAGE_FULL_LABEL = 'full'
+IMAGE_FORMAT_MIME = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+IMAGE_FORMAT_EXT = {'avif': '.avif', 'webp': '.webp', 'jpeg': '.jpg'}
+# Originais em /uploads que podem ser trocados pela variante `full` via Accept
+NEGOTIABLE_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+# Formatos decodificados por device_type, do preferido para o de fallback
+DEVICE_IMAGE_FORMATS = {
+    'legacy': ('jpeg',),
+    'tizen': ('webp', 'jpeg'),
+    'modern': ('avif', 'webp', 'jpeg'),
+}
+
+
+def parse_ladder(spec=None):
+    """Rótulos válidos de COMPILE_RENDITIONS (ex.: '360p,720p,1080p'), do menor para o maior."""
+    if spec is None:
+        spec = os.getenv('COMPILE_RENDITIONS', '')
+    labels = {part.strip().lower() for part in str(spec or '').split(',')}
+    return sorted((label for label in labels if label in RENDITION_PRESETS),
+                  key=lambda label: RENDITION_PRESETS[label][1])
+
+
+def player_target_height(resolution=None, device_type=None):
+    """Altura desejada para o player: lado menor da tela, limitado pelo tipo de dispositivo."""
+    height = DEFAULT_PLAYER_HEIGHT
+    try:
+        w, h = str(resolution or '').lower().split('x')
+        height = min(int(w), int(h))
+    except (TypeError, ValueError):
+        pass
+    cap = DEVICE_MAX_HEIGHT.get((device_type or '').lower())
+    return min(height, cap) if cap else height
+
+
+def select_rendition(renditions, resolution=None, device_type=None):
+    """Menor rendition que cobre a tela do player (ou a maior que o dispositivo suporta)."""
+    if not renditions:
+        return None
+    target = player_target_height(resolution, device_type)
+    ordered = sorted(renditions, key=lambda r: r.get('height') or 0)
+    cap = DEVICE_MAX_HEIGHT.get((device_type or '').lower())
+    playable = [r for r in ordered if not cap or (r.get('height') or 0) <= cap] or ordered[:1]
+    for rendition in playable:
+        if (rendition.get('height') or 0) >= target:
+            return rendition
+    return playable[-1]
+
+
+def rendition_rel_path(file_rel_path, name, ext='.mp4'):
+    """Caminho de uma versão derivada, ao lado do original: media/ab/<sha>.<nome><ext>."""
+    return f"{os.path.splitext(file_rel_path)[0]}.{name}{ext}"
+
+
+def compatible_profiles(device_type):
+    """Perfis cujos arquivos o dispositivo reproduz (o próprio e os mais restritos)."""
+    device_type = (device_type or 'modern').lower()
+    if device_type not in DEVICE_ORDER:
+        device_type = 'modern'
+    return DEVICE_ORDER[:DEVICE_ORDER.index(device_type) + 1]
+
+
+def _short_side(entry):
+    return min(entry.get('width') or 0, entry.get('height') or 0)
+
+
+def _lightest_covering(candidates, target):
+    """[(entrada, lado menor, bytes)]: a mais leve que cobre `target`, senão a maior disponível."""
+    covering = [c for c in candidates if c[1] >= target]
+    if covering:
+        return min(covering, key=lambda c: (c[2], c[1]))[0]
+    return max(candidates, key=lambda c: (c[1], -c[2]))[0]
+
+
+def select_device_file(renditions, resolution=None, device_type=None, original_size=None):
+    """Arquivo mais leve que o player reproduz e que cobre sua tela.
+
+    `renditions` é Content.get_renditions(). Retorna a entrada escolhida de
+    renditions['video'] ou None para usar o original.
+    """
+    source = (renditions or {}).get('source') or {}
+    videos = (renditions or {}).get('video') or {}
+    if not source:
+        return None
+    allowed = compatible_profiles(device_type)
+    target = player_target_height(resolution, device_type)
+    candidates = []
+    if any(name in allowed for name in source.get('compatible', [])):
+        candidates.append((None, _short_side(source), original_size or source.get('size') or 0))
+    for name in allowed:
+        entry = videos.get(name)
+        if entry and entry.get('path'):
+            candidates.append((entry, _short_side(entry), entry.get('size') or 0))
+    if not candidates:
+        # Nenhum arquivo declaradamente compatível: o mais restrito disponível
+        for name in DEVICE_ORDER:
+            if (videos.get(name) or {}).get('path'):
+                return videos[name]
+        return None
+    return _lightest_covering(candidates, target)
+
+
+def select_image_variant(renditions, resolution=None, device_type=None, original_size=None):
+    """Variante de imagem mais leve, em formato que o dispositivo decodifica, que cobre a tela.
+
+    Retorna a entrada de renditions['image'] ou None para usar o original.
+    """
+    source = (renditions or {}).get('source') or {}
+    variants = (renditions or {}).get('image') or []
+    if not source or not variants:
+        return None
+    device_type = (device_type or 'modern').lower()
+    formats = DEVICE_IMAGE_FORMATS.get(device_type, DEVICE_IMAGE_FORMATS['modern'])
+    target = player_target_height(resolution, device_type)
+    candidates = [(None, _short_side(source), original_size or source.get('size') or 0)]
+    candidates.extend((v, _short_side(v), v.get('size') or 0) for v in variants if v.get('format') in formats)
+    return _lightest_covering(candidates, target)
+
+
+def accepted_image_formats(accept):
+    """Formatos modernos aceitos pelo cliente segundo o cabeçalho Accept, do preferido ao último."""
+    accept = (accept or '').lower()
+    return [fmt for fmt in ('avif', 'webp') if IMAGE_FORMAT_MIME[fmt] in accept]
@@ -0,0 +1,202 @@
+"""Índice de conflitos de agendamentos por player (varredura por dia da semana × horário).
+
+Os helpers antigos do calendário comparavam cada agendamento com todos os
+outros em quatro passadas O(n²), reinterpretando dias e horários a cada par.
+Aqui cada agendamento vira, uma única vez, segmentos semiabertos
+[início, fim) em minutos para cada dia da semana em que roda; os segmentos
+de cada player são ordenados e varridos (sweep-line): ao abrir um segmento,
+ele sobrepõe exatamente os que ainda estão abertos. O custo é O(n log n) mais
+o número de pares sobrepostos.
+
+Regras de normalização:
+- dias seguem services.schedule_predicates.parse_days_of_week; days_of_week
+  vazio não ocupa nenhum dia (como no modelo, no calendário e em /conflicts),
+  exceto com `empty_days_all=True` (criação em massa), em que ocupa todos;
+- janela que cruza a meia-noite (fim < início) vira [início, 24h) ∪ [0, fim)
+  nos mesmos dias, como o checador de /conflicts já fazia;
+- dia inteiro (00:00–23:59) ocupa o dia todo; início == fim é uma janela
+  vazia (não conflita com nada);
+- horários ausentes: no calendário (_has_time_conflict da rota) o agendamento
+  não conflita; com `missing_times_all_day=True` ocupa o dia todo, como
+  Schedule._has_time_conflict (has_conflicts da serialização), POST /conflicts
+  e a criação em massa faziam;
+- só agendamentos ativos contam como "o outro lado" de um conflito, e a
+  vigência (start_date/end_date) precisa se cruzar.
+
+Usado pelo calendário (/range), pelo POST /conflicts, pela criação em massa e
+pelo has_conflicts da serialização.
+"""
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+from services.schedule_predicates import parse_days_of_week
+
+MINUTES_PER_DAY = 24 * 60
+ALL_DAY_END_MIN = MINUTES_PER_DAY - 1  # 23:59
+COLOR_SLOTS = 8
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def time_segments(start_time, end_time, days_of_week, missing_times_all_day=False, empty_days_all=False):
+    """Segmentos (dia, início_min, fim_min) ocupados na semana."""
+    if not str(days_of_week or '').strip() and not empty_days_all:
+        return []
+    if not start_time or not end_time:
+        if not missing_times_all_day:
+            return []
+        spans = [(0, MINUTES_PER_DAY)]
+    else:
+        start, end = _minutes(start_time), _minutes(end_time)
+        if start == 0 and end >= ALL_DAY_END_MIN:
+            spans = [(0, MINUTES_PER_DAY)]
+        elif end < start:
+            spans = [(start, MINUTES_PER_DAY), (0, end)]
+        else:
+            spans = [(start, end)]
+    return [(day, s, e) for day in parse_days_of_week(days_of_week) for s, e in spans if e > s]
+
+
+class _Entry:
+    __slots__ = ('schedule', 'id', 'is_active', 'start_date', 'end_date', 'content_type', 'created_key')
+
+    def __init__(self, schedule, content_type):
+        self.schedule = schedule
+        self.id = schedule.id
+        self.is_active = bool(schedule.is_active)
+        self.start_date = schedule.start_date
+        self.end_date = schedule.end_date
+        self.content_type = content_type
+        created_at = getattr(schedule, 'created_at', None)
+        # Mais recente = created_at maior (sem created_at fica por baixo); empate pelo id
+        self.created_key = (created_at is not None, created_at, str(schedule.id))
+
+    def dates_overlap(self, start_date, end_date):
+        return (self.start_date is not None and self.end_date is not None
+                and self.start_date <= end_date and self.end_date >= start_date)
+
+
+class ScheduleConflictIndex:
+    """Conflitos entre agendamentos de um conjunto e contra candidatos novos.
+
+    `missing_times_all_day` define se agendamentos sem horário ocupam o dia
+    todo ou nenhum horário; `empty_days_all`, se days_of_week vazio ocupa
+    todos os dias ou nenhum (ver regras no topo do módulo).
+    """
+
+    def __init__(self, schedules, content_type_of=None, missing_times_all_day=False, empty_days_all=False):
+        self.missing_times_all_day = missing_times_all_day
+        self.empty_days_all = empty_days_all
+        content_type_of = content_type_of or (lambda s: s.content_type or 'main')
+        self._entries = {}
+        self._segments = defaultdict(lambda: defaultdict(list))  # player -> dia -> [(início, fim, entry)]
+        for schedule in schedules:
+            if schedule.id in self._entries or not schedule.player_id:
+                continue
+            entry = _Entry(schedule, content_type_of(schedule))
+            self._entries[entry.id] = entry
+            by_day = self._segments[schedule.player_id]
+            for day, start, end in time_segments(schedule.start_time, schedule.end_time, schedule.days_of_week,
+                                                  missing_times_all_day, empty_days_all):
+                by_day[day].append((start, end, entry))
+        self._starts = {}  # player -> dia -> [início] (para bisect)
+        for player_id, by_day in self._segments.items():
+            for segments in by_day.values():
+                segments.sort(key=lambda seg: (seg[0], seg[1]))
+            self._starts[player_id] = {day: [seg[0] for seg in segments] for day, segments in by_day.items()}
+        self._neighbors = None
+
+    # -------------------- Varredura --------------------
+    def _sweep(self):
+        """Pares sobrepostos (dias, horário e vigência) de todo o conjunto: id -> {ids}."""
+        neighbors = defaultdict(set)
+        for by_day in self._segments.values():
+            for segments in by_day.values():
+                open_segments = []  # heap (fim, seq, entry) dos segmentos ainda abertos
+                for seq, (start, end, entry) in enumerate(segments):
+                    while open_segments and open_segments[0][0] <= start:
+                        heapq.heappop(open_segments)
+                    for _, _, other in open_segments:
+                        if other.id != entry.id and entry.dates_overlap(other.start_date, other.end_date):
+                            neighbors[entry.id].add(other.id)
+                            neighbors[other.id].add(entry.id)
+                    heapq.heappush(open_segments, (end, seq, entry))
+        return neighbors
+
+    def _active_overlaps(self, schedule_id):
+        if self._neighbors is None:
+            self._neighbors = self._sweep()
+        return [self._entries[other_id] for other_id in self._neighbors.get(schedule_id, ())
+                if self._entries[other_id].is_active]
+
+    # -------------------- Anotações do calendário --------------------
+    def has_conflicts(self, schedule_id):
+        entry = self._entries.get(schedule_id)
+        if entry is None or entry.start_date is None or entry.end_date is None:
+            return False
+        return bool(self._active_overlaps(schedule_id))
+
+    def annotate(self, schedule_id):
+        """has_conflicts, conflict_type, overlap_priority e color_index de um agendamento do conjunto."""
+        entry = self._entries.get(schedule_id)
+        if entry is None:
+            return {'has_conflicts': False, 'conflict_type': 'normal', 'overlap_priority': 'normal', 'color_index': 0}
+        overlaps = self._active_overlaps(schedule_id)
+        has_conflicts = bool(overlaps) and entry.start_date is not None and entry.end_date is not None
+
+        if entry.content_type == 'overlay':
+            conflict_type = overlap_priority = 'overlay'
+        else:
+            # Sobrepor apenas overlays não é crítico; sobrepor conteúdo principal é
+            conflict_type = 'conflict' if any(o.content_type != 'overlay' for o in overlaps) else 'normal'
+            main_overlaps = [o for o in overlaps if o.content_type == 'main']
+            if not main_overlaps:
+                overlap_priority = 'normal'
+            elif all(o.created_key <= entry.created_key for o in main_overlaps):
+                overlap_priority = 'overlap_top'     # mais recente: cor mais vibrante
+            else:
+                overlap_priority = 'overlap_bottom'  # mais antigo: cor mais suave
+
+        # Sobrepostos recebem índices distintos (ordem estável por id); 0 = cor padrão
+        color_index = 0
+        if overlaps:
+            ordered = sorted([str(schedule_id)] + [str(o.id) for o in overlaps])
+            color_index = (ordered.index(str(schedule_id)) + 1) % COLOR_SLOTS
+
+        return {
+            'has_conflicts': has_conflicts,
+            'conflict_type': conflict_type,
+            'overlap_priority': overlap_priority,
+            'color_index': color_index,
+        }
+
+    def annotations(self):
+        return {schedule_id: self.annotate(schedule_id) for schedule_id in self._entries}
+
+    # -------------------- Candidatos novos --------------------
+    def conflicts_for(self, player_id, start_date, end_date, start_time, end_time, days_of_week,
+                      content_type=None, exclude_id=None):
+        """Agendamentos ativos do player que conflitam com a janela informada.
+
+        Com `content_type`, só conta quem tem o mesmo tipo (overlay não conflita com main).
+        """
+        by_day = self._segments.get(player_id)
+        if not by_day:
+            return []
+        starts = self._starts[player_id]
+        found = {}
+        for day, start, end in time_segments(start_time, end_time, days_of_week,
+                                              self.missing_times_all_day, self.empty_days_all):
+            segments = by_day.get(day, ())
+            # Segmentos que começam antes do fim do candidato; basta checar o fim de cada um
+            for seg_start, seg_end, entry in segments[:bisect_left(starts.get(day, ()), end)]:
+                if seg_end <= start or entry.id in found or entry.id == exclude_id or not entry.is_active:
+                    continue
+                if content_type is not None and entry.content_type != content_type:
+                    continue
+                if entry.dates_overlap(start_date, end_date):
+                    found[entry.id] = entry.schedule
+        return list(found.values())
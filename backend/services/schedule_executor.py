@@ -1,14 +1,16 @@
 import logging
 import os
+import threading
 from datetime import datetime, time, date
 from typing import List
+from flask import current_app
 from database import db
 from models.schedule import Schedule
 from models.player import Player
 from models.campaign import Campaign, CampaignContent, PlaybackEvent
-from models.content import Content
-from services.chromecast_service import chromecast_service
-from sqlalchemy import or_
+from services.chromecast_service import CastConnectionError, chromecast_service
+from services.schedule_timeline import schedule_timeline
+from services.media_store import media_rel_path
 
 logger = logging.getLogger(__name__)
 
@@ -24,85 +26,115 @@ class ScheduleExecutor:
         self.active_overlays = {}    # player_id -> schedule_id (for overlay content)
         self.current_content_tracking = {}  # "player_id_schedule_id" -> current_content_id
         self.current_content_started_at = {}  # "player_id_schedule_id" -> datetime started
+        self.active_sets = {}  # player_id -> {'main': [schedule_id], 'overlay': [schedule_id]} avaliado na timeline
+        self._tick_lock = threading.Lock()
+        # Tracking de rotação é escrito também pelas threads do cast_dispatcher (callback do LOAD)
+        self._tracking_lock = threading.RLock()
+        self._tracking_generation = {}  # player_id -> incrementado a cada limpeza do tracking
     
     def check_and_execute_schedules(self):
-        """Verifica e executa agendamentos que devem estar ativos agora"""
+        """Verifica e executa agendamentos que devem estar ativos agora.
+
+        Usa a timeline em memória: só reavalia players cujo limite de janela passou
+        ou cujos agendamentos mudaram, e só consulta o banco pelos agendamentos
+        ativos que precisam de execução ou rotação.
+        """
+        if not self._tick_lock.acquire(blocking=False):
+            # Outra verificação (tick do minuto ou despertar de limite) já está rodando
+            return
         try:
             logger.info("Verificando agendamentos ativos...")
-            print(f"[DEBUG] Iniciando verificação de agendamentos às {datetime.now()}")
-            
+
             # Usar horário local ao invés de UTC
             now = datetime.now()
-            current_time = now.time()
-            current_date = now.date()
-            current_weekday = now.weekday()  # 0=segunda, 6=domingo
-            
-            print(f"[DEBUG] Data atual: {current_date}, Hora: {current_time}, Dia da semana: {current_weekday}")
-            
-            # Debug: Verificar todos os agendamentos primeiro
-            all_schedules = Schedule.query.all()
-            print(f"[DEBUG] Total de agendamentos no banco: {len(all_schedules)}")
-            
-            for s in all_schedules:
-                campaign = Campaign.query.get(s.campaign_id)
-                campaign_active = campaign.is_active if campaign else False
-                print(f"[DEBUG] Schedule: {s.name}, is_active: {s.is_active}, campaign_active: {campaign_active}, start_date: {s.start_date}, end_date: {s.end_date}")
-            
-            # Buscar agendamentos que devem estar ativos - incluindo verificação da campanha ativa
-            active_schedules = Schedule.query.join(Campaign).filter(
-                Schedule.is_active == True,
-                Campaign.is_active == True,  # ✅ CORREÇÃO CRÍTICA: Verificar se campanha está ativa
-                db.func.date(Schedule.start_date) <= current_date,
-                or_(Schedule.end_date.is_(None), db.func.date(Schedule.end_date) >= current_date)
-            ).all()
-            
-            print(f"[DEBUG] Encontrados {len(active_schedules)} agendamentos ativos")
-            
-            # Agrupar agendamentos por player e tipo de conteúdo
-            player_schedules = {}
-            for schedule in active_schedules:
-                if self._should_execute_now(schedule, current_time, current_weekday):
-                    player_id = schedule.player_id
-                    if player_id not in player_schedules:
-                        player_schedules[player_id] = {'main': [], 'overlay': []}
-                    
-                    # Determinar tipo de conteúdo baseado na campanha
-                    content_type = self._get_content_type(schedule)
-                    player_schedules[player_id][content_type].append(schedule)
-            
+
+            schedule_timeline.refresh(now)
+            due_players = schedule_timeline.pop_due_players(now)
+
+            changed_players = set()
+            active_ids = schedule_timeline.active_schedule_ids(now) if due_players else set()
+            for player_id in due_players:
+                active_set = self._evaluate_player_active_set(player_id, active_ids)
+                if not (active_set['main'] or active_set['overlay']):
+                    active_set = None
+                if active_set == self.active_sets.get(player_id):
+                    continue
+                changed_players.add(player_id)
+                if active_set:
+                    self.active_sets[player_id] = active_set
+                else:
+                    # Nada mais ativo: limpar tracking para permitir reexecução futura
+                    self.active_sets.pop(player_id, None)
+                    self._clear_player_tracking(player_id)
+
+            if changed_players:
+                print(f"[Schedule] {len(changed_players)} player(s) com conjunto ativo alterado")
+
+            # Players que precisam de ação: conjunto mudou ou há conteúdo em rotação
+            targets = [pid for pid in self.active_sets
+                       if pid in changed_players or self._has_rotation_tracking(pid)]
+            if not targets:
+                return
+
+            schedule_ids = set()
+            for pid in targets:
+                schedule_ids.update(self.active_sets[pid]['main'])
+                schedule_ids.update(self.active_sets[pid]['overlay'])
+            loaded = {s.id: s for s in Schedule.query.filter(Schedule.id.in_(list(schedule_ids))).all()}
+
             # Executar agendamentos para cada player
-            for player_id, schedules in player_schedules.items():
+            for player_id in targets:
+                active_set = self.active_sets[player_id]
+                schedules = {
+                    'main': [loaded[sid] for sid in active_set['main'] if sid in loaded],
+                    'overlay': [loaded[sid] for sid in active_set['overlay'] if sid in loaded],
+                }
                 self._execute_player_schedules(player_id, schedules)
-                
+
         except Exception as e:
             logger.error(f"Erro ao verificar agendamentos: {e}")
             print(f"[ERROR] Erro ao verificar agendamentos: {e}")
-    
-    def _get_content_type(self, schedule):
-        """Determina o tipo de conteúdo baseado na campanha e conteúdo"""
-        try:
-            campaign = Campaign.query.get(schedule.campaign_id)
-            if not campaign:
-                return 'main'
-            
-            # Buscar primeiro conteúdo da campanha para determinar tipo
-            campaign_content = CampaignContent.query.filter_by(
-                campaign_id=campaign.id
-            ).order_by(CampaignContent.order_index).first()
-            
-            if campaign_content:
-                content = Content.query.get(campaign_content.content_id)
-                if content:
-                    # Considerar imagens como overlay se o nome contém "logo" ou se é do tipo image
-                    if ('logo' in content.title.lower() or 
-                        'overlay' in content.title.lower() or 
-                        content.content_type == 'image'):
-                        return 'overlay'
-            
-            return 'main'
-        except Exception as e:
-            logger.error(f"Erro ao determinar tipo de conteúdo: {e}")
-            return 'main'
+        finally:
+            self._tick_lock.release()
+
+    def next_wakeup(self):
+        """Próximo instante em que algum agendamento começa/termina (para despertar o job)."""
+        return schedule_timeline.next_boundary()
+
+    def _evaluate_player_active_set(self, player_id, active_ids):
+        """Agrupa por tipo os IDs dos agendamentos do player presentes em `active_ids`."""
+        active_set = {'main': [], 'overlay': []}
+        for snap in schedule_timeline.schedules_for_player(player_id):
+            if snap.id in active_ids:
+                active_set[snap.content_type].append(snap.id)
+        active_set['main'].sort()
+        active_set['overlay'].sort()
+        return active_set
+
+    def _has_rotation_tracking(self, player_id):
+        prefix = f"{player_id}_"
+        with self._tracking_lock:
+            return any(key.startswith(prefix) for key in self.current_content_started_at)
+
+    def _clear_player_tracking(self, player_id):
+        self.active_executions.pop(player_id, None)
+        self.active_overlays.pop(player_id, None)
+        prefix = f"{player_id}_"
+        with self._tracking_lock:
+            # LOADs ainda na fila deste player não devem recriar o tracking ao terminar
+            self._tracking_generation[player_id] = self._tracking_generation.get(player_id, 0) + 1
+            for tracking in (self.current_content_tracking, self.current_content_started_at):
+                for key in [k for k in tracking if k.startswith(prefix)]:
+                    del tracking[key]
+
+    def _record_content_loaded(self, player_id, schedule_id, content_id, generation):
+        """Marca o conteúdo carregado e o início da reprodução, se o tracking do player não foi limpo desde o envio."""
+        with self._tracking_lock:
+            if self._tracking_generation.get(player_id, 0) != generation:
+                return False
+            self._update_current_content_for_player(player_id, schedule_id, content_id)
+            self._set_content_started_at(player_id, schedule_id, datetime.now())
+            return True
     
     def _execute_player_schedules(self, player_id, schedules):
         """Executa agendamentos para um player específico, permitindo overlay + main content"""
@@ -159,80 +191,32 @@ class ScheduleExecutor:
             print(f"[ERROR] Erro ao executar agendamentos do player {player_id}: {e}")
     
     def _execute_chromecast_schedule(self, schedule: Schedule, player: Player, campaign: Campaign, content_type: str):
-        """Executa agendamento em um Chromecast"""
+        """Executa agendamento em um Chromecast.
+
+        O LOAD é enfileirado na thread do dispositivo (chromecast_service.load_media_async)
+        e o resultado é tratado em _on_chromecast_load_done: um Chromecast lento não
+        segura o tick do executor nem os demais dispositivos.
+        """
         try:
+            player_chromecast_id = str(player.chromecast_id) if player.chromecast_id else None
+            if not player_chromecast_id:
+                logger.error(f"Player {player.name} não tem chromecast_id configurado")
+                return
+
             # Prefer compiled video for main content if available and not stale
             if content_type == 'main':
                 if getattr(campaign, 'compiled_video_status', None) == 'ready' and not getattr(campaign, 'compiled_stale', False) and getattr(campaign, 'compiled_video_path', None):
                     compiled_url = f"{MEDIA_BASE_URL}/uploads/{campaign.compiled_video_path}?pid={player.id}"
                     print(f"[DEBUG] Usando vídeo compilado da campanha: {compiled_url}")
-
-                    player_chromecast_id = str(player.chromecast_id) if player.chromecast_id else None
-                    if not player_chromecast_id:
-                        logger.error(f"Player {player.name} não tem chromecast_id configurado")
-                        return
-
-                    device_name_for_discovery = getattr(player, 'chromecast_name', None) or player.name
-                    connection_success, actual_device_id = chromecast_service.connect_to_device(
-                        device_id=player_chromecast_id,
-                        device_name=device_name_for_discovery
-                    )
-                    if not connection_success:
-                        logger.error(f"Falha ao conectar ao Chromecast {player.name} para vídeo compilado")
-                        return
-
-                    # Load compiled media
-                    success = chromecast_service.load_media(
-                        device_id=player_chromecast_id,
+                    self._submit_chromecast_load(
+                        schedule, player, campaign,
                         media_url=compiled_url,
-                        content_type='video/mp4',
-                        title=f"Campanha: {campaign.name} (Compilado)"
+                        mime_type='video/mp4',
+                        title=f"Campanha: {campaign.name} (Compilado)",
+                        content_id=None,
+                        content_title=f"Compilado - {campaign.name}",
+                        duration=getattr(campaign, 'compiled_video_duration', None),
                     )
-
-                    # Register event
-                    try:
-                        event = PlaybackEvent(
-                            campaign_id=str(campaign.id),
-                            schedule_id=str(schedule.id),
-                            player_id=str(player.id),
-                            content_id=None,
-                            started_at=datetime.now(),
-                            duration_seconds=int(getattr(campaign, 'compiled_video_duration', 0) or 0),
-                            success=bool(success),
-                            error_message=None if success else 'Chromecast load_media failed (compiled)'
-                        )
-                        db.session.add(event)
-                        db.session.commit()
-                    except Exception as e:
-                        logger.error(f"Erro ao registrar PlaybackEvent (compilado): {e}")
-                        db.session.rollback()
-
-                    if success:
-                        print(f"[SUCCESS] Vídeo compilado enviado para {player.name}")
-                        # Track as a synthetic content id for rotation control
-                        self._update_current_content_for_player(player.id, schedule.id, 'compiled')
-                        self._set_content_started_at(player.id, schedule.id, datetime.now())
-                        # Update player status
-                        try:
-                            player.status = 'online'
-                            player.last_ping = datetime.now()
-                            player.last_seen = datetime.now()
-                            db.session.commit()
-                        except Exception:
-                            db.session.rollback()
-                        # Notify via socket
-                        if self.socketio:
-                            self.socketio.emit('schedule_executed', {
-                                'schedule_id': str(schedule.id),
-                                'player_id': str(player.id),
-                                'content_id': None,
-                                'content_title': f"Compilado - {campaign.name}",
-                                'campaign_id': str(campaign.id),
-                                'campaign_name': campaign.name,
-                                'playback_mode': schedule.get_effective_playback_mode(),
-                                'duration': getattr(campaign, 'compiled_video_duration', None),
-                                'status': 'playing'
-                            }, room=f'player_{player.id}')
                     return
 
             # Obter conteúdos filtrados da campanha
@@ -260,164 +244,144 @@ class ScheduleExecutor:
             
             # Construir URL do conteúdo
             if content.file_path:
-                filename = content.file_path.split('/')[-1]
+                filename = media_rel_path(content.file_path)
                 content_url = f"{MEDIA_BASE_URL}/uploads/{filename}?pid={player.id}"
                 print(f"[DEBUG] Enviando para Chromecast: {content_url}")
             else:
                 print(f"[ERROR] Conteúdo {content.title} não tem arquivo associado")
                 return
             
-            # Obter IDs como strings para evitar problemas de UUID
-            player_chromecast_id = str(player.chromecast_id) if player.chromecast_id else None
-            if not player_chromecast_id:
-                logger.error(f"Player {player.name} não tem chromecast_id configurado")
-                return
-            
-            print(f"[DEBUG] Tentando conectar ao Chromecast:")
-            print(f"[DEBUG] - Player: {player.name}")
-            print(f"[DEBUG] - Chromecast ID: {player_chromecast_id}")
-            print(f"[DEBUG] - Chromecast Name: {getattr(player, 'chromecast_name', 'N/A')}")
-            
-            # Tentar conectar usando UUID e nome do dispositivo
-            # CORREÇÃO: Usar chromecast_name se disponível, senão usar nome do player
-            device_name_for_discovery = getattr(player, 'chromecast_name', None) or player.name
-            
-            print(f"[DEBUG] - Nome para descoberta: {device_name_for_discovery}")
-            
-            connection_success, actual_device_id = chromecast_service.connect_to_device(
-                device_id=player_chromecast_id,
-                device_name=device_name_for_discovery  # Usar nome correto do dispositivo
-            )
-            
-            print(f"[DEBUG] Resultado da conexão:")
-            print(f"[DEBUG] - Success: {connection_success}")
-            print(f"[DEBUG] - Actual Device ID: {actual_device_id}")
-            
-            if not connection_success:
-                logger.error(f"Falha ao conectar ao Chromecast {player.name} após todas as tentativas")
-                print(f"[ERROR] Falha ao conectar ao Chromecast {player.name}")
-                
-                # Tentar atualizar status do player para offline
-                try:
-                    player.status = 'offline'
-                    player.last_seen = datetime.now()
-                    db.session.commit()
-                    logger.info(f"Status do player {player.name} atualizado para offline")
-                except Exception as e:
-                    logger.error(f"Erro ao atualizar status do player: {e}")
-                    db.session.rollback()
-                
-                # Registrar evento de reprodução (falha)
-                try:
-                    event = PlaybackEvent(
-                        campaign_id=str(campaign.id),
-                        schedule_id=str(schedule.id),
-                        player_id=str(player.id),
-                        content_id=str(content.id),
-                        started_at=datetime.now(),
-                        duration_seconds=int(next_content_item.get_effective_duration() or 0),
-                        success=False,
-                        error_message="Chromecast connection failed"
-                    )
-                    db.session.add(event)
-                    db.session.commit()
-                except Exception as e:
-                    logger.error(f"Erro ao registrar PlaybackEvent (falha): {e}")
-                    db.session.rollback()
-                
-                return
-            
-            # Usar o device_id original para load_media (compatibilidade)
-            device_id_for_media = player_chromecast_id
-            
-            # Determinar tipo de mídia
-            media_type = self._infer_mime_type_from_content(content)
-            
-            # Enviar mídia para o Chromecast
-            success = chromecast_service.load_media(
-                device_id=device_id_for_media,
+            self._submit_chromecast_load(
+                schedule, player, campaign,
                 media_url=content_url,
-                content_type=media_type,
-                title=content.title or "Conteúdo da Campanha"
+                mime_type=self._infer_mime_type_from_content(content),
+                title=content.title or "Conteúdo da Campanha",
+                content_id=str(content.id),
+                content_title=content.title,
+                duration=next_content_item.get_effective_duration(),
             )
-            
-            if success:
-                logger.info(f"Conteúdo '{content.title}' enviado para {player.name}")
-                print(f"[SUCCESS] Conteúdo '{content.title}' enviado para {player.name}")
-                
-                # Registrar evento de reprodução (sucesso)
-                try:
-                    event = PlaybackEvent(
-                        campaign_id=str(campaign.id),
-                        schedule_id=str(schedule.id),
-                        player_id=str(player.id),
-                        content_id=str(content.id),
-                        started_at=datetime.now(),
-                        duration_seconds=int(next_content_item.get_effective_duration() or 0),
-                        success=True
-                    )
-                    db.session.add(event)
-                    db.session.commit()
-                except Exception as e:
-                    logger.error(f"Erro ao registrar PlaybackEvent (sucesso): {e}")
-                    db.session.rollback()
-                
-                # Atualizar controle de conteúdo atual
-                self._update_current_content_for_player(player.id, schedule.id, content.id)
-                # Marcar início da reprodução do conteúdo atual
-                self._set_content_started_at(player.id, schedule.id, datetime.now())
-                
-                # Atualizar status do player
-                try:
-                    player.status = 'online'
-                    player.last_ping = datetime.now()
-                    player.last_seen = datetime.now()
-                    db.session.commit()
-                    logger.info(f"Status do player {player.name} atualizado para online")
-                except Exception as e:
-                    logger.error(f"Erro ao atualizar status do player: {e}")
-                    db.session.rollback()
-                
-                # Notificar via WebSocket se disponível
-                if self.socketio:
-                    self.socketio.emit('schedule_executed', {
-                        'schedule_id': str(schedule.id),
-                        'player_id': str(player.id),
-                        'content_id': str(content.id),
-                        'content_title': content.title,
-                        'campaign_id': str(campaign.id),
-                        'campaign_name': campaign.name,
-                        'playback_mode': schedule.get_effective_playback_mode(),
-                        'duration': next_content_item.get_effective_duration(),
-                        'status': 'playing'
-                    }, room=f'player_{player.id}')
-            else:
-                logger.error(f"Falha ao enviar conteúdo para {player.name}")
-                print(f"[ERROR] Falha ao carregar mídia no Chromecast {player.name}")
-                
-                # Registrar evento de reprodução (falha)
-                try:
-                    event = PlaybackEvent(
-                        campaign_id=str(campaign.id),
-                        schedule_id=str(schedule.id),
-                        player_id=str(player.id),
-                        content_id=str(content.id),
-                        started_at=datetime.now(),
-                        duration_seconds=int(next_content_item.get_effective_duration() or 0),
-                        success=False,
-                        error_message="Chromecast load_media failed"
-                    )
-                    db.session.add(event)
-                    db.session.commit()
-                except Exception as e:
-                    logger.error(f"Erro ao registrar PlaybackEvent (falha): {e}")
-                    db.session.rollback()
                  
         except Exception as e:
             logger.error(f"Erro ao executar agendamento Chromecast: {e}")
             print(f"[ERROR] Erro ao executar agendamento Chromecast: {e}")
             import traceback
             print(f"[ERROR] Traceback: {traceback.format_exc()}")
+
+    def _submit_chromecast_load(self, schedule, player, campaign, media_url, mime_type, title,
+                                content_id, content_title, duration):
+        """Enfileira o LOAD no dispositivo; o registro do resultado fica no callback."""
+        # CORREÇÃO: Usar chromecast_name se disponível, senão usar nome do player
+        device_name_for_discovery = getattr(player, 'chromecast_name', None) or player.name
+        context = {
+            'app': current_app._get_current_object(),
+            'schedule_id': str(schedule.id),
+            'player_id': str(player.id),
+            'player_name': player.name,
+            'campaign_id': str(campaign.id),
+            'campaign_name': campaign.name,
+            'playback_mode': schedule.get_effective_playback_mode(),
+            'content_id': content_id,
+            'content_title': content_title,
+            'duration': duration,
+        }
+        with self._tracking_lock:
+            context['generation'] = self._tracking_generation.get(context['player_id'], 0)
+        # O espelho de status já mostra este URL em reprodução: nada a enviar
+        if chromecast_service.is_playing(str(player.chromecast_id), media_url):
+            print(f"[DEBUG] {player.name} já reproduz '{title}'; LOAD redundante ignorado")
+            with self._tracking_lock:
+                self._update_current_content_for_player(context['player_id'], context['schedule_id'], content_id or 'compiled')
+                if not self._get_content_started_at(context['player_id'], context['schedule_id']):
+                    self._set_content_started_at(context['player_id'], context['schedule_id'], datetime.now())
+            return None
+        print(f"[DEBUG] Enfileirando LOAD para {player.name} ({player.chromecast_id}): {title}")
+        future = chromecast_service.load_media_async(
+            device_id=str(player.chromecast_id),
+            media_url=media_url,
+            content_type=mime_type,
+            title=title,
+            device_name=device_name_for_discovery
+        )
+        future.add_done_callback(lambda f: self._on_chromecast_load_done(f, context))
+        return future
+
+    def _on_chromecast_load_done(self, future, context):
+        """Registra evento, tracking de rotação e status do player após o LOAD (thread do dispositivo)."""
+        player_name = context['player_name']
+        if future.cancelled():
+            print(f"[DEBUG] LOAD para {player_name} substituído por um mais recente")
+            return
+        error = future.exception()
+        success = error is None and bool(future.result())
+        connection_failed = isinstance(error, CastConnectionError)
+        if connection_failed:
+            error_message = "Chromecast connection failed"
+        elif not success:
+            error_message = 'Chromecast load_media failed' if context['content_id'] else 'Chromecast load_media failed (compiled)'
+        else:
+            error_message = None
+
+        with context['app'].app_context():
+            player_id = context['player_id']
+            schedule_id = context['schedule_id']
+            try:
+                event = PlaybackEvent(
+                    campaign_id=context['campaign_id'],
+                    schedule_id=schedule_id,
+                    player_id=player_id,
+                    content_id=context['content_id'],
+                    started_at=datetime.now(),
+                    duration_seconds=int(context['duration'] or 0),
+                    success=success,
+                    error_message=error_message
+                )
+                db.session.add(event)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Erro ao registrar PlaybackEvent: {e}")
+                db.session.rollback()
+
+            if success:
+                logger.info(f"Conteúdo '{context['content_title']}' enviado para {player_name}")
+                print(f"[SUCCESS] Conteúdo '{context['content_title']}' enviado para {player_name}")
+                # Tracking de rotação (id sintético 'compiled' para o vídeo compilado) e início da reprodução
+                if not self._record_content_loaded(player_id, schedule_id, context['content_id'] or 'compiled',
+                                                   context['generation']):
+                    print(f"[DEBUG] Tracking de {player_name} foi limpo durante o LOAD; não recriado")
+            elif connection_failed:
+                print(f"[ERROR] Falha ao conectar ao Chromecast {player_name}")
+            else:
+                print(f"[ERROR] Falha ao carregar mídia no Chromecast {player_name}")
+
+            # Atualizar status do player (online após sucesso, offline se não conectou)
+            if success or connection_failed:
+                try:
+                    player = db.session.get(Player, player_id)
+                    if player is not None:
+                        if success:
+                            player.status = 'online'
+                            player.last_ping = datetime.now()
+                        else:
+                            player.status = 'offline'
+                        player.last_seen = datetime.now()
+                        db.session.commit()
+                except Exception as e:
+                    logger.error(f"Erro ao atualizar status do player: {e}")
+                    db.session.rollback()
+
+        # Notificar via WebSocket se disponível
+        if success and self.socketio:
+            self.socketio.emit('schedule_executed', {
+                'schedule_id': schedule_id,
+                'player_id': player_id,
+                'content_id': context['content_id'],
+                'content_title': context['content_title'],
+                'campaign_id': context['campaign_id'],
+                'campaign_name': context['campaign_name'],
+                'playback_mode': context['playback_mode'],
+                'duration': context['duration'],
+                'status': 'playing'
+            }, room=f'player_{player_id}')
     
     def _get_content_type_chromecast(self, content_type: str) -> str:
         """Converte tipo de conteúdo para formato Chromecast"""
@@ -574,22 +538,24 @@ class ScheduleExecutor:
     def _update_current_content_for_player(self, player_id: str, schedule_id: str, content_id: str):
         """Atualiza o conteúdo atual sendo reproduzido pelo player para um agendamento"""
         key = f"{player_id}_{schedule_id}"
-        self.current_content_tracking[key] = content_id
+        with self._tracking_lock:
+            self.current_content_tracking[key] = content_id
 
     # ======= NOVAS FUNÇÕES PARA ROTAÇÃO =======
     def _get_key(self, player_id: str, schedule_id: str) -> str:
         return f"{player_id}_{schedule_id}"
 
     def _get_content_started_at(self, player_id: str, schedule_id: str):
-        return self.current_content_started_at.get(self._get_key(player_id, schedule_id))
+        with self._tracking_lock:
+            return self.current_content_started_at.get(self._get_key(player_id, schedule_id))
 
     def _set_content_started_at(self, player_id: str, schedule_id: str, started_at: datetime):
-        self.current_content_started_at[self._get_key(player_id, schedule_id)] = started_at
+        with self._tracking_lock:
+            self.current_content_started_at[self._get_key(player_id, schedule_id)] = started_at
 
     def _clear_content_started_at(self, player_id: str, schedule_id: str):
-        key = self._get_key(player_id, schedule_id)
-        if key in self.current_content_started_at:
-            del self.current_content_started_at[key]
+        with self._tracking_lock:
+            self.current_content_started_at.pop(self._get_key(player_id, schedule_id), None)
 
     def _rotate_if_needed(self, schedule: Schedule, content_type: str):
         """Verifica se o conteúdo atual já cumpriu a duração e avança para o próximo."""
@@ -629,94 +595,6 @@ class ScheduleExecutor:
             logger.error(f"Erro ao rotacionar conteúdo: {e}")
             print(f"[ERROR] Erro ao rotacionar conteúdo: {e}")
     
-    def _should_execute_now(self, schedule, current_time, current_weekday):
-        """Verifica se um agendamento deve ser executado agora"""
-        try:
-            print(f"[DEBUG] Verificando agendamento: {schedule.name}")
-            print(f"[DEBUG] - Player ID: {schedule.player_id}")
-            print(f"[DEBUG] - Horário: {schedule.start_time}")
-            print(f"[DEBUG] - End time: {schedule.end_time}")
-            print(f"[DEBUG] - Is persistent: {schedule.is_persistent}")
-            print(f"[DEBUG] - Content type: {schedule.content_type}")
-            print(f"[DEBUG] - Dias da semana: {schedule.days_of_week}")
-            print(f"[DEBUG] - Tipo de repetição: {schedule.repeat_type}")
-            
-            # Preparar lista de dias (0=segunda ... 6=domingo)
-            raw_days = [int(d) for d in schedule.days_of_week.split(',') if d.strip()]
-            days_of_week = [(6 if d == 0 else d - 1) for d in raw_days]
-
-            from datetime import time as time_obj
-            midnight = time_obj(0, 0, 0)
-
-            # Garantir que ambos horários existem (modelo exige, mas por segurança)
-            if schedule.start_time and schedule.end_time:
-                # Caso especial: persistente até meia-noite -> ativo após start_time somente no mesmo dia
-                if schedule.is_persistent and schedule.end_time == midnight:
-                    if current_time >= schedule.start_time:
-                        if current_weekday in days_of_week:
-                            print(f"[DEBUG] Persistente até 00:00 ativo após {schedule.start_time} no dia {current_weekday}")
-                            return True
-                        else:
-                            print(f"[DEBUG] Dia {current_weekday} não permitido para persistente até 00:00 {days_of_week}")
-                            return False
-                    else:
-                        print(f"[DEBUG] Ainda não chegou o horário (persistente até 00:00): {schedule.start_time} > {current_time}")
-                        return False
-
-                # Agendamento overnight (cruza a meia-noite)
-                if schedule.end_time < schedule.start_time:
-                    print(f"[DEBUG] Agendamento overnight detectado: {schedule.start_time} até {schedule.end_time} (próximo dia)")
-                    # Dentro da janela se: >= start OU <= end
-                    if current_time >= schedule.start_time or current_time <= schedule.end_time:
-                        # Se estamos após start_time, usar o próprio dia; se estamos antes (madrugada), usar o dia anterior
-                        weekday_to_check = current_weekday if current_time >= schedule.start_time else (current_weekday - 1) % 7
-                        if weekday_to_check in days_of_week:
-                            print(f"[DEBUG] Agendamento overnight ativo: {current_time} está no período válido (weekday={weekday_to_check})")
-                            return True
-                        else:
-                            print(f"[DEBUG] Overnight: dia {weekday_to_check} não está nos dias configurados {days_of_week}")
-                            return False
-                    else:
-                        print(f"[DEBUG] Agendamento overnight inativo: {current_time} fora da janela")
-                        return False
-                else:
-                    # Agendamento normal (mesmo dia): ativo entre start e end (com tolerância no fim)
-                    if current_time < schedule.start_time:
-                        print(f"[DEBUG] Ainda não chegou o horário: {schedule.start_time} > {current_time}")
-                        return False
-                    GRACE_SECONDS = 30
-                    def _time_to_seconds(t):
-                        return t.hour * 3600 + t.minute * 60 + t.second
-                    now_s = _time_to_seconds(current_time)
-                    start_s = _time_to_seconds(schedule.start_time)
-                    end_s = _time_to_seconds(schedule.end_time) + GRACE_SECONDS
-                    if start_s <= now_s <= end_s:
-                        if current_weekday in days_of_week:
-                            print(f"[DEBUG] Agendamento normal ativo com tolerância: {current_time} entre {schedule.start_time} e {schedule.end_time} (+{GRACE_SECONDS}s)")
-                            return True
-                        else:
-                            print(f"[DEBUG] Dia da semana {current_weekday} não está nos dias configurados {days_of_week}")
-                            return False
-                    else:
-                        print(f"[DEBUG] Agendamento normal já passou: {schedule.end_time} < {current_time}")
-                        return False
-
-            # Fallback: se não há end_time definido, considerar após start_time e dia permitido
-            if schedule.start_time:
-                if current_time >= schedule.start_time and current_weekday in days_of_week:
-                    print(f"[DEBUG] Fallback ativo: após start_time e dia permitido")
-                    return True
-                else:
-                    print(f"[DEBUG] Fallback inativo: antes de start_time ou dia não permitido")
-                    return False
-
-            print(f"[DEBUG] Agendamento {schedule.name} deve ser executado agora!")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erro ao verificar se deve executar agendamento: {e}")
-            return False
-    
     def _cleanup_inactive_executions(self):
         """Para execuções que não devem mais estar ativas"""
         for player_id, executions in list(self.active_executions.items()):
@@ -727,8 +605,8 @@ class ScheduleExecutor:
                     
                     player = Player.query.get(player_id)
                     if player and player.chromecast_id:
-                        # Parar reprodução no Chromecast
-                        chromecast_service.send_command(player.chromecast_id, 'stop')
+                        # Parar reprodução no Chromecast (enfileirado; não espera o dispositivo)
+                        chromecast_service.send_command_async(str(player.chromecast_id), 'stop')
                     
                     # Remover da lista de execuções ativas
                     del self.active_executions[player_id][content_type]
@@ -753,12 +631,14 @@ class ScheduleExecutor:
     def _get_current_content_for_player(self, player_id: str, schedule_id: str) -> str:
         """Obtém o conteúdo atual sendo reproduzido pelo player para um agendamento"""
         key = f"{player_id}_{schedule_id}"
-        return self.current_content_tracking.get(key)
+        with self._tracking_lock:
+            return self.current_content_tracking.get(key)
     
     def _update_current_content_for_player(self, player_id: str, schedule_id: str, content_id: str):
         """Atualiza o conteúdo atual sendo reproduzido pelo player para um agendamento"""
         key = f"{player_id}_{schedule_id}"
-        self.current_content_tracking[key] = content_id
+        with self._tracking_lock:
+            self.current_content_tracking[key] = content_id
 
 # Instância global do executor
 schedule_executor = ScheduleExecutor()
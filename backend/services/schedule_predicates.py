@@ -0,0 +1,194 @@
+"""Predicados de ativação de agendamentos pré-compilados.
+
+Cada agendamento é reduzido a poucos inteiros (máscara de dias da semana,
+início/fim em segundos do dia, flags overnight/persistente e a vigência como
+ordinais de data) guardados em colunas `array`. A pergunta "quem está ativo
+agora?" vira uma única passada sobre a tabela — com máscaras NumPy quando a
+biblioteca estiver instalada, ou um laço simples sobre as colunas caso
+contrário. Executor, endpoint de playlist e dashboard usam a mesma regra.
+"""
+from array import array
+from datetime import datetime, time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+ALL_DAYS_MASK = 0x7F  # bits 0..6 = segunda..domingo (weekday() do Python)
+
+# Flags por agendamento
+FLAG_OVERNIGHT = 1            # janela cruza a meia-noite (ex: 22:00 -> 06:00)
+FLAG_PERSISTENT_MIDNIGHT = 2  # persistente até 00:00: ativo após o início no mesmo dia
+FLAG_NO_END = 4               # sem end_time: ativo após o início
+FLAG_ALWAYS = 8               # sem horários: apenas dia/vigência contam
+
+# Vigência aberta
+MIN_ORDINAL = 0
+MAX_ORDINAL = 2 ** 31 - 1
+
+MIDNIGHT = time(0, 0, 0)
+
+
+def parse_days_of_week(raw):
+    """Converte "0,1,2" (0=Dom..6=Sáb, formato do frontend) para dias Python (0=Seg..6=Dom).
+
+    Valor vazio ou inválido significa todos os dias.
+    """
+    try:
+        raw_days = [int(d) for d in str(raw or '').split(',') if d.strip()]
+    except Exception:
+        return list(range(7))
+    if not raw_days:
+        return list(range(7))
+    return [(6 if d == 0 else d - 1) for d in raw_days if 0 <= d <= 6]
+
+
+def weekday_mask(raw):
+    mask = 0
+    for d in parse_days_of_week(raw):
+        mask |= 1 << d
+    return mask
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _ordinal(value, default):
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+def compile_schedule(schedule):
+    """Compila um agendamento (model ou snapshot) em (mask, start_s, end_s, flags, start_ord, end_ord)."""
+    start_time = getattr(schedule, 'start_time', None)
+    end_time = getattr(schedule, 'end_time', None)
+    flags = 0
+    start_s = _seconds(start_time) if start_time else 0
+    end_s = _seconds(end_time) if end_time else 0
+    if start_time and end_time:
+        if getattr(schedule, 'is_persistent', False) and end_time == MIDNIGHT:
+            flags |= FLAG_PERSISTENT_MIDNIGHT
+        elif end_time < start_time:
+            flags |= FLAG_OVERNIGHT
+    elif start_time:
+        flags |= FLAG_NO_END
+    else:
+        flags |= FLAG_ALWAYS
+    return (
+        weekday_mask(getattr(schedule, 'days_of_week', None)),
+        start_s,
+        end_s,
+        flags,
+        _ordinal(getattr(schedule, 'start_date', None), MIN_ORDINAL),
+        _ordinal(getattr(schedule, 'end_date', None), MAX_ORDINAL),
+    )
+
+
+class CompiledScheduleTable:
+    """Tabela colunar de predicados compilados, indexada por uma chave (ID do agendamento)."""
+
+    def __init__(self, schedules=(), key=lambda s: s.id):
+        self.keys = []
+        self.mask = array('B')
+        self.start_s = array('l')
+        self.end_s = array('l')
+        self.flags = array('B')
+        self.start_ord = array('l')
+        self.end_ord = array('l')
+        for schedule in schedules:
+            self.add(key(schedule), schedule)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, schedule):
+        mask, start_s, end_s, flags, start_ord, end_ord = compile_schedule(schedule)
+        self.keys.append(key)
+        self.mask.append(mask)
+        self.start_s.append(start_s)
+        self.end_s.append(end_s)
+        self.flags.append(flags)
+        self.start_ord.append(start_ord)
+        self.end_ord.append(end_ord)
+
+    def active_flags(self, now=None, grace_seconds=0):
+        """Lista de bools (uma por linha) indicando quem está ativo em `now`.
+
+        `grace_seconds` estende o fim das janelas normais (mesmo dia).
+        """
+        if not self.keys:
+            return []
+        now = now or datetime.now()
+        today_bit = 1 << now.weekday()
+        yesterday_bit = 1 << ((now.weekday() - 1) % 7)
+        now_s = _seconds(now)
+        today = now.toordinal()
+        if np is not None:
+            return self._active_numpy(now_s, today, today_bit, yesterday_bit, grace_seconds).tolist()
+        return self._active_python(now_s, today, today_bit, yesterday_bit, grace_seconds)
+
+    def _active_numpy(self, now_s, today, today_bit, yesterday_bit, grace_seconds):
+        mask = np.frombuffer(self.mask, dtype=np.uint8)
+        start_s = np.frombuffer(self.start_s, dtype=np.dtype('l'))
+        end_s = np.frombuffer(self.end_s, dtype=np.dtype('l'))
+        flags = np.frombuffer(self.flags, dtype=np.uint8)
+        start_ord = np.frombuffer(self.start_ord, dtype=np.dtype('l'))
+        end_ord = np.frombuffer(self.end_ord, dtype=np.dtype('l'))
+
+        in_dates = (start_ord <= today) & (today <= end_ord)
+        today_ok = (mask & today_bit) != 0
+        after_start = start_s <= now_s
+        overnight = (flags & FLAG_OVERNIGHT) != 0
+        after_start_only = (flags & (FLAG_PERSISTENT_MIDNIGHT | FLAG_NO_END)) != 0
+        always = (flags & FLAG_ALWAYS) != 0
+        normal = ~(overnight | after_start_only | always)
+
+        active = (
+            (normal & today_ok & after_start & (now_s <= end_s + grace_seconds))
+            | (after_start_only & today_ok & after_start)
+            | (overnight & ((today_ok & after_start)
+                            | (((mask & yesterday_bit) != 0) & (now_s <= end_s))))
+            | (always & today_ok)
+        )
+        return active & in_dates
+
+    def _active_python(self, now_s, today, today_bit, yesterday_bit, grace_seconds):
+        out = []
+        append = out.append
+        for mask, start_s, end_s, flags, start_ord, end_ord in zip(
+                self.mask, self.start_s, self.end_s, self.flags, self.start_ord, self.end_ord):
+            if start_ord > today or today > end_ord:
+                append(False)
+            elif flags & FLAG_OVERNIGHT:
+                append(bool((mask & today_bit and now_s >= start_s)
+                            or (mask & yesterday_bit and now_s <= end_s)))
+            elif not mask & today_bit:
+                append(False)
+            elif flags & FLAG_ALWAYS:
+                append(True)
+            elif flags & (FLAG_PERSISTENT_MIDNIGHT | FLAG_NO_END):
+                append(now_s >= start_s)
+            else:
+                append(start_s <= now_s <= end_s + grace_seconds)
+        return out
+
+    def active_keys(self, now=None, grace_seconds=0):
+        """Chaves das linhas ativas em `now`."""
+        return [k for k, ok in zip(self.keys, self.active_flags(now, grace_seconds)) if ok]
+
+
+def filter_active_schedules(schedules, now=None, grace_seconds=0):
+    """Filtra uma lista de agendamentos mantendo a ordem, avaliando todos numa passada."""
+    schedules = list(schedules)
+    table = CompiledScheduleTable(schedules, key=lambda s: s)
+    return [s for s, ok in zip(schedules, table.active_flags(now, grace_seconds)) if ok]
+
+
+def is_schedule_active(schedule, now=None, grace_seconds=0):
+    """Avalia um único agendamento (mesma regra da tabela)."""
+    return bool(CompiledScheduleTable([schedule], key=lambda s: s).active_flags(now, grace_seconds)[0])
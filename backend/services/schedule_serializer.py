@@ -0,0 +1,78 @@
+"""Serialização em lote de agendamentos para os endpoints de listagem.
+
+Schedule.to_dict() embute player (com location), campanha (que percorre os
+conteúdos) e ainda consultava os conflitos de cada linha: uma página de N
+agendamentos custava dezenas de consultas por item. Aqui:
+
+- `schedule_load_options(view)` carrega player→location e campanha por JOIN e
+  os conteúdos das campanhas com um único SELECT ... IN (apenas em 'full');
+- `conflict_flags(schedules)` calcula has_conflicts de todo o conjunto com uma
+  só consulta dos agendamentos ativos dos players envolvidos;
+- `serialize_schedules(schedules, view)` gera a projeção 'full' (to_dict) ou
+  'summary' (to_summary_dict, sem player/campanha embutidos).
+
+O número de consultas por requisição fica constante, independente do tamanho
+da página.
+"""
+from sqlalchemy.orm import joinedload
+
+from models.schedule import Schedule
+from models.campaign import Campaign
+from models.player import Player
+from services.schedule_conflicts import ScheduleConflictIndex
+
+VIEWS = ('full', 'summary')
+DEFAULT_VIEW = 'full'
+
+
+def resolve_view(raw):
+    """Valor do query param `view` normalizado ('full' quando ausente/inválido)."""
+    view = str(raw or DEFAULT_VIEW).strip().lower()
+    return view if view in VIEWS else DEFAULT_VIEW
+
+
+def schedule_load_options(view=DEFAULT_VIEW):
+    """Opções de carregamento antecipado para Schedule.query.options(...)."""
+    options = [joinedload(Schedule.player).joinedload(Player.location)]
+    if view == 'summary':
+        options.append(joinedload(Schedule.campaign))
+    else:
+        # Coleção via SELECT ... IN: não multiplica linhas nem quebra LIMIT da paginação
+        options.append(joinedload(Schedule.campaign).selectinload(Campaign.contents))
+    return options
+
+
+def conflict_flags(schedules):
+    """has_conflicts por id, com a mesma regra de Schedule.has_conflicts_with_other_schedules.
+
+    Uma única consulta traz os agendamentos ativos dos players do conjunto que
+    tocam a vigência total; os pares são resolvidos em memória pelo
+    ScheduleConflictIndex.
+    """
+    flags = {schedule.id: False for schedule in schedules}
+    eligible = [s for s in schedules if s.player_id and s.start_date and s.end_date]
+    if not eligible:
+        return flags
+
+    player_ids = {s.player_id for s in eligible}
+    candidates = Schedule.query.filter(
+        Schedule.player_id.in_(player_ids),
+        Schedule.is_active == True,
+        Schedule.start_date <= max(s.end_date for s in eligible),
+        Schedule.end_date >= min(s.start_date for s in eligible)
+    ).all()
+
+    index = ScheduleConflictIndex(list(candidates) + eligible, missing_times_all_day=True)
+    for schedule in eligible:
+        flags[schedule.id] = index.has_conflicts(schedule.id)
+    return flags
+
+
+def serialize_schedules(schedules, view=DEFAULT_VIEW, has_conflicts=None):
+    """Lista de dicts na projeção pedida; `has_conflicts` (id -> bool) evita o cálculo em lote."""
+    schedules = list(schedules)
+    if has_conflicts is None:
+        has_conflicts = conflict_flags(schedules)
+    if view == 'summary':
+        return [s.to_summary_dict(has_conflicts=has_conflicts.get(s.id, False)) for s in schedules]
+    return [s.to_dict(has_conflicts=has_conflicts.get(s.id, False)) for s in schedules]
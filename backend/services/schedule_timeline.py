@@ -0,0 +1,328 @@
+"""Timeline em memória dos agendamentos (eventos de início/fim por player).
+
+O executor de agendamentos não precisa varrer a tabela inteira a cada minuto:
+mantemos um snapshot leve de cada agendamento ativo (campanha ativa) e, para
+cada player, os instantes em que seu conjunto de agendamentos ativos pode mudar
+(início/fim da janela diária, virada de data da vigência). O executor só
+reavalia os players cujo próximo limite já passou ou cujos agendamentos foram
+alterados (via services.model_events), e carrega do banco apenas o necessário.
+"""
+import heapq
+import threading
+from datetime import datetime, time, timedelta
+
+from database import db
+from models.schedule import Schedule
+from models.campaign import Campaign, CampaignContent
+from models.content import Content
+from services.model_events import subscribe
+from services.schedule_predicates import CompiledScheduleTable, parse_days_of_week
+
+# Tolerância aplicada pelo executor ao fim de janelas normais (mesmo dia)
+GRACE_SECONDS = 30
+# Quanto do futuro materializamos em eventos
+HORIZON = timedelta(hours=36)
+# Reconstrói os eventos quando faltar menos que isso para o fim do horizonte
+HORIZON_REFRESH_MARGIN = timedelta(hours=12)
+
+MIDNIGHT = time(0, 0, 0)
+
+
+def schedule_boundaries(schedule, window_start, window_end, grace_seconds=GRACE_SECONDS):
+    """Instantes em (window_start, window_end] em que a atividade do agendamento pode mudar.
+
+    Aceita model ou snapshot; `grace_seconds` é a tolerância no fim de janelas normais.
+    """
+    out = []
+    if schedule.start_date:
+        out.append(datetime.combine(schedule.start_date.date(), MIDNIGHT))
+    if schedule.end_date:
+        out.append(datetime.combine(schedule.end_date.date() + timedelta(days=1), MIDNIGHT))
+
+    if schedule.start_time and schedule.end_time:
+        allowed = set(parse_days_of_week(schedule.days_of_week))
+        persistent_midnight = bool(schedule.is_persistent) and schedule.end_time == MIDNIGHT
+        overnight = schedule.end_time < schedule.start_time
+        day = window_start.date() - timedelta(days=1)
+        while day <= window_end.date():
+            if day.weekday() in allowed:
+                start_dt = datetime.combine(day, schedule.start_time)
+                if persistent_midnight:
+                    end_dt = datetime.combine(day + timedelta(days=1), MIDNIGHT)
+                elif overnight:
+                    end_dt = datetime.combine(day + timedelta(days=1), schedule.end_time) + timedelta(seconds=1)
+                else:
+                    end_dt = datetime.combine(day, schedule.end_time) + timedelta(seconds=grace_seconds + 1)
+                out.append(start_dt)
+                out.append(end_dt)
+            day += timedelta(days=1)
+
+    return [t for t in out if window_start < t <= window_end]
+
+
+class ScheduleSnapshot:
+    """Cópia imutável (desacoplada da sessão) dos campos usados na avaliação."""
+
+    __slots__ = (
+        'id', 'name', 'player_id', 'campaign_id', 'start_date', 'end_date',
+        'start_time', 'end_time', 'days_of_week', 'repeat_type', 'is_persistent',
+        'priority', 'created_at', 'content_type'
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def boundaries(self, window_start, window_end):
+        return schedule_boundaries(self, window_start, window_end)
+
+
+def _campaign_content_types(campaign_ids=None):
+    """Tipo de conteúdo (main/overlay) por campanha numa única consulta.
+
+    O primeiro conteúdo da campanha (menor order_index) define overlay quando
+    é imagem ou o título contém logo/overlay.
+    """
+    query = db.session.query(
+        CampaignContent.campaign_id, Content.title, Content.content_type
+    ).join(Content, Content.id == CampaignContent.content_id)
+    if campaign_ids is not None:
+        if not campaign_ids:
+            return {}
+        query = query.filter(CampaignContent.campaign_id.in_(list(campaign_ids)))
+    query = query.order_by(CampaignContent.campaign_id, CampaignContent.order_index)
+
+    types = {}
+    for campaign_id, title, content_type in query.all():
+        if campaign_id in types:
+            continue
+        title_l = (title or '').lower()
+        if 'logo' in title_l or 'overlay' in title_l or content_type == 'image':
+            types[campaign_id] = 'overlay'
+        else:
+            types[campaign_id] = 'main'
+    return types
+
+
+class ScheduleTimeline:
+    """Índice por player dos agendamentos elegíveis e de seus próximos limites."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._snapshots = {}     # schedule_id -> ScheduleSnapshot
+        self._by_player = {}     # player_id -> set(schedule_id)
+        self._heap = []          # (instante, player_id, geração)
+        self._generation = {}    # player_id -> geração atual dos eventos
+        self._built_until = None
+        self._due_players = set()
+        self._table = None       # CompiledScheduleTable (recompilada após mudanças)
+        # Alterações recebidas após commits, aplicadas no próximo refresh
+        self._pending_schedules = set()
+        self._pending_campaigns = set()
+        self._pending_contents = set()
+        self._pending_players = set()
+        subscribe(self._on_model_changes)
+
+    # ------------------------------------------------------------------
+    # Invalidação
+    # ------------------------------------------------------------------
+    def _on_model_changes(self, changes):
+        with self._lock:
+            self._pending_schedules.update(changes.get('schedules', ()))
+            self._pending_campaigns.update(changes.get('campaigns', ()))
+            self._pending_campaigns.update(changes.get('affected_campaigns', ()))
+            self._pending_contents.update(changes.get('contents', ()))
+            # Players podem ter deixado de ter agendamentos (schedule movido/excluído)
+            self._pending_players.update(p for p in changes.get('affected_players', ())
+                                         if p in self._by_player)
+
+    def invalidate_all(self):
+        """Força recarga completa no próximo refresh."""
+        with self._lock:
+            self._loaded = False
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def _query_rows(self, schedule_ids=None, campaign_ids=None):
+        query = db.session.query(
+            Schedule.id, Schedule.name, Schedule.player_id, Schedule.campaign_id,
+            Schedule.start_date, Schedule.end_date, Schedule.start_time, Schedule.end_time,
+            Schedule.days_of_week, Schedule.repeat_type, Schedule.is_persistent,
+            Schedule.priority, Schedule.created_at, Schedule.is_active, Campaign.is_active
+        ).outerjoin(Campaign, Campaign.id == Schedule.campaign_id)
+        if schedule_ids is not None or campaign_ids is not None:
+            clauses = []
+            if schedule_ids:
+                clauses.append(Schedule.id.in_(list(schedule_ids)))
+            if campaign_ids:
+                clauses.append(Schedule.campaign_id.in_(list(campaign_ids)))
+            if not clauses:
+                return []
+            query = query.filter(db.or_(*clauses))
+        else:
+            query = query.filter(Schedule.is_active == True, Campaign.is_active == True)
+        return query.all()
+
+    def _snapshot_from_row(self, row, content_types):
+        return ScheduleSnapshot(
+            id=row[0], name=row[1], player_id=row[2], campaign_id=row[3],
+            start_date=row[4], end_date=row[5], start_time=row[6], end_time=row[7],
+            days_of_week=row[8], repeat_type=row[9], is_persistent=row[10],
+            priority=row[11], created_at=row[12],
+            content_type=content_types.get(row[3], 'main')
+        )
+
+    def _add_snapshot(self, snap):
+        self._table = None
+        self._snapshots[snap.id] = snap
+        self._by_player.setdefault(snap.player_id, set()).add(snap.id)
+
+    def _remove_snapshot(self, schedule_id):
+        snap = self._snapshots.pop(schedule_id, None)
+        if snap:
+            self._table = None
+            ids = self._by_player.get(snap.player_id)
+            if ids is not None:
+                ids.discard(schedule_id)
+                if not ids:
+                    del self._by_player[snap.player_id]
+        return snap
+
+    def _full_load(self, now):
+        rows = self._query_rows()
+        content_types = _campaign_content_types()
+        previous_players = set(self._by_player)
+        self._snapshots = {}
+        self._by_player = {}
+        self._table = None
+        for row in rows:
+            self._add_snapshot(self._snapshot_from_row(row, content_types))
+        self._pending_schedules.clear()
+        self._pending_campaigns.clear()
+        self._pending_contents.clear()
+        self._pending_players.clear()
+        self._loaded = True
+        self._rebuild_events(now)
+        # Na carga inicial todos os players precisam de avaliação
+        self._due_players.update(previous_players | set(self._by_player))
+        print(f"[Timeline] Carregados {len(self._snapshots)} agendamentos de {len(self._by_player)} players")
+
+    def _apply_pending(self, now):
+        schedule_ids = set(self._pending_schedules)
+        campaign_ids = set(self._pending_campaigns)
+        content_ids = set(self._pending_contents)
+        players = set(self._pending_players)
+        self._pending_schedules.clear()
+        self._pending_campaigns.clear()
+        self._pending_contents.clear()
+        self._pending_players.clear()
+        if not (schedule_ids or campaign_ids or content_ids or players):
+            return
+
+        if content_ids:
+            # Conteúdo alterado pode mudar o tipo (main/overlay) das campanhas que o usam
+            rows = db.session.query(CampaignContent.campaign_id).filter(
+                CampaignContent.content_id.in_(list(content_ids))
+            ).distinct().all()
+            campaign_ids.update(r[0] for r in rows)
+
+        touched_players = set(players)
+        # Remove snapshots afetados e recarrega apenas eles
+        stale_ids = set(sid for sid in schedule_ids if sid in self._snapshots)
+        if campaign_ids:
+            stale_ids.update(sid for sid, snap in self._snapshots.items() if snap.campaign_id in campaign_ids)
+        for sid in stale_ids:
+            snap = self._remove_snapshot(sid)
+            if snap:
+                touched_players.add(snap.player_id)
+
+        rows = self._query_rows(schedule_ids=schedule_ids, campaign_ids=campaign_ids)
+        reload_campaigns = set(r[3] for r in rows if r[13] and r[14])
+        content_types = _campaign_content_types(reload_campaigns)
+        for row in rows:
+            touched_players.add(row[2])
+            if row[13] and row[14]:
+                self._add_snapshot(self._snapshot_from_row(row, content_types))
+
+        for player_id in touched_players:
+            self._rebuild_player_events(player_id, now)
+        self._due_players.update(touched_players)
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+    def _rebuild_player_events(self, player_id, now):
+        gen = self._generation.get(player_id, 0) + 1
+        self._generation[player_id] = gen
+        window_end = self._built_until or (now + HORIZON)
+        instants = set()
+        for sid in self._by_player.get(player_id, ()):
+            instants.update(self._snapshots[sid].boundaries(now, window_end))
+        for instant in instants:
+            heapq.heappush(self._heap, (instant, player_id, gen))
+
+    def _rebuild_events(self, now):
+        self._heap = []
+        self._built_until = now + HORIZON
+        for player_id in list(self._by_player):
+            self._rebuild_player_events(player_id, now)
+
+    # ------------------------------------------------------------------
+    # API usada pelo executor
+    # ------------------------------------------------------------------
+    def refresh(self, now=None):
+        """Garante snapshot carregado, aplica alterações pendentes e estende o horizonte."""
+        now = now or datetime.now()
+        with self._lock:
+            if not self._loaded:
+                self._full_load(now)
+                return
+            self._apply_pending(now)
+            if self._built_until is None or now >= self._built_until - HORIZON_REFRESH_MARGIN:
+                self._rebuild_events(now)
+
+    def pop_due_players(self, now=None):
+        """Retorna (e consome) os players cujo conjunto ativo pode ter mudado até `now`."""
+        now = now or datetime.now()
+        with self._lock:
+            due = set(self._due_players)
+            self._due_players.clear()
+            while self._heap and self._heap[0][0] <= now:
+                _, player_id, gen = heapq.heappop(self._heap)
+                if self._generation.get(player_id) == gen:
+                    due.add(player_id)
+            return due
+
+    def next_boundary(self):
+        """Próximo instante em que algum player pode mudar de conjunto ativo (ou None)."""
+        with self._lock:
+            while self._heap and self._generation.get(self._heap[0][1]) != self._heap[0][2]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def active_schedule_ids(self, now=None, grace_seconds=GRACE_SECONDS):
+        """IDs de todos os agendamentos ativos em `now`, avaliados numa única passada."""
+        now = now or datetime.now()
+        with self._lock:
+            if self._table is None:
+                self._table = CompiledScheduleTable(self._snapshots.values())
+            return set(self._table.active_keys(now, grace_seconds))
+
+    def schedules_for_player(self, player_id):
+        with self._lock:
+            return [self._snapshots[sid] for sid in self._by_player.get(player_id, ())]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'schedules': len(self._snapshots),
+                'players': len(self._by_player),
+                'pending_events': len(self._heap),
+                'built_until': self._built_until.isoformat() if self._built_until else None,
+            }
+
+
+# Instância global da timeline
+schedule_timeline = ScheduleTimeline()
@@ -0,0 +1,145 @@
+"""Cache em disco dos segmentos normalizados usados pelo VideoCompiler.
+
+Cada CampaignContent vira um segmento MP4 (libx264/yuv420p, AAC 44.1 kHz
+estéreo) com resolução e fps da compilação. O segmento depende apenas do
+arquivo de origem e dos parâmetros de transcodificação, então é guardado em
+uploads/compiled/segments/<chave>.mp4, onde a chave é o SHA-256 de
+(hash da origem, tipo, resolução, fps, duração, filtros, versão do formato).
+Recompilar após reordenar ou adicionar um item só transcodifica o que mudou.
+
+Evicção LRU por mtime (atualizado a cada acerto) até o total caber em
+COMPILE_SEGMENT_CACHE_MB. Cada compilação segura um lease (acquire/release)
+das chaves do seu plano: segmentos em uso por qualquer compilação em
+andamento nunca são removidos. Temporários (.<chave>.<uuid>.tmp.mp4) de
+compilações interrompidas são apagados após COMPILE_SEGMENT_TMP_GRACE_SEC.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+
+COMPILE_SEGMENT_CACHE_MB = int(os.getenv('COMPILE_SEGMENT_CACHE_MB', '5120') or 5120)
+# Idade mínima para apagar um temporário órfão (um segmento em geração ainda o está escrevendo)
+COMPILE_SEGMENT_TMP_GRACE_SEC = int(os.getenv('COMPILE_SEGMENT_TMP_GRACE_SEC', '3600') or 3600)
+# Incrementar quando os argumentos do ffmpeg dos segmentos mudarem
+SEGMENT_FORMAT_VERSION = 1
+
+
+def segment_key(**params):
+    payload = json.dumps(dict(params, format_version=SEGMENT_FORMAT_VERSION), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def source_fingerprint(content, src):
+    """Hash do arquivo de origem: file_hash do banco ou tamanho/mtime para conteúdos legados."""
+    if getattr(content, 'file_hash', None):
+        return content.file_hash
+    st = os.stat(src)
+    return f"stat:{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+class SegmentCache:
+    def __init__(self, directory, max_bytes=COMPILE_SEGMENT_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._leases = Counter()  # chave -> compilações em andamento que a usam
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def get(self, key):
+        """Caminho do segmento em cache (atualiza o mtime para o LRU) ou None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def temp_path(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp.mp4")
+
+    def put(self, key, tmp_path):
+        """Publica atomicamente um segmento recém-gerado; retorna o caminho final."""
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        return path
+
+    def acquire(self, keys):
+        """Marca as chaves como em uso até o release() correspondente."""
+        keys = set(keys)
+        with self._lock:
+            self._leases.update(keys)
+        return keys
+
+    def release(self, keys):
+        with self._lock:
+            self._leases.subtract(keys)
+            self._leases += Counter()  # descarta contagens zeradas
+
+    def evict(self):
+        """Remove os segmentos menos usados até caber no limite; retorna bytes liberados.
+
+        Segmentos com lease ativo são preservados; temporários órfãos mais
+        antigos que COMPILE_SEGMENT_TMP_GRACE_SEC são apagados.
+        """
+        freed = 0
+        with self._lock:
+            keep_paths = {self.path_for(k) for k in self._leases}
+            tmp_cutoff = time.time() - COMPILE_SEGMENT_TMP_GRACE_SEC
+            try:
+                entries = []
+                total = 0
+                for entry in os.scandir(self.directory):
+                    if not entry.is_file() or not entry.name.endswith('.mp4'):
+                        continue
+                    st = entry.stat()
+                    if entry.name.startswith('.'):
+                        if st.st_mtime < tmp_cutoff:
+                            try:
+                                os.remove(entry.path)
+                                freed += st.st_size
+                            except OSError:
+                                pass
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+            except FileNotFoundError:
+                return 0
+            for _mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in keep_paths:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    freed += size
+                except OSError:
+                    pass
+        if freed:
+            print(f"[SegmentCache] {freed // (1024 * 1024)} MB liberados (limite {self.max_bytes // (1024 * 1024)} MB)")
+        return freed
+
+    def stats(self):
+        size = count = 0
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.mp4') and not entry.name.startswith('.'):
+                    size += entry.stat().st_size
+                    count += 1
+        except FileNotFoundError:
+            pass
+        return {'segments': count, 'bytes': size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
@@ -1,8 +1,10 @@
+import json
 import os
 import shutil
 import subprocess
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Optional
 
@@ -10,6 +12,63 @@ from database import db
 from flask import current_app
 from models.campaign import Campaign, CampaignContent
 from models.content import Content
+from services.media_server import media_index
+from services.media_store import media_rel_path
+from services.renditions import AUDIO_BITRATE_KBPS, HLS_SEGMENT_SEC, RENDITION_PRESETS, parse_ladder
+from services.segment_cache import SegmentCache, segment_key, source_fingerprint
+
+
+class CompileCancelled(Exception):
+    """Compilação interrompida por CompileControl.cancel()."""
+
+
+class CompileControl:
+    """Controle de uma compilação em andamento (usado por services.compile_queue).
+
+    Limita as threads de cada processo FFmpeg (`-threads N`) e permite cancelar:
+    cancel() marca o evento e encerra os processos FFmpeg registrados; a próxima
+    verificação levanta CompileCancelled.
+    """
+
+    def __init__(self, threads: int = 0):
+        self.threads = max(0, int(threads or 0))
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._procs = set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise CompileCancelled()
+
+    def apply(self, cmd: List[str]) -> List[str]:
+        """Comando com `-threads N` antes do arquivo de saída (último argumento)."""
+        cmd = list(cmd)
+        if self.threads and cmd and cmd[0] == 'ffmpeg' and '-threads' not in cmd:
+            cmd[-1:-1] = ['-threads', str(self.threads)]
+        return cmd
+
+    def register(self, proc):
+        with self._lock:
+            self._procs.add(proc)
+        if self.cancelled.is_set():
+            self._kill(proc)
+
+    def unregister(self, proc):
+        with self._lock:
+            self._procs.discard(proc)
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            self._kill(proc)
+
+    def _kill(self, proc):
+        try:
+            proc.kill()
+        except Exception:
+            pass
 
 
 class VideoCompiler:
@@ -17,19 +76,19 @@ class VideoCompiler:
         self.uploads_dir = uploads_dir
         self.compiled_dir = os.path.join(self.uploads_dir, 'compiled')
         os.makedirs(self.compiled_dir, exist_ok=True)
+        self.segment_cache = SegmentCache(os.path.join(self.compiled_dir, 'segments'))
+        # Transcodificações de segmentos simultâneas por compilação
+        self.segment_workers = int(os.getenv('COMPILE_SEGMENT_WORKERS', '0') or 0) or max(1, (os.cpu_count() or 2) // 2)
 
     # -------------------- Public API --------------------
-    def start_async_compile(self, campaign_id: str, resolution: str = None, fps: int = None, background_audio_content_id: str = None) -> bool:
+    def start_async_compile(self, campaign_id: str, resolution: str = None, fps: int = None, background_audio_content_id: str = None,
+                            priority: int = 0, requested_by: Optional[str] = None) -> bool:
         try:
             # Validate campaign exists
             campaign = Campaign.query.get(campaign_id)
             if not campaign:
                 return False
 
-            # If already processing, do not start another
-            if campaign.compiled_video_status == 'processing':
-                return True
-
             # Normalizar parâmetros a partir do .env se não informados
             try:
                 preset_map = {
@@ -60,45 +119,50 @@ class VideoCompiler:
                 except Exception:
                     fps = 30
 
-            # Mark as processing
-            campaign.compiled_video_status = 'processing'
-            campaign.compiled_video_error = None
-            campaign.compiled_video_updated_at = datetime.utcnow()
-            db.session.commit()
-
-            # Capture Flask app and launch background thread
-            app = current_app._get_current_object()
-            t = threading.Thread(target=self._compile_campaign_worker, args=(app, campaign_id, resolution, fps, background_audio_content_id), daemon=True)
-            t.start()
-            # Fire start event
-            try:
-                self._emit(app, 'campaign_compile_progress', {
-                    'campaign_id': campaign_id,
-                    'status': 'processing',
-                    'progress': 1,
-                    'message': 'Iniciando compilação'
-                })
-            except Exception:
-                pass
+            # Fila global (services.compile_queue): concorrência limitada, prioridade e persistência
+            from services.compile_queue import compile_queue
+            compile_queue.enqueue(campaign_id, resolution=resolution, fps=fps,
+                                  background_audio_content_id=background_audio_content_id,
+                                  priority=priority, requested_by=requested_by)
             return True
         except Exception as e:
+            print(f"[VideoCompiler] Falha ao enfileirar compilação: {e}")
             try:
                 db.session.rollback()
             except Exception:
                 pass
             return False
 
+    def restore_cancelled(self, campaign: Campaign):
+        """Status da campanha após cancelar a compilação (sem commit).
+
+        Mantém o último vídeo compilado, marcado como desatualizado, se ele ainda existir.
+        """
+        previous = campaign.compiled_video_path
+        if previous and os.path.exists(os.path.join(self.uploads_dir, previous)):
+            campaign.compiled_video_status = 'ready'
+            campaign.compiled_video_error = None
+        else:
+            campaign.compiled_video_status = 'failed'
+            campaign.compiled_video_error = 'Compilação cancelada'
+        campaign.compiled_video_updated_at = datetime.utcnow()
+        campaign.compiled_stale = True
+
     # -------------------- Worker --------------------
-    def _compile_campaign_worker(self, app, campaign_id: str, resolution: str, fps: int, background_audio_content_id: str = None):
+    def _compile_campaign_worker(self, app, campaign_id: str, resolution: str, fps: int, background_audio_content_id: str = None,
+                                 control: Optional['CompileControl'] = None) -> str:
+        """Compila a campanha; retorna 'ready', 'failed' ou 'cancelled'."""
+        control = control or CompileControl()
         # Ensure app context for DB/session access
         with app.app_context():
             campaign = Campaign.query.get(campaign_id)
             if not campaign:
-                return
+                return 'failed'
 
             ts = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             work_dir = os.path.join(self.compiled_dir, 'tmp', str(campaign_id), ts)
             os.makedirs(work_dir, exist_ok=True)
+            leased_keys = set()
 
             try:
                 self._ensure_ffmpeg_available()
@@ -109,13 +173,9 @@ class VideoCompiler:
                     raise RuntimeError('Campaign has no active contents to compile')
 
                 # Prepare segments
-                seg_paths: List[str] = []
                 width, height = self._parse_resolution(resolution)
 
                 total = len(contents)
-                # Estimate total duration for better progress mapping
-                estimated_total_duration = 0.0
-
                 # Preparation done
                 self._emit(app, 'campaign_compile_progress', {
                     'campaign_id': campaign_id,
@@ -124,12 +184,14 @@ class VideoCompiler:
                     'message': f'{total} conteúdos para processar'
                 })
 
+                # Plano de segmentos: chave de cache = origem + parâmetros de transcodificação
+                plan = []
                 for idx, cc in enumerate(contents):
                     content: Optional[Content] = cc.content
                     if not content or not content.file_path:
                         # Skip invalid content
                         continue
-                    src = os.path.join(self.uploads_dir, os.path.basename(content.file_path))
+                    src = os.path.join(self.uploads_dir, media_rel_path(content.file_path))
                     if not os.path.exists(src):
                         # Try original path as-is if stored differently
                         alt = content.file_path
@@ -138,45 +200,20 @@ class VideoCompiler:
                         else:
                             raise FileNotFoundError(f'Content file not found: {content.file_path}')
 
-                    seg_out = os.path.join(work_dir, f'seg_{idx:04d}.mp4')
-
-                    # Allocate a slice of the global progress for this segment within 5..80%
-                    start_pct = 5 + int((idx / total) * 75)
-                    end_pct = 5 + int(((idx + 1) / total) * 75)
-
-                    if (content.content_type or '').lower() == 'image':
-                        duration = int(cc.get_effective_duration() or campaign.content_duration or 10)
-                        estimated_total_duration += max(1, duration)
-                        # Build with progress
-                        self._build_image_segment(
-                            src, seg_out, width, height, fps, duration,
-                            app=app, campaign_id=campaign_id,
-                            start_pct=start_pct, end_pct=end_pct
-                        )
-                        step = 'image'
-                    else:
-                        # Probe input duration to map FFmpeg out_time
-                        src_dur = self._probe_duration(src) or max(1.0, float(cc.get_effective_duration() or 0) or 1)
-                        estimated_total_duration += max(1.0, float(src_dur))
-                        self._transcode_video_segment(
-                            src, seg_out, width, height, fps,
-                            app=app, campaign_id=campaign_id,
-                            start_pct=start_pct, end_pct=end_pct,
-                            input_duration=float(src_dur)
-                        )
-                        step = 'video'
-                    seg_paths.append(seg_out)
-
-                    # Finalize this segment slice at end_pct to avoid visual gaps
-                    try:
-                        self._emit(app, 'campaign_compile_progress', {
-                            'campaign_id': campaign_id,
-                            'status': 'processing',
-                            'progress': end_pct,
-                            'message': f'Segmento {idx + 1}/{total} ({step}) gerado'
-                        })
-                    except Exception:
-                        pass
+                    kind = 'image' if (content.content_type or '').lower() == 'image' else 'video'
+                    duration = None
+                    if kind == 'image':
+                        duration = max(1, int(cc.get_effective_duration() or campaign.content_duration or 10))
+                    key = segment_key(source=source_fingerprint(content, src), kind=kind,
+                                      width=width, height=height, fps=int(fps), duration=duration,
+                                      vf=self._segment_filter(width, height))
+                    plan.append({'idx': idx, 'kind': kind, 'src': src, 'key': key, 'duration': duration})
+
+                control.check()
+                # Lease antes de consultar o cache: outra compilação não remove estes segmentos
+                leased_keys = self.segment_cache.acquire(item['key'] for item in plan)
+                seg_paths, estimated_total_duration = self._resolve_segments(app, campaign_id, plan, width, height, fps, control)
+                control.check()
 
                 if not seg_paths:
                     raise RuntimeError('No valid segments were generated')
@@ -198,7 +235,10 @@ class VideoCompiler:
                 self._concat_segments(list_path, out_full,
                                       app=app, campaign_id=campaign_id,
                                       start_pct=85, end_pct=92,
-                                      total_duration=max(1.0, estimated_total_duration))
+                                      total_duration=max(1.0, estimated_total_duration),
+                                      control=control)
+                # Limite de tamanho do cache (segmentos de compilações em andamento preservados)
+                self.segment_cache.evict()
 
                 # Probe duration
                 self._emit(app, 'campaign_compile_progress', {
@@ -237,7 +277,7 @@ class VideoCompiler:
                         bg_src = None
                         # Resolver caminho do áudio de forma tolerante (não depender do content_type)
                         if bg_content and getattr(bg_content, 'file_path', None):
-                            candidate1 = os.path.join(self.uploads_dir, os.path.basename(bg_content.file_path))
+                            candidate1 = os.path.join(self.uploads_dir, media_rel_path(bg_content.file_path))
                             candidate2 = bg_content.file_path
                             # Se o caminho salvo começar com '/uploads' ou 'uploads', normalizar
                             try:
@@ -282,7 +322,7 @@ class VideoCompiler:
                             out_with_audio
                         ])
 
-                        self._run(cmd, 'mux-background-audio')
+                        self._run(cmd, 'mux-background-audio', control)
 
                         # Replace output with audio version
                         try:
@@ -301,6 +341,8 @@ class VideoCompiler:
                             'progress': 96,
                             'message': 'Música aplicada'
                         })
+                    except CompileCancelled:
+                        raise
                     except Exception as e:
                         # Do not fail compilation if audio mix fails; record warning
                         try:
@@ -313,6 +355,15 @@ class VideoCompiler:
                         except Exception:
                             pass
 
+                # Saída regravada no mesmo caminho: atualizar ETag/tamanho servidos em /uploads
+                media_index.refresh(out_full)
+
+                # Escada HLS/fMP4 opcional (COMPILE_RENDITIONS)
+                control.check()
+                ladder = self._build_ladder(app, campaign_id, out_full, f"campaign_{campaign_id}_{ts}",
+                                            width, height, fps, duration_sec, control)
+                previous_ladder = campaign.get_compiled_renditions()
+
                 # Persist compiled metadata
                 campaign.compiled_video_path = os.path.join('compiled', out_name).replace('\\', '/')
                 campaign.compiled_video_duration = int(duration_sec) if duration_sec is not None else None
@@ -322,7 +373,9 @@ class VideoCompiler:
                 campaign.compiled_stale = False
                 campaign.compiled_video_resolution = f"{width}x{height}"
                 campaign.compiled_video_fps = int(fps)
+                campaign.compiled_renditions = json.dumps(ladder) if ladder else None
                 db.session.commit()
+                self.remove_ladder(previous_ladder)
 
                 # Emit completion event
                 self._emit(app, 'campaign_compile_complete', {
@@ -333,8 +386,24 @@ class VideoCompiler:
                     'compiled_video_url': f"/uploads/{campaign.compiled_video_path}",
                     'duration': campaign.compiled_video_duration,
                     'resolution': campaign.compiled_video_resolution,
-                    'fps': campaign.compiled_video_fps
+                    'fps': campaign.compiled_video_fps,
+                    'renditions': [r['label'] for r in (ladder or {}).get('renditions', [])],
                 })
+                return 'ready'
+            except CompileCancelled:
+                db.session.rollback()
+                try:
+                    self.restore_cancelled(campaign)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                self._emit(app, 'campaign_compile_complete', {
+                    'campaign_id': campaign_id,
+                    'status': 'cancelled',
+                    'progress': 100,
+                    'message': 'Compilação cancelada'
+                })
+                return 'cancelled'
             except Exception as e:
                 try:
                     campaign.compiled_video_status = 'failed'
@@ -354,13 +423,204 @@ class VideoCompiler:
                     })
                 except Exception:
                     pass
+                return 'failed'
             finally:
+                self.segment_cache.release(leased_keys)
                 # Cleanup workspace
                 try:
                     shutil.rmtree(work_dir, ignore_errors=True)
                 except Exception:
                     pass
 
+    # -------------------- Segments --------------------
+    def _resolve_segments(self, app, campaign_id: str, plan: List[dict], width: int, height: int, fps: int,
+                          control: Optional['CompileControl'] = None):
+        """Segmentos na ordem do plano: acertos do cache direto, faltantes gerados em paralelo.
+
+        Retorna (caminhos, duração total estimada em segundos).
+        """
+        total = len(plan)
+        paths = {}
+        misses = {}
+        for item in plan:
+            cached = self.segment_cache.get(item['key'])
+            if cached:
+                paths[item['key']] = cached
+            else:
+                misses.setdefault(item['key'], item)
+
+        self._emit(app, 'campaign_compile_progress', {
+            'campaign_id': campaign_id,
+            'status': 'processing',
+            'progress': 6,
+            'message': f'{total - len(misses)} segmentos em cache, {len(misses)} para gerar'
+        })
+
+        def build(item):
+            if control:
+                control.check()
+            tmp = self.segment_cache.temp_path(item['key'])
+            try:
+                if item['kind'] == 'image':
+                    self._build_image_segment(item['src'], tmp, width, height, fps, item['duration'], control=control)
+                else:
+                    self._transcode_video_segment(item['src'], tmp, width, height, fps, control=control)
+                return self.segment_cache.put(item['key'], tmp)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        if misses:
+            done = 0
+            pool = ThreadPoolExecutor(max_workers=min(self.segment_workers, len(misses)),
+                                      thread_name_prefix='compile-segment')
+            try:
+                futures = {pool.submit(build, item): item for item in misses.values()}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    paths[item['key']] = future.result()
+                    done += 1
+                    self._emit(app, 'campaign_compile_progress', {
+                        'campaign_id': campaign_id,
+                        'status': 'processing',
+                        'progress': 5 + int((done / len(misses)) * 75),
+                        'message': f"Segmento {done}/{len(misses)} ({item['kind']}) gerado"
+                    })
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                pool.shutdown(wait=True)
+
+        seg_paths = [paths[item['key']] for item in plan]
+        estimated_total_duration = 0.0
+        for item, path in zip(plan, seg_paths):
+            if item['kind'] == 'image':
+                estimated_total_duration += item['duration']
+            else:
+                estimated_total_duration += max(1.0, self._probe_duration(path) or 1.0)
+        return seg_paths, estimated_total_duration
+
+    def _segment_filter(self, width: int, height: int) -> str:
+        # Scale with aspect ratio preserved and pad to target
+        return f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p"
+
+    # -------------------- Renditions --------------------
+    def _build_ladder(self, app, campaign_id: str, src: str, name: str, width: int, height: int, fps: int,
+                      duration_sec: Optional[float], control: Optional['CompileControl'] = None) -> Optional[dict]:
+        """Gera a escada HLS/fMP4 de `src` em compiled/hls/<name>/; None se desativada ou se falhar.
+
+        Todas as renditions, inclusive a da resolução compilada, são
+        transcodificadas em paralelo com o mesmo GOP fixo alinhado aos segmentos
+        HLS: o MP4 compilado tem keyframes onde cada item da campanha começa, e
+        um -c copy não ficaria alinhado às demais (#EXT-X-INDEPENDENT-SEGMENTS).
+        A do topo usa qualidade constante (CRF) em vez de bitrate alvo.
+        """
+        ladder = parse_ladder()
+        if not ladder:
+            return None
+        labels = [label for label in ladder if RENDITION_PRESETS[label][1] < height]
+        rel_dir = f"compiled/hls/{name}"
+        out_dir = os.path.join(self.uploads_dir, rel_dir)
+        os.makedirs(out_dir, exist_ok=True)
+        self._emit(app, 'campaign_compile_progress', {
+            'campaign_id': campaign_id,
+            'status': 'processing',
+            'progress': 97,
+            'message': f'Gerando {len(labels) + 1} renditions'
+        })
+
+        source_label = f"{height}p"
+        specs = [{'label': source_label, 'width': width, 'height': height, 'kbps': None}]
+        for label in labels:
+            w, h, kbps = RENDITION_PRESETS[label]
+            specs.append({'label': label, 'width': w, 'height': h, 'kbps': kbps})
+
+        def build(spec):
+            media = os.path.join(out_dir, f"{spec['label']}.mp4")
+            playlist = os.path.join(out_dir, f"{spec['label']}.m3u8")
+            gop = str(int(fps) * HLS_SEGMENT_SEC)
+            kbps = spec['kbps']
+            cmd = [
+                'ffmpeg', '-y', '-loglevel', 'error', '-i', src,
+                '-r', str(int(fps)),
+                '-vf', self._segment_filter(spec['width'], spec['height']),
+                '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+            ]
+            if kbps:
+                cmd.extend(['-b:v', f'{kbps}k', '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k'])
+            cmd.extend([
+                '-g', gop, '-keyint_min', gop, '-sc_threshold', '0',
+                '-c:a', 'aac', '-b:a', f'{AUDIO_BITRATE_KBPS}k', '-ar', '44100', '-ac', '2',
+            ])
+            cmd.extend([
+                '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SEC), '-hls_playlist_type', 'vod',
+                '-hls_segment_type', 'fmp4', '-hls_flags', 'single_file',
+                '-hls_segment_filename', media,
+                playlist
+            ])
+            self._run(cmd, f"rendition-{spec['label']}", control)
+            if not kbps and duration_sec:
+                bandwidth = int(os.path.getsize(media) * 8 / max(1.0, float(duration_sec)))
+            else:
+                bandwidth = ((kbps or 0) + AUDIO_BITRATE_KBPS) * 1000
+            media_index.refresh(media)
+            media_index.refresh(playlist)
+            return {
+                'label': spec['label'],
+                'width': spec['width'],
+                'height': spec['height'],
+                'bandwidth': bandwidth,
+                'path': f"{rel_dir}/{spec['label']}.mp4",
+                'playlist': f"{rel_dir}/{spec['label']}.m3u8",
+            }
+
+        try:
+            pool = ThreadPoolExecutor(max_workers=min(self.segment_workers, len(specs)),
+                                      thread_name_prefix='compile-rendition')
+            try:
+                renditions = list(pool.map(build, specs))
+            finally:
+                pool.shutdown(wait=True)
+            renditions.sort(key=lambda r: r['height'])
+
+            lines = ['#EXTM3U', '#EXT-X-VERSION:7', '#EXT-X-INDEPENDENT-SEGMENTS']
+            for r in renditions:
+                lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']},RESOLUTION={r['width']}x{r['height']},"
+                             f"FRAME-RATE={int(fps)}.000")
+                lines.append(os.path.basename(r['playlist']))
+            master = os.path.join(out_dir, 'master.m3u8')
+            with open(master, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            media_index.refresh(master)
+            return {'master': f"{rel_dir}/master.m3u8", 'renditions': renditions}
+        except CompileCancelled:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+        except Exception as e:
+            # Renditions são opcionais: o MP4 principal continua válido
+            shutil.rmtree(out_dir, ignore_errors=True)
+            self._emit(app, 'campaign_compile_progress', {
+                'campaign_id': campaign_id,
+                'status': 'processing',
+                'progress': 99,
+                'message': f'Falha ao gerar renditions: {str(e)[:200]}'
+            })
+            return None
+
+    def remove_ladder(self, ladder: dict):
+        """Remove do disco a escada de uma compilação anterior."""
+        master = (ladder or {}).get('master')
+        if not master:
+            return
+        out_dir = os.path.join(self.uploads_dir, os.path.dirname(master))
+        for r in ladder.get('renditions', []):
+            for key in ('path', 'playlist'):
+                media_index.invalidate(os.path.join(self.uploads_dir, r[key]))
+        media_index.invalidate(os.path.join(self.uploads_dir, master))
+        shutil.rmtree(out_dir, ignore_errors=True)
+
     # -------------------- Helpers --------------------
     def _emit(self, app, event: str, payload: dict):
         try:
@@ -383,9 +643,8 @@ class VideoCompiler:
         except Exception:
             return 1920, 1080
 
-    def _build_image_segment(self, src: str, out: str, width: int, height: int, fps: int, duration: int, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None):
-        # Scale with aspect ratio preserved and pad to target
-        vf = f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p"
+    def _build_image_segment(self, src: str, out: str, width: int, height: int, fps: int, duration: int, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None, control: Optional['CompileControl']=None):
+        vf = self._segment_filter(width, height)
         dur = str(max(1, duration))
         cmd = [
             'ffmpeg', '-y',
@@ -409,12 +668,12 @@ class VideoCompiler:
             out
         ]
         if app and campaign_id and start_pct is not None and end_pct is not None:
-            self._run_with_progress(cmd, max(1.0, float(duration)), app, campaign_id, start_pct, end_pct, 'Segmento (imagem)')
+            self._run_with_progress(cmd, max(1.0, float(duration)), app, campaign_id, start_pct, end_pct, 'Segmento (imagem)', control)
         else:
-            self._run(cmd, 'image-segment')
+            self._run(cmd, 'image-segment', control)
 
-    def _transcode_video_segment(self, src: str, out: str, width: int, height: int, fps: int, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None, input_duration: Optional[float]=None):
-        vf = f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p"
+    def _transcode_video_segment(self, src: str, out: str, width: int, height: int, fps: int, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None, input_duration: Optional[float]=None, control: Optional['CompileControl']=None):
+        vf = self._segment_filter(width, height)
         cmd = [
             'ffmpeg', '-y',
             '-i', src,
@@ -428,11 +687,26 @@ class VideoCompiler:
             out
         ]
         if app and campaign_id and start_pct is not None and end_pct is not None and input_duration:
-            self._run_with_progress(cmd, max(1.0, float(input_duration)), app, campaign_id, start_pct, end_pct, 'Segmento (vídeo)')
+            self._run_with_progress(cmd, max(1.0, float(input_duration)), app, campaign_id, start_pct, end_pct, 'Segmento (vídeo)', control)
         else:
-            self._run(cmd, 'video-segment')
+            self._run(cmd, 'video-segment', control)
 
-    def _concat_segments(self, list_file: str, out_path: str, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None, total_duration: Optional[float]=None):
+    def _concat_segments(self, list_file: str, out_path: str, app=None, campaign_id: Optional[str]=None, start_pct: Optional[int]=None, end_pct: Optional[int]=None, total_duration: Optional[float]=None, control: Optional['CompileControl']=None):
+        # Segmentos já normalizados (mesmo codec/resolução/fps/áudio): concatenar sem recodificar
+        try:
+            self._run([
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'concat', '-safe', '0',
+                '-i', list_file,
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                out_path
+            ], 'concat-copy', control)
+            return
+        except CompileCancelled:
+            raise
+        except Exception as e:
+            print(f"[VideoCompiler] Concatenação sem recodificar falhou, recodificando: {str(e)[:200]}")
         cmd = [
             'ffmpeg', '-y',
             '-f', 'concat', '-safe', '0',
@@ -443,9 +717,9 @@ class VideoCompiler:
             out_path
         ]
         if app and campaign_id and start_pct is not None and end_pct is not None and total_duration:
-            self._run_with_progress(cmd, max(1.0, float(total_duration)), app, campaign_id, start_pct, end_pct, 'Concatenação')
+            self._run_with_progress(cmd, max(1.0, float(total_duration)), app, campaign_id, start_pct, end_pct, 'Concatenação', control)
         else:
-            self._run(cmd, 'concat')
+            self._run(cmd, 'concat', control)
 
     def _probe_duration(self, file_path: str) -> Optional[float]:
         try:
@@ -461,18 +735,21 @@ class VideoCompiler:
         except Exception:
             return None
 
-    def _run_with_progress(self, cmd: List[str], total_duration: float, app, campaign_id: str, start_pct: int, end_pct: int, stage_label: str):
+    def _run_with_progress(self, cmd: List[str], total_duration: float, app, campaign_id: str, start_pct: int, end_pct: int, stage_label: str,
+                           control: Optional['CompileControl'] = None):
         """Execute FFmpeg and emit progress between start_pct..end_pct using -progress pipe:1 output.
         total_duration is in seconds for the current step. Emits 'campaign_compile_progress'.
         """
         # Insert progress flags for streaming updates
-        cmd_prog = list(cmd)
+        cmd_prog = control.apply(cmd) if control else list(cmd)
         # Prefer minimal log noise and structured progress on stdout
         cmd_prog.insert(1, '-loglevel')
         cmd_prog.insert(2, 'error')
         cmd_prog.extend(['-progress', 'pipe:1', '-nostats'])
 
         proc = subprocess.Popen(cmd_prog, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, universal_newlines=True)
+        if control:
+            control.register(proc)
         last_emit_ts = 0.0
         last_pct = -1
         try:
@@ -524,6 +801,8 @@ class VideoCompiler:
                             last_pct = pct
                             last_emit_ts = now
             proc.wait()
+            if control:
+                control.check()
             if proc.returncode != 0:
                 try:
                     out = proc.stdout.read() if proc.stdout else ''
@@ -531,16 +810,30 @@ class VideoCompiler:
                     out = ''
                 raise RuntimeError(f"FFmpeg step '{stage_label}' failed with code {proc.returncode}. Output tail: {out[-500:]}")
         finally:
+            if control:
+                control.unregister(proc)
             try:
                 if proc and proc.stdout:
                     proc.stdout.close()
             except Exception:
                 pass
 
-    def _run(self, cmd: List[str], step: str):
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    def _run(self, cmd: List[str], step: str, control: Optional['CompileControl'] = None):
+        if control:
+            control.check()
+            cmd = control.apply(cmd)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if control:
+            control.register(proc)
+        try:
+            _, stderr = proc.communicate()
+        finally:
+            if control:
+                control.unregister(proc)
+        if control:
+            control.check()
         if proc.returncode != 0:
-            raise RuntimeError(f"FFmpeg step '{step}' failed: {proc.stderr[-500:]}\nCmd: {' '.join(cmd)}")
+            raise RuntimeError(f"FFmpeg step '{step}' failed: {stderr[-500:]}\nCmd: {' '.join(cmd)}")
 
 
 video_compiler = VideoCompiler()
@@ -0,0 +1,134 @@
+"""Número de consultas das listagens de agendamentos independe do tamanho da página.
+
+Conta os statements SQL de cada requisição (before_cursor_execute) com páginas
+de 5, 20 e 60 agendamentos; se alguma relação voltar a ser carregada item a
+item (N+1), a contagem cresce com a página e o teste falha.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix='tvs-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(_TMP_DIR, 'uploads')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import app, db
+from models.user import User
+from models.location import Location
+from models.player import Player
+from models.campaign import Campaign, CampaignContent
+from models.content import Content
+from models.schedule import Schedule
+
+PAGE_SIZES = (5, 20, 60)
+BASE_DATE = datetime(2030, 1, 1)
+
+
+def _campaign(user, name):
+    campaign = Campaign(name=name, is_active=True)
+    content = Content(title=f'{name}-video', content_type='video', file_path=f'{name}.mp4', user_id=user.id)
+    db.session.add_all([campaign, content])
+    db.session.flush()
+    db.session.add(CampaignContent(campaign_id=campaign.id, content_id=content.id, order_index=0))
+    return campaign
+
+
+def _schedule(name, campaign, player, day):
+    return Schedule(
+        name=name, campaign_id=campaign.id, player_id=player.id,
+        start_date=day, end_date=day + timedelta(hours=23),
+        start_time=time(8, 0), end_time=time(18, 0), days_of_week='0,1,2,3,4,5,6',
+        is_active=True,
+    )
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    """Um player por agendamento; campanha própria por agendamento e outra compartilhada.
+
+    Os da campanha compartilhada são criados antes (ficam fora da primeira página
+    de /api/schedules, ordenada por created_at desc) e bem depois de BASE_DATE
+    (fora das janelas de /range).
+    """
+    total = max(PAGE_SIZES)
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin', email='admin@test', password_hash='x', role='admin', company='C')
+        location = Location(name='Loja', company='C', city='Rio', state='RJ', address='Rua')
+        db.session.add_all([user, location])
+        db.session.flush()
+
+        players = [Player(name=f'player-{i}', location_id=location.id, device_type='modern')
+                   for i in range(total * 2)]
+        db.session.add_all(players)
+        db.session.flush()
+
+        shared = _campaign(user, 'shared')
+        for i in range(total):
+            db.session.add(_schedule(f'shared-{i}', shared, players[total + i], BASE_DATE + timedelta(days=365)))
+        db.session.commit()
+
+        for i in range(total):
+            campaign = _campaign(user, f'camp-{i}')
+            db.session.add(_schedule(f'own-{i}', campaign, players[i], BASE_DATE + timedelta(days=i)))
+        db.session.commit()
+
+        data = {
+            'token': create_access_token(identity=str(user.id)),
+            'shared_campaign_id': shared.id,
+        }
+        db.session.remove()
+    return data
+
+
+def _count_queries(client, token, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url, headers={'Authorization': f'Bearer {token}'})
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements), response.get_json()['schedules']
+
+
+def _range_url(size, view):
+    end = BASE_DATE + timedelta(days=size - 1)
+    return f"/api/schedules/range?start={BASE_DATE:%d/%m/%Y}&end={end:%d/%m/%Y}&view={view}"
+
+
+@pytest.mark.parametrize('endpoint,view', [
+    ('list', 'full'),
+    ('list', 'summary'),
+    ('campaign', 'full'),
+    ('campaign', 'summary'),
+    ('range', 'full'),
+    ('range', 'summary'),
+])
+def test_query_count_is_constant(seeded, endpoint, view):
+    client = app.test_client()
+    counts = {}
+    for size in PAGE_SIZES:
+        if endpoint == 'list':
+            url = f'/api/schedules?per_page={size}&view={view}'
+        elif endpoint == 'campaign':
+            url = f"/api/schedules/campaign/{seeded['shared_campaign_id']}?per_page={size}&view={view}"
+        else:
+            url = _range_url(size, view)
+        counts[size], schedules = _count_queries(client, seeded['token'], url)
+        assert len(schedules) == size
+
+    assert len(set(counts.values())) == 1, counts
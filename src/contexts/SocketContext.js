@@ -140,8 +140,8 @@ export const SocketProvider = ({ children }) => {
           setNotifications(prev => [notification, ...prev.slice(0, 49)]);
         });
 
-        socketInstance.on('player_status_update', (data) => {
-          console.log('Status do player atualizado:', data);
+        socketInstance.on('admin_status_batch', (batch) => {
+          console.log('Status dos players atualizado:', batch);
         });
 
         // Admin traffic stats (room 'admin')
@@ -101,11 +101,14 @@ const PlayerList = () => {
           : p
       )));
     };
-    socket.on('player_status_update', onPlayerStatus);
-    socket.on('playback_status_update', onPlaybackStatus);
+    // Atualizações chegam agrupadas por tick (admin_status_batch)
+    const onStatusBatch = (batch) => {
+      (batch?.player_status || []).forEach(onPlayerStatus);
+      (batch?.playback_status || []).forEach(onPlaybackStatus);
+    };
+    socket.on('admin_status_batch', onStatusBatch);
     return () => {
-      socket.off('player_status_update', onPlayerStatus);
-      socket.off('playback_status_update', onPlaybackStatus);
+      socket.off('admin_status_batch', onStatusBatch);
     };
   }, [socket]);
 